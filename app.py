@@ -1,14 +1,45 @@
 # Usar configuración global de Tesseract
 import configurar_tesseract_global
 
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import Response
-from routes import health, validar, validar_documento, config, risk_levels, alineacion, reclamos, validacion_firma_universal, validar_imagen, validar_factura, validar_factura_nuevo, analisis_forense_imagen, parse_pdf_to_images
+from helpers.type_conversion import NumpyJSONResponse
+from helpers.trazas import MiddlewareTrazas
+from helpers.perfilado import MiddlewarePerfilado
+from helpers.importacion_diferida import precalentar_en_segundo_plano
+from helpers.servidor import extras_precalentamiento
+from config import LOG_LEVEL, PRECALENTAR
+from helpers.trabajos import gestor as trabajos_asincronos
+from helpers.metricas import compartidas as metricas_compartidas
+from routes import health, validar, validar_documento, config, risk_levels, alineacion, reclamos, validacion_firma_universal, validar_imagen, validar_factura, validar_factura_nuevo, analisis_forense_imagen, parse_pdf_to_images, validar_factura_batch, trabajos, metricas, perfiles
  
+logging.basicConfig(level=LOG_LEVEL, format="%(message)s")
+
+
+@asynccontextmanager
+async def ciclo_de_vida(app: FastAPI):
+    # Las dependencias pesadas se importan en el primer uso; con PRECALENTAR se
+    # cargan en un hilo de fondo mientras el servidor ya atiende peticiones
+    # (con gunicorn ya lo hizo el maestro antes del fork y esto no hace nada)
+    if PRECALENTAR:
+        precalentar_en_segundo_plano(extras=extras_precalentamiento())
+    # Cada worker publica sus métricas para que /metrics exponga las de todos
+    metricas_compartidas.iniciar()
+    yield
+    # Worker reciclado o detenido: sus trabajos en cola no van a terminar
+    trabajos_asincronos.detener()
+    metricas_compartidas.detener()
+
+
 app = FastAPI(
     title="Validador SRI + OCR + Comparación productos + Riesgo",
-    version="1.50.0-risk"
+    version="1.50.0-risk",
+    default_response_class=NumpyJSONResponse,
+    lifespan=ciclo_de_vida,
 )
  
 origins = [
@@ -24,8 +55,15 @@ app.add_middleware(
     allow_credentials=False,  # Debe ser False cuando allow_origins=["*"]
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Request-Id", "X-Perfil-Id", "ETag"],
 )
 
+# Perfilado bajo demanda (X-Perfil o PERFIL_MUESTREO)
+app.add_middleware(MiddlewarePerfilado)
+
+# Traza por petición (Server-Timing, log JSON y ?timings=true)
+app.add_middleware(MiddlewareTrazas)
+
 # Endpoint para manejar peticiones OPTIONS (CORS preflight)
 @app.options("/{path:path}")
 async def options_handler(path: str):
@@ -53,5 +91,9 @@ app.include_router(validar_factura.router)
 app.include_router(validar_factura_nuevo.router)
 app.include_router(analisis_forense_imagen.router)
 app.include_router(parse_pdf_to_images.router)
+app.include_router(validar_factura_batch.router)
+ 
  
- 
\ No newline at end of file
+app.include_router(trabajos.router)
+app.include_router(metricas.router)
+app.include_router(perfiles.router)
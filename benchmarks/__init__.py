@@ -0,0 +1,11 @@
+"""
+Benchmarks de la API (no forman parte del servicio). Ver docs/BENCHMARKS.md.
+
+    python -m benchmarks.corpus            # corpus sintético y determinista de facturas
+    python -m benchmarks.etapas            # p50/p95, RSS pico y llamadas por etapa del análisis
+    python -m benchmarks.sri_falso         # servicio SOAP local que imita AutorizacionComprobantesOffline
+    python -m benchmarks.carga             # carga a tasa fija contra la API: throughput, latencias, CPU por worker
+    python -m benchmarks.importacion       # arranque en frío: import app, /health y dependencias cargadas de más
+    python -m benchmarks.comparar          # compuerta de regresiones entre dos resultados (o dos commits)
+    python -m benchmarks.clave_acceso      # escáner de claves de acceso con entradas adversarias
+"""
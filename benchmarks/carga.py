@@ -0,0 +1,349 @@
+"""
+Prueba de carga de extremo a extremo contra la API, sin SRI real.
+
+Reenvía los PDFs del corpus (benchmarks.corpus) al endpoint con una tasa
+objetivo constante (lazo abierto: las peticiones salen a su hora aunque las
+anteriores no hayan vuelto) e informa throughput, percentiles de latencia,
+errores y CPU/RSS por proceso del servidor.
+
+    python -m benchmarks.sri_falso --corpus benchmarks/corpus &
+    SRI_WSDL="http://127.0.0.1:8790/comprobantes-electronicos-ws/AutorizacionComprobantesOffline?wsdl" \\
+        uvicorn main:app --port 8001 --workers 2 &
+    python -m benchmarks.carga --url http://127.0.0.1:8001 --rps 4 --duracion 60 \\
+        --pid $(pgrep -of "uvicorn main:app") --sri http://127.0.0.1:8790 --json benchmarks/resultados/carga.json
+
+La latencia se mide de dos formas: desde que la petición sale (latencia_ms) y
+desde la hora en que debía salir (latencia_programada_ms). Si el cliente se
+queda sin conexiones libres (--concurrencia), la segunda incluye esa espera y
+no esconde la saturación del servidor.
+
+Con --pid se leen /proc/<pid> y sus descendientes (workers de uvicorn, procesos
+de paralelo_paginas): segundos de CPU, % de un núcleo y RSS máximo de cada uno.
+Solo en Linux, y el proceso tiene que ser visible desde donde corre la carga.
+"""
+
+import argparse
+import base64
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+import urllib.request
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from benchmarks.comun import DIRECTORIO, MANIFIESTO, cargar_manifiesto, entorno, huella_corpus, resumen_ms
+
+VERSION_FORMATO = 1
+PERCENTILES = (50, 90, 95, 99)
+
+
+# ---- Cliente ----
+
+class _Cliente(threading.local):
+    """Una conexión HTTP persistente por hilo."""
+
+    def __init__(self, url: str, timeout: float):
+        partes = urlsplit(url)
+        self.host, self.puerto = partes.hostname, partes.port or 80
+        self.timeout = timeout
+        self.conexion: Optional[http.client.HTTPConnection] = None
+
+    def enviar(self, ruta: str, cuerpo: bytes, tipo: str) -> Tuple[int, bytes]:
+        reutilizada = self.conexion is not None
+        if self.conexion is None:
+            self.conexion = http.client.HTTPConnection(self.host, self.puerto, timeout=self.timeout)
+        try:
+            self.conexion.request("POST", ruta, body=cuerpo, headers={"Content-Type": tipo})
+            respuesta = self.conexion.getresponse()
+            return respuesta.status, respuesta.read()
+        except (BrokenPipeError, ConnectionResetError, http.client.RemoteDisconnected):
+            self.conexion.close()
+            self.conexion = None
+            # El servidor cerró la conexión inactiva (p. ej. un worker que se recicló):
+            # se reintenta una vez en una nueva, como hacen los clientes HTTP
+            if reutilizada:
+                return self.enviar(ruta, cuerpo, tipo)
+            raise
+        except Exception:
+            self.conexion.close()
+            self.conexion = None
+            raise
+
+
+def _cuerpo(endpoint: str, pdf: bytes) -> Tuple[bytes, str]:
+    """/validar-factura recibe JSON con base64; las variantes /archivo, el PDF tal cual."""
+    if endpoint.rstrip("/").endswith("/archivo"):
+        return pdf, "application/pdf"
+    return json.dumps({"pdfbase64": base64.b64encode(pdf).decode("ascii")}).encode(), "application/json"
+
+
+def _resultado_respuesta(status: int, datos: bytes) -> str:
+    if status != 200:
+        return f"http_{status}"
+    try:
+        return "sri_verificado" if json.loads(datos).get("sri_verificado") else "sri_no_verificado"
+    except Exception:
+        return "json_invalido"
+
+
+# ---- Procesos del servidor (/proc) ----
+
+_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+_PAGINA = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _stat(pid: int) -> Optional[Tuple[int, float, int]]:
+    """(ppid, segundos de CPU, RSS en bytes) de /proc/<pid>/stat."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            campos = f.read().rsplit(")", 1)[1].split()
+    except (OSError, IndexError):
+        return None
+    # Tras el nombre: estado(3) ppid(4) ... utime(14) stime(15) ... rss(24)
+    return int(campos[1]), (int(campos[11]) + int(campos[12])) / _TICKS, int(campos[21]) * _PAGINA
+
+
+def _arbol(raiz: int) -> Dict[int, Tuple[float, int]]:
+    """pid -> (CPU, RSS) de `raiz` y todos sus descendientes."""
+    estados = {}
+    for nombre in os.listdir("/proc"):
+        if nombre.isdigit():
+            stat = _stat(int(nombre))
+            if stat:
+                estados[int(nombre)] = stat
+    hijos = defaultdict(list)
+    for pid, (ppid, _, _) in estados.items():
+        hijos[ppid].append(pid)
+    arbol, pendientes = {}, [raiz]
+    while pendientes:
+        pid = pendientes.pop()
+        if pid in estados:
+            arbol[pid] = estados[pid][1:]
+            pendientes += hijos[pid]
+    return arbol
+
+
+def _comando(pid: int) -> str:
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            return f.read().replace(b"\0", b" ").decode(errors="replace").strip()[:120]
+    except OSError:
+        return ""
+
+
+class MonitorProcesos:
+    """Muestrea CPU y RSS del árbol de procesos del servidor durante la prueba."""
+
+    def __init__(self, pid: int, intervalo: float = 1.0):
+        self.pid = pid
+        self.intervalo = intervalo
+        self.inicial = {p: cpu for p, (cpu, _) in _arbol(pid).items()}
+        self.ultimo: Dict[int, float] = {}
+        self.rss_max: Dict[int, int] = {}
+        self.comandos: Dict[int, str] = {}
+        self._parar = threading.Event()
+        self._hilo = threading.Thread(target=self._bucle, daemon=True)
+        self._inicio = time.perf_counter()
+
+    def _muestrear(self) -> None:
+        for p, (cpu, rss) in _arbol(self.pid).items():
+            self.ultimo[p] = cpu
+            self.rss_max[p] = max(rss, self.rss_max.get(p, 0))
+            if p not in self.comandos:
+                self.comandos[p] = _comando(p)
+
+    def _bucle(self) -> None:
+        while not self._parar.wait(self.intervalo):
+            self._muestrear()
+
+    def iniciar(self) -> None:
+        self._inicio = time.perf_counter()
+        self._hilo.start()
+
+    def terminar(self) -> List[Dict[str, Any]]:
+        self._parar.set()
+        self._hilo.join()
+        self._muestrear()
+        duracion = time.perf_counter() - self._inicio
+        procesos = []
+        for p in sorted(self.ultimo):
+            # Los procesos que nacieron durante la prueba cuentan desde 0
+            cpu = self.ultimo[p] - self.inicial.get(p, 0.0)
+            procesos.append({
+                "pid": p,
+                "comando": self.comandos.get(p, ""),
+                "cpu_s": round(cpu, 2),
+                "cpu_pct": round(100.0 * cpu / duracion, 1) if duracion else None,
+                "rss_max_mb": round(self.rss_max.get(p, 0) / (1024 * 1024), 1),
+            })
+        return procesos
+
+
+def _estadisticas_sri(url: Optional[str]) -> Optional[Dict[str, int]]:
+    if not url:
+        return None
+    try:
+        with urllib.request.urlopen(url.rstrip("/") + "/estadisticas", timeout=5) as r:
+            return json.load(r)
+    except Exception:
+        return None
+
+
+# ---- Carga ----
+
+def ejecutar(url: str, directorio: str, rps: float, duracion: float, concurrencia: int,
+             endpoint: str = "/validar-factura/archivo", consulta: str = "", tipos: Optional[List[str]] = None,
+             timeout: float = 120.0, pid: Optional[int] = None, url_sri: Optional[str] = None) -> Dict[str, Any]:
+    manifiesto = cargar_manifiesto(directorio)
+    documentos = []
+    for archivo in manifiesto["archivos"]:
+        if archivo["archivo"].endswith(".pdf") and (not tipos or archivo["tipo"] in tipos):
+            with open(os.path.join(directorio, archivo["archivo"]), "rb") as f:
+                documentos.append((archivo["tipo"], *_cuerpo(endpoint, f.read())))
+    if not documentos:
+        raise ValueError("no hay PDFs del corpus para enviar")
+
+    ruta = endpoint + (f"?{consulta}" if consulta else "")
+    cliente = _Cliente(url, timeout)
+    muestras: List[Dict[str, Any]] = []
+    lock = threading.Lock()
+
+    def enviar(n: int, programada: float) -> None:
+        tipo, cuerpo, contenido = documentos[n % len(documentos)]
+        t0 = time.perf_counter()
+        try:
+            status, datos = cliente.enviar(ruta, cuerpo, contenido)
+            resultado = _resultado_respuesta(status, datos)
+        except Exception as e:
+            status, resultado = None, f"excepcion_{type(e).__name__}"
+        t1 = time.perf_counter()
+        with lock:
+            muestras.append({"tipo": tipo, "status": status, "resultado": resultado,
+                             "latencia": t1 - t0, "programada": t1 - programada})
+
+    sri_antes = _estadisticas_sri(url_sri)
+    monitor = MonitorProcesos(pid) if pid else None
+    if monitor:
+        monitor.iniciar()
+
+    intervalo = 1.0 / rps
+    inicio = time.perf_counter()
+    enviadas = 0
+    with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+        while True:
+            programada = inicio + enviadas * intervalo
+            if programada - inicio >= duracion:
+                break
+            espera = programada - time.perf_counter()
+            if espera > 0:
+                time.sleep(espera)
+            pool.submit(enviar, enviadas, programada)
+            enviadas += 1
+    # Al salir del pool ya volvieron todas: la ventana llega hasta la última respuesta
+    ventana = time.perf_counter() - inicio
+
+    procesos = monitor.terminar() if monitor else None
+    sri_despues = _estadisticas_sri(url_sri)
+    return _informe(url, ruta, manifiesto, rps, duracion, concurrencia, enviadas,
+                    muestras, ventana, procesos, sri_antes, sri_despues)
+
+
+def _informe(url, ruta, manifiesto, rps, duracion, concurrencia, enviadas, muestras, ventana,
+             procesos, sri_antes, sri_despues) -> Dict[str, Any]:
+    correctas = [m for m in muestras if m["status"] == 200]
+    resultados = Counter(m["resultado"] for m in muestras)
+    errores = len(muestras) - len(correctas)
+    por_tipo = {}
+    for tipo in sorted({m["tipo"] for m in muestras}):
+        del_tipo = [m for m in muestras if m["tipo"] == tipo]
+        por_tipo[tipo] = {
+            **resumen_ms([m["latencia"] for m in del_tipo], PERCENTILES),
+            "errores": sum(1 for m in del_tipo if m["status"] != 200),
+        }
+    informe = {
+        "benchmark": "carga",
+        "version": VERSION_FORMATO,
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        # Entorno del cliente; el commit es el del servidor solo si corren del mismo checkout
+        "entorno": entorno(),
+        "corpus": huella_corpus(manifiesto),
+        "parametros": {
+            "url": url, "ruta": ruta, "rps_objetivo": rps, "duracion_s": duracion, "concurrencia": concurrencia,
+        },
+        "enviadas": enviadas,
+        "completadas": len(muestras),
+        "duracion_real_s": round(ventana, 2),
+        # Respuestas 200 por segundo, desde el primer envío hasta la última respuesta
+        "rps_logrado": round(len(correctas) / ventana, 3) if ventana else 0.0,
+        "tasa_error": round(errores / len(muestras), 4) if muestras else None,
+        "resultados": dict(resultados),
+        "latencia_ms": resumen_ms([m["latencia"] for m in muestras], PERCENTILES) if muestras else None,
+        "latencia_programada_ms": resumen_ms([m["programada"] for m in muestras], PERCENTILES) if muestras else None,
+        "por_tipo": por_tipo,
+        "servidor": procesos,
+    }
+    if sri_despues is not None:
+        antes = Counter(sri_antes or {})
+        informe["sri_falso"] = {k: v - antes.get(k, 0) for k, v in sri_despues.items() if v - antes.get(k, 0)}
+    return informe
+
+
+def _imprimir(informe: Dict[str, Any]) -> None:
+    p = informe["parametros"]
+    print(f"\n{informe['completadas']}/{informe['enviadas']} respuestas a {p['rps_objetivo']} rps objetivo "
+          f"({informe['rps_logrado']} rps logrados, error {informe['tasa_error']})")
+    for nombre in ("latencia_ms", "latencia_programada_ms"):
+        lat = informe[nombre]
+        if lat:
+            print(f"  {nombre:<24} " + "  ".join(f"p{q} {lat[f'p{q}_ms']:.0f}" for q in PERCENTILES)
+                  + f"  max {lat['max_ms']:.0f}")
+    print("  resultados: " + ", ".join(f"{k}={v}" for k, v in sorted(informe["resultados"].items())))
+    for proceso in informe["servidor"] or []:
+        print(f"  pid {proceso['pid']:<7} CPU {proceso['cpu_s']:>7.1f} s ({proceso['cpu_pct']:>5.1f}%)  "
+              f"RSS máx {proceso['rss_max_mb']:>7.1f} MB  {proceso['comando'][:60]}")
+    if "sri_falso" in informe:
+        print("  SRI falso: " + ", ".join(f"{k}={v}" for k, v in sorted(informe["sri_falso"].items())))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8001", help="base de la API")
+    parser.add_argument("--endpoint", default="/validar-factura/archivo",
+                        help="ruta; /validar-factura envía JSON con base64, las que terminan en /archivo el PDF")
+    parser.add_argument("--consulta", default="", help="query string, p. ej. detail=summary")
+    parser.add_argument("--corpus", default=DIRECTORIO, help="directorio generado por benchmarks.corpus")
+    parser.add_argument("--tipos", help="solo estos tipos de PDF del corpus, separados por coma")
+    parser.add_argument("--rps", type=float, default=2.0, help="peticiones por segundo objetivo")
+    parser.add_argument("--duracion", type=float, default=30.0, help="segundos enviando peticiones")
+    parser.add_argument("--concurrencia", type=int, default=32, help="peticiones en vuelo como máximo")
+    parser.add_argument("--timeout", type=float, default=120.0, help="timeout por petición (s)")
+    parser.add_argument("--pid", type=int, help="PID del servidor (uvicorn/gunicorn) para medir CPU por proceso")
+    parser.add_argument("--sri", help="base del SRI falso, para contar sus consultas durante la prueba")
+    parser.add_argument("--json", help="archivo donde guardar el informe")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(os.path.join(args.corpus, MANIFIESTO)):
+        parser.error(f"no hay corpus en {args.corpus}; generarlo con: python -m benchmarks.corpus --salida {args.corpus}")
+    if args.pid and not os.path.exists(f"/proc/{args.pid}"):
+        parser.error(f"no se ve el proceso {args.pid} en /proc")
+
+    informe = ejecutar(args.url, args.corpus, args.rps, args.duracion, args.concurrencia, args.endpoint,
+                       args.consulta, args.tipos.split(",") if args.tipos else None, args.timeout,
+                       args.pid, args.sri)
+    _imprimir(informe)
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(informe, f, ensure_ascii=False, indent=2)
+        print(f"\nInforme en {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""
+Benchmark adversario del escáner de claves de acceso (helpers/clave_acceso).
+
+Mide el escáner lineal contra los patrones que reemplazó, con textos que
+hacen retroceder a las expresiones regulares: corridas largas de dígitos y
+espacios, muchas etiquetas seguidas de casi-claves de 48 dígitos y ruido de
+OCR. El tiempo por carácter del escáner debe mantenerse estable al crecer la
+entrada.
+
+    python -m benchmarks.clave_acceso
+    python -m benchmarks.clave_acceso --tamanos 10000,100000,1000000 --max-legado 100000 --json resultado.json
+"""
+
+import argparse
+import json
+import random
+import re
+import sys
+import time
+from typing import Callable, Dict, List
+
+from helpers.clave_acceso import dv_modulo11, escanear_claves
+
+# ---- Patrones anteriores (solo para comparar) ----
+_DIGITS49_FLEX = r"((?:\d[\s-]*){49})"
+_DIGITS49_SIMPLE = r"(\d{49}|" + r"\s+".join([r"\d{1,2}"] * 49) + ")"
+_ETIQUETAS_LEGADO = [r"\bCLAVE\s*DE\s*ACCESO\b", r"\bCLAVE\s*ACCESO\b"]
+
+
+def _legado_pdf_extract(t: str):
+    """Búsqueda por etiqueta de pdf_extract antes del escáner lineal."""
+    for etiqueta in _ETIQUETAS_LEGADO:
+        for m in re.finditer(etiqueta, t, flags=re.I):
+            ventana = t[m.end():m.end() + 2000]
+            for patron in (_DIGITS49_FLEX, _DIGITS49_SIMPLE, r"(\d{49})", r"(\d+(?:\s+\d+)*)"):
+                for prefijo in (r"[:\s-]*", r"[\r\n]+[:\s-]*"):
+                    encontrado = re.search(prefijo + patron, ventana)
+                    if encontrado and len(re.sub(r"\D", "", encontrado.group(1))) == 49:
+                        return encontrado.group(1)
+    return None
+
+
+def _legado_capturas(t: str):
+    """Barrido global de invoice_capture_parser.extract_sri_access_key."""
+    return re.findall(r"(?:\d[\s\-.]{0,2}){44,50}", t)
+
+
+def _legado_factura_parser(t: str):
+    """Barrido de helpers/pdf_factura_parser."""
+    return re.findall(r"\d[\d\s]{47,70}\d", t)
+
+
+IMPLEMENTACIONES: Dict[str, Callable[[str], object]] = {
+    "escaner_lineal": escanear_claves,
+    "legado_pdf_extract": _legado_pdf_extract,
+    "legado_capturas": _legado_capturas,
+    "legado_factura_parser": _legado_factura_parser,
+}
+
+
+def _clave_valida(rng: random.Random) -> str:
+    d = lambda n: "".join(rng.choice("0123456789") for _ in range(n))
+    base = f"{rng.randint(1, 28):02d}{rng.randint(1, 12):02d}2024" + "01" + d(13) + "2" + d(6) + d(9) + d(8) + "1"
+    return base + str(dv_modulo11(base))
+
+
+def _repetir(trozo: str, tamano: int) -> str:
+    return (trozo * (tamano // len(trozo) + 1))[:tamano]
+
+
+def generar_casos(tamano: int, semilla: int = 7) -> Dict[str, str]:
+    """Textos adversarios de ~tamano caracteres (deterministas)."""
+    rng = random.Random(semilla)
+    ruido = "".join(rng.choice("0123456789     -.\n") for _ in range(tamano))
+    clave = _clave_valida(rng)
+    return {
+        # Una sola corrida enorme de dígitos separados por espacios
+        "digitos_espaciados": _repetir("1 ", tamano),
+        # Muchas etiquetas, cada una seguida de una casi-clave (48 dígitos) con separadores
+        "etiquetas_casi_clave": _repetir("CLAVE DE ACCESO: " + " ".join("1" * 48) + " x\n", tamano),
+        # Dígitos, separadores y saltos de línea al azar
+        "ruido_ocr": ruido,
+        # Ruido con una clave real al final, tras su etiqueta
+        "ruido_con_clave": ruido[:max(0, tamano - 80)] + "\nCLAVE DE ACCESO\n" + clave,
+    }
+
+
+def _medir(funcion: Callable[[str], object], texto: str, repeticiones: int) -> float:
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        funcion(texto)
+        mejor = min(mejor, time.perf_counter() - t0)
+    return mejor
+
+
+def ejecutar(tamanos: List[int], max_legado: int, repeticiones: int) -> List[Dict[str, object]]:
+    resultados = []
+    for tamano in tamanos:
+        for caso, texto in generar_casos(tamano).items():
+            for nombre, funcion in IMPLEMENTACIONES.items():
+                if nombre != "escaner_lineal" and tamano > max_legado:
+                    continue
+                segundos = _medir(funcion, texto, repeticiones)
+                resultados.append({
+                    "implementacion": nombre,
+                    "caso": caso,
+                    "caracteres": len(texto),
+                    "segundos": round(segundos, 6),
+                    "us_por_caracter": round(segundos * 1e6 / max(1, len(texto)), 4),
+                })
+    return resultados
+
+
+def _verificar() -> None:
+    """El escáner encuentra la clave real en el caso con ruido."""
+    casos = generar_casos(5000)
+    _, clave = casos["ruido_con_clave"].rsplit("\n", 1)
+    candidatos = escanear_claves(casos["ruido_con_clave"])
+    if not candidatos or candidatos[0].clave != clave:
+        raise SystemExit(f"El escáner no eligió la clave esperada {clave}: {candidatos[:3]}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamanos", default="10000,100000,1000000", help="tamaños de entrada (caracteres)")
+    parser.add_argument("--max-legado", type=int, default=100000, help="tamaño máximo para los patrones anteriores")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--json", help="archivo donde guardar los resultados")
+    args = parser.parse_args(argv)
+
+    _verificar()
+    tamanos = [int(t) for t in args.tamanos.split(",") if t.strip()]
+    resultados = ejecutar(tamanos, args.max_legado, args.repeticiones)
+
+    print(f"{'implementación':<24}{'caso':<24}{'caracteres':>12}{'segundos':>12}{'µs/car':>10}")
+    for r in resultados:
+        print(f"{r['implementacion']:<24}{r['caso']:<24}{r['caracteres']:>12}{r['segundos']:>12.4f}{r['us_por_caracter']:>10.3f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"benchmark": "clave_acceso", "resultados": resultados}, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
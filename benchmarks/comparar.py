@@ -0,0 +1,304 @@
+"""
+Compuerta de regresiones de rendimiento: compara dos resultados de
+benchmarks.etapas (o de benchmarks.carga o benchmarks.importacion) y falla si
+alguno empeora más de lo permitido.
+
+    python -m benchmarks.etapas --json /tmp/etapas.json
+    python -m benchmarks.comparar guardar /tmp/etapas.json      # benchmarks/resultados/<commit>/etapas.json
+    python -m benchmarks.comparar main HEAD                     # resultados guardados de dos commits
+    python -m benchmarks.comparar base.json /tmp/etapas.json --umbral p95_ms=0.25 --umbral ocr.p95_ms=1.0
+
+Cada resultado se reduce a métricas por ámbito: la etapa ("ocr") y la etapa
+por tipo del corpus ("ocr/captura_4mp_jpg"); en carga, "carga" y
+"carga/<tipo>"; en importacion, "importacion" y "importacion/arranque". Métricas:
+
+- p95_ms       p95 de la etapa; por tipo, el mayor p95 de sus archivos
+- tesseract    invocaciones a Tesseract por ejecución (suma de los archivos)
+- rss_pico_mb  pico de RSS del proceso de la etapa (solo por etapa: por tipo
+               depende del orden de los archivos); en carga, el mayor por worker
+- errores      casos que fallan (tasa_error en carga); en importacion, dependencias
+               diferidas que se importan al arrancar
+
+Una métrica es regresión si sube más del umbral relativo Y más del mínimo
+absoluto (el mínimo evita fallar por ruido en etapas de pocos ms). Los
+umbrales se cambian con --umbral metrica=relativo[:minimo] para todas las
+etapas o etapa.metrica=... para una, p. ej. al volver a activar un análisis
+sabiendo lo que cuesta.
+
+Código de salida: 0 sin regresiones, 1 con regresiones, 2 si los resultados
+no son comparables (otro corpus u otros parámetros; --forzar lo ignora).
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+from benchmarks.comun import RESULTADOS, commit
+
+# métrica -> (relativo, mínimo absoluto)
+UMBRALES: Dict[str, Tuple[float, float]] = {
+    "p95_ms": (0.15, 5.0),
+    "tesseract": (0.0, 0.0),
+    "rss_pico_mb": (0.10, 10.0),
+    "errores": (0.0, 0.0),
+    "tasa_error": (0.0, 0.01),
+}
+
+SIN_CAMBIOS, REGRESION, MEJORA, NUEVA, AUSENTE = "=", "REGRESIÓN", "mejora", "nueva", "ausente"
+
+Metricas = Dict[Tuple[str, str], float]
+
+
+# ---- Métricas ----
+
+def _metricas_etapas(resultado: Dict[str, Any]) -> Metricas:
+    metricas: Metricas = {}
+    for nombre, etapa in resultado["etapas"].items():
+        if etapa.get("total"):
+            metricas[(nombre, "p95_ms")] = etapa["total"]["p95_ms"]
+        metricas[(nombre, "tesseract")] = etapa.get("llamadas", {}).get("tesseract", 0)
+        if etapa.get("rss_pico_mb") is not None:
+            metricas[(nombre, "rss_pico_mb")] = etapa["rss_pico_mb"]
+        metricas[(nombre, "errores")] = etapa.get("errores", 0)
+
+        por_tipo: Dict[str, List[Dict[str, Any]]] = {}
+        for caso in etapa["casos"].values():
+            por_tipo.setdefault(caso["tipo"], []).append(caso)
+        for tipo, casos in por_tipo.items():
+            ambito = f"{nombre}/{tipo}"
+            medidos = [c for c in casos if "error" not in c]
+            if medidos:
+                metricas[(ambito, "p95_ms")] = max(c["p95_ms"] for c in medidos)
+                metricas[(ambito, "tesseract")] = round(sum(c["llamadas"].get("tesseract", 0) for c in medidos), 2)
+            metricas[(ambito, "errores")] = len(casos) - len(medidos)
+    return metricas
+
+
+def _metricas_carga(resultado: Dict[str, Any]) -> Metricas:
+    metricas: Metricas = {}
+    if resultado.get("latencia_ms"):
+        metricas[("carga", "p95_ms")] = resultado["latencia_ms"]["p95_ms"]
+    if resultado.get("tasa_error") is not None:
+        metricas[("carga", "tasa_error")] = resultado["tasa_error"]
+    if resultado.get("servidor"):
+        metricas[("carga", "rss_pico_mb")] = max(p["rss_max_mb"] for p in resultado["servidor"])
+    for tipo, datos in resultado.get("por_tipo", {}).items():
+        metricas[(f"carga/{tipo}", "p95_ms")] = datos["p95_ms"]
+        metricas[(f"carga/{tipo}", "errores")] = datos["errores"]
+    return metricas
+
+
+def _metricas_importacion(resultado: Dict[str, Any]) -> Metricas:
+    metricas: Metricas = {
+        ("importacion", "p95_ms"): resultado["import_ms"]["p95_ms"],
+        # Cada dependencia diferida que se vuelve a importar al arrancar cuenta como error
+        ("importacion", "errores"): len(resultado.get("diferidos") or {}),
+    }
+    if resultado.get("arranque_ms"):
+        metricas[("importacion/arranque", "p95_ms")] = resultado["arranque_ms"]["p95_ms"]
+    return metricas
+
+
+EXTRACTORES = {"etapas": _metricas_etapas, "carga": _metricas_carga, "importacion": _metricas_importacion}
+
+
+def metricas(resultado: Dict[str, Any]) -> Metricas:
+    tipo = resultado.get("benchmark")
+    if tipo not in EXTRACTORES:
+        raise ValueError(f"resultado de benchmark desconocido: {tipo!r}")
+    return EXTRACTORES[tipo](resultado)
+
+
+# ---- Comparación ----
+
+def umbral(umbrales: Dict[str, Tuple[float, float]], ambito: str, metrica: str) -> Tuple[float, float]:
+    """El umbral más específico: etapa/tipo.metrica, etapa.metrica, metrica."""
+    etapa = ambito.split("/", 1)[0]
+    for clave in (f"{ambito}.{metrica}", f"{etapa}.{metrica}", metrica):
+        if clave in umbrales:
+            return umbrales[clave]
+    return 0.0, 0.0
+
+
+def _estado(base: float, nuevo: float, relativo: float, minimo: float) -> str:
+    delta = nuevo - base
+    if delta > minimo and delta > base * relativo:
+        return REGRESION
+    if -delta > minimo and -delta > base * relativo:
+        return MEJORA
+    return SIN_CAMBIOS
+
+
+def comparar(base: Dict[str, Any], nuevo: Dict[str, Any],
+             umbrales: Optional[Dict[str, Tuple[float, float]]] = None) -> List[Dict[str, Any]]:
+    """Una fila por (ámbito, métrica) presente en alguno de los dos resultados."""
+    umbrales = {**UMBRALES, **(umbrales or {})}
+    antes, despues = metricas(base), metricas(nuevo)
+    filas = []
+    for ambito, metrica in sorted(set(antes) | set(despues)):
+        a, d = antes.get((ambito, metrica)), despues.get((ambito, metrica))
+        relativo, minimo = umbral(umbrales, ambito, metrica)
+        if a is None or d is None:
+            estado = NUEVA if a is None else AUSENTE
+        else:
+            estado = _estado(a, d, relativo, minimo)
+        filas.append({
+            "ambito": ambito, "metrica": metrica, "base": a, "nuevo": d,
+            "delta": round(d - a, 3) if a is not None and d is not None else None,
+            "delta_pct": round(100.0 * (d - a) / a, 1) if a and d is not None else None,
+            "umbral": {"relativo": relativo, "minimo": minimo},
+            "estado": estado,
+        })
+    return filas
+
+
+def incompatibilidades(base: Dict[str, Any], nuevo: Dict[str, Any]) -> Tuple[List[str], List[str]]:
+    """(motivos por los que no se pueden comparar, diferencias de entorno que solo merecen aviso)."""
+    errores, avisos = [], []
+    if base.get("benchmark") != nuevo.get("benchmark"):
+        errores.append(f"benchmarks distintos: {base.get('benchmark')} y {nuevo.get('benchmark')}")
+    if base.get("version") != nuevo.get("version"):
+        errores.append(f"formatos distintos: versión {base.get('version')} y {nuevo.get('version')}")
+    if (base.get("corpus") or {}).get("sha256") != (nuevo.get("corpus") or {}).get("sha256"):
+        errores.append("corpus distinto (sha256): regenerar ambos con la misma semilla y PyMuPDF")
+    for clave in ("repeticiones", "calentamiento", "rps_objetivo", "duracion_s", "concurrencia", "ruta", "modulo"):
+        a, d = (base.get("parametros") or {}).get(clave), (nuevo.get("parametros") or {}).get(clave)
+        if a != d:
+            errores.append(f"parámetro {clave}: {a} y {d}")
+    for clave in ("python", "pymupdf", "cpus", "plataforma"):
+        a, d = (base.get("entorno") or {}).get(clave), (nuevo.get("entorno") or {}).get(clave)
+        if a != d:
+            avisos.append(f"entorno {clave}: {a} y {d}")
+    for nombre, resultado in (("base", base), ("nuevo", nuevo)):
+        if (resultado.get("entorno") or {}).get("modificado"):
+            avisos.append(f"{nombre}: medido con cambios sin commitear sobre {resultado['entorno'].get('commit')}")
+    return errores, avisos
+
+
+# ---- Resultados por commit ----
+
+def ruta_guardada(referencia: str, benchmark: str, directorio: str = RESULTADOS) -> str:
+    return os.path.join(directorio, commit(referencia) or referencia, f"{benchmark}.json")
+
+
+def guardar(archivo: str, directorio: str = RESULTADOS) -> str:
+    """Copia un resultado a <directorio>/<commit>/<benchmark>.json, con el commit de su entorno."""
+    with open(archivo, encoding="utf-8") as f:
+        resultado = json.load(f)
+    hash_commit = (resultado.get("entorno") or {}).get("commit")
+    if not hash_commit:
+        raise ValueError(f"{archivo} no registra el commit en que se midió")
+    destino = os.path.join(directorio, hash_commit, f"{resultado['benchmark']}.json")
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    shutil.copyfile(archivo, destino)
+    return destino
+
+
+def cargar(referencia: str, benchmark: str, directorio: str = RESULTADOS) -> Dict[str, Any]:
+    """Un archivo JSON, o el resultado guardado de un commit (hash, rama, HEAD~1...)."""
+    ruta = referencia if os.path.isfile(referencia) else ruta_guardada(referencia, benchmark, directorio)
+    if not os.path.isfile(ruta):
+        raise FileNotFoundError(f"no hay resultado para {referencia!r} ({ruta})")
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)
+
+
+# ---- Informe ----
+
+def _valor(valor: Optional[float]) -> str:
+    return "—" if valor is None else f"{valor:g}"
+
+
+def imprimir(filas: List[Dict[str, Any]], base: Dict[str, Any], nuevo: Dict[str, Any], todo: bool = False) -> None:
+    def commit_de(resultado):
+        return (resultado.get("entorno") or {}).get("commit") or "?"
+
+    print(f"{base['benchmark']}: {commit_de(base)} ({base.get('fecha', '?')}) -> {commit_de(nuevo)} ({nuevo.get('fecha', '?')})")
+    orden = (REGRESION, MEJORA, NUEVA, AUSENTE, SIN_CAMBIOS)
+    for estado in orden:
+        grupo = [f for f in filas if f["estado"] == estado]
+        if not grupo or (estado == SIN_CAMBIOS and not todo):
+            continue
+        print(f"\n{estado} ({len(grupo)})")
+        for f in grupo:
+            pct = f" ({f['delta_pct']:+.1f}%)" if f["delta_pct"] is not None else ""
+            limite = ""
+            if estado == REGRESION:
+                limite = f"  [umbral +{f['umbral']['relativo'] * 100:g}% y +{f['umbral']['minimo']:g}]"
+            print(f"  {f['ambito']:<36} {f['metrica']:<12} {_valor(f['base']):>10} -> {_valor(f['nuevo']):<10}{pct}{limite}")
+    sin_cambios = sum(1 for f in filas if f["estado"] == SIN_CAMBIOS)
+    regresiones = sum(1 for f in filas if f["estado"] == REGRESION)
+    print(f"\n{regresiones} regresiones, {sin_cambios} métricas sin cambios de {len(filas)}")
+
+
+def _umbral_cli(texto: str) -> Tuple[str, Tuple[float, float]]:
+    """'p95_ms=0.25', 'ocr.p95_ms=1.0:50' -> (clave, (relativo, mínimo))."""
+    clave, _, valor = texto.partition("=")
+    metrica = clave.rsplit(".", 1)[-1]
+    if not valor or metrica not in UMBRALES:
+        raise argparse.ArgumentTypeError(f"umbral inválido {texto!r}: se espera [etapa.]metrica=relativo[:minimo], "
+                                         f"con metrica en {', '.join(UMBRALES)}")
+    relativo, _, minimo = valor.partition(":")
+    try:
+        return clave, (float(relativo), float(minimo) if minimo else UMBRALES[metrica][1])
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"umbral inválido {texto!r}: valores no numéricos")
+
+
+def main(argv=None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == "guardar":
+        parser = argparse.ArgumentParser(prog="python -m benchmarks.comparar guardar",
+                                         description="guarda resultados en <resultados>/<commit>/<benchmark>.json")
+        parser.add_argument("archivos", nargs="+", help="JSON de benchmarks.etapas, carga o importacion")
+        parser.add_argument("--resultados", default=RESULTADOS)
+        args = parser.parse_args(argv[1:])
+        for archivo in args.archivos:
+            try:
+                print(guardar(archivo, args.resultados))
+            except (OSError, ValueError, KeyError) as e:
+                parser.error(f"{archivo}: {e}")
+        return 0
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base", help="JSON o commit con resultados guardados (main, HEAD~1, 4079e0e)")
+    parser.add_argument("nuevo", help="JSON o commit con resultados guardados")
+    parser.add_argument("--benchmark", default="etapas", choices=sorted(EXTRACTORES),
+                        help="qué resultado guardado usar cuando se da un commit")
+    parser.add_argument("--umbral", action="append", type=_umbral_cli, default=[],
+                        help="[etapa.]metrica=relativo[:minimo], p. ej. p95_ms=0.2:10 u ocr.tesseract=0.5")
+    parser.add_argument("--resultados", default=RESULTADOS, help="directorio de resultados por commit")
+    parser.add_argument("--forzar", action="store_true", help="comparar aunque el corpus o los parámetros difieran")
+    parser.add_argument("--todo", action="store_true", help="listar también las métricas sin cambios")
+    parser.add_argument("--json", help="archivo donde guardar la comparación")
+    args = parser.parse_args(argv)
+
+    try:
+        base = cargar(args.base, args.benchmark, args.resultados)
+        nuevo = cargar(args.nuevo, args.benchmark, args.resultados)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    errores, avisos = incompatibilidades(base, nuevo)
+    for aviso in avisos:
+        print(f"aviso: {aviso}")
+    if errores and not args.forzar:
+        for error in errores:
+            print(f"no comparables: {error}")
+        return 2
+
+    filas = comparar(base, nuevo, dict(args.umbral))
+    imprimir(filas, base, nuevo, args.todo)
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"benchmark": base["benchmark"], "avisos": avisos, "incompatibilidades": errores,
+                       "filas": filas}, f, ensure_ascii=False, indent=2)
+    return 1 if any(f["estado"] == REGRESION for f in filas) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+"""
+Piezas compartidas por los benchmarks que no necesitan PyMuPDF: ubicación y
+manifiesto del corpus, entorno de la ejecución, percentiles y resúmenes de
+latencias.
+"""
+
+import hashlib
+import json
+import math
+import os
+import platform
+import subprocess
+from typing import Any, Dict, List, Optional
+
+# Corpus por defecto (python -m benchmarks.corpus) y su manifiesto
+DIRECTORIO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+MANIFIESTO = "corpus.json"
+# Resultados guardados por commit (python -m benchmarks.comparar guardar)
+RESULTADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resultados")
+
+
+def cargar_manifiesto(directorio: str = DIRECTORIO) -> Dict[str, Any]:
+    with open(os.path.join(directorio, MANIFIESTO), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def huella_corpus(manifiesto: Dict[str, Any]) -> Dict[str, Any]:
+    """Semilla, facturas y sha256 del corpus: dos resultados con distinta huella no son comparables."""
+    return {
+        "semilla": manifiesto["semilla"],
+        "facturas": manifiesto["facturas"],
+        "sha256": hashlib.sha256("".join(a["sha256"] for a in manifiesto["archivos"]).encode()).hexdigest(),
+    }
+
+
+def _git(*argumentos: str) -> Optional[str]:
+    try:
+        salida = subprocess.run(["git", *argumentos], capture_output=True, text=True, timeout=5,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+    except Exception:
+        return None
+    return salida.stdout.strip() if salida.returncode == 0 else None
+
+
+def commit(referencia: str = "HEAD") -> Optional[str]:
+    """Hash corto de `referencia` (HEAD, main, HEAD~1, ...) o None fuera de git."""
+    return _git("rev-parse", "--short", referencia) or None
+
+
+def entorno() -> Dict[str, Any]:
+    """Versión de Python, plataforma, CPUs y commit de la ejecución."""
+    return {
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "commit": commit(),
+        # Cambios sin commitear en archivos versionados: el commit no describe del todo el código medido
+        "modificado": bool(_git("status", "--porcelain", "--untracked-files=no")),
+    }
+
+
+def percentil(valores: List[float], q: float) -> float:
+    """Percentil por rango más cercano (q entre 0 y 100)."""
+    ordenados = sorted(valores)
+    rango = max(1, math.ceil(q / 100.0 * len(ordenados)))
+    return ordenados[rango - 1]
+
+
+def resumen_ms(duraciones: List[float], percentiles=(50, 95)) -> Dict[str, Any]:
+    """n, pXX_ms, media, mínimo y máximo en ms de duraciones en segundos."""
+    ms = [d * 1000.0 for d in duraciones]
+    resumen: Dict[str, Any] = {"n": len(ms)}
+    for q in percentiles:
+        resumen[f"p{q}_ms"] = round(percentil(ms, q), 3)
+    resumen.update({
+        "media_ms": round(sum(ms) / len(ms), 3),
+        "min_ms": round(min(ms), 3),
+        "max_ms": round(max(ms), 3),
+    })
+    return resumen
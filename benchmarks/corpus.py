@@ -0,0 +1,487 @@
+"""
+Corpus sintético y determinista de facturas para los benchmarks.
+
+Genera, a partir del contenido de crear_pdf_prueba.lineas_factura con datos
+aleatorios de semilla fija:
+
+- ride_texto        RIDE con texto nativo (PyMuPDF)
+- ride_escaneado    el mismo RIDE rasterizado como imagen, sin texto
+- overlay_streams   RIDE con un parche blanco y un total nuevo en content streams añadidos
+- capas_ocg         RIDE con el parche y el total nuevo en una capa opcional (OCG)
+- firmado           RIDE con un campo de firma PAdES (adbe.pkcs7.detached) sobre todo el archivo
+- captura_{1,4,12}mp_{jpg,png}   capturas del RIDE de 1, 4 y 12 megapíxeles
+- xml_xades         comprobante (factura) firmado con XAdES-BES
+
+Con la misma semilla y la misma versión de PyMuPDF, los archivos son idénticos
+byte a byte: fechas fijas, sin /ID aleatorio, y la firma (CMS con un
+certificado de prueba) se arma con valores derivados de la semilla. La firma
+no es criptográficamente válida: sirve para medir el análisis, no para
+aprobarlo.
+
+    python -m benchmarks.corpus                        # benchmarks/corpus/, 2 facturas por tipo
+    python -m benchmarks.corpus --salida /tmp/corpus --facturas 5 --semilla 11
+
+El manifiesto (corpus.json) lista cada archivo con su tipo y sha256.
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import math
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+
+from benchmarks.comun import DIRECTORIO, MANIFIESTO
+from crear_pdf_prueba import lineas_factura
+from helpers.clave_acceso import dv_modulo11
+
+SEMILLA = 20250708
+
+_FUENTES = {"Helvetica": "helv", "Helvetica-Bold": "hebo"}
+_ANCHO, _ALTO = 612, 792  # carta
+_FECHA_PDF = "D:20250708195813-05'00'"
+_PRODUCTOR = "api-forense benchmarks"
+# Dígitos hexadecimales reservados para el CMS en /Contents
+_RESERVA_FIRMA = 8192
+
+_RAZONES = [
+    "FARMACIAS Y COMISARIATOS DE MEDICINAS S.A.",
+    "CORPORACION FAVORITA C.A.",
+    "TIENDAS INDUSTRIALES ASOCIADAS TIA S.A.",
+    "DISTRIBUIDORA DE ALIMENTOS DEL PACIFICO CIA. LTDA.",
+    "FERRETERIA EL CONSTRUCTOR S.A.",
+]
+_PRODUCTOS = [
+    "MEDICAMENTO A", "MEDICAMENTO B", "ARROZ 2KG", "ACEITE 1L", "LECHE ENTERA",
+    "CEMENTO 50KG", "CLAVOS 2PULG", "PAPEL HIGIENICO", "DETERGENTE 1KG", "AGUA 6L",
+]
+_CLIENTES = ["ROCKO VERDEZOTO", "MARIA PEREZ", "JUAN CARLOS ANDRADE", "CONSUMIDOR FINAL"]
+_FORMAS_PAGO = ["TARJETA DE CREDITO", "SIN UTILIZACION DEL SISTEMA FINANCIERO", "TARJETA DE DEBITO"]
+
+MEGAPIXELES = (1, 4, 12)
+
+
+# ---- Datos de factura ----
+
+def _dinero(valor: Decimal) -> str:
+    return str(valor.quantize(Decimal("0.01")))
+
+
+def datos_factura(rng: random.Random) -> Dict[str, Any]:
+    """Datos coherentes de una factura (clave de acceso con DV válido, totales cuadrados)."""
+    fecha = datetime(2025, 1, 1, 8, 0, 0) + timedelta(minutes=rng.randrange(0, 365 * 24 * 60))
+    ruc = "".join(str(rng.randrange(10)) for _ in range(10)) + "001"
+    estab, pto, secuencial = rng.randrange(1, 100), rng.randrange(1, 300), rng.randrange(1, 10 ** 6)
+    serie = f"{estab:03d}{pto:03d}"
+    base = (fecha.strftime("%d%m%Y") + "01" + ruc + "2" + serie + f"{secuencial:09d}"
+            + f"{rng.randrange(10 ** 8):08d}" + "1")
+    items = []
+    subtotal = Decimal("0")
+    for descripcion in rng.sample(_PRODUCTOS, rng.randrange(2, 7)):
+        cantidad = rng.randrange(1, 5)
+        precio = Decimal(rng.randrange(50, 5000)) / 100
+        items.append((descripcion, cantidad, _dinero(precio)))
+        subtotal += cantidad * precio
+    iva = (subtotal * Decimal("0.15")).quantize(Decimal("0.01"))
+    return {
+        "razon_social": rng.choice(_RAZONES),
+        "ruc": ruc,
+        "direccion": "Av. Interoceánica S/N",
+        "numero": f"{estab:03d}-{pto:03d}-{secuencial:09d}",
+        "clave_acceso": base + str(dv_modulo11(base)),
+        "ambiente": "PRODUCCION",
+        "fecha_emision": fecha.strftime("%Y-%m-%d %H:%M:%S"),
+        "cliente": rng.choice(_CLIENTES),
+        "identificacion": "".join(str(rng.randrange(10)) for _ in range(10)),
+        "items": items,
+        "subtotal": _dinero(subtotal),
+        "iva": _dinero(iva),
+        "total": _dinero(subtotal + iva),
+        "forma_pago": rng.choice(_FORMAS_PAGO),
+    }
+
+
+# ---- PDFs ----
+
+def _metadatos(doc: fitz.Document) -> None:
+    doc.set_metadata({
+        "producer": _PRODUCTOR, "creator": _PRODUCTOR,
+        "creationDate": _FECHA_PDF, "modDate": _FECHA_PDF,
+    })
+
+
+def _bytes_pdf(doc: fitz.Document) -> bytes:
+    # Sin /ID nuevo: el archivo depende solo del contenido
+    return doc.tobytes(garbage=3, deflate=True, no_new_id=True)
+
+
+def _documento_ride(datos: Dict[str, Any]) -> fitz.Document:
+    doc = fitz.open()
+    page = doc.new_page(width=_ANCHO, height=_ALTO)
+    # Un solo content stream, como el RIDE que emite un sistema de facturación
+    escritor = fitz.TextWriter(page.rect)
+    fuentes = {nombre: fitz.Font(codigo) for nombre, codigo in _FUENTES.items()}
+    for fuente, tamano, x, y, texto in lineas_factura(datos):
+        escritor.append((x, y), texto, font=fuentes[fuente], fontsize=tamano)
+    escritor.write_text(page)
+    _metadatos(doc)
+    return doc
+
+
+def ride_texto(datos: Dict[str, Any]) -> bytes:
+    return _bytes_pdf(_documento_ride(datos))
+
+
+def ride_escaneado(datos: Dict[str, Any], dpi: int = 200) -> bytes:
+    """Página única con el RIDE como imagen en escala de grises (sin capa de texto)."""
+    origen = _documento_ride(datos)
+    pix = origen[0].get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+    doc = fitz.open()
+    page = doc.new_page(width=_ANCHO, height=_ALTO)
+    page.insert_image(page.rect, stream=pix.tobytes("png"))
+    _metadatos(doc)
+    return _bytes_pdf(doc)
+
+
+def _rect_total(page: fitz.Page, total: str) -> fitz.Rect:
+    encontrados = page.search_for(f"TOTAL: ${total}")
+    # El primero puede ser "SUBTOTAL: $..."; el total va debajo
+    return max(encontrados, key=lambda r: r.y0) if encontrados else fitz.Rect(95, 455, 260, 475)
+
+
+def _total_alterado(datos: Dict[str, Any]) -> str:
+    return _dinero(Decimal(datos["total"]) * 3)
+
+
+def overlay_streams(datos: Dict[str, Any]) -> bytes:
+    """
+    Edición típica de un RIDE: un rectángulo blanco tapa el total y encima se
+    escribe otro; cada operación queda en su propio content stream.
+    """
+    doc = _documento_ride(datos)
+    page = doc[0]
+    rect = _rect_total(page, datos["total"])
+    page.draw_rect(rect + (-1, -1, 1, 1), color=(1, 1, 1), fill=(1, 1, 1), overlay=True)
+    page.insert_text((rect.x0, rect.y1 - 3), f"TOTAL: ${_total_alterado(datos)}", fontname="helv", fontsize=12)
+    return _bytes_pdf(doc)
+
+
+def capas_ocg(datos: Dict[str, Any]) -> bytes:
+    """Como overlay_streams, pero el parche y el total nuevo viven en una capa opcional."""
+    doc = _documento_ride(datos)
+    capa = doc.add_ocg("Edicion", on=True)
+    page = doc[0]
+    rect = _rect_total(page, datos["total"])
+    page.draw_rect(rect + (-1, -1, 1, 1), color=(1, 1, 1), fill=(1, 1, 1), overlay=True, oc=capa)
+    page.insert_text((rect.x0, rect.y1 - 3), f"TOTAL: ${_total_alterado(datos)}",
+                     fontname="helv", fontsize=12, oc=capa)
+    return _bytes_pdf(doc)
+
+
+def firmado(datos: Dict[str, Any], semilla: int) -> bytes:
+    """
+    RIDE con un campo de firma PAdES: el diccionario /Sig con /ByteRange y un
+    CMS SignedData (certificado de prueba, messageDigest real del rango firmado).
+    """
+    doc = _documento_ride(datos)
+    page = doc[0]
+    sig = doc.get_new_xref()
+    doc.update_object(sig, (
+        "<</Type/Sig/Filter/Adobe.PPKLite/SubFilter/adbe.pkcs7.detached"
+        "/ByteRange[0 1111111111 1111111111 1111111111]"
+        f"/Contents<{'0' * _RESERVA_FIRMA}>/M({_FECHA_PDF})/Name({_CN_FIRMANTE})>>"
+    ))
+    widget = doc.get_new_xref()
+    doc.update_object(widget, (
+        f"<</Type/Annot/Subtype/Widget/FT/Sig/T(Firma1)/V {sig} 0 R/F 132"
+        f"/Rect[0 0 0 0]/P {page.xref} 0 R>>"
+    ))
+    doc.xref_set_key(page.xref, "Annots", f"[{widget} 0 R]")
+    doc.xref_set_key(doc.pdf_catalog(), "AcroForm", f"<</Fields[{widget} 0 R]/SigFlags 3>>")
+    pdf = bytearray(_bytes_pdf(doc))
+
+    # /ByteRange cubre todo menos el valor de /Contents (entre < y >, incluidos)
+    inicio = pdf.index(b"/Contents<" + b"0" * 16) + len(b"/Contents")
+    fin = pdf.index(b">", inicio) + 1
+    rango = b"0 %010d %010d %010d" % (inicio, fin, len(pdf) - fin)
+    marca = b"0 1111111111 1111111111 1111111111"
+    posicion = pdf.index(marca)
+    pdf[posicion:posicion + len(marca)] = rango
+
+    digest = hashlib.sha256(bytes(pdf[:inicio]) + bytes(pdf[fin:])).digest()
+    cms = firma_cms(digest, semilla).hex().encode()
+    if len(cms) > fin - inicio - 2:
+        raise ValueError("el CMS no cabe en la reserva de /Contents")
+    pdf[inicio + 1:inicio + 1 + len(cms)] = cms
+    return bytes(pdf)
+
+
+# ---- Capturas ----
+
+def captura(datos: Dict[str, Any], megapixeles: float, formato: str) -> bytes:
+    """El RIDE renderizado a `megapixeles` (±1%), como JPEG (calidad 88) o PNG."""
+    zoom = math.sqrt(megapixeles * 1e6 / (_ANCHO * _ALTO))
+    pix = _documento_ride(datos)[0].get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+    if formato == "jpg":
+        return pix.tobytes("jpeg", jpg_quality=88)
+    return pix.tobytes("png")
+
+
+# ---- Firma de prueba (DER mínimo) ----
+
+_CN_FIRMANTE = "FIRMANTE DE PRUEBA BENCHMARK"
+_OID = {
+    "data": "1.2.840.113549.1.7.1",
+    "signedData": "1.2.840.113549.1.7.2",
+    "contentType": "1.2.840.113549.1.9.3",
+    "messageDigest": "1.2.840.113549.1.9.4",
+    "signingTime": "1.2.840.113549.1.9.5",
+    "sha256": "2.16.840.1.101.3.4.2.1",
+    "rsaEncryption": "1.2.840.113549.1.1.1",
+    "sha256WithRSAEncryption": "1.2.840.113549.1.1.11",
+    "commonName": "2.5.4.3",
+    "organizationName": "2.5.4.10",
+    "countryName": "2.5.4.6",
+}
+
+
+def _der(etiqueta: int, contenido: bytes) -> bytes:
+    n = len(contenido)
+    if n < 0x80:
+        longitud = bytes([n])
+    else:
+        cifras = n.to_bytes((n.bit_length() + 7) // 8, "big")
+        longitud = bytes([0x80 | len(cifras)]) + cifras
+    return bytes([etiqueta]) + longitud + contenido
+
+
+def _secuencia(*partes: bytes) -> bytes:
+    return _der(0x30, b"".join(partes))
+
+
+def _conjunto(*partes: bytes) -> bytes:
+    return _der(0x31, b"".join(sorted(partes)))
+
+
+def _entero(valor: int) -> bytes:
+    return _der(0x02, valor.to_bytes(valor.bit_length() // 8 + 1, "big"))
+
+
+def _oid(nombre: str) -> bytes:
+    arcos = [int(a) for a in _OID[nombre].split(".")]
+    cuerpo = bytearray([40 * arcos[0] + arcos[1]])
+    for arco in arcos[2:]:
+        grupo = [arco & 0x7F]
+        arco >>= 7
+        while arco:
+            grupo.append(0x80 | (arco & 0x7F))
+            arco >>= 7
+        cuerpo += bytes(reversed(grupo))
+    return _der(0x06, bytes(cuerpo))
+
+
+def _algoritmo(nombre: str) -> bytes:
+    return _secuencia(_oid(nombre), b"\x05\x00")
+
+
+def _nombre(cn: str) -> bytes:
+    return _secuencia(
+        _conjunto(_secuencia(_oid("countryName"), _der(0x13, b"EC"))),
+        _conjunto(_secuencia(_oid("organizationName"), _der(0x0C, b"API FORENSE BENCHMARKS"))),
+        _conjunto(_secuencia(_oid("commonName"), _der(0x0C, cn.encode()))),
+    )
+
+
+def _pseudoaleatorio(semilla: int, etiqueta: str, n: int) -> bytes:
+    bloques = b""
+    i = 0
+    while len(bloques) < n:
+        bloques += hashlib.sha256(f"{semilla}:{etiqueta}:{i}".encode()).digest()
+        i += 1
+    return bloques[:n]
+
+
+def certificado_prueba(semilla: int) -> bytes:
+    """Certificado X.509 autoemitido (módulo RSA de 2048 bits derivado de la semilla)."""
+    modulo = int.from_bytes(_pseudoaleatorio(semilla, "modulo", 256), "big") | (1 << 2047) | 1
+    clave_publica = _secuencia(
+        _algoritmo("rsaEncryption"),
+        _der(0x03, b"\x00" + _secuencia(_entero(modulo), _entero(65537))),
+    )
+    tbs = _secuencia(
+        _der(0xA0, _entero(2)),
+        _entero(semilla),
+        _algoritmo("sha256WithRSAEncryption"),
+        _nombre(_CN_FIRMANTE),
+        _secuencia(_der(0x17, b"250101000000Z"), _der(0x17, b"300101000000Z")),
+        _nombre(_CN_FIRMANTE),
+        clave_publica,
+    )
+    return _secuencia(tbs, _algoritmo("sha256WithRSAEncryption"),
+                      _der(0x03, b"\x00" + _pseudoaleatorio(semilla, "cert", 256)))
+
+
+def firma_cms(digest: bytes, semilla: int) -> bytes:
+    """CMS SignedData separado con el messageDigest dado y un valor de firma de relleno."""
+    certificado = certificado_prueba(semilla)
+    atributos = [
+        _secuencia(_oid("contentType"), _conjunto(_oid("data"))),
+        _secuencia(_oid("signingTime"), _conjunto(_der(0x17, b"250708195813Z"))),
+        _secuencia(_oid("messageDigest"), _conjunto(_der(0x04, digest))),
+    ]
+    firmante = _secuencia(
+        _entero(1),
+        _secuencia(_nombre(_CN_FIRMANTE), _entero(semilla)),
+        _algoritmo("sha256"),
+        _der(0xA0, b"".join(sorted(atributos))),
+        _algoritmo("rsaEncryption"),
+        _der(0x04, _pseudoaleatorio(semilla, digest.hex(), 256)),
+    )
+    datos_firmados = _secuencia(
+        _entero(1),
+        _conjunto(_algoritmo("sha256")),
+        _secuencia(_oid("data")),
+        _der(0xA0, certificado),
+        _conjunto(firmante),
+    )
+    return _secuencia(_oid("signedData"), _der(0xA0, datos_firmados))
+
+
+# ---- XML XAdES ----
+
+def xml_xades(datos: Dict[str, Any], semilla: int) -> bytes:
+    """Factura electrónica firmada con XAdES-BES (firma enveloped), como la envía el emisor al SRI."""
+    certificado = certificado_prueba(semilla)
+    detalles = "".join(
+        f"<detalle><descripcion>{d}</descripcion><cantidad>{c}</cantidad>"
+        f"<precioUnitario>{p}</precioUnitario><precioTotalSinImpuesto>{_dinero(c * Decimal(p))}"
+        f"</precioTotalSinImpuesto></detalle>"
+        for d, c, p in datos["items"]
+    )
+    estab, pto, secuencial = datos["numero"].split("-")
+    fecha = datetime.strptime(datos["fecha_emision"], "%Y-%m-%d %H:%M:%S")
+    comprobante = (
+        '<factura id="comprobante" version="1.1.0">'
+        f"<infoTributaria><ambiente>2</ambiente><tipoEmision>1</tipoEmision>"
+        f"<razonSocial>{datos['razon_social']}</razonSocial><ruc>{datos['ruc']}</ruc>"
+        f"<claveAcceso>{datos['clave_acceso']}</claveAcceso><codDoc>01</codDoc>"
+        f"<estab>{estab}</estab><ptoEmi>{pto}</ptoEmi><secuencial>{secuencial}</secuencial></infoTributaria>"
+        f"<infoFactura><fechaEmision>{fecha:%d/%m/%Y}</fechaEmision>"
+        f"<razonSocialComprador>{datos['cliente']}</razonSocialComprador>"
+        f"<identificacionComprador>{datos['identificacion']}</identificacionComprador>"
+        f"<totalSinImpuestos>{datos['subtotal']}</totalSinImpuestos>"
+        f"<totalConImpuestos><totalImpuesto><codigo>2</codigo><codigoPorcentaje>4</codigoPorcentaje>"
+        f"<baseImponible>{datos['subtotal']}</baseImponible><valor>{datos['iva']}</valor>"
+        f"</totalImpuesto></totalConImpuestos>"
+        f"<importeTotal>{datos['total']}</importeTotal></infoFactura>"
+        f"<detalles>{detalles}</detalles>"
+    )
+    digest_comprobante = base64.b64encode(hashlib.sha256(comprobante.encode()).digest()).decode()
+    digest_cert = base64.b64encode(hashlib.sha256(certificado).digest()).decode()
+    firma = (
+        '<ds:Signature xmlns:ds="http://www.w3.org/2000/09/xmldsig#" '
+        'xmlns:etsi="http://uri.etsi.org/01903/v1.3.2#" Id="Signature1">'
+        "<ds:SignedInfo>"
+        '<ds:CanonicalizationMethod Algorithm="http://www.w3.org/TR/2001/REC-xml-c14n-20010315"/>'
+        '<ds:SignatureMethod Algorithm="http://www.w3.org/2001/04/xmldsig-more#rsa-sha256"/>'
+        '<ds:Reference URI="#comprobante">'
+        '<ds:DigestMethod Algorithm="http://www.w3.org/2001/04/xmlenc#sha256"/>'
+        f"<ds:DigestValue>{digest_comprobante}</ds:DigestValue></ds:Reference>"
+        "</ds:SignedInfo>"
+        f"<ds:SignatureValue>{base64.b64encode(_pseudoaleatorio(semilla, digest_comprobante, 256)).decode()}"
+        "</ds:SignatureValue>"
+        f"<ds:KeyInfo><ds:X509Data><ds:X509Certificate>{base64.b64encode(certificado).decode()}"
+        "</ds:X509Certificate></ds:X509Data></ds:KeyInfo>"
+        '<ds:Object><etsi:QualifyingProperties Target="#Signature1"><etsi:SignedProperties Id="SignedProperties1">'
+        "<etsi:SignedSignatureProperties>"
+        f"<etsi:SigningTime>{fecha:%Y-%m-%dT%H:%M:%S}-05:00</etsi:SigningTime>"
+        "<etsi:SigningCertificate><etsi:Cert><etsi:CertDigest>"
+        '<ds:DigestMethod Algorithm="http://www.w3.org/2001/04/xmlenc#sha256"/>'
+        f"<ds:DigestValue>{digest_cert}</ds:DigestValue></etsi:CertDigest>"
+        f"<etsi:IssuerSerial><ds:X509IssuerName>CN={_CN_FIRMANTE},O=API FORENSE BENCHMARKS,C=EC</ds:X509IssuerName>"
+        f"<ds:X509SerialNumber>{semilla}</ds:X509SerialNumber></etsi:IssuerSerial>"
+        "</etsi:Cert></etsi:SigningCertificate>"
+        "</etsi:SignedSignatureProperties></etsi:SignedProperties></etsi:QualifyingProperties></ds:Object>"
+        "</ds:Signature>"
+    )
+    return ('<?xml version="1.0" encoding="UTF-8"?>' + comprobante + firma + "</factura>").encode("utf-8")
+
+
+# ---- Corpus ----
+
+def _generadores(semilla: int) -> List[Tuple[str, str, Callable[[Dict[str, Any]], bytes]]]:
+    """(tipo, extensión, generador) de cada archivo por factura."""
+    generadores = [
+        ("ride_texto", "pdf", ride_texto),
+        ("ride_escaneado", "pdf", ride_escaneado),
+        ("overlay_streams", "pdf", overlay_streams),
+        ("capas_ocg", "pdf", capas_ocg),
+        ("firmado", "pdf", lambda d: firmado(d, semilla)),
+    ]
+    for mp in MEGAPIXELES:
+        for formato in ("jpg", "png"):
+            generadores.append((f"captura_{mp}mp_{formato}", formato,
+                                lambda d, mp=mp, formato=formato: captura(d, mp, formato)))
+    generadores.append(("xml_xades", "xml", lambda d: xml_xades(d, semilla)))
+    return generadores
+
+
+def generar_corpus(directorio: str = DIRECTORIO, facturas: int = 2, semilla: int = SEMILLA,
+                   tipos: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Escribe el corpus en `directorio` y devuelve el manifiesto (también en corpus.json)."""
+    os.makedirs(directorio, exist_ok=True)
+    rng = random.Random(semilla)
+    archivos = []
+    for n in range(1, facturas + 1):
+        datos = datos_factura(rng)
+        for tipo, extension, generador in _generadores(semilla):
+            if tipos and tipo not in tipos:
+                continue
+            contenido = generador(datos)
+            nombre = f"{tipo}_{n:02d}.{extension}"
+            with open(os.path.join(directorio, nombre), "wb") as f:
+                f.write(contenido)
+            archivos.append({
+                "archivo": nombre,
+                "tipo": tipo,
+                "bytes": len(contenido),
+                "sha256": hashlib.sha256(contenido).hexdigest(),
+                "clave_acceso": datos["clave_acceso"],
+                "total": datos["total"],
+            })
+    manifiesto = {
+        "semilla": semilla,
+        "facturas": facturas,
+        "pymupdf": fitz.VersionBind,
+        "archivos": archivos,
+    }
+    with open(os.path.join(directorio, MANIFIESTO), "w", encoding="utf-8") as f:
+        json.dump(manifiesto, f, ensure_ascii=False, indent=2)
+    return manifiesto
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--salida", default=DIRECTORIO, help="directorio del corpus")
+    parser.add_argument("--facturas", type=int, default=2, help="facturas distintas por tipo de archivo")
+    parser.add_argument("--semilla", type=int, default=SEMILLA)
+    parser.add_argument("--tipos", help="solo estos tipos, separados por coma")
+    args = parser.parse_args(argv)
+
+    tipos = args.tipos.split(",") if args.tipos else None
+    manifiesto = generar_corpus(args.salida, args.facturas, args.semilla, tipos)
+    for a in manifiesto["archivos"]:
+        print(f"{a['archivo']:<28} {a['bytes']:>10} B  {a['sha256'][:16]}")
+    print(f"{len(manifiesto['archivos'])} archivos en {args.salida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,271 @@
+"""
+Benchmarks por etapa del análisis sobre el corpus de benchmarks/corpus.
+
+- texto     pdfminer + clave de acceso + campos de la factura (pdf_extract)
+- overlay   texto superpuesto en PDFs (helpers/deteccion_texto_superpuesto)
+- riesgo    evaluar_riesgo_factura sin SRI; texto y campos se preparan fuera de la medición
+- ocr       RIDEs escaneados (pdf_factura_parser) y capturas (invoice_capture_parser)
+- forense   análisis forense completo de las capturas (helpers/analisis_forense_profesional)
+- firmas    firmas PDF (helpers/firma_digital) y XAdES (helpers/validacion_xades, analisis_sri_ride)
+
+Cada etapa corre en un proceso nuevo, así el pico de RSS es el de esa etapa y
+no arrastra módulos ni cachés de las anteriores. Por archivo se informa
+p50/p95/media/mín/máx en ms y las llamadas por ejecución: etapas registradas
+con helpers/trazas (span/log_step), invocaciones a Tesseract y aperturas de
+PDF con fitz.open.
+
+    python -m benchmarks.corpus
+    python -m benchmarks.etapas --json benchmarks/resultados/base.json
+    python -m benchmarks.etapas --etapas texto,riesgo --repeticiones 10 --tipos ride_texto,firmado
+"""
+
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from benchmarks.comun import DIRECTORIO, MANIFIESTO, cargar_manifiesto, entorno, huella_corpus, resumen_ms
+from benchmarks.corpus import MEGAPIXELES
+
+VERSION_FORMATO = 1
+
+TIPOS_PDF = ("ride_texto", "ride_escaneado", "overlay_streams", "capas_ocg", "firmado")
+TIPOS_CAPTURA = tuple(f"captura_{mp}mp_{formato}" for mp in MEGAPIXELES for formato in ("jpg", "png"))
+
+# Una preparación recibe (tipo, contenido) y devuelve la función sin argumentos que se mide
+Preparacion = Callable[[str, bytes], Callable[[], Any]]
+
+
+# ---- Etapas ----
+
+def _texto_pdf(pdf_bytes: bytes) -> str:
+    from pdfminer.high_level import extract_text
+    try:
+        return extract_text(io.BytesIO(pdf_bytes)) or ""
+    except Exception:
+        return ""
+
+
+def _preparar_texto(tipo: str, contenido: bytes):
+    from pdf_extract import extract_clave_acceso_from_text, extract_invoice_fields_from_text
+
+    def ejecutar():
+        texto = _texto_pdf(contenido)
+        clave, _ = extract_clave_acceso_from_text(texto)
+        return extract_invoice_fields_from_text(texto, clave, type="factura")
+    return ejecutar
+
+
+def _preparar_overlay(tipo: str, contenido: bytes):
+    from helpers.deteccion_texto_superpuesto import detectar_texto_superpuesto_desde_bytes
+    return lambda: detectar_texto_superpuesto_desde_bytes(contenido)
+
+
+def _preparar_riesgo(tipo: str, contenido: bytes):
+    from pdf_extract import extract_clave_acceso_from_text, extract_invoice_fields_from_text
+    from riesgo import evaluar_riesgo_factura
+
+    texto = _texto_pdf(contenido)
+    clave, _ = extract_clave_acceso_from_text(texto)
+    campos = extract_invoice_fields_from_text(texto, clave, type="factura")
+    return lambda: evaluar_riesgo_factura(contenido, texto, campos, sri_ok=False)
+
+
+def _preparar_ocr(tipo: str, contenido: bytes):
+    if tipo in TIPOS_PDF:
+        from helpers.pdf_factura_parser import extraer_datos_factura_pdf
+        return lambda: extraer_datos_factura_pdf(contenido)
+    from helpers.invoice_capture_parser import parse_capture_from_bytes
+    nombre = "captura.jpg" if tipo.endswith("jpg") else "captura.png"
+    return lambda: parse_capture_from_bytes(contenido, nombre)
+
+
+def _preparar_forense(tipo: str, contenido: bytes):
+    from helpers.analisis_forense_profesional import analisis_forense_completo
+    return lambda: analisis_forense_completo(contenido)
+
+
+def _preparar_firmas(tipo: str, contenido: bytes):
+    if tipo == "xml_xades":
+        from helpers.validacion_xades import validar_xades
+        from helpers.analisis_sri_ride import validar_xml_firmado_sri
+        xml = contenido.decode("utf-8")
+        return lambda: (validar_xades(xml), validar_xml_firmado_sri(xml))
+    from helpers.firma_digital import analizar_firmas_digitales
+    return lambda: analizar_firmas_digitales(contenido)
+
+
+# nombre -> (tipos del corpus que recibe, preparación)
+ETAPAS: Dict[str, Tuple[Tuple[str, ...], Preparacion]] = {
+    "texto": (TIPOS_PDF, _preparar_texto),
+    "overlay": (TIPOS_PDF, _preparar_overlay),
+    "riesgo": (TIPOS_PDF, _preparar_riesgo),
+    "ocr": (("ride_escaneado",) + TIPOS_CAPTURA, _preparar_ocr),
+    "forense": (TIPOS_CAPTURA, _preparar_forense),
+    "firmas": (("ride_texto", "firmado", "xml_xades"), _preparar_firmas),
+}
+
+
+# ---- Medición ----
+
+def rss_pico_mb() -> Optional[float]:
+    """Pico de memoria residente del proceso actual (None donde no hay getrusage)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa KiB; macOS, bytes
+    return round(pico / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _instrumentar() -> None:
+    """Cuenta Tesseract y fitz.open en la traza actual (solo en el proceso del benchmark)."""
+    import fitz
+    from helpers.trazas import contar, instrumentar_tesseract
+
+    instrumentar_tesseract()
+    original = fitz.open
+
+    def abrir(*args, **kwargs):
+        contar("fitz.open")
+        return original(*args, **kwargs)
+
+    fitz.open = abrir
+
+
+def medir_etapa(nombre: str, directorio: str, archivos: List[Tuple[str, str]],
+                repeticiones: int, calentamiento: int) -> Dict[str, Any]:
+    """Mide la etapa sobre los (archivo, tipo) dados; pensada para correr en un proceso propio."""
+    from helpers.trazas import Traza, activar
+
+    inicio = time.perf_counter()
+    rss_inicio = rss_pico_mb()
+    _instrumentar()
+    _, preparar = ETAPAS[nombre]
+
+    casos: Dict[str, Dict[str, Any]] = {}
+    todas: List[float] = []
+    llamadas_etapa: Counter = Counter()
+    for archivo, tipo in archivos:
+        with open(os.path.join(directorio, archivo), "rb") as f:
+            contenido = f.read()
+        try:
+            ejecutar = preparar(tipo, contenido)
+            for _ in range(calentamiento):
+                ejecutar()
+            duraciones = []
+            llamadas: Counter = Counter()
+            for _ in range(repeticiones):
+                traza = Traza("BENCH", f"{nombre}/{archivo}")
+                with activar(traza):
+                    t0 = time.perf_counter()
+                    ejecutar()
+                    duraciones.append(time.perf_counter() - t0)
+                for etapa, datos in traza.por_etapa().items():
+                    llamadas[etapa] += datos["veces"]
+                llamadas["fitz.open"] += traza.atributos.get("fitz.open", 0)
+        except Exception as e:
+            casos[archivo] = {"tipo": tipo, "error": f"{type(e).__name__}: {e}"}
+            continue
+        todas += duraciones
+        llamadas_etapa.update(llamadas)
+        casos[archivo] = {
+            "tipo": tipo,
+            **resumen_ms(duraciones),
+            "llamadas": {k: round(v / repeticiones, 2) for k, v in sorted(llamadas.items()) if v},
+            "rss_pico_mb": rss_pico_mb(),
+        }
+
+    return {
+        "rss_inicio_mb": rss_inicio,
+        "rss_pico_mb": rss_pico_mb(),
+        "duracion_s": round(time.perf_counter() - inicio, 2),
+        "total": resumen_ms(todas) if todas else None,
+        "llamadas": {k: round(v / repeticiones, 2) for k, v in sorted(llamadas_etapa.items()) if v},
+        "errores": sum(1 for c in casos.values() if "error" in c),
+        "casos": casos,
+    }
+
+
+def _entorno() -> Dict[str, Any]:
+    import fitz
+    return {**entorno(), "pymupdf": fitz.VersionBind}
+
+
+def ejecutar(directorio: str, etapas: List[str], repeticiones: int, calentamiento: int,
+             tipos: Optional[List[str]] = None, mismo_proceso: bool = False) -> Dict[str, Any]:
+    manifiesto = cargar_manifiesto(directorio)
+    resultado: Dict[str, Any] = {
+        "benchmark": "etapas",
+        "version": VERSION_FORMATO,
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "entorno": _entorno(),
+        "corpus": {"directorio": directorio, **huella_corpus(manifiesto)},
+        "parametros": {"repeticiones": repeticiones, "calentamiento": calentamiento},
+        "etapas": {},
+    }
+    contexto = multiprocessing.get_context("spawn")
+    for nombre in etapas:
+        admitidos, _ = ETAPAS[nombre]
+        archivos = [(a["archivo"], a["tipo"]) for a in manifiesto["archivos"]
+                    if a["tipo"] in admitidos and (not tipos or a["tipo"] in tipos)]
+        if not archivos:
+            continue
+        argumentos = (nombre, directorio, archivos, repeticiones, calentamiento)
+        if mismo_proceso:
+            resultado["etapas"][nombre] = medir_etapa(*argumentos)
+        else:
+            with contexto.Pool(1) as pool:
+                resultado["etapas"][nombre] = pool.apply(medir_etapa, argumentos)
+        _imprimir_etapa(nombre, resultado["etapas"][nombre])
+    return resultado
+
+
+def _imprimir_etapa(nombre: str, etapa: Dict[str, Any]) -> None:
+    print(f"\n== {nombre}  (RSS pico {etapa['rss_pico_mb']} MB, {etapa['duracion_s']} s)")
+    for archivo, caso in etapa["casos"].items():
+        if "error" in caso:
+            print(f"  {archivo:<28} ERROR {caso['error']}")
+            continue
+        llamadas = ", ".join(f"{k}={v:g}" for k, v in caso["llamadas"].items())
+        print(f"  {archivo:<28} p50 {caso['p50_ms']:>10.2f} ms  p95 {caso['p95_ms']:>10.2f} ms  {llamadas}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=DIRECTORIO, help="directorio generado por benchmarks.corpus")
+    parser.add_argument("--etapas", default=",".join(ETAPAS), help="etapas separadas por coma")
+    parser.add_argument("--tipos", help="solo estos tipos del corpus, separados por coma")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--calentamiento", type=int, default=1, help="ejecuciones sin medir por archivo")
+    parser.add_argument("--mismo-proceso", action="store_true",
+                        help="no lanzar un proceso por etapa (el RSS pico deja de ser por etapa)")
+    parser.add_argument("--json", help="archivo donde guardar los resultados")
+    args = parser.parse_args(argv)
+
+    etapas = [e for e in args.etapas.split(",") if e]
+    desconocidas = [e for e in etapas if e not in ETAPAS]
+    if desconocidas:
+        parser.error(f"etapas desconocidas: {', '.join(desconocidas)} (disponibles: {', '.join(ETAPAS)})")
+    if not os.path.exists(os.path.join(args.corpus, MANIFIESTO)):
+        parser.error(f"no hay corpus en {args.corpus}; generarlo con: python -m benchmarks.corpus --salida {args.corpus}")
+
+    tipos = args.tipos.split(",") if args.tipos else None
+    resultado = ejecutar(args.corpus, etapas, args.repeticiones, args.calentamiento, tipos, args.mismo_proceso)
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+        print(f"\nResultados en {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+"""
+Arranque en frío de la app: tiempo de importación y dependencias pesadas
+cargadas antes de tiempo.
+
+Cada repetición corre `python -X importtime -c "import app"` en un proceso
+nuevo y resume:
+
+- import_ms    lo que tarda `import app` (sin el arranque del intérprete)
+- proceso_ms   el proceso completo, con intérprete y salida
+- paquetes     tiempo acumulado por paquete de primer nivel (mediana), los más caros
+- diferidos    módulos de helpers/importacion_diferida.DIFERIDOS que ya quedaron
+               importados tras `import app`, con el módulo del repo que los trajo.
+               Debería estar vacío: cada uno es una regresión del arranque.
+
+Con --servidor además levanta uvicorn y mide hasta que /health responde.
+
+    python -m benchmarks.importacion
+    python -m benchmarks.importacion --repeticiones 10 --servidor --json benchmarks/resultados/importacion.json
+"""
+
+import argparse
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from benchmarks.comun import entorno, percentil, resumen_ms
+
+VERSION_FORMATO = 1
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MARCA = "@@importacion@@"
+
+# Código del proceso hijo; MODULO se reemplaza por el módulo a importar
+_HIJO = """
+import json, sys, time
+t0 = time.perf_counter()
+import MODULO
+t1 = time.perf_counter()
+from helpers.importacion_diferida import DIFERIDOS
+cargados = [m for m in DIFERIDOS if m.split(".")[0] in sys.modules]
+print("MARCA" + json.dumps({"import_s": t1 - t0, "diferidos": cargados}))
+""".replace("MARCA", MARCA)
+
+_LINEA = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def _filas_importtime(salida: str) -> List[Tuple[int, int, str]]:
+    """(acumulado en µs, profundidad, módulo) en el orden de -X importtime (hijos antes que el padre)."""
+    filas = []
+    for linea in salida.splitlines():
+        m = _LINEA.match(linea)
+        if m:
+            filas.append((int(m.group(2)), len(m.group(3)) // 2, m.group(4)))
+    return filas
+
+
+def _modulos_del_repo() -> set:
+    nombres = {n[:-3] for n in os.listdir(RAIZ) if n.endswith(".py")}
+    nombres |= {n for n in os.listdir(RAIZ) if os.path.isfile(os.path.join(RAIZ, n, "__init__.py"))}
+    return nombres | {"routes"}
+
+
+def _importado_por(filas: List[Tuple[int, int, str]], paquete: str, propios: set) -> Optional[str]:
+    """Módulo del repo más cercano en la cadena que importó `paquete` por primera vez."""
+    for i, (_, profundidad, nombre) in enumerate(filas):
+        if nombre.split(".")[0] != paquete:
+            continue
+        # El padre de una fila es la siguiente con profundidad menor
+        for _, p, padre in filas[i + 1:]:
+            if p < profundidad:
+                profundidad = p
+                if padre.split(".")[0] in propios:
+                    return padre
+        return None
+    return None
+
+
+def medir_importacion(modulo: str = "app") -> Dict[str, Any]:
+    """Una importación en un proceso nuevo."""
+    t0 = time.perf_counter()
+    proceso = subprocess.run([sys.executable, "-X", "importtime", "-c", _HIJO.replace("MODULO", modulo)],
+                             cwd=RAIZ, capture_output=True, text=True, timeout=300)
+    duracion = time.perf_counter() - t0
+    linea = next((l for l in proceso.stdout.splitlines() if l.startswith(MARCA)), None)
+    if proceso.returncode != 0 or linea is None:
+        ultima = (proceso.stderr.strip().splitlines() or ["sin salida"])[-1]
+        raise RuntimeError(f"import {modulo} falló: {ultima}")
+    datos = json.loads(linea[len(MARCA):])
+    filas = _filas_importtime(proceso.stderr)
+    propios = _modulos_del_repo()
+    paquetes = {nombre: acumulado for acumulado, _, nombre in filas if "." not in nombre}
+    return {
+        "import_s": datos["import_s"],
+        "proceso_s": duracion,
+        "paquetes": paquetes,
+        "diferidos": {m: _importado_por(filas, m.split(".")[0], propios) for m in datos["diferidos"]},
+    }
+
+
+def _puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def medir_arranque(modulo: str = "app", timeout: float = 120.0) -> float:
+    """Segundos desde lanzar uvicorn hasta que /health responde 200."""
+    puerto = _puerto_libre()
+    t0 = time.perf_counter()
+    servidor = subprocess.Popen([sys.executable, "-m", "uvicorn", f"{modulo}:app", "--host", "127.0.0.1",
+                                 "--port", str(puerto), "--log-level", "warning"],
+                                cwd=RAIZ, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    try:
+        while time.perf_counter() - t0 < timeout:
+            if servidor.poll() is not None:
+                raise RuntimeError(f"uvicorn terminó al arrancar: {servidor.stderr.read().decode(errors='replace')[-300:]}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{puerto}/health", timeout=1) as r:
+                    if r.status == 200:
+                        return time.perf_counter() - t0
+            except OSError:
+                time.sleep(0.05)
+        raise RuntimeError(f"/health no respondió en {timeout} s")
+    finally:
+        servidor.terminate()
+        try:
+            servidor.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            servidor.kill()
+
+
+def ejecutar(modulo: str = "app", repeticiones: int = 5, servidor: bool = False, top: int = 15) -> Dict[str, Any]:
+    medidas = [medir_importacion(modulo) for _ in range(repeticiones)]
+    por_paquete = defaultdict(list)
+    for medida in medidas:
+        for nombre, acumulado in medida["paquetes"].items():
+            por_paquete[nombre].append(acumulado / 1000.0)
+    medianas = {nombre: round(percentil(ms, 50), 1) for nombre, ms in por_paquete.items() if nombre != modulo}
+    diferidos: Dict[str, Optional[str]] = {}
+    for medida in medidas:
+        diferidos.update(medida["diferidos"])
+    return {
+        "benchmark": "importacion",
+        "version": VERSION_FORMATO,
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "entorno": entorno(),
+        "parametros": {"modulo": modulo, "repeticiones": repeticiones, "servidor": servidor},
+        "import_ms": resumen_ms([m["import_s"] for m in medidas]),
+        "proceso_ms": resumen_ms([m["proceso_s"] for m in medidas]),
+        "arranque_ms": resumen_ms([medir_arranque(modulo) for _ in range(repeticiones)]) if servidor else None,
+        "paquetes": dict(sorted(medianas.items(), key=lambda kv: -kv[1])[:top]),
+        "diferidos": diferidos,
+    }
+
+
+def _imprimir(resultado: Dict[str, Any]) -> None:
+    print(f"\nimport {resultado['parametros']['modulo']}:  p50 {resultado['import_ms']['p50_ms']:.0f} ms  "
+          f"p95 {resultado['import_ms']['p95_ms']:.0f} ms   (proceso completo p50 {resultado['proceso_ms']['p50_ms']:.0f} ms)")
+    if resultado["arranque_ms"]:
+        print(f"hasta /health:  p50 {resultado['arranque_ms']['p50_ms']:.0f} ms  p95 {resultado['arranque_ms']['p95_ms']:.0f} ms")
+    print("\nPaquetes más caros (mediana, acumulado):")
+    for nombre, ms in resultado["paquetes"].items():
+        print(f"  {ms:>8.1f} ms  {nombre}")
+    if resultado["diferidos"]:
+        print("\nDependencias diferidas importadas al arrancar:")
+        for nombre, origen in resultado["diferidos"].items():
+            print(f"  {nombre:<18} <- {origen or '?'}")
+    else:
+        print("\nNinguna dependencia diferida se importa al arrancar.")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modulo", default="app", help="módulo a importar (con un `app` ASGI para --servidor)")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--servidor", action="store_true", help="medir también uvicorn hasta que /health responde")
+    parser.add_argument("--top", type=int, default=15, help="paquetes más caros a listar")
+    parser.add_argument("--json", help="archivo donde guardar los resultados")
+    args = parser.parse_args(argv)
+
+    resultado = ejecutar(args.modulo, args.repeticiones, args.servidor, args.top)
+    _imprimir(resultado)
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+        print(f"\nResultados en {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,319 @@
+"""
+Servicio SRI falso para pruebas de carga sin salir de la máquina.
+
+Sirve el WSDL de AutorizacionComprobantesOffline y responde
+autorizacionComprobante con respuestas enlatadas, con la latencia que se
+configure. Solo usa la biblioteca estándar.
+
+La respuesta depende de la clave consultada, y siempre es la misma para la
+misma clave:
+
+- claves del corpus (--corpus): AUTORIZADO con el XML firmado de esa factura
+- el resto se reparte por hash de la clave según --proporciones entre
+  autorizado (XML mínimo), no_autorizado (con mensaje de error), vacio
+  (numeroComprobantes 0, como una clave que el SRI no conoce) y timeout
+  (responde después de --timeout-s, por encima del SRI_TIMEOUT de la API)
+
+    python -m benchmarks.sri_falso --puerto 8790 --corpus benchmarks/corpus --latencia-ms 150 --jitter-ms 50
+    SRI_WSDL="http://127.0.0.1:8790/comprobantes-electronicos-ws/AutorizacionComprobantesOffline?wsdl" \\
+        uvicorn main:app --port 8001
+
+GET /estadisticas devuelve cuántas consultas se respondieron con cada estado.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from xml.sax.saxutils import escape
+
+from benchmarks.comun import cargar_manifiesto
+
+RUTA_SERVICIO = "/comprobantes-electronicos-ws/AutorizacionComprobantesOffline"
+NAMESPACE = "http://ec.gob.sri.ws.autorizacion"
+
+ESTADOS = ("autorizado", "no_autorizado", "vacio", "timeout")
+PROPORCIONES = "autorizado=0.9,no_autorizado=0.05,vacio=0.03,timeout=0.02"
+
+_CLAVE = re.compile(r"<(?:\w+:)?claveAccesoComprobante>\s*(\d+)\s*</(?:\w+:)?claveAccesoComprobante>")
+
+_WSDL = """<?xml version="1.0" encoding="UTF-8"?>
+<definitions xmlns="http://schemas.xmlsoap.org/wsdl/" xmlns:soap="http://schemas.xmlsoap.org/wsdl/soap/"
+             xmlns:xsd="http://www.w3.org/2001/XMLSchema" xmlns:tns="{ns}"
+             targetNamespace="{ns}" name="AutorizacionComprobantesOfflineService">
+  <types>
+    <xsd:schema targetNamespace="{ns}" elementFormDefault="unqualified">
+      <xsd:element name="autorizacionComprobante" type="tns:autorizacionComprobante"/>
+      <xsd:element name="autorizacionComprobanteResponse" type="tns:autorizacionComprobanteResponse"/>
+      <xsd:complexType name="autorizacionComprobante">
+        <xsd:sequence><xsd:element name="claveAccesoComprobante" type="xsd:string" minOccurs="0"/></xsd:sequence>
+      </xsd:complexType>
+      <xsd:complexType name="autorizacionComprobanteResponse">
+        <xsd:sequence>
+          <xsd:element name="RespuestaAutorizacionComprobante" type="tns:respuestaComprobante" minOccurs="0"/>
+        </xsd:sequence>
+      </xsd:complexType>
+      <xsd:complexType name="respuestaComprobante">
+        <xsd:sequence>
+          <xsd:element name="claveAccesoConsultada" type="xsd:string" minOccurs="0"/>
+          <xsd:element name="numeroComprobantes" type="xsd:string" minOccurs="0"/>
+          <xsd:element name="autorizaciones" minOccurs="0">
+            <xsd:complexType>
+              <xsd:sequence>
+                <xsd:element name="autorizacion" type="tns:autorizacion" minOccurs="0" maxOccurs="unbounded"/>
+              </xsd:sequence>
+            </xsd:complexType>
+          </xsd:element>
+        </xsd:sequence>
+      </xsd:complexType>
+      <xsd:complexType name="autorizacion">
+        <xsd:sequence>
+          <xsd:element name="estado" type="xsd:string" minOccurs="0"/>
+          <xsd:element name="numeroAutorizacion" type="xsd:string" minOccurs="0"/>
+          <xsd:element name="fechaAutorizacion" type="xsd:dateTime" minOccurs="0"/>
+          <xsd:element name="ambiente" type="xsd:string" minOccurs="0"/>
+          <xsd:element name="comprobante" type="xsd:string" minOccurs="0"/>
+          <xsd:element name="mensajes" minOccurs="0">
+            <xsd:complexType>
+              <xsd:sequence>
+                <xsd:element name="mensaje" type="tns:mensaje" minOccurs="0" maxOccurs="unbounded"/>
+              </xsd:sequence>
+            </xsd:complexType>
+          </xsd:element>
+        </xsd:sequence>
+      </xsd:complexType>
+      <xsd:complexType name="mensaje">
+        <xsd:sequence>
+          <xsd:element name="identificador" type="xsd:string" minOccurs="0"/>
+          <xsd:element name="mensaje" type="xsd:string" minOccurs="0"/>
+          <xsd:element name="informacionAdicional" type="xsd:string" minOccurs="0"/>
+          <xsd:element name="tipo" type="xsd:string" minOccurs="0"/>
+        </xsd:sequence>
+      </xsd:complexType>
+    </xsd:schema>
+  </types>
+  <message name="autorizacionComprobante"><part name="parameters" element="tns:autorizacionComprobante"/></message>
+  <message name="autorizacionComprobanteResponse"><part name="parameters" element="tns:autorizacionComprobanteResponse"/></message>
+  <portType name="AutorizacionComprobantesOffline">
+    <operation name="autorizacionComprobante">
+      <input message="tns:autorizacionComprobante"/>
+      <output message="tns:autorizacionComprobanteResponse"/>
+    </operation>
+  </portType>
+  <binding name="AutorizacionComprobantesOfflinePortBinding" type="tns:AutorizacionComprobantesOffline">
+    <soap:binding transport="http://schemas.xmlsoap.org/soap/http" style="document"/>
+    <operation name="autorizacionComprobante">
+      <soap:operation soapAction=""/>
+      <input><soap:body use="literal"/></input>
+      <output><soap:body use="literal"/></output>
+    </operation>
+  </binding>
+  <service name="AutorizacionComprobantesOfflineService">
+    <port name="AutorizacionComprobantesOfflinePort" binding="tns:AutorizacionComprobantesOfflinePortBinding">
+      <soap:address location="{ubicacion}"/>
+    </port>
+  </service>
+</definitions>
+"""
+
+_SOBRE = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/"><soap:Body>'
+    '<ns2:autorizacionComprobanteResponse xmlns:ns2="{ns}"><RespuestaAutorizacionComprobante>'
+    "<claveAccesoConsultada>{clave}</claveAccesoConsultada>"
+    "<numeroComprobantes>{numero}</numeroComprobantes>"
+    "<autorizaciones>{autorizaciones}</autorizaciones>"
+    "</RespuestaAutorizacionComprobante></ns2:autorizacionComprobanteResponse>"
+    "</soap:Body></soap:Envelope>"
+)
+
+_AUTORIZACION = (
+    "<autorizacion><estado>{estado}</estado>{numero}"
+    "<fechaAutorizacion>{fecha}</fechaAutorizacion><ambiente>PRODUCCIÓN</ambiente>"
+    "<comprobante>{comprobante}</comprobante><mensajes>{mensajes}</mensajes></autorizacion>"
+)
+
+_MENSAJE_NO_AUTORIZADO = (
+    "<mensaje><identificador>39</identificador><mensaje>FIRMA INVALIDA</mensaje>"
+    "<informacionAdicional>La firma es invalida [Firma inválida (firma y/o certificados alterados)]"
+    "</informacionAdicional><tipo>ERROR</tipo></mensaje>"
+)
+
+
+def _proporciones(texto: str) -> Tuple[Tuple[str, float], ...]:
+    pares = []
+    for parte in texto.split(","):
+        estado, _, peso = parte.partition("=")
+        estado = estado.strip()
+        if estado not in ESTADOS:
+            raise ValueError(f"estado desconocido: {estado} (disponibles: {', '.join(ESTADOS)})")
+        pares.append((estado, float(peso)))
+    total = sum(p for _, p in pares)
+    if total <= 0:
+        raise ValueError("las proporciones deben sumar más de 0")
+    return tuple((e, p / total) for e, p in pares)
+
+
+def _comprobantes_corpus(directorio: Optional[str]) -> Dict[str, str]:
+    """clave de acceso -> XML firmado del corpus de benchmarks."""
+    if not directorio:
+        return {}
+    comprobantes = {}
+    for archivo in cargar_manifiesto(directorio)["archivos"]:
+        if archivo["tipo"] == "xml_xades":
+            with open(os.path.join(directorio, archivo["archivo"]), encoding="utf-8") as f:
+                comprobantes[archivo["clave_acceso"]] = f.read()
+    return comprobantes
+
+
+class ServicioSRI:
+    """Decide la respuesta y la latencia de cada consulta; lleva las estadísticas."""
+
+    def __init__(self, proporciones: str = PROPORCIONES, latencia_ms: float = 150.0, jitter_ms: float = 50.0,
+                 timeout_s: float = 30.0, comprobantes: Optional[Dict[str, str]] = None, semilla: int = 7):
+        self.proporciones = _proporciones(proporciones)
+        self.latencia_ms = latencia_ms
+        self.jitter_ms = jitter_ms
+        self.timeout_s = timeout_s
+        self.comprobantes = comprobantes or {}
+        self._rng = random.Random(semilla)
+        self._lock = threading.Lock()
+        self.estadisticas: Counter = Counter()
+
+    def estado(self, clave: str) -> str:
+        if clave in self.comprobantes:
+            return "autorizado"
+        # Fracción estable en [0, 1) a partir de la clave
+        x = int(hashlib.sha256(clave.encode()).hexdigest()[:8], 16) / 0x100000000
+        acumulado = 0.0
+        for estado, peso in self.proporciones:
+            acumulado += peso
+            if x < acumulado:
+                return estado
+        return self.proporciones[-1][0]
+
+    def demora(self, estado: str) -> float:
+        if estado == "timeout":
+            return self.timeout_s
+        with self._lock:
+            jitter = self._rng.uniform(-self.jitter_ms, self.jitter_ms)
+        return max(0.0, self.latencia_ms + jitter) / 1000.0
+
+    def respuesta(self, clave: str, estado: str) -> str:
+        fecha = datetime.now().astimezone().isoformat(timespec="seconds")
+        if estado == "vacio":
+            return _SOBRE.format(ns=NAMESPACE, clave=clave, numero=0, autorizaciones="")
+        if estado == "no_autorizado":
+            autorizacion = _AUTORIZACION.format(estado="NO AUTORIZADO", numero="", fecha=fecha,
+                                                comprobante="", mensajes=_MENSAJE_NO_AUTORIZADO)
+        else:
+            comprobante = self.comprobantes.get(clave) or (
+                f'<?xml version="1.0" encoding="UTF-8"?><factura id="comprobante" version="1.1.0">'
+                f"<infoTributaria><claveAcceso>{clave}</claveAcceso></infoTributaria></factura>"
+            )
+            autorizacion = _AUTORIZACION.format(
+                estado="AUTORIZADO", numero=f"<numeroAutorizacion>{clave}</numeroAutorizacion>",
+                fecha=fecha, comprobante=escape(comprobante), mensajes="")
+        return _SOBRE.format(ns=NAMESPACE, clave=clave, numero=1, autorizaciones=autorizacion)
+
+    def contar(self, nombre: str) -> None:
+        with self._lock:
+            self.estadisticas[nombre] += 1
+
+
+class _Manejador(BaseHTTPRequestHandler):
+    server_version = "SRIFalso/1.0"
+    protocol_version = "HTTP/1.1"
+    servicio: ServicioSRI
+
+    def log_message(self, formato, *args):
+        pass
+
+    def _enviar(self, status: int, cuerpo: bytes, tipo: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def do_GET(self):
+        ruta, _, consulta = self.path.partition("?")
+        if ruta == RUTA_SERVICIO and consulta.lower() == "wsdl":
+            self.servicio.contar("wsdl")
+            anfitrion = self.headers.get("Host") or f"{self.server.server_address[0]}:{self.server.server_address[1]}"
+            wsdl = _WSDL.format(ns=NAMESPACE, ubicacion=f"http://{anfitrion}{RUTA_SERVICIO}")
+            self._enviar(200, wsdl.encode("utf-8"), "text/xml; charset=utf-8")
+        elif ruta == "/estadisticas":
+            self._enviar(200, json.dumps(dict(self.servicio.estadisticas)).encode(), "application/json")
+        else:
+            self._enviar(404, b"no encontrado", "text/plain")
+
+    def do_POST(self):
+        longitud = int(self.headers.get("Content-Length") or 0)
+        cuerpo = self.rfile.read(longitud).decode("utf-8", errors="replace")
+        if self.path.partition("?")[0] != RUTA_SERVICIO:
+            self._enviar(404, b"no encontrado", "text/plain")
+            return
+        encontrado = _CLAVE.search(cuerpo)
+        if not encontrado:
+            self.servicio.contar("peticion_invalida")
+            self._enviar(500, b"claveAccesoComprobante ausente", "text/plain")
+            return
+        clave = encontrado.group(1)
+        estado = self.servicio.estado(clave)
+        self.servicio.contar(estado)
+        time.sleep(self.servicio.demora(estado))
+        self._enviar(200, self.servicio.respuesta(clave, estado).encode("utf-8"), "text/xml; charset=utf-8")
+
+
+def crear_servidor(servicio: ServicioSRI, host: str = "127.0.0.1", puerto: int = 8790) -> ThreadingHTTPServer:
+    manejador = type("Manejador", (_Manejador,), {"servicio": servicio})
+    servidor = ThreadingHTTPServer((host, puerto), manejador)
+    servidor.daemon_threads = True
+    return servidor
+
+
+def url_wsdl(host: str, puerto: int) -> str:
+    return f"http://{host}:{puerto}{RUTA_SERVICIO}?wsdl"
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8790)
+    parser.add_argument("--corpus", help="corpus de benchmarks.corpus: sus claves responden AUTORIZADO con su XML")
+    parser.add_argument("--proporciones", default=PROPORCIONES,
+                        help=f"reparto para claves fuera del corpus (por defecto {PROPORCIONES})")
+    parser.add_argument("--latencia-ms", type=float, default=150.0)
+    parser.add_argument("--jitter-ms", type=float, default=50.0, help="variación uniforme ± sobre la latencia")
+    parser.add_argument("--timeout-s", type=float, default=30.0, help="demora de las respuestas 'timeout'")
+    args = parser.parse_args(argv)
+
+    try:
+        servicio = ServicioSRI(args.proporciones, args.latencia_ms, args.jitter_ms, args.timeout_s,
+                               _comprobantes_corpus(args.corpus))
+    except ValueError as e:
+        parser.error(str(e))
+    servidor = crear_servidor(servicio, args.host, args.puerto)
+    print(f"SRI falso en {url_wsdl(args.host, args.puerto)}")
+    print(f"  {len(servicio.comprobantes)} claves del corpus; resto: {args.proporciones}")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,7 @@
 import os
-import json   
 
 # --------------------------- CONFIG ----------------------------------
-SRI_WSDL = "https://cel.sri.gob.ec/comprobantes-electronicos-ws/AutorizacionComprobantesOffline?wsdl"
+SRI_WSDL = os.getenv("SRI_WSDL", "https://cel.sri.gob.ec/comprobantes-electronicos-ws/AutorizacionComprobantesOffline?wsdl")
 MAX_PDF_BYTES = int(os.getenv("MAX_PDF_BYTES", 10 * 1024 * 1024))  # 10 MB
 SRI_TIMEOUT = float(os.getenv("SRI_TIMEOUT", "12"))
 TEXT_MIN_LEN_FOR_DOC = int(os.getenv("TEXT_MIN_LEN_FOR_DOC", "50"))
@@ -10,149 +9,233 @@ RENDER_DPI = int(os.getenv("RENDER_DPI", "260"))
 EASYOCR_LANGS = os.getenv("EASYOCR_LANGS", "es,en").split(",")
 EASYOCR_GPU = os.getenv("EASYOCR_GPU", "false").lower() == "true"
 
+# Política de páginas para documentos largos
+# - las primeras PAGINAS_ANALISIS_COMPLETO páginas se analizan por completo
+# - del resto se muestrean PAGINAS_MUESTREO_ESTRUCTURAL para los checks estructurales baratos
+# - los análisis por renderizado se limitan a MAX_PAGINAS_RENDER páginas y MAX_PIXELES_RENDER píxeles
+PAGINAS_ANALISIS_COMPLETO = int(os.getenv("PAGINAS_ANALISIS_COMPLETO", "3"))
+PAGINAS_MUESTREO_ESTRUCTURAL = int(os.getenv("PAGINAS_MUESTREO_ESTRUCTURAL", "5"))
+MAX_PAGINAS_RENDER = int(os.getenv("MAX_PAGINAS_RENDER", "2"))
+MAX_PIXELES_RENDER = int(os.getenv("MAX_PIXELES_RENDER", str(8_000_000)))
+
+# Diffs de render por capas (texto superpuesto)
+# - se compara en escala de grises a DIFF_DPI_GRUESO (reducido si la página supera DIFF_MAX_PIXELES)
+# - si el ratio queda a menos de DIFF_MARGEN_ESCALADO * umbral del umbral, se repite a DIFF_DPI_FINO
+DIFF_DPI_GRUESO = int(os.getenv("DIFF_DPI_GRUESO", "72"))
+DIFF_DPI_FINO = int(os.getenv("DIFF_DPI_FINO", "144"))
+DIFF_MAX_PIXELES = int(os.getenv("DIFF_MAX_PIXELES", str(1_000_000)))
+DIFF_MARGEN_ESCALADO = float(os.getenv("DIFF_MARGEN_ESCALADO", "0.5"))
+
+# Procesos para analizar páginas en paralelo, por worker (0 = automático: min(4, CPUs / workers de gunicorn); 1 = secuencial)
+PARALELISMO_PAGINAS = int(os.getenv("PARALELISMO_PAGINAS", "0"))
+
+# Caché de rasterizado de páginas (por proceso)
+# - LRU de rasters con clave (sha256, página, dpi, color)
+# - RASTER_CACHE_MAX_BYTES es el total del servidor: con gunicorn cada worker usa
+#   RASTER_CACHE_MAX_BYTES / workers; los procesos del pool de páginas no guardan rasters
+# - con RASTER_CACHE_REESCALADO se reduce un raster de mayor dpi en lugar de volver a renderizar
+RASTER_CACHE_MAX_BYTES = int(os.getenv("RASTER_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+RASTER_CACHE_REESCALADO = os.getenv("RASTER_CACHE_REESCALADO", "true").lower() == "true"
+
+# Validación por lotes (/validar-factura/batch)
+LOTE_MAX_DOCUMENTOS = int(os.getenv("LOTE_MAX_DOCUMENTOS", "1000"))
+LOTE_CONCURRENCIA_DOCUMENTOS = int(os.getenv("LOTE_CONCURRENCIA_DOCUMENTOS", "4"))
+LOTE_CONCURRENCIA_SRI = int(os.getenv("LOTE_CONCURRENCIA_SRI", "8"))
+
+# Trabajos asíncronos (/jobs)
+# - estado y resultados en SQLite (TRABAJOS_DB), expiran tras TRABAJOS_TTL_SEGUNDOS
+# - TRABAJOS_WORKERS hilos procesan una cola de hasta TRABAJOS_MAX_COLA documentos (503 si está llena)
+TRABAJOS_DB = os.getenv("TRABAJOS_DB", "trabajos.db")
+TRABAJOS_WORKERS = int(os.getenv("TRABAJOS_WORKERS", "2"))
+TRABAJOS_MAX_COLA = int(os.getenv("TRABAJOS_MAX_COLA", "50"))
+TRABAJOS_TTL_SEGUNDOS = int(os.getenv("TRABAJOS_TTL_SEGUNDOS", "3600"))
+TRABAJOS_ESPERA_MAX_SEGUNDOS = float(os.getenv("TRABAJOS_ESPERA_MAX_SEGUNDOS", "25"))
+TRABAJOS_CALLBACK_REINTENTOS = int(os.getenv("TRABAJOS_CALLBACK_REINTENTOS", "3"))
+TRABAJOS_CALLBACK_TIMEOUT = float(os.getenv("TRABAJOS_CALLBACK_TIMEOUT", "10"))
+# Hosts admitidos en callback_url, separados por comas (".dominio.com" admite subdominios).
+# Vacío: cualquier host que resuelva solo a direcciones públicas (nunca privadas, loopback ni link-local)
+TRABAJOS_CALLBACK_HOSTS = [h.strip().lower() for h in os.getenv("TRABAJOS_CALLBACK_HOSTS", "").split(",") if h.strip()]
+# Cada proceso con trabajos registra un latido; sus trabajos activos se dan por
+# perdidos si deja de latir durante 3 intervalos (caída, reciclaje, reinicio)
+TRABAJOS_LATIDO_SEGUNDOS = float(os.getenv("TRABAJOS_LATIDO_SEGUNDOS", "10"))
+
+# Reclamos (/reclamos) en SQLite; RECLAMOS_JSON es el archivo anterior, que se
+# importa una sola vez cuando la base está vacía (helpers/almacen_reclamos.py)
+RECLAMOS_DB = os.getenv("RECLAMOS_DB", "reclamos.db")
+RECLAMOS_JSON = os.getenv("RECLAMOS_JSON", "reclamos_data.json")
+
+# Trazas por petición (Server-Timing, línea JSON en el log "trazas", ?timings=true)
+TRAZAS_ACTIVAS = os.getenv("TRAZAS_ACTIVAS", "true").lower() == "true"
+TRAZAS_LOG = os.getenv("TRAZAS_LOG", "true").lower() == "true"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# Métricas (/metrics): cada worker publica las suyas en METRICAS_DB cada
+# METRICAS_PUBLICACION_SEGUNDOS y /metrics expone las de todos. Vacío: solo las
+# del proceso que atiende
+METRICAS_DB = os.getenv("METRICAS_DB", "metricas.db")
+METRICAS_PUBLICACION_SEGUNDOS = float(os.getenv("METRICAS_PUBLICACION_SEGUNDOS", "5"))
+
+# Perfilado bajo demanda (cabeceras X-Perfil + X-Perfil-Token, o muestreo aleatorio)
+# - sin PERFIL_TOKEN solo funciona el muestreo y los endpoints /perfiles quedan deshabilitados
+PERFIL_TOKEN = os.getenv("PERFIL_TOKEN", "")
+PERFIL_MUESTREO = float(os.getenv("PERFIL_MUESTREO", "0"))
+PERFIL_DIR = os.getenv("PERFIL_DIR", "perfiles")
+PERFIL_MAX = int(os.getenv("PERFIL_MAX", "200"))
+
+# Nivel de detalle por defecto de las respuestas de validación (summary | standard | full)
+DETALLE_RESPUESTA = os.getenv("DETALLE_RESPUESTA", "full")
+
+# Precalentamiento al arrancar: importar en segundo plano las dependencias pesadas que
+# se cargan en el primer uso (OpenCV, scikit-image, pikepdf, zeep, ...) y, si se pide,
+# el modelo de EasyOCR. El servidor atiende mientras tanto.
+PRECALENTAR = os.getenv("PRECALENTAR", "false").lower() == "true"
+PRECALENTAR_EASYOCR = os.getenv("PRECALENTAR_EASYOCR", "false").lower() == "true"
+
+# Servidor de producción (gunicorn.conf.py): N workers uvicorn que se bifurcan de un
+# maestro que ya importó la app y precalentó (WSDL, raíces de confianza, modelos),
+# así esa memoria de solo lectura se comparte entre workers (copy-on-write)
+# - SERVIDOR_WORKERS=0: uno por CPU disponible
+# - SERVIDOR_MAX_PETICIONES: el worker se recicla tras N peticiones (±VARIACION) para contener fugas; 0 = nunca
+SERVIDOR_WORKERS = int(os.getenv("SERVIDOR_WORKERS", "0"))
+SERVIDOR_MAX_PETICIONES = int(os.getenv("SERVIDOR_MAX_PETICIONES", "1000"))
+SERVIDOR_MAX_PETICIONES_VARIACION = int(os.getenv("SERVIDOR_MAX_PETICIONES_VARIACION", "100"))
+SERVIDOR_TIMEOUT = int(os.getenv("SERVIDOR_TIMEOUT", "120"))
+SERVIDOR_TIMEOUT_GRACEFUL = int(os.getenv("SERVIDOR_TIMEOUT_GRACEFUL", "30"))
+SERVIDOR_KEEPALIVE = int(os.getenv("SERVIDOR_KEEPALIVE", "5"))
+
 # Tolerancias comparación SRI vs PDF
 QTY_EPS = float(os.getenv("CMP_QTY_EPS", "0.001"))
 PRICE_EPS = float(os.getenv("CMP_PRICE_EPS", "0.01"))
 TOTAL_EPS = float(os.getenv("CMP_TOTAL_EPS", "0.02"))
 MATCH_THRESHOLD = float(os.getenv("CMP_MATCH_THRESHOLD", "0.60"))
 
+# Configuración de riesgo: pesos, descripciones y niveles. Se leen con
+# helpers.config_riesgo.actual() (instantánea inmutable y versionada, que se
+# recarga en todos los workers cuando cambian estos archivos); aquí solo quedan
+# las rutas y los valores por defecto
 CONFIG_FILE = "risk_weights.json"
 DESCRIPTIONS_FILE = "risk_weights_descriptions.json"
+RISK_LEVELS_FILE = "risk_levels_config.json"
 
-# cargar desde json si existe
-if os.path.exists(CONFIG_FILE):
-    with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-        RISK_WEIGHTS = json.load(f)
-
-
-# Cargar descripciones de RISK_WEIGHTS
-if os.path.exists(DESCRIPTIONS_FILE):
-    with open(DESCRIPTIONS_FILE, "r", encoding="utf-8") as f:
-        RISK_WEIGHTS_DESCRIPTIONS = json.load(f)
-else:
-    # Descripciones por defecto si no existe el archivo
-    RISK_WEIGHTS_DESCRIPTIONS = {
-        "fecha_creacion_vs_emision": {
-            "valor": 15,
-            "descripcion": "Diferencia entre la fecha de creación del PDF y la fecha de emisión del documento",
-            "explicacion": "Un documento legítimo debería crearse cerca de su fecha de emisión. Diferencias grandes pueden indicar manipulación."
-        },
-        "fecha_mod_vs_creacion": {
-            "valor": 12,
-            "descripcion": "Diferencia entre la fecha de modificación y creación del PDF",
-            "explicacion": "Modificaciones posteriores a la creación pueden sugerir alteraciones del documento original."
-        },
-        "software_conocido": {
-            "valor": 12,
-            "descripcion": "Uso de software conocido y confiable para crear el PDF",
-            "explicacion": "Documentos creados con software desconocido o poco común pueden ser sospechosos."
-        },
-        "capas_multiples": {
-            "valor": 10,
-            "descripcion": "Presencia de capas múltiples (OCG) en el PDF",
-            "explicacion": "Las capas pueden usarse para ocultar o superponer información, común en documentos manipulados."
-        },
-        "consistencia_fuentes": {
-            "valor": 8,
-            "descripcion": "Consistencia en el uso de fuentes tipográficas",
-            "explicacion": "Mezcla excesiva de fuentes puede indicar que el documento fue compuesto de múltiples fuentes."
-        },
-        "dpi_uniforme": {
-            "valor": 8,
-            "descripcion": "Uniformidad en la resolución (DPI) de las imágenes",
-            "explicacion": "Resoluciones muy diferentes pueden indicar inserción de imágenes de distintas fuentes."
-        },
-        "compresion_estandar": {
-            "valor": 6,
-            "descripcion": "Uso de métodos de compresión estándar",
-            "explicacion": "Métodos de compresión inusuales pueden indicar manipulación o generación no estándar."
-        },
-        "alineacion_texto": {
-            "valor": 6,
-            "descripcion": "Alineación correcta de elementos de texto",
-            "explicacion": "Texto mal alineado o con rotaciones extrañas puede indicar manipulación digital."
-        },
-        "anotaciones_o_formularios": {
-            "valor": 3,
-            "descripcion": "Presencia de anotaciones o campos de formulario",
-            "explicacion": "Elementos interactivos en documentos oficiales pueden facilitar la manipulación."
-        },
-        "javascript_embebido": {
-            "valor": 2,
-            "descripcion": "Código JavaScript embebido en el PDF",
-            "explicacion": "JavaScript en documentos oficiales es inusual y puede usarse para ocultar contenido."
-        },
-        "archivos_incrustados": {
-            "valor": 3,
-            "descripcion": "Archivos adjuntos o incrustados en el PDF",
-            "explicacion": "Archivos ocultos dentro del PDF pueden contener información maliciosa o no autorizada."
-        },
-        "firmas_pdf": {
-            "valor": -4,
-            "descripcion": "Presencia de firmas digitales válidas",
-            "explicacion": "Las firmas digitales aumentan la confiabilidad del documento (reduce el riesgo)."
-        },
-        "actualizaciones_incrementales": {
-            "valor": 3,
-            "descripcion": "Múltiples actualizaciones incrementales del PDF",
-            "explicacion": "Muchas modificaciones pueden indicar alteraciones sucesivas del documento original."
-        },
-        "cifrado_permisos_extra": {
-            "valor": 2,
-            "descripcion": "Cifrado o permisos especiales aplicados",
-            "explicacion": "Restricciones inusuales pueden usarse para ocultar el método de creación del documento."
-        },
-        "math_consistency": {
-            "valor": 10,
-            "descripcion": "Consistencia aritmética: subtotal + impuestos − descuentos − retenciones = total",
-            "explicacion": "Descuadres contables evidencian manipulación o error."
-        },
-        "sri_verificacion": {
-            "valor": 20,
-            "descripcion": "Verificación exitosa contra el SRI (Servicio de Rentas Internas)",
-            "explicacion": "La capacidad de verificar el documento contra registros oficiales del SRI aumenta significativamente la confiabilidad."
-        },
-        "extraccion_texto_ocr": {
-            "valor": 30,
-            "descripcion": "Extracción de texto mediante OCR (Reconocimiento Óptico de Caracteres)",
-            "explicacion": "La incapacidad de extraer texto legible de una imagen puede indicar manipulación, baja calidad o formato no estándar."
-        },
-        "inconsistencias_ruido_bordes": {
-            "valor": 18,
-            "descripcion": "Inconsistencias en patrones de ruido y bordes",
-            "explicacion": "Patrones de ruido inconsistentes pueden indicar edición local, clonado o pegado de elementos."
-        },
-        "analisis_ela_sospechoso": {
-            "valor": 12,
-            "descripcion": "Análisis ELA (Error Level Analysis) sospechoso",
-            "explicacion": "El ELA detecta áreas de la imagen que han sido editadas o re-comprimidas, indicando posible manipulación."
-        },
-        "metadatos_sospechosos": {
-            "valor": 5,
-            "descripcion": "Metadatos EXIF/IPTC/XMP sospechosos o inconsistentes",
-            "explicacion": "Metadatos faltantes, inconsistentes o con información sospechosa pueden indicar manipulación."
-        },
-        "texto_superpuesto": {
-            "valor": 25,
-            "descripcion": "Detección de texto superpuesto en imagen",
-            "explicacion": "Texto superpuesto puede indicar que se agregó información sobre el documento original."
-        },
-        "capas_ocultas": {
-            "valor": 20,
-            "descripcion": "Presencia de capas ocultas en formatos que las soportan",
-            "explicacion": "Capas ocultas pueden contener información no visible que modifica el contenido aparente del documento."
-        }
+# Cada cuánto (segundos) se revisa si esos archivos cambiaron (solo stat, sin leerlos)
+CONFIG_RIESGO_REVISION_S = float(os.getenv("CONFIG_RIESGO_REVISION_S", "2"))
+
+# Descripciones por defecto si no existe el archivo (sus "valor" son también los
+# pesos por defecto si falta risk_weights.json)
+RISK_WEIGHTS_DESCRIPTIONS_DEFAULT = {
+    "fecha_creacion_vs_emision": {
+        "valor": 15,
+        "descripcion": "Diferencia entre la fecha de creación del PDF y la fecha de emisión del documento",
+        "explicacion": "Un documento legítimo debería crearse cerca de su fecha de emisión. Diferencias grandes pueden indicar manipulación."
+    },
+    "fecha_mod_vs_creacion": {
+        "valor": 12,
+        "descripcion": "Diferencia entre la fecha de modificación y creación del PDF",
+        "explicacion": "Modificaciones posteriores a la creación pueden sugerir alteraciones del documento original."
+    },
+    "software_conocido": {
+        "valor": 12,
+        "descripcion": "Uso de software conocido y confiable para crear el PDF",
+        "explicacion": "Documentos creados con software desconocido o poco común pueden ser sospechosos."
+    },
+    "capas_multiples": {
+        "valor": 10,
+        "descripcion": "Presencia de capas múltiples (OCG) en el PDF",
+        "explicacion": "Las capas pueden usarse para ocultar o superponer información, común en documentos manipulados."
+    },
+    "consistencia_fuentes": {
+        "valor": 8,
+        "descripcion": "Consistencia en el uso de fuentes tipográficas",
+        "explicacion": "Mezcla excesiva de fuentes puede indicar que el documento fue compuesto de múltiples fuentes."
+    },
+    "dpi_uniforme": {
+        "valor": 8,
+        "descripcion": "Uniformidad en la resolución (DPI) de las imágenes",
+        "explicacion": "Resoluciones muy diferentes pueden indicar inserción de imágenes de distintas fuentes."
+    },
+    "compresion_estandar": {
+        "valor": 6,
+        "descripcion": "Uso de métodos de compresión estándar",
+        "explicacion": "Métodos de compresión inusuales pueden indicar manipulación o generación no estándar."
+    },
+    "alineacion_texto": {
+        "valor": 6,
+        "descripcion": "Alineación correcta de elementos de texto",
+        "explicacion": "Texto mal alineado o con rotaciones extrañas puede indicar manipulación digital."
+    },
+    "anotaciones_o_formularios": {
+        "valor": 3,
+        "descripcion": "Presencia de anotaciones o campos de formulario",
+        "explicacion": "Elementos interactivos en documentos oficiales pueden facilitar la manipulación."
+    },
+    "javascript_embebido": {
+        "valor": 2,
+        "descripcion": "Código JavaScript embebido en el PDF",
+        "explicacion": "JavaScript en documentos oficiales es inusual y puede usarse para ocultar contenido."
+    },
+    "archivos_incrustados": {
+        "valor": 3,
+        "descripcion": "Archivos adjuntos o incrustados en el PDF",
+        "explicacion": "Archivos ocultos dentro del PDF pueden contener información maliciosa o no autorizada."
+    },
+    "firmas_pdf": {
+        "valor": -4,
+        "descripcion": "Presencia de firmas digitales válidas",
+        "explicacion": "Las firmas digitales aumentan la confiabilidad del documento (reduce el riesgo)."
+    },
+    "actualizaciones_incrementales": {
+        "valor": 3,
+        "descripcion": "Múltiples actualizaciones incrementales del PDF",
+        "explicacion": "Muchas modificaciones pueden indicar alteraciones sucesivas del documento original."
+    },
+    "cifrado_permisos_extra": {
+        "valor": 2,
+        "descripcion": "Cifrado o permisos especiales aplicados",
+        "explicacion": "Restricciones inusuales pueden usarse para ocultar el método de creación del documento."
+    },
+    "math_consistency": {
+        "valor": 10,
+        "descripcion": "Consistencia aritmética: subtotal + impuestos − descuentos − retenciones = total",
+        "explicacion": "Descuadres contables evidencian manipulación o error."
+    },
+    "sri_verificacion": {
+        "valor": 20,
+        "descripcion": "Verificación exitosa contra el SRI (Servicio de Rentas Internas)",
+        "explicacion": "La capacidad de verificar el documento contra registros oficiales del SRI aumenta significativamente la confiabilidad."
+    },
+    "extraccion_texto_ocr": {
+        "valor": 30,
+        "descripcion": "Extracción de texto mediante OCR (Reconocimiento Óptico de Caracteres)",
+        "explicacion": "La incapacidad de extraer texto legible de una imagen puede indicar manipulación, baja calidad o formato no estándar."
+    },
+    "inconsistencias_ruido_bordes": {
+        "valor": 18,
+        "descripcion": "Inconsistencias en patrones de ruido y bordes",
+        "explicacion": "Patrones de ruido inconsistentes pueden indicar edición local, clonado o pegado de elementos."
+    },
+    "analisis_ela_sospechoso": {
+        "valor": 12,
+        "descripcion": "Análisis ELA (Error Level Analysis) sospechoso",
+        "explicacion": "El ELA detecta áreas de la imagen que han sido editadas o re-comprimidas, indicando posible manipulación."
+    },
+    "metadatos_sospechosos": {
+        "valor": 5,
+        "descripcion": "Metadatos EXIF/IPTC/XMP sospechosos o inconsistentes",
+        "explicacion": "Metadatos faltantes, inconsistentes o con información sospechosa pueden indicar manipulación."
+    },
+    "texto_superpuesto": {
+        "valor": 25,
+        "descripcion": "Detección de texto superpuesto en imagen",
+        "explicacion": "Texto superpuesto puede indicar que se agregó información sobre el documento original."
+    },
+    "capas_ocultas": {
+        "valor": 20,
+        "descripcion": "Presencia de capas ocultas en formatos que las soportan",
+        "explicacion": "Capas ocultas pueden contener información no visible que modifica el contenido aparente del documento."
     }
-    
-# Cargar RISK_LEVELS (con persistencia)
-RISK_LEVELS_FILE = "risk_levels_config.json"
-if os.path.exists(RISK_LEVELS_FILE):
-    with open(RISK_LEVELS_FILE, "r", encoding="utf-8") as f:
-        risk_levels_data = json.load(f)
-        # Convertir listas a tuplas
-        RISK_LEVELS = {k: tuple(v) if isinstance(v, list) else v for k, v in risk_levels_data.items()}
-else:
-    RISK_LEVELS = {"bajo": (0, 29), "medio": (30, 59), "alto": (60, 100)}
+}
+
+RISK_LEVELS_DEFAULT = {"bajo": (0, 29), "medio": (30, 59), "alto": (60, 100)}
 
 # Heurística fechas
 MAX_DIAS_CREACION_EMISION_OK = int(os.getenv("MAX_DIAS_CREACION_EMISION_OK", "30"))
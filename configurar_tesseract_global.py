@@ -5,16 +5,25 @@
 Script para configurar Tesseract globalmente para Linux (Docker/producción)
 """
 
-import os
-import sys
-
-# Configurar Tesseract ANTES de importar cualquier módulo que lo use
-try:
-    import pytesseract
-    pytesseract.pytesseract.tesseract_cmd = "/usr/bin/tesseract"
-    print("✅ Tesseract configurado globalmente para Linux: /usr/bin/tesseract")
-except Exception as e:
-    print(f"❌ Error configurando Tesseract: {e}")
+import logging
+
+from helpers.importacion_diferida import al_importar
+
+logger = logging.getLogger(__name__)
+
+TESSERACT_CMD = "/usr/bin/tesseract"
+
+
+def _configurar(pytesseract) -> None:
+    pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
+    from helpers.trazas import instrumentar_tesseract
+    instrumentar_tesseract()
+    logger.info("Tesseract configurado globalmente para Linux: %s", TESSERACT_CMD)
+
+
+# Se configura cuando algún módulo importa pytesseract por primera vez, no al
+# arrancar: importar pytesseract (y pandas detrás) alarga el arranque en frío.
+al_importar("pytesseract", _configurar)
 
 # Ahora importar y ejecutar el servidor
 if __name__ == "__main__":
@@ -3,76 +3,105 @@
 
 """
 Script para crear un PDF de prueba con texto nativo
+
+El contenido de la factura (lineas_factura) también lo usa el generador de
+corpus de benchmarks/corpus.py con otros datos.
 """
 
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.units import inch
 import os
 
+# Datos de la factura de prueba original
+DATOS_FACTURA = {
+    "razon_social": "FARMACIAS Y COMISARIATOS DE MEDICINAS S.A.",
+    "ruc": "1790710319001",
+    "direccion": "Av. Interoceánica S/N",
+    "numero": "026-200-000021384",
+    "clave_acceso": "0807202501179071031900120262000000213845658032318",
+    "ambiente": "PRODUCCION",
+    "fecha_emision": "2025-07-08 19:58:13",
+    "cliente": "ROCKO VERDEZOTO",
+    "identificacion": "1234567890",
+    "items": [
+        ("MEDICAMENTO A", 1, "23.00"),
+        ("MEDICAMENTO B", 2, "15.50"),
+    ],
+    "subtotal": "54.00",
+    "iva": "8.10",
+    "total": "62.10",
+    "forma_pago": "TARJETA DE CREDITO",
+}
+
+
+def lineas_factura(datos=DATOS_FACTURA):
+    """
+    Contenido de la factura como (fuente, tamaño, x, y desde arriba, texto);
+    fuente es "Helvetica" o "Helvetica-Bold".
+    """
+    lineas = [
+        # Título
+        ("Helvetica-Bold", 16, 100, 50, "FACTURA ELECTRÓNICA"),
+        # Información de la empresa
+        ("Helvetica", 12, 100, 80, datos["razon_social"]),
+        ("Helvetica", 12, 100, 100, f"RUC: {datos['ruc']}"),
+        ("Helvetica", 12, 100, 120, f"Dirección: {datos['direccion']}"),
+        # Número de factura
+        ("Helvetica", 12, 100, 150, f"FACTURA No. {datos['numero']}"),
+        # Número de autorización
+        ("Helvetica", 12, 100, 180, "NÚMERO DE AUTORIZACIÓN"),
+        ("Helvetica-Bold", 14, 100, 200, datos["clave_acceso"]),
+        # Ambiente
+        ("Helvetica", 12, 100, 230, f"AMBIENTE: {datos['ambiente']}"),
+        # Fecha
+        ("Helvetica", 12, 100, 260, f"FECHA Y HORA DE EMISIÓN: {datos['fecha_emision']}"),
+        # Cliente
+        ("Helvetica", 12, 100, 290, f"Razón Social: {datos['cliente']}"),
+        ("Helvetica", 12, 100, 310, f"Identificación: {datos['identificacion']}"),
+        # Productos
+        ("Helvetica", 12, 100, 350, "DETALLE DE PRODUCTOS:"),
+    ]
+    y = 370
+    for i, (descripcion, cantidad, precio) in enumerate(datos["items"], 1):
+        lineas.append(("Helvetica", 12, 120, y, f"{i}. {descripcion} - Cantidad: {cantidad} - Precio: ${precio}"))
+        y += 20
+    # Totales
+    y += 20
+    lineas += [
+        ("Helvetica", 12, 100, y, f"SUBTOTAL: ${datos['subtotal']}"),
+        ("Helvetica", 12, 100, y + 20, f"IVA 15%: ${datos['iva']}"),
+        ("Helvetica", 12, 100, y + 40, f"TOTAL: ${datos['total']}"),
+        # Forma de pago
+        ("Helvetica", 12, 100, y + 70, f"FORMA DE PAGO: {datos['forma_pago']}"),
+    ]
+    return lineas
+
+
 def crear_pdf_prueba():
     """Crea un PDF de prueba con texto nativo"""
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.pagesizes import letter
+
     print("📄 CREANDO PDF DE PRUEBA")
     print("=" * 40)
-    
+
     # Crear directorio si no existe
     os.makedirs("helpers/IMG", exist_ok=True)
-    
+
     # Crear PDF
     filename = "helpers/IMG/factura_prueba.pdf"
     c = canvas.Canvas(filename, pagesize=letter)
     width, height = letter
-    
-    # Título
-    c.setFont("Helvetica-Bold", 16)
-    c.drawString(100, height - 50, "FACTURA ELECTRÓNICA")
-    
-    # Información de la empresa
-    c.setFont("Helvetica", 12)
-    c.drawString(100, height - 80, "FARMACIAS Y COMISARIATOS DE MEDICINAS S.A.")
-    c.drawString(100, height - 100, "RUC: 1790710319001")
-    c.drawString(100, height - 120, "Dirección: Av. Interoceánica S/N")
-    
-    # Número de factura
-    c.drawString(100, height - 150, "FACTURA No. 026-200-000021384")
-    
-    # Número de autorización
-    c.drawString(100, height - 180, "NÚMERO DE AUTORIZACIÓN")
-    c.setFont("Helvetica-Bold", 14)
-    c.drawString(100, height - 200, "0807202501179071031900120262000000213845658032318")
-    
-    # Ambiente
-    c.setFont("Helvetica", 12)
-    c.drawString(100, height - 230, "AMBIENTE: PRODUCCION")
-    
-    # Fecha
-    c.drawString(100, height - 260, "FECHA Y HORA DE EMISIÓN: 2025-07-08 19:58:13")
-    
-    # Cliente
-    c.drawString(100, height - 290, "Razón Social: ROCKO VERDEZOTO")
-    c.drawString(100, height - 310, "Identificación: 1234567890")
-    
-    # Productos
-    c.drawString(100, height - 350, "DETALLE DE PRODUCTOS:")
-    c.drawString(120, height - 370, "1. MEDICAMENTO A - Cantidad: 1 - Precio: $23.00")
-    c.drawString(120, height - 390, "2. MEDICAMENTO B - Cantidad: 2 - Precio: $15.50")
-    
-    # Totales
-    c.drawString(100, height - 430, "SUBTOTAL: $54.00")
-    c.drawString(100, height - 450, "IVA 15%: $8.10")
-    c.drawString(100, height - 470, "TOTAL: $62.10")
-    
-    # Forma de pago
-    c.drawString(100, height - 500, "FORMA DE PAGO: TARJETA DE CREDITO")
-    
+
+    for fuente, tamano, x, y, texto in lineas_factura():
+        c.setFont(fuente, tamano)
+        c.drawString(x, height - y, texto)
+
     # Guardar PDF
     c.save()
-    
+
     print(f"✅ PDF creado: {filename}")
     print(f"   Tamaño: {os.path.getsize(filename)} bytes")
-    
+
     return filename
 
 if __name__ == "__main__":
     crear_pdf_prueba()
-
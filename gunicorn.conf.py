@@ -0,0 +1,55 @@
+# gunicorn.conf.py
+"""
+Servidor de producción: N workers uvicorn bifurcados de un maestro precargado.
+
+    gunicorn -c gunicorn.conf.py app:app
+
+Se configura con las variables SERVIDOR_* (config.py) y UVICORN_HOST /
+UVICORN_PORT. Ver docs/ARRANQUE.md y helpers/servidor.py.
+"""
+
+import gc
+import os
+
+# Desde antes de importar la app: sin recolecciones en el maestro no quedan
+# huecos en páginas que luego comparten los workers (se reactiva en cada worker)
+gc.disable()
+
+from config import (  # noqa: E402
+    LOG_LEVEL,
+    SERVIDOR_KEEPALIVE,
+    SERVIDOR_MAX_PETICIONES,
+    SERVIDOR_MAX_PETICIONES_VARIACION,
+    SERVIDOR_TIMEOUT,
+    SERVIDOR_TIMEOUT_GRACEFUL,
+)
+from helpers.servidor import al_bifurcar, numero_workers, precargar_antes_del_fork  # noqa: E402
+
+bind = f"{os.getenv('UVICORN_HOST', '0.0.0.0')}:{os.getenv('UVICORN_PORT', '8000')}"
+worker_class = "uvicorn_worker.UvicornWorker"
+workers = numero_workers()
+preload_app = True
+
+# Reciclar workers para contener fugas de memoria (la variación evita que se reinicien todos a la vez)
+max_requests = SERVIDOR_MAX_PETICIONES
+max_requests_jitter = SERVIDOR_MAX_PETICIONES_VARIACION if SERVIDOR_MAX_PETICIONES > 0 else 0
+
+# Un worker sin latido durante `timeout` se mata; al reiniciar o detener, las
+# peticiones en curso tienen `graceful_timeout` para terminar
+timeout = SERVIDOR_TIMEOUT
+graceful_timeout = SERVIDOR_TIMEOUT_GRACEFUL
+keepalive = SERVIDOR_KEEPALIVE
+
+# Cada petición ya deja su línea JSON (helpers/trazas); sin access log de gunicorn
+loglevel = LOG_LEVEL.lower()
+
+
+def when_ready(server):
+    # La app ya está importada (preload_app) y aún no hay workers
+    resultado = precargar_antes_del_fork()
+    server.log.info("Precarga en el maestro: %d cargados en %.2f s; %d workers",
+                    len(resultado["cargados"]), resultado["duracion_s"], server.num_workers)
+
+
+def post_fork(server, worker):
+    al_bifurcar(server.num_workers)
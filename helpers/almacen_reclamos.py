@@ -0,0 +1,486 @@
+"""
+Reclamos en SQLite (antes reclamos_data.json).
+
+El JSON se leía y reescribía entero en cada petición, los filtros eran
+recorridos lineales y dos POST simultáneos podían perder una escritura o
+repetir un id. Aquí:
+
+- un reclamo por fila, con índices por estado, fecha y proveedor; los filtros
+  (incluidas las fechas) y la paginación se resuelven en la consulta
+- los ids salen de un contador dentro de una transacción BEGIN IMMEDIATE, que
+  serializa las altas entre hilos y entre procesos (workers); un id borrado no
+  se vuelve a asignar
+- la primera vez que se abre una base sin reclamos se importa
+  reclamos_data.json, una sola vez (queda marcado en la tabla metadatos).
+  También se puede correr a mano:
+
+    python -m helpers.almacen_reclamos migrar [--json reclamos_data.json] [--db reclamos.db]
+
+El tablero de reclamos consulta cada pocos segundos por revisor, así que lo
+que lee seguido no recorre la tabla:
+
+- agregados por estado (cantidad y montos) en la tabla agregados, que
+  mantienen triggers de SQLite en cada alta, cambio y baja, en la misma
+  transacción que la escritura. Las estadísticas y los totales sin filtros (o
+  solo por estado) salen de ahí.
+- una revisión que los mismos triggers incrementan con cada cambio. Junto con
+  la época de la base (aleatoria, fijada al crearla) forma revision(), que las
+  rutas usan de ETag: si no hubo cambios, la respuesta es un 304 sin consultar
+  nada más.
+- listar() pagina por clave (despues_de = último secuencial visto) además de
+  por offset: cada página cuesta lo mismo, la primera o la milésima.
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import secrets
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from config import RECLAMOS_DB, RECLAMOS_JSON
+from generar_id_reclamo import generar_id_reclamo
+
+logger = logging.getLogger(__name__)
+
+ESTADOS_DISPONIBLES = ["En Revisión", "Aprobado", "Rechazado"]
+CONFIGURACION_ID = {
+    "prefijo": "CLM",
+    "formato": "CLM-{secuencial:000-000}",
+    "ejemplo": "CLM-000-001",
+}
+
+_COLUMNAS = ("secuencial, id_reclamo, fecha_envio, proveedor, tipo_servicio, estado, "
+             "monto_solicitado, monto_aprobado, moneda, ver, subir")
+
+
+def fecha_iso(texto: str) -> str:
+    """'19/08/2024' (formato de la API) o '2024-08-19' -> '2024-08-19'. ValueError si no es fecha."""
+    texto = texto.strip()
+    for formato in ("%d/%m/%Y", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(texto, formato).date().isoformat()
+        except ValueError:
+            continue
+    raise ValueError(f"fecha inválida: {texto!r} (se espera DD/MM/YYYY)")
+
+
+def _secuencial_de_id(id_reclamo: str) -> Optional[int]:
+    """'CLM-000-005' -> 5 (la misma lectura que generar_id_reclamo.obtener_siguiente_id)."""
+    digitos = re.sub(r"\D", "", id_reclamo or "")
+    return int(digitos) if digitos else None
+
+
+def _a_dict(fila: sqlite3.Row) -> Dict[str, Any]:
+    """Fila -> reclamo con la forma de siempre de la API."""
+    return {
+        "id_reclamo": fila["id_reclamo"],
+        "fecha_envio": fila["fecha_envio"],
+        "proveedor": {
+            "nombre": fila["proveedor"],
+            "tipo_servicio": fila["tipo_servicio"],
+        },
+        "estado": fila["estado"],
+        "monto_solicitado": fila["monto_solicitado"],
+        "monto_aprobado": fila["monto_aprobado"],
+        "moneda": fila["moneda"],
+        "acciones": {
+            "ver": bool(fila["ver"]),
+            "subir": bool(fila["subir"]),
+        },
+    }
+
+
+class AlmacenReclamos:
+    """Reclamos en SQLite; una conexión por proceso, compartida entre hilos."""
+
+    def __init__(self, ruta: str = RECLAMOS_DB, json_legado: Optional[str] = RECLAMOS_JSON):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(ruta, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS reclamos (
+                secuencial INTEGER PRIMARY KEY,
+                id_reclamo TEXT NOT NULL UNIQUE,
+                fecha_envio TEXT NOT NULL,
+                fecha TEXT,
+                proveedor TEXT NOT NULL,
+                proveedor_min TEXT NOT NULL,
+                tipo_servicio TEXT NOT NULL,
+                estado TEXT NOT NULL,
+                estado_min TEXT NOT NULL,
+                monto_solicitado REAL NOT NULL,
+                monto_aprobado REAL,
+                moneda TEXT NOT NULL,
+                ver INTEGER NOT NULL,
+                subir INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ix_reclamos_estado ON reclamos (estado_min, secuencial);
+            CREATE INDEX IF NOT EXISTS ix_reclamos_fecha ON reclamos (fecha, secuencial);
+            CREATE INDEX IF NOT EXISTS ix_reclamos_proveedor ON reclamos (proveedor_min);
+            CREATE TABLE IF NOT EXISTS metadatos (
+                clave TEXT PRIMARY KEY,
+                valor TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS agregados (
+                estado TEXT PRIMARY KEY,
+                estado_min TEXT NOT NULL,
+                n INTEGER NOT NULL,
+                solicitado REAL NOT NULL,
+                aprobado REAL NOT NULL,
+                orden INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS revision (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                valor INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO revision (id, valor) VALUES (1, 0);
+
+            CREATE TRIGGER IF NOT EXISTS tr_reclamos_alta AFTER INSERT ON reclamos BEGIN
+                INSERT INTO agregados (estado, estado_min, n, solicitado, aprobado, orden)
+                VALUES (NEW.estado, NEW.estado_min, 1, NEW.monto_solicitado,
+                        COALESCE(NEW.monto_aprobado, 0), NEW.secuencial)
+                ON CONFLICT (estado) DO UPDATE SET n = n + 1,
+                    solicitado = solicitado + excluded.solicitado, aprobado = aprobado + excluded.aprobado;
+                UPDATE revision SET valor = valor + 1;
+            END;
+            CREATE TRIGGER IF NOT EXISTS tr_reclamos_baja AFTER DELETE ON reclamos BEGIN
+                UPDATE agregados SET n = n - 1, solicitado = solicitado - OLD.monto_solicitado,
+                    aprobado = aprobado - COALESCE(OLD.monto_aprobado, 0)
+                WHERE estado = OLD.estado;
+                UPDATE revision SET valor = valor + 1;
+            END;
+            CREATE TRIGGER IF NOT EXISTS tr_reclamos_cambio AFTER UPDATE ON reclamos BEGIN
+                UPDATE agregados SET n = n - 1, solicitado = solicitado - OLD.monto_solicitado,
+                    aprobado = aprobado - COALESCE(OLD.monto_aprobado, 0)
+                WHERE estado = OLD.estado;
+                INSERT INTO agregados (estado, estado_min, n, solicitado, aprobado, orden)
+                VALUES (NEW.estado, NEW.estado_min, 1, NEW.monto_solicitado,
+                        COALESCE(NEW.monto_aprobado, 0), NEW.secuencial)
+                ON CONFLICT (estado) DO UPDATE SET n = n + 1,
+                    solicitado = solicitado + excluded.solicitado, aprobado = aprobado + excluded.aprobado;
+                UPDATE revision SET valor = valor + 1;
+            END;
+        """)
+        with self._transaccion() as conn:
+            self._epoca = self._leer_meta(conn, "epoca")
+            if self._epoca is None:
+                self._epoca = secrets.token_hex(4)
+                self._escribir_meta(conn, "epoca", self._epoca)
+            # Base creada antes de que existieran los agregados: se calculan una vez
+            if not self._leer_meta(conn, "agregados_inicializados"):
+                self._recalcular_agregados(conn)
+                self._escribir_meta(conn, "agregados_inicializados", True)
+        if json_legado and os.path.exists(json_legado):
+            self.migrar_json(json_legado)
+
+    @contextmanager
+    def _transaccion(self) -> Iterator[sqlite3.Connection]:
+        """BEGIN IMMEDIATE: toma el candado de escritura de la base al empezar, no al primer UPDATE."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _ejecutar(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._conn.execute(sql, params)
+
+    # ---- metadatos ----
+
+    @staticmethod
+    def _leer_meta(conn: sqlite3.Connection, clave: str, defecto: Any = None) -> Any:
+        fila = conn.execute("SELECT valor FROM metadatos WHERE clave = ?", (clave,)).fetchone()
+        return json.loads(fila["valor"]) if fila else defecto
+
+    @staticmethod
+    def _escribir_meta(conn: sqlite3.Connection, clave: str, valor: Any) -> None:
+        conn.execute("INSERT INTO metadatos (clave, valor) VALUES (?, ?) "
+                     "ON CONFLICT (clave) DO UPDATE SET valor = excluded.valor",
+                     (clave, json.dumps(valor, ensure_ascii=False)))
+
+    def estados_disponibles(self) -> List[str]:
+        with self._lock:
+            return self._leer_meta(self._conn, "estados_disponibles", ESTADOS_DISPONIBLES)
+
+    def revision(self) -> str:
+        """Cambia con cada alta, cambio o baja (en cualquier proceso); distinta entre bases."""
+        valor = self._ejecutar("SELECT valor FROM revision WHERE id = 1").fetchone()["valor"]
+        return f"{self._epoca}-{valor}"
+
+    def metadatos(self) -> Dict[str, Any]:
+        return {
+            "total_reclamos": self.contar(),
+            "estados_disponibles": self.estados_disponibles(),
+            "configuracion_id": CONFIGURACION_ID,
+        }
+
+    # ---- altas y cambios ----
+
+    @staticmethod
+    def _siguiente_secuencial(conn: sqlite3.Connection) -> int:
+        """Dentro de una transacción: el contador nunca retrocede, aunque se borre el último."""
+        maximo = conn.execute("SELECT COALESCE(MAX(secuencial), 0) AS m FROM reclamos").fetchone()["m"]
+        siguiente = max(maximo, AlmacenReclamos._leer_meta(conn, "ultimo_secuencial", 0)) + 1
+        AlmacenReclamos._escribir_meta(conn, "ultimo_secuencial", siguiente)
+        return siguiente
+
+    @staticmethod
+    def _insertar(conn: sqlite3.Connection, secuencial: int, reclamo: Dict[str, Any]) -> None:
+        proveedor = reclamo.get("proveedor") or {}
+        acciones = reclamo.get("acciones") or {}
+        try:
+            fecha = fecha_iso(reclamo["fecha_envio"])
+        except ValueError:
+            fecha = None
+        conn.execute(
+            "INSERT INTO reclamos (secuencial, id_reclamo, fecha_envio, fecha, proveedor, proveedor_min, "
+            "tipo_servicio, estado, estado_min, monto_solicitado, monto_aprobado, moneda, ver, subir) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (secuencial, reclamo["id_reclamo"], reclamo["fecha_envio"], fecha,
+             proveedor.get("nombre", ""), proveedor.get("nombre", "").lower(), proveedor.get("tipo_servicio", ""),
+             reclamo["estado"], reclamo["estado"].lower(), reclamo["monto_solicitado"],
+             reclamo.get("monto_aprobado"), reclamo.get("moneda", "$"),
+             int(bool(acciones.get("ver", True))), int(bool(acciones.get("subir", False)))),
+        )
+
+    def crear(self, proveedor: str, tipo_servicio: str, estado: str, monto_solicitado: float,
+              moneda: str = "$") -> Dict[str, Any]:
+        """Alta con id nuevo (CLM-000-001, ...) y fecha de hoy."""
+        with self._transaccion() as conn:
+            secuencial = self._siguiente_secuencial(conn)
+            reclamo = {
+                "id_reclamo": generar_id_reclamo(secuencial),
+                "fecha_envio": datetime.now().strftime("%d/%m/%Y"),
+                "proveedor": {"nombre": proveedor, "tipo_servicio": tipo_servicio},
+                "estado": estado,
+                "monto_solicitado": monto_solicitado,
+                "monto_aprobado": None,
+                "moneda": moneda,
+                "acciones": {
+                    "ver": True,
+                    "subir": estado in ["En Revisión", "Rechazado"],  # Puede subir según el estado
+                },
+            }
+            self._insertar(conn, secuencial, reclamo)
+        return reclamo
+
+    def actualizar(self, id_reclamo: str, estado: Optional[str] = None,
+                   monto_aprobado: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Cambia estado y/o monto aprobado; None si no existe."""
+        with self._transaccion() as conn:
+            fila = conn.execute("SELECT subir FROM reclamos WHERE id_reclamo = ?", (id_reclamo,)).fetchone()
+            if fila is None:
+                return None
+            if estado:
+                subir = fila["subir"]
+                # Ajustar acciones según el estado
+                if estado == "Aprobado":
+                    subir = 0  # Ya no puede subir más documentos
+                elif estado == "Rechazado":
+                    subir = 1  # Puede subir documentos para corrección
+                conn.execute("UPDATE reclamos SET estado = ?, estado_min = ?, subir = ? WHERE id_reclamo = ?",
+                             (estado, estado.lower(), subir, id_reclamo))
+            if monto_aprobado is not None:
+                conn.execute("UPDATE reclamos SET monto_aprobado = ? WHERE id_reclamo = ?",
+                             (monto_aprobado, id_reclamo))
+            fila = conn.execute(f"SELECT {_COLUMNAS} FROM reclamos WHERE id_reclamo = ?", (id_reclamo,)).fetchone()
+        return _a_dict(fila)
+
+    def eliminar(self, id_reclamo: str) -> bool:
+        return self._ejecutar("DELETE FROM reclamos WHERE id_reclamo = ?", (id_reclamo,)).rowcount > 0
+
+    # ---- consultas ----
+
+    def obtener(self, id_reclamo: str) -> Optional[Dict[str, Any]]:
+        fila = self._ejecutar(f"SELECT {_COLUMNAS} FROM reclamos WHERE id_reclamo = ?", (id_reclamo,)).fetchone()
+        return _a_dict(fila) if fila else None
+
+    def contar(self, estado: Optional[str] = None) -> int:
+        """Total (o por estado, sin distinguir mayúsculas) desde los agregados."""
+        if estado:
+            fila = self._ejecutar("SELECT COALESCE(SUM(n), 0) AS n FROM agregados WHERE estado_min = ?",
+                                  (estado.lower(),)).fetchone()
+        else:
+            fila = self._ejecutar("SELECT COALESCE(SUM(n), 0) AS n FROM agregados").fetchone()
+        return fila["n"]
+
+    @staticmethod
+    def _filtros(estado: Optional[str], proveedor: Optional[str],
+                 fecha_desde: Optional[str], fecha_hasta: Optional[str]) -> Tuple[str, list]:
+        condiciones, params = [], []
+        if estado:
+            condiciones.append("estado_min = ?")
+            params.append(estado.lower())
+        if proveedor:
+            # Subcadena sin distinguir mayúsculas, como antes; recorre solo el índice de proveedor
+            condiciones.append("instr(proveedor_min, ?) > 0")
+            params.append(proveedor.lower())
+        if fecha_desde:
+            condiciones.append("fecha >= ?")
+            params.append(fecha_desde)
+        if fecha_hasta:
+            condiciones.append("fecha <= ?")
+            params.append(fecha_hasta)
+        return (" WHERE " + " AND ".join(condiciones)) if condiciones else "", params
+
+    def listar(self, estado: Optional[str] = None, proveedor: Optional[str] = None,
+               fecha_desde: Optional[str] = None, fecha_hasta: Optional[str] = None,
+               limit: Optional[int] = None, offset: int = 0,
+               despues_de: Optional[int] = None) -> Tuple[List[Dict[str, Any]], int, Optional[int]]:
+        """
+        Reclamos en orden de alta, total que cumple los filtros y secuencial para
+        pedir la página siguiente (None si no hay más).
+
+        fecha_desde / fecha_hasta en ISO (fecha_iso()), ambas inclusive. Con
+        despues_de (paginación por clave) se ignora offset.
+        """
+        donde, params = self._filtros(estado, proveedor, fecha_desde, fecha_hasta)
+        if proveedor or fecha_desde or fecha_hasta:
+            with self._lock:
+                total = self._conn.execute(f"SELECT COUNT(*) AS n FROM reclamos{donde}", params).fetchone()["n"]
+        else:
+            total = self.contar(estado)
+
+        if despues_de is not None:
+            donde += " AND secuencial > ?" if donde else " WHERE secuencial > ?"
+            params = params + [despues_de]
+            offset = 0
+        # Una fila de más para saber si hay página siguiente sin contar
+        with self._lock:
+            filas = self._conn.execute(
+                f"SELECT {_COLUMNAS} FROM reclamos{donde} ORDER BY secuencial LIMIT ? OFFSET ?",
+                params + [-1 if limit is None else limit + 1, max(0, offset or 0)],
+            ).fetchall()
+        siguiente = None
+        if limit is not None and len(filas) > limit:
+            filas = filas[:limit]
+            siguiente = filas[-1]["secuencial"] if filas else None
+        return [_a_dict(f) for f in filas], total, siguiente
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """Conteos y montos por estado, leídos de los agregados (una fila por estado)."""
+        with self._lock:
+            filas = self._conn.execute(
+                "SELECT estado, n, solicitado, aprobado FROM agregados WHERE n > 0 ORDER BY orden"
+            ).fetchall()
+        return {
+            "total_reclamos": sum(f["n"] for f in filas),
+            "por_estado": {f["estado"]: f["n"] for f in filas},
+            "total_solicitado": sum(f["solicitado"] or 0 for f in filas),
+            "total_aprobado": sum(f["aprobado"] or 0 for f in filas),
+        }
+
+    @staticmethod
+    def _recalcular_agregados(conn: sqlite3.Connection) -> None:
+        """Rehace los agregados desde los reclamos (dentro de una transacción)."""
+        conn.execute("DELETE FROM agregados")
+        conn.execute(
+            "INSERT INTO agregados (estado, estado_min, n, solicitado, aprobado, orden) "
+            "SELECT estado, MIN(estado_min), COUNT(*), SUM(monto_solicitado), "
+            "COALESCE(SUM(monto_aprobado), 0), MIN(secuencial) FROM reclamos GROUP BY estado"
+        )
+        conn.execute("UPDATE revision SET valor = valor + 1")
+
+    def recalcular_agregados(self) -> None:
+        """Por si se editó la base a mano con los triggers desactivados."""
+        with self._transaccion() as conn:
+            self._recalcular_agregados(conn)
+
+    # ---- migración ----
+
+    def migrar_json(self, ruta: str = RECLAMOS_JSON, forzar: bool = False) -> int:
+        """
+        Importa los reclamos de reclamos_data.json; devuelve cuántos.
+
+        Corre una sola vez por base (marca "migrado_desde_json"), salvo forzar=True;
+        los ids que ya existan en la base no se duplican.
+        """
+        with open(ruta, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        with self._transaccion() as conn:
+            if self._leer_meta(conn, "migrado_desde_json") and not forzar:
+                return 0
+            existentes = {f["id_reclamo"] for f in conn.execute("SELECT id_reclamo FROM reclamos")}
+            usados = {f["secuencial"] for f in conn.execute("SELECT secuencial FROM reclamos")}
+            pendientes = [r for r in data.get("reclamos", []) if r.get("id_reclamo") not in existentes]
+            sin_secuencial = []
+            for reclamo in pendientes:
+                secuencial = _secuencial_de_id(reclamo["id_reclamo"])
+                if secuencial is None or secuencial in usados:
+                    sin_secuencial.append(reclamo)
+                    continue
+                usados.add(secuencial)
+                self._insertar(conn, secuencial, reclamo)
+            # Ids que no siguen el formato: conservan su id y reciben un secuencial libre
+            for reclamo in sin_secuencial:
+                self._insertar(conn, self._siguiente_secuencial(conn), reclamo)
+            estados = (data.get("metadatos") or {}).get("estados_disponibles")
+            if estados:
+                self._escribir_meta(conn, "estados_disponibles", estados)
+            self._escribir_meta(conn, "migrado_desde_json", {
+                "archivo": os.path.abspath(ruta),
+                "reclamos": len(pendientes),
+                "fecha": datetime.now().isoformat(timespec="seconds"),
+            })
+        logger.info("reclamos: %d importados de %s a %s", len(pendientes), ruta, self.ruta)
+        return len(pendientes)
+
+
+_almacen: Optional[AlmacenReclamos] = None
+_almacen_pid: Optional[int] = None
+_almacen_lock = threading.Lock()
+
+
+def almacen() -> AlmacenReclamos:
+    """Almacén del proceso, creado en el primer uso (una conexión SQLite no se comparte tras un fork)."""
+    global _almacen, _almacen_pid
+    with _almacen_lock:
+        if _almacen is None or _almacen_pid != os.getpid():
+            _almacen = AlmacenReclamos()
+            _almacen_pid = os.getpid()
+        return _almacen
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Almacén de reclamos en SQLite")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    migrar = sub.add_parser("migrar", help="importar reclamos_data.json a la base")
+    migrar.add_argument("--json", default=RECLAMOS_JSON)
+    migrar.add_argument("--db", default=RECLAMOS_DB)
+    migrar.add_argument("--forzar", action="store_true", help="volver a importar aunque ya se haya migrado")
+    recalcular = sub.add_parser("recalcular", help="rehacer los agregados por estado desde los reclamos")
+    recalcular.add_argument("--db", default=RECLAMOS_DB)
+    args = parser.parse_args(argv)
+
+    if args.comando == "recalcular":
+        destino = AlmacenReclamos(args.db, json_legado=None)
+        destino.recalcular_agregados()
+        print(json.dumps(destino.estadisticas(), ensure_ascii=False))
+        return 0
+
+    if not os.path.exists(args.json):
+        parser.error(f"no existe {args.json}")
+    destino = AlmacenReclamos(args.db, json_legado=None)
+    importados = destino.migrar_json(args.json, forzar=args.forzar)
+    if importados == 0 and not args.forzar:
+        print(f"{args.db} ya estaba migrada (usar --forzar para importar de nuevo los ids que falten)")
+    else:
+        print(f"{importados} reclamos importados de {args.json} a {args.db} ({destino.contar()} en total)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
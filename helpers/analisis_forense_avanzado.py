@@ -19,11 +19,13 @@ import io
 import json
 import numpy as np
 from PIL import Image
-import cv2
-from skimage.metrics import structural_similarity as ssim
-from .type_conversion import ensure_python_bool, ensure_python_float, safe_serialize_dict
-from skimage import measure
-import imagehash
+from .type_conversion import ensure_python_bool, ensure_python_float
+from .perfilado import perfilable
+from .importacion_diferida import funcion_diferida, modulo_diferido
+
+cv2 = modulo_diferido("cv2")
+imagehash = modulo_diferido("imagehash")
+ssim = funcion_diferida("skimage.metrics", "structural_similarity")
 from typing import Dict, Any, List, Tuple, Optional
 import datetime
 
@@ -229,7 +231,7 @@ def detectar_doble_compresion_jpeg(imagen_bytes: bytes) -> Dict[str, Any]:
         
         doble_compresion = tiene_periodicidad or varianza_alta
         
-        return safe_serialize_dict({
+        return {
             "tiene_doble_compresion": ensure_python_bool(doble_compresion),
             "periodicidad_detectada": ensure_python_bool(tiene_periodicidad),
             "varianza_alta": ensure_python_bool(varianza_alta),
@@ -237,7 +239,7 @@ def detectar_doble_compresion_jpeg(imagen_bytes: bytes) -> Dict[str, Any]:
             "ac_variance": ensure_python_float(ac_variance),
             "dc_variance": ensure_python_float(np.var(dc_coeffs)),
             "confianza": "ALTA" if doble_compresion and tiene_periodicidad else "MEDIA" if doble_compresion else "BAJA"
-        })
+        }
         
     except Exception as e:
         return {
@@ -597,6 +599,7 @@ def _generar_recomendacion(grado: str, evidencias: List[str]) -> str:
         return "IMAGEN APARENTEMENTE AUTÉNTICA - Sin embargo, se recomienda verificar el canal de origen"
 
 
+@perfilable
 def analisis_forense_completo(imagen_bytes: bytes, tipo_archivo: str) -> Dict[str, Any]:
     """
     Realiza análisis forense completo de la imagen.
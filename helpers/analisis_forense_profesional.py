@@ -19,13 +19,15 @@ import hashlib
 import json
 import numpy as np
 from PIL import Image, ImageChops, ImageEnhance
-import cv2
-from skimage.metrics import structural_similarity as ssim
-from .type_conversion import ensure_python_bool, ensure_python_float, safe_serialize_dict
+from .type_conversion import ensure_python_bool, ensure_python_float
+from .perfilado import perfilable
+from .importacion_diferida import modulo_diferido
 # Usar configuración global de Tesseract
 import configurar_tesseract_global
-import pytesseract
-from pytesseract import Output
+
+cv2 = modulo_diferido("cv2")
+pytesseract = modulo_diferido("pytesseract")
+imagehash = modulo_diferido("imagehash")
 
 
 def _limpiar_datos_exif(data):
@@ -60,7 +62,6 @@ def _limpiar_datos_exif(data):
             return str(data)
     else:
         return data
-import imagehash
 from typing import Dict, Any, List, Tuple, Optional
 import datetime
 import re
@@ -193,7 +194,7 @@ def analizar_metadatos_forenses(imagen_bytes: bytes) -> Dict[str, Any]:
         if not make and not model and not exif_dict.get('MakerNote'):
             compresion_analisis.append("🚨 POSIBLE PROCESAMIENTO POR APP DE MENSAJERÍA")
         
-        return safe_serialize_dict({
+        return {
             "software_edicion": software_edicion,
             "fechas_analisis": fechas_analisis,
             "camara_analisis": camara_analisis,
@@ -201,7 +202,7 @@ def analizar_metadatos_forenses(imagen_bytes: bytes) -> Dict[str, Any]:
             "compresion_analisis": compresion_analisis,
             "exif_completo": _limpiar_datos_exif(exif_dict),
             "tags_exifread": _limpiar_datos_exif({str(k): str(v) for k, v in tags.items()})
-        })
+        }
         
     except Exception as e:
         return {
@@ -347,13 +348,13 @@ def detectar_cuadricula_jpeg_localizada(imagen_bytes: bytes) -> Dict[str, Any]:
              localizacion_analisis.get("bordes_agrupados", False))
         )
         
-        return safe_serialize_dict({
+        return {
             "desalineacion_analisis": desalineacion_analisis,
             "splicing_analisis": splicing_analisis,
             "localizacion_analisis": localizacion_analisis,
             "tiene_splicing": tiene_splicing,
             "nivel_sospecha": "ALTO" if tiene_splicing else "BAJO"
-        })
+        }
         
     except Exception as e:
         return {
@@ -444,12 +445,12 @@ def analizar_compresion_jpeg_avanzada(imagen_bytes: bytes) -> Dict[str, Any]:
         if calidad_probable < 80:
             app_indicators.append("🚨 CALIDAD BAJA - POSIBLE COMPRESIÓN POR APP")
         
-        return safe_serialize_dict({
+        return {
             "quality_analysis": quality_analysis,
             "doble_compresion": doble_compresion,
             "tablas_analisis": tablas_analisis,
             "app_indicators": app_indicators
-        })
+        }
         
     except Exception as e:
         return {
@@ -544,7 +545,7 @@ def ela_mejorado(imagen_bytes: bytes, calidad: int = 95, amplificacion: int = 15
         else:
             nivel_sospecha = "NORMAL"
         
-        return safe_serialize_dict({
+        return {
             "ela_mean": float(ela_mean),
             "ela_std": float(ela_std),
             "ela_max": float(ela_max),
@@ -555,7 +556,7 @@ def ela_mejorado(imagen_bytes: bytes, calidad: int = 95, amplificacion: int = 15
             "patrones_edicion": patrones_edicion,
             "nivel_sospecha": nivel_sospecha,
             "tiene_ediciones": nivel_sospecha != "NORMAL"
-        })
+        }
         
     except Exception as e:
         return {
@@ -685,12 +686,12 @@ def analizar_ruido_bordes_avanzado(imagen_bytes: bytes) -> Dict[str, Any]:
             alpha_analisis["rectangulos_alpha"] = 0
             alpha_analisis["parches_alpha"] = "N/A - No es PNG con alpha"
         
-        return safe_serialize_dict({
+        return {
             "ruido_analisis": ruido_analisis,
             "bordes_analisis": bordes_analisis,
             "halo_analisis": halo_analisis,
             "alpha_analisis": alpha_analisis
-        })
+        }
         
     except Exception as e:
         return {
@@ -789,11 +790,11 @@ def comparar_hashes_forenses(imagen_bytes: bytes) -> Dict[str, Any]:
         else:
             estabilidad["estable_escala"] = "✅ Estable a escala"
         
-        return safe_serialize_dict({
+        return {
             "hashes_analisis": hashes_analisis,
             "inconsistencias": inconsistencias,
             "estabilidad": estabilidad
-        })
+        }
         
     except Exception as e:
         return {
@@ -1114,7 +1115,7 @@ def detectar_texto_sintetico_aplanado(imagen_bytes: bytes, metadatos_forenses: D
         else:
             nivel_sospecha = "ALTO" if tiene_texto_sintetico else "BAJO"
         
-        return safe_serialize_dict({
+        return {
             "reguardado_analisis": reguardado_analisis,
             "swt_analisis": swt_analisis,
             "frecuencia_entropia_analisis": frecuencia_entropia_analisis,
@@ -1124,7 +1125,7 @@ def detectar_texto_sintetico_aplanado(imagen_bytes: bytes, metadatos_forenses: D
             "tipo_imagen_analisis": tipo_imagen_analisis,
             "tiene_texto_sintetico": tiene_texto_sintetico,
             "nivel_sospecha": nivel_sospecha
-        })
+        }
         
     except Exception as e:
         return {
@@ -1200,7 +1201,7 @@ def detectar_texto_sobrepuesto(imagen_bytes: bytes,
         pil = Image.open(io.BytesIO(imagen_bytes)).convert("RGB")
         
         # OCR básico solo para palabras con alta confianza
-        data = pytesseract.image_to_data(pil, lang=lang, output_type=Output.DICT)
+        data = pytesseract.image_to_data(pil, lang=lang, output_type=pytesseract.Output.DICT)
         n = len(data["text"])
         resultados = []
         
@@ -1250,10 +1251,10 @@ def detectar_texto_sobrepuesto(imagen_bytes: bytes,
             "mean_score_overlay": float(np.mean([r["score"] for r in overlays])) if overlays else 0.0
         }
 
-        return safe_serialize_dict({
+        return {
             "items": resultados,
             "resumen": resumen
-        })
+        }
 
     except Exception as e:
         return {
@@ -1263,6 +1264,7 @@ def detectar_texto_sobrepuesto(imagen_bytes: bytes,
         }
 
 
+@perfilable
 def analisis_forense_completo(imagen_bytes: bytes) -> Dict[str, Any]:
     """
     Análisis forense ULTRA-OPTIMIZADO para velocidad.
@@ -1426,7 +1428,7 @@ def analisis_forense_completo(imagen_bytes: bytes) -> Dict[str, Any]:
         else:
             grado_confianza = "BAJO"
         
-        return safe_serialize_dict({
+        return {
             "metadatos": metadatos,
             "compresion": compresion,
             "cuadricula_jpeg": cuadricula_jpeg,
@@ -1442,7 +1444,7 @@ def analisis_forense_completo(imagen_bytes: bytes) -> Dict[str, Any]:
             "max_puntuacion": max_puntuacion,
             "es_screenshot": es_screenshot,
             "tipo_imagen": "screenshot/web" if es_screenshot else "imagen_normal"
-        })
+        }
         
     except Exception as e:
         return {
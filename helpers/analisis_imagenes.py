@@ -19,12 +19,14 @@ import xml.etree.ElementTree as ET
 import re
 from typing import Dict, Any, List, Optional, Tuple
 from PIL import Image, ExifTags
-import exifread
 import piexif
-import imagehash
 import numpy as np
 from collections import defaultdict
-from .type_conversion import ensure_python_bool, ensure_python_float, safe_serialize_dict
+from .type_conversion import ensure_python_bool, ensure_python_float
+from .importacion_diferida import modulo_diferido
+
+exifread = modulo_diferido("exifread")
+imagehash = modulo_diferido("imagehash")
 
 
 def _extract_xmp_dict(img_bytes: bytes) -> Dict[str, str]:
@@ -65,8 +67,31 @@ def detectar_tipo_archivo(archivo_base64: str) -> Dict[str, Any]:
         Dict con información del tipo de archivo
     """
     try:
-        # Decodificar base64
         archivo_bytes = base64.b64decode(archivo_base64)
+    except Exception as e:
+        return {
+            "tipo": "ERROR",
+            "extension": "error",
+            "mime_type": "application/octet-stream",
+            "valido": False,
+            "error": str(e)
+        }
+    return detectar_tipo_archivo_desde_bytes(archivo_bytes)
+
+
+def detectar_tipo_archivo_desde_bytes(archivo_bytes: bytes) -> Dict[str, Any]:
+    """
+    Detecta el tipo de archivo por sus magic bytes.
+    
+    Args:
+        archivo_bytes: Contenido del archivo (bytes o memoryview)
+        
+    Returns:
+        Dict con información del tipo de archivo
+    """
+    try:
+        # Solo la cabecera: evita copiar el archivo completo si llega un memoryview
+        archivo_bytes = bytes(archivo_bytes[:16])
         
         # Detectar tipo por magic bytes
         if archivo_bytes.startswith(b'%PDF'):
@@ -426,7 +451,7 @@ def detectar_superposicion_texto_imagen(imagen_bytes: bytes) -> Dict[str, Any]:
         # Determinar si hay superposición
         analisis["tiene_texto_superpuesto"] = ensure_python_bool(analisis["probabilidad"] > 0.5)
         
-        return safe_serialize_dict(analisis)
+        return analisis
         
     except Exception as e:
         return {
@@ -500,12 +525,34 @@ def analizar_imagen_completa(archivo_base64: str) -> Dict[str, Any]:
     Args:
         archivo_base64: Imagen codificada en base64
         
+    Returns:
+        Dict con análisis completo incluyendo análisis forense
+    """
+    try:
+        archivo_bytes = base64.b64decode(archivo_base64)
+    except Exception as e:
+        tipo_info = {"tipo": "ERROR", "extension": "error", "mime_type": "application/octet-stream",
+                     "valido": False, "error": str(e)}
+        return {
+            "error": f"Archivo no válido: {tipo_info['error']}",
+            "tipo_archivo": tipo_info
+        }
+    return analizar_imagen_completa_desde_bytes(archivo_bytes)
+
+
+def analizar_imagen_completa_desde_bytes(archivo_bytes: bytes) -> Dict[str, Any]:
+    """
+    Análisis completo de una imagen con técnicas forenses avanzadas.
+    
+    Args:
+        archivo_bytes: Contenido de la imagen
+        
     Returns:
         Dict con análisis completo incluyendo análisis forense
     """
     try:
         # Detectar tipo de archivo
-        tipo_info = detectar_tipo_archivo(archivo_base64)
+        tipo_info = detectar_tipo_archivo_desde_bytes(archivo_bytes)
         
         if not tipo_info["valido"]:
             return {
@@ -513,8 +560,7 @@ def analizar_imagen_completa(archivo_base64: str) -> Dict[str, Any]:
                 "tipo_archivo": tipo_info
             }
         
-        # Decodificar archivo
-        archivo_bytes = base64.b64decode(archivo_base64)
+        archivo_bytes = bytes(archivo_bytes)
         
         # Análisis básico
         metadatos = analizar_metadatos_imagen(archivo_bytes)
@@ -572,7 +618,7 @@ def analizar_imagen_completa(archivo_base64: str) -> Dict[str, Any]:
         else:
             nivel_riesgo = "LOW"
         
-        return safe_serialize_dict({
+        return {
             "tipo_archivo": tipo_info,
             "metadatos": metadatos,
             "capas": capas,
@@ -588,7 +634,7 @@ def analizar_imagen_completa(archivo_base64: str) -> Dict[str, Any]:
                 "tiene_evidencias_forenses": ensure_python_bool(analisis_forense.get("grado_confianza", {}).get("grado_confianza") in ["ALTO", "MEDIO"]),
                 "total_indicadores": len(indicadores)
             }
-        })
+        }
         
     except Exception as e:
         return {
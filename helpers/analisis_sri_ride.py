@@ -17,7 +17,7 @@ from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 
 from .validacion_xades import validar_xades
-from .type_conversion import safe_serialize_dict, ensure_python_bool
+from .type_conversion import ensure_python_bool
 
 
 def analizar_documento_sri(pdf_bytes: bytes) -> Dict[str, Any]:
@@ -49,7 +49,7 @@ def analizar_documento_sri(pdf_bytes: bytes) -> Dict[str, Any]:
         # Generar resumen
         resumen = _generar_resumen_sri(analisis_basico, referencias_xml, metadatos_fiscales)
         
-        return safe_serialize_dict({
+        return {
             "tipo_documento": tipo_documento,
             "firma_detectada": False,  # Los RIDE no tienen firma propia
             "analisis_basico": analisis_basico,
@@ -57,15 +57,15 @@ def analizar_documento_sri(pdf_bytes: bytes) -> Dict[str, Any]:
             "metadatos_fiscales": metadatos_fiscales,
             "resumen": resumen,
             "observaciones": _generar_observaciones_sri(tipo_documento, referencias_xml)
-        })
+        }
         
     except Exception as e:
-        return safe_serialize_dict({
+        return {
             "tipo_documento": "desconocido",
             "firma_detectada": False,
             "error": f"Error en análisis: {str(e)}",
             "resumen": "Error en análisis"
-        })
+        }
 
 
 def _analizar_documento_basico(text: str) -> Dict[str, Any]:
@@ -350,14 +350,14 @@ def validar_xml_firmado_sri(xml_content: str) -> Dict[str, Any]:
                            resultado_xades.get("resumen", {}).get("firmas_validas", 0) > 0
         }
         
-        return safe_serialize_dict(resultado_completo)
+        return resultado_completo
         
     except Exception as e:
-        return safe_serialize_dict({
+        return {
             "error": f"Error en validación: {str(e)}",
             "es_documento_sri": False,
             "firma_valida": False
-        })
+        }
 
 
 def _analizar_xml_sri(xml_content: str) -> Dict[str, Any]:
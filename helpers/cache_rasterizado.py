@@ -0,0 +1,220 @@
+"""
+Caché de rasterizado de páginas compartida por los endpoints y los análisis forenses.
+
+La misma página se renderiza muchas veces en una petición (conversión a
+imágenes, OCR, diffs por capas, parser de facturas). La caché guarda el raster
+como arreglo numpy (alto x ancho x canales, solo lectura) con clave
+(sha256 del documento, página, dpi, espacio de color), en un LRU con
+presupuesto de bytes (RASTER_CACHE_MAX_BYTES).
+
+Si se pide un dpi que no está pero hay un raster de la misma página a mayor dpi,
+se reduce ese raster en lugar de volver a renderizar. La reducción no es
+idéntica píxel a píxel a un render nativo, así que los análisis que comparan
+renders entre sí piden reescalar=False.
+
+Cada proceso tiene su propia caché. RASTER_CACHE_MAX_BYTES es el presupuesto de
+todo el servidor: con gunicorn, al_bifurcar le da a cada worker
+RASTER_CACHE_MAX_BYTES / workers. Los trabajadores del pool de paralelo_paginas
+no guardan nada: reciben páginas sueltas que ese proceso casi nunca vuelve a
+ver, y con caché propia el consumo real sería workers × (1 + pool) veces el tope.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import fitz
+import numpy as np
+from PIL import Image
+
+from config import RASTER_CACHE_MAX_BYTES, RASTER_CACHE_REESCALADO
+from .trazas import contar, span
+
+RGB = "rgb"
+GRIS = "gray"
+
+# (sha256, página, dpi, espacio de color)
+Clave = Tuple[str, int, float, str]
+
+
+def sha256_documento(pdf_bytes: bytes) -> str:
+    return hashlib.sha256(pdf_bytes).hexdigest()
+
+
+def _array_desde_pixmap(pix: fitz.Pixmap) -> np.ndarray:
+    arr = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)
+    return arr[:, :pix.width * pix.n].reshape(pix.height, pix.width, pix.n)
+
+
+def pixmap_desde_array(arr: np.ndarray) -> fitz.Pixmap:
+    """Pixmap (sin alfa) a partir de un raster de la caché, p. ej. para codificar a PNG."""
+    alto, ancho, canales = arr.shape
+    espacio = fitz.csGRAY if canales == 1 else fitz.csRGB
+    return fitz.Pixmap(espacio, ancho, alto, np.ascontiguousarray(arr).tobytes(), 0)
+
+
+def imagen_desde_array(arr: np.ndarray) -> Image.Image:
+    """Imagen PIL a partir de un raster de la caché (sin pasar por PNG)."""
+    return Image.fromarray(arr[:, :, 0] if arr.shape[2] == 1 else arr)
+
+
+def _tamano_render(ancho_pt: float, alto_pt: float, dpi: float) -> Tuple[int, int]:
+    """Tamaño en píxeles que produciría fitz para la página a ese dpi."""
+    zoom = dpi / 72.0
+    irect = (fitz.Rect(0, 0, ancho_pt, alto_pt) * fitz.Matrix(zoom, zoom)).irect
+    return irect.width, irect.height
+
+
+class CacheRasterizado:
+    """LRU de rasters de página con presupuesto de bytes; segura entre hilos."""
+
+    def __init__(self, max_bytes: int = RASTER_CACHE_MAX_BYTES, reescalado: bool = RASTER_CACHE_REESCALADO):
+        self.max_bytes = max_bytes
+        self.reescalado = reescalado
+        self._lock = threading.Lock()
+        self._rasters: "OrderedDict[Clave, np.ndarray]" = OrderedDict()
+        # (sha, página) -> tamaño de la página en puntos, para reescalar sin abrir el documento
+        self._tamanos: Dict[Tuple[str, int], Tuple[float, float]] = {}
+        self.bytes = 0
+        self.aciertos = 0
+        self.reescalados = 0
+        self.renders = 0
+
+    def obtener(
+        self,
+        pdf_bytes: Optional[bytes],
+        pno: int,
+        dpi: float,
+        colorspace: str = RGB,
+        doc: Optional[fitz.Document] = None,
+        sha: Optional[str] = None,
+        reescalar: bool = True,
+    ) -> np.ndarray:
+        """
+        Raster de la página pno a dpi (alto x ancho x 3 en RGB, x 1 en gris).
+
+        `doc` evita reabrir el documento si el llamador ya lo tiene abierto; `sha`
+        evita recalcular el hash. El arreglo devuelto es de solo lectura.
+        """
+        if sha is None:
+            sha = sha256_documento(pdf_bytes)
+        dpi = round(float(dpi), 2)
+        clave = (sha, pno, dpi, colorspace)
+
+        with self._lock:
+            arr = self._rasters.get(clave)
+            if arr is not None:
+                self._rasters.move_to_end(clave)
+                self.aciertos += 1
+            else:
+                origen = self._buscar_mayor(sha, pno, dpi, colorspace) if reescalar and self.reescalado else None
+                tamano_pt = self._tamanos.get((sha, pno))
+        if arr is not None:
+            contar("raster_cache_aciertos")
+            return arr
+
+        if origen is not None and tamano_pt is not None:
+            arr = self._reducir(origen, _tamano_render(*tamano_pt, dpi))
+            with self._lock:
+                self.reescalados += 1
+            contar("raster_reescalados")
+        else:
+            with span("render"):
+                arr, tamano_pt = self._renderizar(pdf_bytes, doc, pno, dpi, colorspace)
+            with self._lock:
+                self.renders += 1
+            contar("raster_renders")
+
+        arr.setflags(write=False)
+        self._guardar(clave, arr, tamano_pt)
+        return arr
+
+    def _buscar_mayor(self, sha: str, pno: int, dpi: float, colorspace: str) -> Optional[np.ndarray]:
+        """El raster de menor dpi por encima del pedido (llamar con el lock tomado)."""
+        mejor = None
+        for (s, p, d, c), arr in self._rasters.items():
+            if s == sha and p == pno and c == colorspace and d > dpi and (mejor is None or d < mejor[0]):
+                mejor = (d, arr)
+        return mejor[1] if mejor else None
+
+    @staticmethod
+    def _reducir(origen: np.ndarray, tamano: Tuple[int, int]) -> np.ndarray:
+        img = imagen_desde_array(origen).resize(tamano, Image.BOX)
+        arr = np.asarray(img)
+        return arr.reshape(arr.shape[0], arr.shape[1], -1)
+
+    @staticmethod
+    def _renderizar(pdf_bytes, doc, pno, dpi, colorspace) -> Tuple[np.ndarray, Tuple[float, float]]:
+        propio = doc is None
+        if propio:
+            doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        try:
+            page = doc.load_page(pno)
+            zoom = dpi / 72.0
+            espacio = fitz.csGRAY if colorspace == GRIS else fitz.csRGB
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=espacio, alpha=False)
+            arr = _array_desde_pixmap(pix).copy()
+            return arr, (page.rect.width, page.rect.height)
+        finally:
+            if propio:
+                doc.close()
+
+    def _guardar(self, clave: Clave, arr: np.ndarray, tamano_pt: Tuple[float, float]) -> None:
+        if arr.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            anterior = self._rasters.pop(clave, None)
+            if anterior is not None:
+                self.bytes -= anterior.nbytes
+            self._rasters[clave] = arr
+            self._tamanos[clave[:2]] = tamano_pt
+            self.bytes += arr.nbytes
+            self._descartar_excedente()
+
+    def _descartar_excedente(self) -> None:
+        """Saca los rasters menos usados hasta entrar en max_bytes (llamar con el lock tomado)."""
+        while self.bytes > self.max_bytes:
+            (sha, pno, _, _), viejo = self._rasters.popitem(last=False)
+            self.bytes -= viejo.nbytes
+            if not any(k[0] == sha and k[1] == pno for k in self._rasters):
+                self._tamanos.pop((sha, pno), None)
+
+    def fijar_presupuesto(self, max_bytes: int) -> None:
+        """Cambia el tope de bytes y descarta lo que sobre (0 = renderizar sin guardar)."""
+        with self._lock:
+            self.max_bytes = max(0, max_bytes)
+            self._descartar_excedente()
+
+    def limpiar(self) -> None:
+        with self._lock:
+            self._rasters.clear()
+            self._tamanos.clear()
+            self.bytes = 0
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entradas": len(self._rasters),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "aciertos": self.aciertos,
+                "reescalados": self.reescalados,
+                "renders": self.renders,
+            }
+
+
+cache = CacheRasterizado()
+
+
+def raster_pagina(
+    pdf_bytes: Optional[bytes],
+    pno: int,
+    dpi: float,
+    colorspace: str = RGB,
+    doc: Optional[fitz.Document] = None,
+    sha: Optional[str] = None,
+    reescalar: bool = True,
+) -> np.ndarray:
+    """Atajo a la caché del proceso (ver CacheRasterizado.obtener)."""
+    return cache.obtener(pdf_bytes, pno, dpi, colorspace, doc=doc, sha=sha, reescalar=reescalar)
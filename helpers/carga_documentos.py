@@ -0,0 +1,187 @@
+"""
+Recepción de documentos como multipart o cuerpo binario (sin base64).
+
+Con un JSON base64 FastAPI mantiene a la vez el texto JSON, el str decodificado
+y los bytes (~2.7x el tamaño del archivo). Aquí el contenido se vuelca por
+bloques a un archivo temporal con tope de tamaño (413 apenas se excede), se
+calcula el SHA-256 en el mismo recorrido y luego se lee una sola vez.
+
+El multipart se parsea a medida que llega, contando los bytes del cuerpo: el
+413 se devuelve apenas el cuerpo pasa max_bytes más una holgura para los
+separadores y campos de texto, sin esperar a que el formulario termine de
+llegar a los temporales.
+
+Formas aceptadas:
+- multipart/form-data con el archivo en el campo `archivo` (o el primer archivo del form)
+- cuerpo crudo con Content-Type application/pdf, image/* o application/octet-stream
+"""
+
+import hashlib
+import tempfile
+from typing import AsyncIterator, Iterable, Optional
+
+from fastapi import HTTPException, Request
+from starlette.datastructures import FormData, UploadFile
+from starlette.formparsers import MultiPartException, MultiPartParser
+
+from config import MAX_PDF_BYTES
+
+TAMANO_BLOQUE = 1024 * 1024
+# Separadores, cabeceras de cada parte y campos de texto que acompañan al archivo
+HOLGURA_MULTIPART = 64 * 1024
+
+TIPOS_PDF = ("application/pdf",)
+TIPOS_IMAGEN = ("image/*",)
+TIPOS_PDF_O_XML = ("application/pdf", "application/xml", "text/xml")
+
+
+class DocumentoSubido:
+    """Documento recibido y volcado a un archivo temporal."""
+
+    def __init__(self, archivo, tamano: int, content_type: str, nombre: Optional[str], sha256: str):
+        self.archivo = archivo
+        self.tamano = tamano
+        self.content_type = content_type
+        self.nombre = nombre
+        self.sha256 = sha256
+
+    def leer(self) -> bytes:
+        """Contenido completo como bytes (una sola copia en memoria)."""
+        self.archivo.seek(0)
+        return self.archivo.read()
+
+    def cerrar(self) -> None:
+        self.archivo.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+
+def _tipo_permitido(content_type: str, tipos: Iterable[str]) -> bool:
+    if content_type in ("", "application/octet-stream"):
+        return True
+    for tipo in tipos:
+        if tipo.endswith("/*"):
+            if content_type.startswith(tipo[:-1]):
+                return True
+        elif content_type == tipo:
+            return True
+    return False
+
+
+async def _bloques_upload(upload: UploadFile) -> AsyncIterator[bytes]:
+    while True:
+        bloque = await upload.read(TAMANO_BLOQUE)
+        if not bloque:
+            break
+        yield bloque
+
+
+def _mensaje_excedido(max_bytes: int) -> str:
+    return f"El archivo excede el tamaño máximo permitido ({max_bytes} bytes)."
+
+
+def rechazar_si_declara_mas(request: Request, tope: int, detalle: str) -> None:
+    """413 antes de leer el cuerpo si Content-Length declara más de `tope` bytes."""
+    declarado = request.headers.get("content-length")
+    if declarado and declarado.isdigit() and int(declarado) > tope:
+        raise HTTPException(status_code=413, detail=detalle)
+
+
+async def _cuerpo_con_tope(request: Request, tope: int, detalle: str) -> AsyncIterator[bytes]:
+    """Cuerpo del request por bloques; 413 en cuanto se reciben más de `tope` bytes."""
+    total = 0
+    async for bloque in request.stream():
+        total += len(bloque)
+        if total > tope:
+            raise HTTPException(status_code=413, detail=detalle)
+        yield bloque
+
+
+async def leer_formulario(request: Request, tope: int, detalle: str, max_files: int = 1000) -> FormData:
+    """
+    Parsea el multipart a medida que llega; 413 con `detalle` si el cuerpo pasa de `tope` bytes.
+
+    Los archivos quedan en los temporales de Starlette (UploadFile.size ya
+    conocido); el llamador cierra el formulario.
+    """
+    parser = MultiPartParser(request.headers, _cuerpo_con_tope(request, tope, detalle), max_files=max_files)
+    try:
+        return await parser.parse()
+    except MultiPartException as exc:
+        raise HTTPException(status_code=400, detail=exc.message)
+
+
+async def recibir_documento(
+    request: Request,
+    tipos: Iterable[str] = TIPOS_PDF,
+    max_bytes: int = MAX_PDF_BYTES,
+    campo: str = "archivo",
+) -> DocumentoSubido:
+    """
+    Lee el documento del request (multipart o cuerpo crudo) a un archivo temporal.
+
+    Raises:
+        HTTPException 400 si no hay archivo, 413 si excede max_bytes,
+        415 si el Content-Type no está entre `tipos`.
+    """
+    content_type = (request.headers.get("content-type") or "").split(";")[0].strip().lower()
+
+    es_multipart = content_type == "multipart/form-data"
+    tope = max_bytes + HOLGURA_MULTIPART if es_multipart else max_bytes
+    rechazar_si_declara_mas(request, tope, _mensaje_excedido(max_bytes))
+
+    nombre = None
+    form = None
+    if es_multipart:
+        form = await leer_formulario(request, tope, _mensaje_excedido(max_bytes))
+        upload = form.get(campo)
+        if not isinstance(upload, UploadFile):
+            upload = next((v for v in form.values() if isinstance(v, UploadFile)), None)
+        if upload is None:
+            await form.close()
+            raise HTTPException(status_code=400, detail=f"No se encontró el archivo en el campo '{campo}'.")
+        nombre = upload.filename
+        content_type = (upload.content_type or "").split(";")[0].strip().lower()
+        bloques = _bloques_upload(upload)
+    else:
+        bloques = request.stream()
+
+    destino = None
+    total = 0
+    h = hashlib.sha256()
+    try:
+        if not _tipo_permitido(content_type, tipos):
+            raise HTTPException(
+                status_code=415,
+                detail=f"Tipo de contenido no soportado: '{content_type}'. Se esperaba {', '.join(tipos)}."
+            )
+        destino = tempfile.TemporaryFile()
+        async for bloque in bloques:
+            total += len(bloque)
+            if total > max_bytes:
+                raise HTTPException(status_code=413, detail=_mensaje_excedido(max_bytes))
+            h.update(bloque)
+            destino.write(bloque)
+        if total == 0:
+            raise HTTPException(status_code=400, detail="El cuerpo de la petición está vacío.")
+        destino.flush()
+    except BaseException:
+        if destino is not None:
+            destino.close()
+        raise
+    finally:
+        # Los temporales del formulario ya se copiaron (o se descartan)
+        if form is not None:
+            await form.close()
+
+    return DocumentoSubido(destino, total, content_type, nombre, h.hexdigest())
+
+
+async def recibir_bytes(request: Request, tipos: Iterable[str] = TIPOS_PDF, max_bytes: int = MAX_PDF_BYTES) -> bytes:
+    """Atajo: recibe el documento y devuelve su contenido, liberando el temporal."""
+    with await recibir_documento(request, tipos, max_bytes) as documento:
+        return documento.leer()
@@ -0,0 +1,194 @@
+"""
+Escáner de claves de acceso / números de autorización del SRI (49 dígitos).
+
+Recorre el texto una sola vez: junta las corridas de dígitos separadas por
+separadores tolerados (espacios, saltos de línea, guiones, espacios duros),
+valida cada ventana de 49 dígitos con el módulo 11 mediante sumas prefijas
+(O(1) por ventana) y ordena los candidatos por:
+
+1. alineada con los trozos del texto (no empieza ni termina a mitad de un número)
+2. cercanía a una etiqueta ("CLAVE DE ACCESO", "NÚMERO DE AUTORIZACIÓN", ...)
+3. estructura plausible (fecha ddmmaaaa, tipo de comprobante, ambiente, tipo de emisión)
+4. dígito verificador válido
+5. posición en el texto
+
+El DV va después de la ubicación a propósito: en una corrida larga (una tabla
+de ítems pegada a la clave, un RUC en la línea anterior) aproximadamente una
+de cada 11 ventanas pasa el módulo 11 por azar. Si el DV mandara, esa ventana
+le ganaría a una clave adulterada (DV inválido) impresa bajo su etiqueta, y se
+reportaría y consultaría en el SRI un número que no está en el documento.
+El punto y la coma no son separadores: cortan las corridas en los montos
+(3.50, 0,00).
+
+El tiempo es lineal en el largo del texto: no hay expresiones con cuantificadores
+anidados que puedan retroceder sobre corridas largas de dígitos y espacios.
+
+    candidatos = escanear_claves(texto)
+    clave = candidatos[0].clave if candidatos else None
+"""
+
+import re
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import List, Optional, Pattern
+
+LONGITUD_CLAVE = 49
+
+# Separadores seguidos tolerados dentro de una clave (espacios, saltos de línea, guiones);
+# sin punto ni coma, para no unir montos de una tabla de ítems en una corrida
+_SEPARADORES = r" \t\r\n\f\v\u00a0\u2009\u202f\-"
+MAX_SEPARADOR = 4
+
+# Etiquetas que suelen preceder a la clave (texto ya sin tildes o con ellas)
+ETIQUETAS = re.compile(
+    r"CLAVE\s*(?:DE\s*)?ACCESO|N[UÚ]MERO\s*DE\s*AUTORIZACI[OÓ]N|AUTORIZACI[OÓ]N|DOCUMENTO\s*ELECTR[OÓ]NICO",
+    re.I,
+)
+# Distancia máxima (en caracteres) entre el fin de la etiqueta y la clave
+VENTANA_ETIQUETA = 2000
+
+# Dígito seguido de (hasta MAX_SEPARADOR separadores y un dígito)*: separadores y dígitos
+# son disjuntos, así que la expresión no retrocede más de MAX_SEPARADOR caracteres
+_CORRIDA = re.compile(r"[0-9](?:[%s]{0,%d}[0-9])*" % (_SEPARADORES, MAX_SEPARADOR))
+_NO_DIGITO = re.compile(r"[^0-9]")
+
+# codDoc: factura, liquidación de compra, nota de crédito, nota de débito, guía de remisión, retención
+_TIPOS_COMPROBANTE = frozenset(("01", "03", "04", "05", "06", "07"))
+
+
+@dataclass
+class CandidatoClave:
+    clave: str
+    inicio: int
+    fin: int
+    valida: bool
+    plausible: bool = False
+    alineada: bool = False
+    distancia_etiqueta: Optional[int] = None
+
+    def orden(self):
+        return (not self.alineada, self.distancia_etiqueta is None, not self.plausible,
+                not self.valida, self.distancia_etiqueta or 0, self.inicio)
+
+
+def dv_modulo11(base48: str) -> int:
+    """Dígito verificador (módulo 11, pesos 2..7 desde la derecha) de los primeros 48 dígitos."""
+    total = sum(int(d) * (7 - i % 6) for i, d in enumerate(base48))
+    dv = 11 - total % 11
+    return 0 if dv == 11 else 1 if dv == 10 else dv
+
+
+def clave_valida(clave: str) -> bool:
+    return len(clave) == LONGITUD_CLAVE and clave.isdigit() and dv_modulo11(clave[:48]) == int(clave[48])
+
+
+def estructura_plausible(clave: str) -> bool:
+    """Fecha ddmmaaaa, tipo de comprobante, ambiente y tipo de emisión con valores posibles."""
+    dia, mes = int(clave[0:2]), int(clave[2:4])
+    return (1 <= dia <= 31 and 1 <= mes <= 12 and clave[8:10] in _TIPOS_COMPROBANTE
+            and clave[23] in "12" and clave[47] == "1")
+
+
+def _corridas(texto: str):
+    """
+    Corridas de 49 o más dígitos unidos por separadores tolerados, como
+    (dígitos, posición en el texto de cada dígito).
+    """
+    for m in _CORRIDA.finditer(texto):
+        trozo = m.group()
+        if len(trozo) < LONGITUD_CLAVE:
+            continue
+        digitos = _NO_DIGITO.sub("", trozo)
+        if len(digitos) < LONGITUD_CLAVE:
+            continue
+        inicio = m.start()
+        yield digitos, [inicio + i for i, c in enumerate(trozo) if "0" <= c <= "9"]
+
+
+def _ventanas_validas(digitos: str) -> List[int]:
+    """Inicios de las ventanas de 49 dígitos con DV válido."""
+    n = len(digitos)
+    valores = [ord(c) - 48 for c in digitos]
+    # cadena[i + 6] = valores[i] + valores[i - 6] + valores[i - 12] + ...; así la suma de
+    # valores[t], valores[t + 6], ..., valores[t + 42] es cadena[t + 48] - cadena[t]
+    cadena = [0] * (n + 6)
+    for i, v in enumerate(valores):
+        cadena[i + 6] = cadena[i] + v
+
+    inicios = []
+    for s in range(n - LONGITUD_CLAVE + 1):
+        # El dígito j de la ventana pesa 7 - j % 6
+        total = (7 * (cadena[s + 48] - cadena[s]) + 6 * (cadena[s + 49] - cadena[s + 1])
+                 + 5 * (cadena[s + 50] - cadena[s + 2]) + 4 * (cadena[s + 51] - cadena[s + 3])
+                 + 3 * (cadena[s + 52] - cadena[s + 4]) + 2 * (cadena[s + 53] - cadena[s + 5]))
+        dv = 11 - total % 11
+        if (0 if dv == 11 else 1 if dv == 10 else dv) == valores[s + 48]:
+            inicios.append(s)
+    return inicios
+
+
+def escanear_claves(
+    texto: str,
+    etiquetas: Optional[Pattern] = ETIQUETAS,
+    ventana_etiqueta: int = VENTANA_ETIQUETA,
+    incluir_invalidas: bool = True,
+) -> List[CandidatoClave]:
+    """
+    Candidatos a clave de acceso en el texto, del mejor al peor.
+
+    Cada corrida de 49 o más dígitos aporta sus ventanas con DV válido (pueden
+    solaparse; el orden decide) y, salvo incluir_invalidas=False, las ventanas
+    alineadas con estructura plausible aunque su DV no valide: así una clave
+    adulterada sigue apareciendo, para que el llamador la reporte, aunque la
+    corrida tenga ventanas válidas por azar. Si la corrida no aporta nada de
+    eso, aporta su primera ventana alineada (o, sin ninguna, la primera).
+    """
+    if not texto:
+        return []
+
+    fines_etiqueta = [m.end() for m in etiquetas.finditer(texto)] if etiquetas is not None else []
+
+    candidatos: List[CandidatoClave] = []
+    for digitos, posiciones in _corridas(texto):
+        validas = set(_ventanas_validas(digitos))
+        # Índices de los dígitos que empiezan o terminan un número en el texto
+        n = len(digitos)
+        limites = [0] + [i for i in range(1, n) if posiciones[i] - posiciones[i - 1] > 1] + [n]
+        bordes = set(limites)
+        alineadas = [s for s in limites if s + LONGITUD_CLAVE in bordes]
+
+        inicios = set(validas)
+        if incluir_invalidas:
+            inicios.update(s for s in alineadas if estructura_plausible(digitos[s:s + LONGITUD_CLAVE]))
+            if not inicios:
+                inicios.add(alineadas[0] if alineadas else 0)
+        for s in sorted(inicios):
+            clave = digitos[s:s + LONGITUD_CLAVE]
+            inicio = posiciones[s]
+            candidatos.append(CandidatoClave(
+                clave=clave,
+                inicio=inicio,
+                fin=posiciones[s + LONGITUD_CLAVE - 1] + 1,
+                valida=s in validas,
+                plausible=estructura_plausible(clave),
+                alineada=s in bordes and s + LONGITUD_CLAVE in bordes,
+                distancia_etiqueta=_distancia(fines_etiqueta, inicio, ventana_etiqueta),
+            ))
+
+    candidatos.sort(key=CandidatoClave.orden)
+    return candidatos
+
+
+def _distancia(fines_etiqueta: List[int], inicio: int, ventana: int) -> Optional[int]:
+    """Caracteres entre el fin de la etiqueta anterior más cercana y el candidato."""
+    i = bisect_right(fines_etiqueta, inicio) - 1
+    if i < 0:
+        return None
+    distancia = inicio - fines_etiqueta[i]
+    return distancia if distancia <= ventana else None
+
+
+def mejor_clave(texto: str, etiquetas: Optional[Pattern] = ETIQUETAS, solo_validas: bool = False) -> Optional[str]:
+    """La clave mejor ubicada del texto (ver escanear_claves)."""
+    candidatos = escanear_claves(texto, etiquetas, incluir_invalidas=not solo_validas)
+    return candidatos[0].clave if candidatos else None
@@ -0,0 +1,206 @@
+"""
+Configuración de riesgo (pesos, niveles, descripciones) como instantánea inmutable y versionada.
+
+Antes config.py leía los JSON al importar y PUT /config/risk-weights y
+PUT /risk-levels modificaban esos dicts en el sitio: el cambio solo lo veía el
+worker que atendió el PUT, y una evaluación en curso podía mezclar pesos viejos
+con niveles nuevos.
+
+- actual() devuelve la instantánea vigente (ConfigRiesgo, de solo lectura).
+  Una evaluación la toma una vez y la usa de principio a fin; publicar una
+  nueva es reemplazar una referencia, así que nadie ve una a medias.
+- guardar_pesos() / guardar_niveles() / restaurar_niveles() escriben el JSON de
+  forma atómica (temporal + os.replace) y publican la nueva instantánea.
+- Los demás workers se enteran por el archivo: actual() revisa inode, tamaño y
+  mtime de los JSON como mucho cada CONFIG_RIESGO_REVISION_S segundos (un stat,
+  sin leerlos) y recarga si cambiaron. Una edición a mano también se recoge.
+- version: hash del contenido de pesos y niveles (no de las descripciones, que
+  no cambian puntajes). Es la misma en todos los procesos con los mismos
+  archivos; se estampa en cada resultado de riesgo ("version_config") y sirve
+  de clave para no reutilizar puntajes calculados con otra configuración.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from config import (
+    CONFIG_FILE,
+    CONFIG_RIESGO_REVISION_S,
+    DESCRIPTIONS_FILE,
+    RISK_LEVELS_DEFAULT,
+    RISK_LEVELS_FILE,
+    RISK_WEIGHTS_DESCRIPTIONS_DEFAULT,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _congelar(valor: Any) -> Any:
+    if isinstance(valor, dict):
+        return MappingProxyType({k: _congelar(v) for k, v in valor.items()})
+    if isinstance(valor, list):
+        return tuple(_congelar(v) for v in valor)
+    return valor
+
+
+def descongelar(valor: Any) -> Any:
+    """Copia mutable (dicts y listas) de una parte de la instantánea, p. ej. para responder JSON."""
+    if isinstance(valor, Mapping):
+        return {k: descongelar(v) for k, v in valor.items()}
+    if isinstance(valor, tuple):
+        return [descongelar(v) for v in valor]
+    return valor
+
+
+@dataclass(frozen=True)
+class ConfigRiesgo:
+    version: str
+    pesos: Mapping[str, int]
+    niveles: Mapping[str, Tuple[int, int]]
+    descripciones: Mapping[str, Any]
+    cargada: float
+
+    def nivel(self, score: float, defecto: Optional[str] = None) -> Optional[str]:
+        """Nivel cuyo rango contiene `score`; `defecto` si ninguno."""
+        for nombre, (minimo, maximo) in self.niveles.items():
+            if minimo <= score <= maximo:
+                return nombre
+        return defecto
+
+
+def _firma_archivos() -> Tuple:
+    """(inode, tamaño, mtime) de cada JSON; os.replace cambia el inode aunque el mtime coincida."""
+    firma = []
+    for ruta in (CONFIG_FILE, RISK_LEVELS_FILE, DESCRIPTIONS_FILE):
+        try:
+            st = os.stat(ruta)
+            firma.append((st.st_ino, st.st_size, st.st_mtime_ns))
+        except FileNotFoundError:
+            firma.append(None)
+    return tuple(firma)
+
+
+def _leer_json(ruta: str) -> Optional[Any]:
+    if not os.path.exists(ruta):
+        return None
+    with open(ruta, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def cargar() -> ConfigRiesgo:
+    """Lee los JSON (o los valores por defecto) y arma una instantánea nueva."""
+    descripciones = _leer_json(DESCRIPTIONS_FILE)
+    if descripciones is None:
+        descripciones = RISK_WEIGHTS_DESCRIPTIONS_DEFAULT
+    pesos = _leer_json(CONFIG_FILE)
+    if pesos is None:
+        pesos = {k: v["valor"] for k, v in descripciones.items()}
+    niveles = _leer_json(RISK_LEVELS_FILE)
+    if niveles is None:
+        niveles = RISK_LEVELS_DEFAULT
+    niveles = {k: tuple(v) for k, v in niveles.items()}
+
+    contenido = json.dumps({"pesos": pesos, "niveles": niveles}, sort_keys=True, ensure_ascii=False)
+    return ConfigRiesgo(
+        version=hashlib.sha256(contenido.encode("utf-8")).hexdigest()[:12],
+        pesos=MappingProxyType(dict(pesos)),
+        niveles=MappingProxyType(niveles),
+        descripciones=_congelar(descripciones),
+        cargada=time.time(),
+    )
+
+
+_lock = threading.Lock()
+_firma = _firma_archivos()
+_actual = cargar()
+_proxima_revision = time.monotonic() + CONFIG_RIESGO_REVISION_S
+
+
+def _publicar() -> ConfigRiesgo:
+    """Recarga desde disco y reemplaza la instantánea (con _lock tomado)."""
+    global _actual, _firma
+    firma = _firma_archivos()
+    nueva = cargar()
+    if nueva.version != _actual.version:
+        logger.info("configuración de riesgo %s -> %s (pid %d)", _actual.version, nueva.version, os.getpid())
+    _actual, _firma = nueva, firma
+    return nueva
+
+
+def _revisar() -> None:
+    global _proxima_revision
+    # Si otro hilo ya está revisando, se sigue con la instantánea vigente
+    if not _lock.acquire(blocking=False):
+        return
+    try:
+        _proxima_revision = time.monotonic() + CONFIG_RIESGO_REVISION_S
+        if _firma_archivos() != _firma:
+            try:
+                _publicar()
+            except (OSError, ValueError) as e:
+                # Archivo a medio escribir (edición a mano) o inválido: se conserva la vigente
+                logger.warning("no se pudo recargar la configuración de riesgo: %s", e)
+    finally:
+        _lock.release()
+
+
+def actual() -> ConfigRiesgo:
+    """Instantánea vigente; tomarla una vez por evaluación."""
+    if time.monotonic() >= _proxima_revision:
+        _revisar()
+    return _actual
+
+
+def recargar() -> ConfigRiesgo:
+    """Relee los archivos ya, sin esperar a la próxima revisión."""
+    with _lock:
+        return _publicar()
+
+
+def _escribir_atomico(ruta: str, datos: Any) -> None:
+    """Escribe en un temporal del mismo directorio y lo renombra: nadie lee un JSON a medias."""
+    directorio = os.path.dirname(os.path.abspath(ruta))
+    fd, temporal = tempfile.mkstemp(prefix=".tmp-", suffix=".json", dir=directorio)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(datos, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp crea con 0600; conservar los permisos del archivo que se reemplaza
+        modo = os.stat(ruta).st_mode & 0o777 if os.path.exists(ruta) else 0o644
+        os.chmod(temporal, modo)
+        os.replace(temporal, ruta)
+    except BaseException:
+        try:
+            os.unlink(temporal)
+        except OSError:
+            pass
+        raise
+
+
+def guardar_pesos(pesos: Dict[str, int]) -> ConfigRiesgo:
+    with _lock:
+        _escribir_atomico(CONFIG_FILE, pesos)
+        return _publicar()
+
+
+def guardar_niveles(niveles: Dict[str, Any]) -> ConfigRiesgo:
+    with _lock:
+        _escribir_atomico(RISK_LEVELS_FILE, {k: list(v) for k, v in niveles.items()})
+        return _publicar()
+
+
+def restaurar_niveles() -> ConfigRiesgo:
+    """Vuelve a RISK_LEVELS_DEFAULT eliminando el archivo de niveles."""
+    with _lock:
+        if os.path.exists(RISK_LEVELS_FILE):
+            os.remove(RISK_LEVELS_FILE)
+        return _publicar()
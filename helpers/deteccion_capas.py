@@ -19,7 +19,9 @@ from typing import Dict, Any, List, Tuple, Optional
 from collections import Counter, defaultdict
 from difflib import SequenceMatcher
 import fitz
-from .type_conversion import ensure_python_bool, ensure_python_float, safe_serialize_dict
+from .type_conversion import ensure_python_bool, ensure_python_float
+from .paralelo_paginas import DocumentoCompartido, mapear_paginas
+from .politica_paginas import PoliticaPaginas, planificar_paginas
 
 # Configuración de patrones y constantes
 class LayerPatterns:
@@ -147,9 +149,10 @@ class OCGAnalyzer:
 
     # ------------------------ núcleo de análisis ------------------------
 
-    def analyze(self) -> Dict[str, Any]:
+    def analyze(self, paginas: Optional[List[int]] = None) -> Dict[str, Any]:
         """
         Analiza la presencia y configuración de Optional Content Groups.
+        paginas: páginas cuyos streams se revisan (None = todas)
         Returns: Dict con análisis detallado de OCG
         """
         result = {
@@ -186,6 +189,7 @@ class OCGAnalyzer:
         # 2) (Opcional) Análisis estructural con PyMuPDF: catalog y streams por página
         ocg_pages = 0
         total_pages = 0
+        analyzed_pages = 0
         pages_with_hits: List[int] = []
         per_page_hits: List[Dict[str, Any]] = []
         catalog_flags = {"has_OCProperties": False, "catalog_hits": 0}
@@ -208,7 +212,9 @@ class OCGAnalyzer:
 
                 # 2.b Streams por página: buscar OC/OCMD en cada stream
                 token_re = re.compile(rb"/OC(?:MD)?\b", re.I)
-                for pno in range(total_pages):
+                revisar = range(total_pages) if paginas is None else [p for p in paginas if p < total_pages]
+                analyzed_pages = len(revisar)
+                for pno in revisar:
                     page = doc.load_page(pno)
                     # Contents puede ser array de referencias o un stream; extrae los bytes de cada stream
                     page_hits = 0
@@ -243,10 +249,11 @@ class OCGAnalyzer:
             except Exception:
                 # si falla, seguimos solo con el escaneo por bytes
                 total_pages = 0
+                analyzed_pages = 0
 
-        # 3) Métricas derivadas (densidad y cobertura)
+        # 3) Métricas derivadas (densidad y cobertura sobre las páginas revisadas)
         ocg_density = ocg_count / self._bytes_per_mb(self.sample_size)   # señales por MB
-        coverage = (ocg_pages / total_pages) if total_pages else 0.0     # 0..1
+        coverage = (ocg_pages / analyzed_pages) if analyzed_pages else 0.0     # 0..1
 
         # 4) Confianza con suavizado y contexto (mejor que escalones)
         confidence = self._ocg_confidence_smooth(ocg_count, coverage, ocg_density)
@@ -263,6 +270,7 @@ class OCGAnalyzer:
                 "pages_with_ocg": pages_with_hits,
                 "ocg_pages": ocg_pages,
                 "total_pages": total_pages,
+                "analyzed_pages": analyzed_pages,
                 "per_page_hits": per_page_hits,
                 "catalog": catalog_flags,
                 "sampled_bytes": self.sample_size
@@ -616,8 +624,13 @@ class TextOverlapAnalyzer:
 class StructureAnalyzer:
     """Analizador especializado para estructura PDF sospechosa."""
     
-    def __init__(self, doc: fitz.Document):
+    def __init__(self, doc: fitz.Document, pdf_bytes: Optional[bytes] = None,
+                 paginas: Optional[List[int]] = None):
         self.doc = doc
+        # Con los bytes, las páginas se pueden analizar en paralelo (cada proceso abre su copia)
+        self.pdf_bytes = pdf_bytes
+        # Páginas a analizar (None = todas); en PDFs largos, las estructurales de la política
+        self.paginas = list(range(doc.page_count)) if paginas is None else list(paginas)
     
     def analyze(self) -> Dict[str, Any]:
         """
@@ -636,20 +649,16 @@ class StructureAnalyzer:
         
         try:
             # Análisis por página
-            page_analysis = []
             total_objects = 0
             overlapping_blocks_total = 0
             
-            for page_num in range(self.doc.page_count):
-                page = self.doc.load_page(page_num)
-                page_info = self._analyze_page_structure(page, page_num)
-                page_analysis.append(page_info)
-                
+            page_analysis = mapear_paginas(self.pdf_bytes, self.paginas, _estructura_pagina, doc=self.doc)
+            for page_info in page_analysis:
                 total_objects += page_info["object_count"]
                 overlapping_blocks_total += page_info["overlapping_blocks"]
             
             # Análisis global
-            objects_per_page = total_objects / max(1, self.doc.page_count)
+            objects_per_page = total_objects / max(1, len(self.paginas))
             
             # Determinar si la estructura es sospechosa
             suspicious_indicators = []
@@ -733,6 +742,11 @@ class StructureAnalyzer:
         return page_info
 
 
+def _estructura_pagina(ctx: DocumentoCompartido, page_num: int) -> Dict[str, Any]:
+    """Estructura de una página (ejecutable en otro proceso)."""
+    return StructureAnalyzer(ctx.doc)._analyze_page_structure(ctx.doc.load_page(page_num), page_num)
+
+
 class RiskCalculator:
     """Calculadora de riesgo dinámico para capas múltiples."""
     
@@ -837,10 +851,13 @@ class RiskCalculator:
 class LayerDetector:
     """Clase principal para detección avanzada de capas múltiples."""
     
-    def __init__(self, pdf_bytes: bytes, extracted_text: str = "", base_weight: int = None):
+    def __init__(self, pdf_bytes: bytes, extracted_text: str = "", base_weight: int = None,
+                 politica: Optional[PoliticaPaginas] = None):
         self.pdf_bytes = pdf_bytes
         self.extracted_text = extracted_text
         self.base_weight = base_weight or RiskWeights.BASE_WEIGHT
+        # Páginas por análisis; sin política se planifica con la de config al abrir el documento
+        self.politica = politica
         
         # Inicializar analizadores
         self.ocg_analyzer = OCGAnalyzer(pdf_bytes)
@@ -862,10 +879,13 @@ class LayerDetector:
         try:
             # Abrir documento para análisis estructural
             self.doc = fitz.open(stream=self.pdf_bytes, filetype="pdf")
-            self.structure_analyzer = StructureAnalyzer(self.doc)
+            if self.politica is None:
+                self.politica = planificar_paginas(self.doc)
+            paginas = self.politica.paginas_estructurales
+            self.structure_analyzer = StructureAnalyzer(self.doc, self.pdf_bytes, paginas)
             
-            # Ejecutar todos los análisis
-            ocg_analysis = self.ocg_analyzer.analyze()
+            # Ejecutar todos los análisis (los que recorren páginas, solo las estructurales)
+            ocg_analysis = self.ocg_analyzer.analyze(paginas)
             overlay_analysis = self.overlay_analyzer.analyze()
             text_analysis = self.text_analyzer.analyze()
             structure_analysis = self.structure_analyzer.analyze()
@@ -892,6 +912,7 @@ class LayerDetector:
                 "penalty_points": risk_result["penalty_points"],
                 "indicators": indicators,
                 "layer_count_estimate": layer_estimate,
+                "cobertura_paginas": self.politica.cobertura(),
                 
                 # Datos técnicos detallados
                 "ocg_objects": ocg_analysis["ocg_count"],
@@ -992,19 +1013,21 @@ class LayerDetector:
 
 # Funciones de conveniencia para compatibilidad con código existente
 
-def detect_layers_advanced(pdf_bytes: bytes, extracted_text: str = "") -> Dict[str, Any]:
+def detect_layers_advanced(pdf_bytes: bytes, extracted_text: str = "",
+                           politica: Optional[PoliticaPaginas] = None) -> Dict[str, Any]:
     """
     Función de conveniencia para mantener compatibilidad con código existente.
     
     Args:
         pdf_bytes: Contenido del PDF en bytes
         extracted_text: Texto extraído del PDF
+        politica: Política de páginas (opcional, por defecto la de config)
         
     Returns:
         Dict con análisis completo de capas múltiples
     """
-    detector = LayerDetector(pdf_bytes, extracted_text)
-    return safe_serialize_dict(detector.analyze())
+    detector = LayerDetector(pdf_bytes, extracted_text, politica=politica)
+    return detector.analyze()
 
 
 def calculate_dynamic_penalty(probability_percentage: float, base_weight: int = 15) -> int:
@@ -4,7 +4,7 @@ Helper simple para detección de firmas digitales en PDFs desde base64.
 Funcionalidad:
 - Detección rápida de firmas digitales
 - Análisis básico de metadatos de firma
-- Compatible con base64
+- Compatible con base64 (wrappers para la frontera HTTP) y con bytes
 - Sin dependencias externas pesadas
 
 Autor: Sistema de Análisis Forense
@@ -14,7 +14,7 @@ Versión: 1.0
 import base64
 import re
 from typing import Dict, Any, Optional
-from .type_conversion import safe_serialize_dict, ensure_python_bool
+from .type_conversion import ensure_python_bool
 
 
 def detectar_firma_desde_base64(pdf_base64: str) -> Dict[str, Any]:
@@ -28,21 +28,40 @@ def detectar_firma_desde_base64(pdf_base64: str) -> Dict[str, Any]:
         Dict con información de detección de firma
     """
     try:
-        # Decodificar PDF
         pdf_bytes = base64.b64decode(pdf_base64)
+    except Exception as e:
+        return {
+            "firma_detectada": False,
+            "error": f"Error procesando PDF: {str(e)}",
+            "metadatos": {},
+            "resumen": "Error en detección"
+        }
+    return detectar_firma_desde_bytes(pdf_bytes)
+
+
+def detectar_firma_desde_bytes(pdf_bytes: bytes) -> Dict[str, Any]:
+    """
+    Detecta si un PDF tiene firmas digitales a partir de sus bytes.
+    
+    Args:
+        pdf_bytes: Contenido del PDF (bytes o memoryview)
         
+    Returns:
+        Dict con información de detección de firma
+    """
+    try:
         # Detectar firmas usando patrones
-        resultado = _detectar_firmas_patrones(pdf_bytes)
+        resultado = _detectar_firmas_patrones(bytes(pdf_bytes))
         
-        return safe_serialize_dict(resultado)
+        return resultado
         
     except Exception as e:
-        return safe_serialize_dict({
+        return {
             "firma_detectada": False,
             "error": f"Error procesando PDF: {str(e)}",
             "metadatos": {},
             "resumen": "Error en detección"
-        })
+        }
 
 
 def _detectar_firmas_patrones(pdf_bytes: bytes) -> Dict[str, Any]:
@@ -276,11 +295,32 @@ def validar_firma_rapida(pdf_base64: str) -> Dict[str, Any]:
         Dict con resultado de validación rápida
     """
     try:
-        # Decodificar PDF
         pdf_bytes = base64.b64decode(pdf_base64)
+    except Exception as e:
+        return {
+            "firma_detectada": False,
+            "es_valida": False,
+            "confianza": 0.0,
+            "tipo": "error",
+            "metadatos": {},
+            "resumen": f"Error: {str(e)}"
+        }
+    return validar_firma_rapida_desde_bytes(pdf_bytes)
+
+
+def validar_firma_rapida_desde_bytes(pdf_bytes: bytes) -> Dict[str, Any]:
+    """
+    Validación rápida de firma digital a partir de los bytes del PDF.
+    
+    Args:
+        pdf_bytes: Contenido del PDF (bytes o memoryview)
         
+    Returns:
+        Dict con resultado de validación rápida
+    """
+    try:
         # Detección básica
-        deteccion = _detectar_firmas_patrones(pdf_bytes)
+        deteccion = _detectar_firmas_patrones(bytes(pdf_bytes))
         
         # Validación simple
         es_valida = (
@@ -288,21 +328,21 @@ def validar_firma_rapida(pdf_base64: str) -> Dict[str, Any]:
             deteccion.get('confianza', 0.0) > 0.3
         )
         
-        return safe_serialize_dict({
+        return {
             "firma_detectada": deteccion.get('firma_detectada', False),
             "es_valida": ensure_python_bool(es_valida),
             "confianza": deteccion.get('confianza', 0.0),
             "tipo": deteccion.get('tipo_firma', 'ninguna'),
             "metadatos": deteccion.get('metadatos', {}),
             "resumen": deteccion.get('resumen', 'Sin información')
-        })
+        }
         
     except Exception as e:
-        return safe_serialize_dict({
+        return {
             "firma_detectada": False,
             "es_valida": False,
             "confianza": 0.0,
             "tipo": "error",
             "metadatos": {},
             "resumen": f"Error: {str(e)}"
-        })
+        }
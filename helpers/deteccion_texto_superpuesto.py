@@ -12,19 +12,28 @@ Versión: 1.0
 """
 
 import re
+import math
 import base64
 import fitz
 from typing import Dict, Any, List, Tuple, Optional
 from collections import defaultdict
 import json
 import io
-from .type_conversion import ensure_python_bool, ensure_python_float, safe_serialize_dict
+from .type_conversion import ensure_python_float
+from .politica_paginas import PoliticaPaginas, planificar_paginas
+from .nivel_detalle import RESUMEN, COMPLETO
+from .inventario_imagenes import InventarioImagenes
+from .paralelo_paginas import DocumentoCompartido, mapear_paginas
+from .cache_rasterizado import raster_pagina, GRIS
+from .perfilado import perfilable
+from .importacion_diferida import modulo_diferido
 import copy
 import numpy as np
-from PIL import ImageChops, Image
-import pikepdf
-import imagehash
-import hashlib
+
+from config import DIFF_DPI_GRUESO, DIFF_DPI_FINO, DIFF_MAX_PIXELES, DIFF_MARGEN_ESCALADO
+from helpers import config_riesgo
+
+pikepdf = modulo_diferido("pikepdf")
 
 
 # Constantes para análisis por stream
@@ -32,23 +41,79 @@ PA = 0.05  # umbral de % de píxeles distintos para decir "hay cambio" (aumentad
 PIX_DIFF_THRESHOLD = 0.05  # 5% de píxeles distintos => consideramos que "cambió" (aumentado de 1% a 5%)
 
 
-def _render_png(pdf_bytes: bytes, page_index=0, dpi=144) -> Image.Image:
-    """Renderiza una página del PDF como imagen PNG"""
+# Renders que conserva cada comparador (variantes recientes, a ambos DPI)
+_MAX_RENDERS_COMPARADOR = 4
+
+
+def _render_gris(pdf_bytes: bytes, page_index: int = 0, dpi: int = DIFF_DPI_GRUESO) -> np.ndarray:
+    """Renderiza una página del PDF en escala de grises como arreglo (alto x ancho)"""
     doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    page = doc[page_index]
-    pix = page.get_pixmap(dpi=dpi)
-    doc.close()
-    return Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+    try:
+        pix = doc[page_index].get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+    finally:
+        doc.close()
+    arr = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)
+    return arr[:, :pix.width]
 
 
-def _diff_ratio(img_a: Image.Image, img_b: Image.Image) -> float:
-    """Calcula el porcentaje de píxeles diferentes entre dos imágenes"""
-    d = ImageChops.difference(img_a, img_b).convert("L")
-    arr = np.array(d)
-    return ensure_python_float((arr > 0).mean())  # % píxeles distintos
+def _diff_ratio(arr_a: np.ndarray, arr_b: np.ndarray) -> float:
+    """Calcula el porcentaje de píxeles diferentes entre dos renders"""
+    if arr_a.shape != arr_b.shape:
+        return 1.0
+    return ensure_python_float(np.count_nonzero(arr_a != arr_b) / max(1, arr_a.size))
 
 
-def _get_page_streams(pdf: pikepdf.Pdf, page_index: int):
+def _dpi_adaptativo(pdf_bytes: bytes, page_index: int, dpi_max: int) -> int:
+    """DPI grueso para una página: DIFF_DPI_GRUESO, reducido si la página excede DIFF_MAX_PIXELES"""
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    try:
+        rect = doc[page_index].rect
+    finally:
+        doc.close()
+    area_pt = max(1.0, rect.width * rect.height)
+    dpi_presupuesto = 72.0 * math.sqrt(DIFF_MAX_PIXELES / area_pt)
+    return int(max(18, min(DIFF_DPI_GRUESO, dpi_max, dpi_presupuesto)))
+
+
+class _ComparadorRender:
+    """
+    Compara variantes (PDF bytes) de una misma página.
+
+    Primero compara en gris a DPI bajo; solo si el ratio queda cerca del umbral
+    vuelve a renderizar el par a dpi_fino para decidir.
+    """
+
+    def __init__(self, pdf_bytes: bytes, page_index: int, umbral: float, dpi_fino: int = DIFF_DPI_FINO):
+        self.page_index = page_index
+        self.umbral = umbral
+        self.dpi_fino = dpi_fino
+        self.dpi_grueso = _dpi_adaptativo(pdf_bytes, page_index, dpi_fino)
+        self.escalados = 0
+        self._renders: Dict[Tuple[bytes, int], np.ndarray] = {}
+
+    def _render(self, pdf_bytes: bytes, dpi: int) -> np.ndarray:
+        clave = (pdf_bytes, dpi)
+        arr = self._renders.pop(clave, None)
+        if arr is None:
+            arr = _render_gris(pdf_bytes, self.page_index, dpi)
+        # reinsertar al final: se descarta el render usado hace más tiempo
+        self._renders[clave] = arr
+        if len(self._renders) > _MAX_RENDERS_COMPARADOR:
+            self._renders.pop(next(iter(self._renders)))
+        return arr
+
+    def diff(self, bytes_a: bytes, bytes_b: bytes) -> Tuple[float, int]:
+        """Devuelve (ratio de píxeles distintos, dpi usado para decidir)"""
+        ratio = _diff_ratio(self._render(bytes_a, self.dpi_grueso), self._render(bytes_b, self.dpi_grueso))
+        cerca_umbral = abs(ratio - self.umbral) <= self.umbral * DIFF_MARGEN_ESCALADO
+        if cerca_umbral and self.dpi_grueso < self.dpi_fino:
+            self.escalados += 1
+            ratio = _diff_ratio(self._render(bytes_a, self.dpi_fino), self._render(bytes_b, self.dpi_fino))
+            return ratio, self.dpi_fino
+        return ratio, self.dpi_grueso
+
+
+def _get_page_streams(pdf: "pikepdf.Pdf", page_index: int):
     """Obtiene los streams de contenido de una página"""
     page = pdf.pages[page_index]
     cont = page.obj.get("/Contents", None)
@@ -83,7 +148,7 @@ def _set_page_stream_prefix(pdf_bytes: bytes, page_index: int, k: int) -> bytes:
         return bio.getvalue()
 
 
-def _get_annots(pdf: pikepdf.Pdf, page_index: int):
+def _get_annots(pdf: "pikepdf.Pdf", page_index: int):
     """Obtiene las anotaciones de una página"""
     page = pdf.pages[page_index]
     arr = page.obj.get("/Annots", None)
@@ -104,7 +169,7 @@ def _set_annots_prefix(pdf_bytes: bytes, page_index: int, k: int) -> bytes:
         return bio.getvalue()
 
 
-def _get_ocgs(pdf: pikepdf.Pdf):
+def _get_ocgs(pdf: "pikepdf.Pdf"):
     """Obtiene los Optional Content Groups del PDF"""
     ocp = pdf.Root.get("/OCProperties", None)
     if not ocp:
@@ -133,7 +198,7 @@ def _set_ocg_on_prefix(pdf_bytes: bytes, k: int) -> bytes:
         return bio.getvalue()
 
 
-def stack_compare(pdf_bytes: bytes, page_index: int = 0, dpi: int = 144) -> Dict[str, Any]:
+def stack_compare(pdf_bytes: bytes, page_index: int = 0, dpi: int = DIFF_DPI_FINO) -> Dict[str, Any]:
     """
     Análisis por capas del PDF - método más avanzado y preciso.
     
@@ -145,39 +210,40 @@ def stack_compare(pdf_bytes: bytes, page_index: int = 0, dpi: int = 144) -> Dict
     Args:
         pdf_bytes: PDF como bytes
         page_index: Índice de la página a analizar
-        dpi: Resolución para renderizado
+        dpi: Resolución máxima; se compara a un DPI menor y solo se sube a este
+            cuando el ratio queda cerca del umbral
         
     Returns:
         Dict con análisis detallado por capas
     """
     try:
-        baseline = _render_png(pdf_bytes, page_index, dpi)
+        comparador = _ComparadorRender(pdf_bytes, page_index, PIX_DIFF_THRESHOLD, dpi)
         report = {
             "page": page_index + 1,
             "by_stream": [],
             "by_annot": [],
             "by_ocg": [],
             "threshold": PIX_DIFF_THRESHOLD,
-            "dpi": dpi
+            "dpi": dpi,
+            "dpi_grueso": comparador.dpi_grueso
         }
 
         # --- 1) Capas: /Contents (streams) ---
         with pikepdf.open(io.BytesIO(pdf_bytes)) as pdf:
             streams = _get_page_streams(pdf, page_index)
         
-        prev_img = None
+        prev_bytes = pdf_bytes
         for k in range(1, len(streams) + 1):
             bytes_k = _set_page_stream_prefix(pdf_bytes, page_index, k)
-            img_k = _render_png(bytes_k, page_index, dpi)
             # compara contra k-1 (o baseline si k==1)
-            base = baseline if k == 1 else prev_img
-            ratio = _diff_ratio(img_k, base)
+            ratio, dpi_usado = comparador.diff(bytes_k, prev_bytes)
             report["by_stream"].append({
                 "k": k,
                 "changed": ratio > PIX_DIFF_THRESHOLD,
-                "diff_ratio": ratio
+                "diff_ratio": ratio,
+                "dpi": dpi_usado
             })
-            prev_img = img_k
+            prev_bytes = bytes_k
 
         # --- 2) Capas: /Annots (encima del contenido) ---
         with pikepdf.open(io.BytesIO(pdf_bytes)) as pdf:
@@ -185,17 +251,16 @@ def stack_compare(pdf_bytes: bytes, page_index: int = 0, dpi: int = 144) -> Dict
         
         if annots:
             prev_bytes = _set_annots_prefix(pdf_bytes, page_index, 0)  # sin annots
-            prev_img = _render_png(prev_bytes, page_index, dpi)
             for k in range(1, len(annots) + 1):
                 bytes_k = _set_annots_prefix(pdf_bytes, page_index, k)
-                img_k = _render_png(bytes_k, page_index, dpi)
-                ratio = _diff_ratio(img_k, prev_img)
+                ratio, dpi_usado = comparador.diff(bytes_k, prev_bytes)
                 report["by_annot"].append({
                     "k": k,
                     "changed": ratio > PIX_DIFF_THRESHOLD,
-                    "diff_ratio": ratio
+                    "diff_ratio": ratio,
+                    "dpi": dpi_usado
                 })
-                prev_img = img_k
+                prev_bytes = bytes_k
 
         # --- 3) Capas: OCG (si hay) ---
         with pikepdf.open(io.BytesIO(pdf_bytes)) as pdf:
@@ -203,25 +268,25 @@ def stack_compare(pdf_bytes: bytes, page_index: int = 0, dpi: int = 144) -> Dict
         
         if ocgs:
             prev_bytes = _set_ocg_on_prefix(pdf_bytes, 0)
-            prev_img = _render_png(prev_bytes, page_index, dpi)
             for k in range(1, len(ocgs) + 1):
                 bytes_k = _set_ocg_on_prefix(pdf_bytes, k)
-                img_k = _render_png(bytes_k, page_index, dpi)
-                ratio = _diff_ratio(img_k, prev_img)
+                ratio, dpi_usado = comparador.diff(bytes_k, prev_bytes)
                 report["by_ocg"].append({
                     "k": k,
                     "changed": ratio > PIX_DIFF_THRESHOLD,
-                    "diff_ratio": ratio
+                    "diff_ratio": ratio,
+                    "dpi": dpi_usado
                 })
-                prev_img = img_k
+                prev_bytes = bytes_k
 
+        report["comparaciones_escaladas"] = comparador.escalados
         return report
         
     except Exception as e:
         return {"error": f"Error en análisis por capas: {str(e)}"}
 
 
-def localizar_overlay_por_stream(pdf_bytes: bytes, page_index: int = 0) -> Dict[str, Any]:
+def localizar_overlay_por_stream(pdf_bytes: bytes, page_index: int = 0, incluir_stream: bool = True) -> Dict[str, Any]:
     """
     Localiza overlay analizando streams de contenido uno por uno.
     
@@ -232,12 +297,13 @@ def localizar_overlay_por_stream(pdf_bytes: bytes, page_index: int = 0) -> Dict[
     Args:
         pdf_bytes: PDF como bytes
         page_index: Índice de la página a analizar
+        incluir_stream: Si False no se vuelca el contenido completo del stream (stream_full)
         
     Returns:
         Dict con información del stream que introduce el overlay
     """
     try:
-        base_img = _render_png(pdf_bytes, page_index)
+        comparador = _ComparadorRender(pdf_bytes, page_index, PA)
 
         with pikepdf.open(io.BytesIO(pdf_bytes)) as pdf:
             page = pdf.pages[page_index]
@@ -272,8 +338,7 @@ def localizar_overlay_por_stream(pdf_bytes: bytes, page_index: int = 0) -> Dict[
                     tmp.save(bio)
                     test_bytes = bio.getvalue()
 
-                img = _render_png(test_bytes, page_index)
-                ratio = _diff_ratio(img, base_img)
+                ratio, _ = comparador.diff(test_bytes, pdf_bytes)
                 if ratio > PA:
                     overlay_idx = k - 1  # índice del stream que "introduce" diferencia
                     overlay_ratio = ratio
@@ -290,8 +355,10 @@ def localizar_overlay_por_stream(pdf_bytes: bytes, page_index: int = 0) -> Dict[
                 "overlay_ratio": overlay_ratio,
                 "overlay_ratio_formatted": None if overlay_idx is None else f">{overlay_ratio:.2%}",
                 "stream_preview": None if sospechoso is None else sospechoso[-1200:],  # cola
-                "stream_full": sospechoso,
+                "stream_full": sospechoso if incluir_stream else None,
                 "threshold": PA,
+                "dpi_grueso": comparador.dpi_grueso,
+                "comparaciones_escaladas": comparador.escalados,
                 "detected": overlay_idx is not None
             }
             
@@ -362,9 +429,9 @@ def inspeccionar_overlay_avanzado(pdf_bytes: bytes, page_index: int = 0, buscar_
 
         # 2) Diff visual con/sin anotaciones
         try:
-            pm1 = page.get_pixmap()  # con anotaciones
-            pm2 = page.get_pixmap(annots=False)  # sin anotaciones
-            out["render_diff"] = (pm1.samples != pm2.samples)
+            con_annots = raster_pagina(pdf_bytes, page_index, 72, GRIS, doc=doc, reescalar=False)
+            pm2 = page.get_pixmap(colorspace=fitz.csGRAY, annots=False)  # sin anotaciones
+            out["render_diff"] = (con_annots.tobytes() != pm2.samples)
         except Exception:
             pass
 
@@ -410,9 +477,14 @@ def inspeccionar_overlay_avanzado(pdf_bytes: bytes, page_index: int = 0, buscar_
 class TextOverlayDetector:
     """Detector especializado de texto superpuesto en PDFs"""
     
-    def __init__(self, pdf_bytes: bytes):
+    def __init__(self, pdf_bytes: bytes, politica: Optional[PoliticaPaginas] = None,
+                 inventario: Optional[InventarioImagenes] = None, detalle: str = COMPLETO):
         self.pdf_bytes = pdf_bytes
         self.doc = None
+        self.politica = politica
+        self.detalle = detalle
+        self.inventario = inventario
+        self._inventario_propio = False
         self.analysis_results = {
             "zona_1_anotaciones": {},
             "zona_2_contenido_pagina": {},
@@ -422,22 +494,31 @@ class TextOverlayDetector:
             "xml_estructura": {}
         }
     
+    @perfilable
     def analyze_pdf(self) -> Dict[str, Any]:
         """Ejecuta el análisis completo del PDF"""
         try:
             self.doc = fitz.open(stream=self.pdf_bytes, filetype="pdf")
-            
-            # Analizar cada zona
-            self.analysis_results["zona_1_anotaciones"] = self._analyze_annotations()
-            self.analysis_results["zona_2_contenido_pagina"] = self._analyze_page_contents()
-            self.analysis_results["zona_3_form_xobject"] = self._analyze_form_xobjects()
-            self.analysis_results["zona_4_acroform"] = self._analyze_acroform()
+            if self.politica is None:
+                self.politica = planificar_paginas(self.doc)
+            if self.inventario is None:
+                self.inventario = InventarioImagenes(self.pdf_bytes, self.doc)
+                self._inventario_propio = True
+            
+            # Analizar cada zona (solo informativas: no entran en el nivel de riesgo)
+            if self.detalle != RESUMEN:
+                self.analysis_results["zona_1_anotaciones"] = self._analyze_annotations()
+                self.analysis_results["zona_2_contenido_pagina"] = self._analyze_page_contents()
+                self.analysis_results["zona_3_form_xobject"] = self._analyze_form_xobjects()
+                self.analysis_results["zona_4_acroform"] = self._analyze_acroform()
             
             # NUEVA: Análisis avanzado de overlay
             self.analysis_results["analisis_avanzado_overlay"] = self._analyze_advanced_overlay()
             
-            # NUEVA: Análisis por stream (método más preciso)
-            self.analysis_results["analisis_por_stream"] = self._analyze_stream_overlay()
+            # NUEVA: Análisis por stream (método más preciso; un render por prefijo de streams,
+            # no entra en el nivel de riesgo, así que se omite en summary)
+            if self.detalle != RESUMEN:
+                self.analysis_results["analisis_por_stream"] = self._analyze_stream_overlay()
             
             # NUEVA: Análisis por capas (método más avanzado)
             self.analysis_results["analisis_por_capas"] = self._analyze_stack_layers()
@@ -449,7 +530,13 @@ class TextOverlayDetector:
             self.analysis_results["resumen_general"] = self._generate_summary()
             
             # Extraer XML/estructura del PDF
-            self.analysis_results["xml_estructura"] = self._extract_pdf_structure()
+            if self.detalle == COMPLETO:
+                self.analysis_results["xml_estructura"] = self._extract_pdf_structure()
+            else:
+                del self.analysis_results["xml_estructura"]
+            
+            # Cobertura de páginas según la política aplicada
+            self.analysis_results["cobertura_paginas"] = self.politica.cobertura()
             
             # Devolver la estructura original del análisis
             return self.analysis_results
@@ -457,6 +544,8 @@ class TextOverlayDetector:
         except Exception as e:
             return {"error": f"Error analizando PDF: {str(e)}"}
         finally:
+            if self._inventario_propio:
+                self.inventario.cerrar()
             if self.doc:
                 self.doc.close()
     
@@ -476,7 +565,7 @@ class TextOverlayDetector:
             total_annotations = 0
             overlapping_count = 0
             
-            for page_num in range(self.doc.page_count):
+            for page_num in self.politica.paginas_estructurales:
                 page = self.doc[page_num]
                 annotations = page.annots()
                 
@@ -529,7 +618,7 @@ class TextOverlayDetector:
         }
         
         try:
-            for page_num in range(self.doc.page_count):
+            for page_num in self.politica.paginas_estructurales:
                 page = self.doc[page_num]
                 
                 # Obtener streams de contenido
@@ -567,7 +656,7 @@ class TextOverlayDetector:
         }
         
         try:
-            for page_num in range(self.doc.page_count):
+            for page_num in self.politica.paginas_estructurales:
                 page = self.doc[page_num]
                 
                 # Obtener recursos de la página
@@ -728,11 +817,13 @@ class TextOverlayDetector:
             text_pattern = r'BT\s+(.*?)\s+ET'
             text_matches = re.findall(text_pattern, stream_text, re.DOTALL)
             for match in text_matches:
-                results["text_commands"].append({
+                comando = {
                     "page": page_num,
                     "content": match[:100] + "..." if len(match) > 100 else match,
-                    "full_content": match
-                })
+                }
+                if self.detalle == COMPLETO:
+                    comando["full_content"] = match
+                results["text_commands"].append(comando)
             
             # Buscar comandos de rectángulo
             rect_pattern = r'(\d+\.?\d*)\s+(\d+\.?\d*)\s+(\d+\.?\d*)\s+(\d+\.?\d*)\s+re\s+f'
@@ -834,7 +925,7 @@ class TextOverlayDetector:
             
             # Verificar número de streams
             total_streams = 0
-            for page_num in range(self.doc.page_count):
+            for page_num in self.politica.paginas_estructurales:
                 page = self.doc[page_num]
                 contents = page.get_contents()
                 if contents:
@@ -998,7 +1089,7 @@ class TextOverlayDetector:
             "capas_multiples": capas_check
         }
         
-        return safe_serialize_dict(resultado_final)
+        return resultado_final
     
     def _generate_capas_check(self) -> Dict[str, Any]:
         """Genera el check de capas múltiples con penalización dinámica"""
@@ -1012,7 +1103,7 @@ class TextOverlayDetector:
         nivel_riesgo = analisis_capas.get("nivel_riesgo", "LOW")
         
         # Calcular penalización dinámica según nivel de riesgo
-        peso_base = RISK_WEIGHTS.get("capas_multiples")  # Valor base de capas_multiples
+        peso_base = config_riesgo.actual().pesos.get("capas_multiples")  # Valor base de capas_multiples
         if nivel_riesgo == "HIGH":
             penalizacion = peso_base  # Penalización completa
         elif nivel_riesgo == "MEDIUM":
@@ -1089,7 +1180,7 @@ class TextOverlayDetector:
             # Usar la función avanzada para cada página
             resultados_paginas = []
             
-            for page_num in range(self.doc.page_count):
+            for page_num in self.politica.paginas_render:
                 resultado_pagina = inspeccionar_overlay_avanzado(
                     self.pdf_bytes, 
                     page_index=page_num
@@ -1119,7 +1210,7 @@ class TextOverlayDetector:
                 nivel_riesgo = "LOW"
             
             return {
-                "total_paginas_analizadas": self.doc.page_count,
+                "total_paginas_analizadas": len(self.politica.paginas_render),
                 "total_anotaciones": total_annots,
                 "total_elementos_sospechosos": total_sospechosos,
                 "paginas_con_render_diff": paginas_con_render_diff,
@@ -1142,10 +1233,11 @@ class TextOverlayDetector:
         try:
             resultados_paginas = []
             
-            for page_num in range(self.doc.page_count):
+            for page_num in self.politica.paginas_render:
                 resultado_pagina = localizar_overlay_por_stream(
                     self.pdf_bytes, 
-                    page_index=page_num
+                    page_index=page_num,
+                    incluir_stream=self.detalle == COMPLETO
                 )
                 resultado_pagina["page"] = page_num + 1
                 resultados_paginas.append(resultado_pagina)
@@ -1173,7 +1265,7 @@ class TextOverlayDetector:
                 nivel_riesgo = "LOW"
             
             return {
-                "total_paginas_analizadas": self.doc.page_count,
+                "total_paginas_analizadas": len(self.politica.paginas_render),
                 "total_streams": total_streams,
                 "paginas_con_overlay": paginas_con_overlay,
                 "streams_sospechosos": len(streams_sospechosos),
@@ -1194,14 +1286,9 @@ class TextOverlayDetector:
     def _analyze_stack_layers(self) -> Dict[str, Any]:
         """Análisis por capas - método más avanzado y preciso"""
         try:
-            resultados_paginas = []
-            
-            for page_num in range(self.doc.page_count):
-                resultado_pagina = stack_compare(
-                    self.pdf_bytes, 
-                    page_index=page_num
-                )
-                resultados_paginas.append(resultado_pagina)
+            resultados_paginas = mapear_paginas(
+                self.pdf_bytes, self.politica.paginas_render, _stack_compare_pagina
+            )
             
             # Consolidar resultados
             total_streams = sum(len(p.get("by_stream", [])) for p in resultados_paginas)
@@ -1243,7 +1330,7 @@ class TextOverlayDetector:
                 nivel_riesgo = "LOW"
             
             return {
-                "total_paginas_analizadas": self.doc.page_count,
+                "total_paginas_analizadas": len(self.politica.paginas_render),
                 "total_streams": total_streams,
                 "total_annots": total_annots,
                 "total_ocgs": total_ocgs,
@@ -1274,9 +1361,15 @@ class TextOverlayDetector:
             total_parches_sospechosos = 0
             total_bytes_imagenes = 0
             
-            for page_num in range(self.doc.page_count):
-                inventario = inventariar_imagenes(self.pdf_bytes, page_num)
-                
+            # En este proceso: el inventario deduplica imágenes entre páginas y lo
+            # comparte riesgo.py; en el pool cada lote decodificaría las suyas
+            inventarios = [
+                inventariar_imagenes(self.pdf_bytes, page_num, self.inventario)
+                for page_num in self.politica.paginas_completas
+            ]
+            xrefs_unicos = set()
+            
+            for page_num, inventario in zip(self.politica.paginas_completas, inventarios):
                 if "error" in inventario:
                     resultados_paginas.append({
                         "pagina": page_num + 1,
@@ -1286,6 +1379,7 @@ class TextOverlayDetector:
                 
                 # Contar imágenes y parches sospechosos
                 imagenes = inventario.get("images", [])
+                xrefs_unicos.update(img.get("xref") for img in imagenes)
                 parches_sospechosos = [img for img in imagenes if img.get("is_patch", False)]
                 
                 total_imagenes += len(imagenes)
@@ -1323,8 +1417,9 @@ class TextOverlayDetector:
                 nivel_riesgo = "LOW"
             
             return {
-                "total_paginas_analizadas": self.doc.page_count,
+                "total_paginas_analizadas": len(self.politica.paginas_completas),
                 "total_imagenes": total_imagenes,
+                "imagenes_unicas": len(xrefs_unicos),
                 "total_parches_sospechosos": total_parches_sospechosos,
                 "total_bytes_imagenes": total_bytes_imagenes,
                 "probabilidad_overlay_imagenes": round(probabilidad_imagenes, 3),
@@ -1348,197 +1443,78 @@ class TextOverlayDetector:
             return {"error": f"Error en análisis de imágenes: {str(e)}"}
 
 
-def _sha256(b: bytes) -> str:
-    """Calcula SHA256 de bytes"""
-    return hashlib.sha256(b).hexdigest()
-
-
-def _png_from_pdf_image(img_bytes: bytes, color_space: str = None) -> Image.Image:
-    """Convierte bytes de imagen del PDF a PIL Image"""
-    # Pillow suele abrir bien JPEG/JPX/Flate ya decodificados por PyMuPDF.
-    return Image.open(io.BytesIO(img_bytes)).convert("RGBA")
-
-
-def inventariar_imagenes(pdf_bytes: bytes, page_idx: int = 0) -> Dict[str, Any]:
+def inventariar_imagenes(pdf_bytes: bytes, page_idx: int = 0,
+                         inventario: Optional[InventarioImagenes] = None) -> Dict[str, Any]:
     """
     Inventaria todas las imágenes en una página del PDF.
     
     Args:
         pdf_bytes: PDF como bytes
         page_idx: Índice de la página (0-based)
+        inventario: Inventario compartido del documento (opcional); si se pasa,
+            las imágenes ya decodificadas en otras páginas no se vuelven a procesar
         
     Returns:
         Dict con información detallada de las imágenes encontradas
     """
-    out = {
-        "page": page_idx + 1,
-        "streams": 0,
-        "images": []  # [{name,xref,bbox,layer_order,bytes,sha256,phash,mean,var,is_patch}]
-    }
-
     try:
-        # 1) BBoxes donde el motor de texto ve imágenes (orden de pintura)
-        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-        page = doc[page_idx]
-        raw = page.get_text("rawdict")
-        img_blocks = [b for b in raw["blocks"] if b.get("type", 0) == 1]
-        # Mapa de bboxes de imagen por orden
-        block_bboxes = [b["bbox"] for b in img_blocks]
-        doc.close()
-
-        # 2) Streams y XObjects por PDF (pikepdf)
-        with pikepdf.open(io.BytesIO(pdf_bytes)) as pdf:
-            page_obj = pdf.pages[page_idx]
-            resources = page_obj.get("/Resources", {})
-            xobjects = resources.get("/XObject", {})
-            
-            out["streams"] = len(xobjects)
-            
-            for name, xobj in xobjects.items():
-                if xobj.get("/Subtype") == "/Image":
-                    try:
-                        # Extraer bytes de la imagen
-                        img_bytes = bytes(xobj.read_bytes())
-                        
-                        # Convertir a PIL Image
-                        pil_img = _png_from_pdf_image(img_bytes)
-                        
-                        # Calcular hash perceptual
-                        phash = str(imagehash.phash(pil_img))
-                        
-                        # Estadísticas de la imagen
-                        img_array = np.array(pil_img)
-                        mean_val = float(np.mean(img_array))
-                        var_val = float(np.var(img_array))
-                        
-                        # Detectar si es un parche sospechoso
-                        is_patch = _detectar_parche_sospechoso(pil_img, img_array)
-                        
-                        # Buscar bbox correspondiente
-                        bbox = _buscar_bbox_correspondiente(name, block_bboxes)
-                        
-                        # Determinar orden de capa (aproximado)
-                        layer_order = _determinar_orden_capa(name, xobjects)
-                        
-                        img_info = {
-                            "name": str(name),
-                            "xref": str(xobj.objgen),
-                            "bbox": bbox,
-                            "layer_order": layer_order,
-                            "bytes": len(img_bytes),
-                            "sha256": _sha256(img_bytes),
-                            "phash": phash,
-                            "mean": mean_val,
-                            "var": var_val,
-                            "is_patch": is_patch,
-                            "width": pil_img.width,
-                            "height": pil_img.height,
-                            "format": pil_img.format
-                        }
-                        
-                        out["images"].append(img_info)
-                        
-                    except Exception as e:
-                        # Si hay error procesando una imagen específica, continuar
-                        continue
-
-        return out
+        if inventario is not None:
+            return inventario.pagina(page_idx)
+        with InventarioImagenes(pdf_bytes) as propio:
+            return propio.pagina(page_idx)
         
     except Exception as e:
         return {"error": f"Error en inventario de imágenes: {str(e)}"}
 
 
-def _detectar_parche_sospechoso(pil_img: Image.Image, img_array: np.ndarray) -> bool:
-    """
-    Detecta si una imagen es un parche sospechoso que podría ocultar texto.
-    
-    Criterios:
-    - Imagen muy pequeña (posible parche)
-    - Colores uniformes (posible fondo para tapar)
-    - Bordes rectangulares perfectos
-    """
-    try:
-        # Criterio 1: Tamaño muy pequeño
-        if pil_img.width < 50 or pil_img.height < 50:
-            return True
-            
-        # Criterio 2: Variación de color muy baja (imagen uniforme)
-        if len(img_array.shape) == 3:
-            color_variance = np.var(img_array, axis=(0, 1))
-            if np.mean(color_variance) < 10:  # Muy poca variación de color
-                return True
-                
-        # Criterio 3: Bordes perfectamente rectangulares
-        if _tiene_bordes_rectangulares(img_array):
-            return True
-            
-        return False
-        
-    except:
-        return False
-
-
-def _tiene_bordes_rectangulares(img_array: np.ndarray) -> bool:
-    """Detecta si la imagen tiene bordes perfectamente rectangulares"""
-    try:
-        if len(img_array.shape) == 3:
-            # Convertir a escala de grises para análisis de bordes
-            gray = np.mean(img_array, axis=2)
-        else:
-            gray = img_array
-            
-        # Detectar bordes usando gradientes
-        grad_x = np.abs(np.diff(gray, axis=1))
-        grad_y = np.abs(np.diff(gray, axis=0))
-        
-        # Si hay muchos bordes rectos, es sospechoso
-        straight_edges_x = np.sum(grad_x > 50) / grad_x.size
-        straight_edges_y = np.sum(grad_y > 50) / grad_y.size
-        
-        return ensure_python_bool(straight_edges_x > 0.1 or straight_edges_y > 0.1)
-        
-    except:
-        return False
-
-
-def _buscar_bbox_correspondiente(name: str, block_bboxes: List) -> List[float]:
-    """Busca el bbox correspondiente a una imagen en los bloques de texto"""
-    # Por ahora retorna bbox vacío, se puede mejorar con más lógica
-    return [0, 0, 0, 0]
-
-
-def _determinar_orden_capa(name: str, xobjects: dict) -> int:
-    """Determina el orden de capa de una imagen (aproximado)"""
-    # Por ahora retorna orden basado en el nombre, se puede mejorar
-    try:
-        # Extraer número del nombre si existe
-        numbers = re.findall(r'\d+', str(name))
-        if numbers:
-            return int(numbers[0])
-        return 0
-    except:
-        return 0
+def _stack_compare_pagina(ctx: DocumentoCompartido, page_num: int) -> Dict[str, Any]:
+    """Análisis por capas de una página (ejecutable en otro proceso)"""
+    return stack_compare(ctx.pdf_bytes, page_index=page_num)
 
 
-def detectar_texto_superpuesto_detallado(pdf_base64: str) -> Dict[str, Any]:
+def detectar_texto_superpuesto_detallado(pdf_base64: str, politica: Optional[PoliticaPaginas] = None,
+                                         inventario: Optional[InventarioImagenes] = None,
+                                         detalle: str = COMPLETO) -> Dict[str, Any]:
     """
     Función principal para detectar texto superpuesto en un PDF.
     
     Args:
         pdf_base64: PDF codificado en base64
+        politica: Política de páginas (opcional, por defecto la de config)
+        inventario: Inventario de imágenes compartido con otros detectores (opcional)
+        detalle: Nivel de detalle (summary omite las zonas informativas y el análisis por stream)
         
     Returns:
         Dict con análisis detallado de las 4 zonas de superposición
     """
     try:
-        # Decodificar PDF
         pdf_bytes = base64.b64decode(pdf_base64)
+    except Exception as e:
+        return {"error": f"Error procesando PDF: {str(e)}"}
+    return detectar_texto_superpuesto_desde_bytes(pdf_bytes, politica, inventario, detalle)
+
+
+def detectar_texto_superpuesto_desde_bytes(pdf_bytes: bytes, politica: Optional[PoliticaPaginas] = None,
+                                           inventario: Optional[InventarioImagenes] = None,
+                                           detalle: str = COMPLETO) -> Dict[str, Any]:
+    """
+    Igual que detectar_texto_superpuesto_detallado, pero a partir de los bytes del PDF.
+    
+    Args:
+        pdf_bytes: Contenido del PDF (bytes o memoryview)
+        politica: Política de páginas (opcional, por defecto la de config)
+        inventario: Inventario de imágenes compartido con otros detectores (opcional)
+        detalle: Nivel de detalle (summary omite las zonas informativas y el análisis por stream)
         
+    Returns:
+        Dict con análisis detallado de las 4 zonas de superposición
+    """
+    try:
         # Crear detector y analizar
-        detector = TextOverlayDetector(pdf_bytes)
+        detector = TextOverlayDetector(bytes(pdf_bytes), politica, inventario, detalle)
         results = detector.analyze_pdf()
         
-        return safe_serialize_dict(results)
+        return results
         
     except Exception as e:
         return {"error": f"Error procesando PDF: {str(e)}"}
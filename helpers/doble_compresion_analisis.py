@@ -1,10 +1,13 @@
 import io
 from typing import Any, Dict, List, Tuple, Union
 
-import cv2
 import numpy as np
 from PIL import Image
 
+from .importacion_diferida import modulo_diferido
+
+cv2 = modulo_diferido("cv2")
+
 
 def _to_gray_u8(img_or_bytes: Union[bytes, np.ndarray]) -> np.ndarray:
     """Devuelve imagen en escala de grises uint8."""
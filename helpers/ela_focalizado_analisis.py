@@ -2,9 +2,12 @@ import io
 import math
 from typing import Any, Dict, List, Tuple, Union
 
-import cv2
 import numpy as np
 
+from .importacion_diferida import modulo_diferido
+
+cv2 = modulo_diferido("cv2")
+
 # Importar detector de texto superpuesto
 try:
     from .texto_superpuesto_analisis import detectar_texto_superpuesto
@@ -7,12 +7,14 @@ Integra técnicas del doc_forensics_pro.py para detección de alteraciones
 """
 
 import numpy as np
-import cv2
 from PIL import Image, ImageChops, ImageEnhance, ImageFilter, ExifTags
 from typing import Dict, Any, Optional, Tuple, List
 import re
 from datetime import datetime
 import os
+from .importacion_diferida import modulo_diferido
+
+cv2 = modulo_diferido("cv2")
 
 def compute_ela_advanced(original: Image.Image, quality: int = 90, enhance_factor: float = 20.0) -> Tuple[Image.Image, np.ndarray]:
     """
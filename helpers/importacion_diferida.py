@@ -0,0 +1,234 @@
+"""
+Importación diferida de dependencias pesadas y precalentamiento.
+
+OpenCV, scikit-image, pikepdf, imagehash, pytesseract, pyzbar, zeep,
+pdfplumber y compañía solo los usan algunas rutas; importarlos al arrancar
+alarga el arranque en frío de cada réplica y de cada worker. Los módulos que
+los usan los declaran diferidos:
+
+    cv2 = modulo_diferido("cv2")                       # no importa nada todavía
+    ssim = funcion_diferida("skimage.metrics", "structural_similarity")
+
+    cv2.cvtColor(...)     # primer uso: importa cv2 (una vez por proceso)
+
+Las anotaciones con tipos de estos módulos van entre comillas ("pikepdf.Pdf")
+para no forzar la importación al definir la función.
+
+al_importar(nombre, funcion) corre `funcion(modulo)` justo después de la
+primera importación de `nombre`, venga de donde venga (así se configura
+Tesseract sin importarlo al arrancar). precalentar() importa todo lo
+diferido, para que las primeras peticiones no paguen la importación: en un
+hilo de fondo desde app.py si PRECALENTAR=true, o en el maestro de gunicorn
+antes de bifurcar los workers (helpers/servidor.py).
+"""
+
+import importlib
+import importlib.abc
+import importlib.util
+import logging
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Lo que no debe importarse al arrancar la app (benchmarks.importacion lo verifica)
+# y que precalentar() importa en segundo plano.
+DIFERIDOS = (
+    "cv2",
+    "skimage.metrics",
+    "imagehash",
+    "exifread",
+    "pikepdf",
+    "pytesseract",
+    "pyzbar.pyzbar",
+    "zeep",
+    "pdfplumber",
+    "sklearn.cluster",
+    "scipy.fft",
+    "scipy.signal",
+)
+
+
+class ModuloDiferido:
+    """Sustituto de un módulo que lo importa en el primer acceso a un atributo."""
+
+    def __init__(self, nombre: str):
+        self.__dict__["_nombre"] = nombre
+        self.__dict__["_modulo"] = None
+
+    def _cargar(self):
+        modulo = self.__dict__["_modulo"]
+        if modulo is None:
+            # import_module ya serializa importaciones concurrentes del mismo módulo
+            modulo = importlib.import_module(self._nombre)
+            self.__dict__["_modulo"] = modulo
+        return modulo
+
+    def __getattr__(self, atributo: str) -> Any:
+        return getattr(self._cargar(), atributo)
+
+    def __setattr__(self, atributo: str, valor: Any) -> None:
+        setattr(self._cargar(), atributo, valor)
+
+    def __repr__(self) -> str:
+        estado = "cargado" if self.__dict__["_modulo"] is not None else "sin cargar"
+        return f"<módulo diferido {self._nombre!r} ({estado})>"
+
+
+def modulo_diferido(nombre: str) -> ModuloDiferido:
+    return ModuloDiferido(nombre)
+
+
+def funcion_diferida(modulo: str, nombre: str) -> Callable[..., Any]:
+    """Función `nombre` de `modulo`, importado en la primera llamada."""
+    diferido = ModuloDiferido(modulo)
+
+    def llamar(*args, **kwargs):
+        return getattr(diferido, nombre)(*args, **kwargs)
+
+    llamar.__name__ = nombre
+    llamar.__qualname__ = f"{modulo}.{nombre}"
+    return llamar
+
+
+def disponible(nombre: str) -> bool:
+    """Si `nombre` se puede importar, sin importarlo (para los try/except ImportError de antes)."""
+    try:
+        return importlib.util.find_spec(nombre) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+# ---- Ganchos tras la importación ----
+
+_ganchos: Dict[str, List[Callable[[Any], None]]] = {}
+_ganchos_lock = threading.Lock()
+
+
+class _CargadorConGancho(importlib.abc.Loader):
+    def __init__(self, cargador, nombre: str):
+        self._cargador = cargador
+        self._nombre = nombre
+
+    def create_module(self, spec):
+        return self._cargador.create_module(spec)
+
+    def exec_module(self, modulo) -> None:
+        self._cargador.exec_module(modulo)
+        with _ganchos_lock:
+            pendientes = _ganchos.pop(self._nombre, [])
+        for funcion in pendientes:
+            try:
+                funcion(modulo)
+            except Exception as e:
+                logger.warning("gancho de importación de %s falló: %s", self._nombre, e)
+
+
+class _BuscadorConGancho(importlib.abc.MetaPathFinder):
+    """Envuelve el cargador de los módulos con ganchos pendientes."""
+
+    def find_spec(self, nombre, ruta, objetivo=None):
+        if nombre not in _ganchos:
+            return None
+        for buscador in sys.meta_path:
+            if buscador is self or not hasattr(buscador, "find_spec"):
+                continue
+            spec = buscador.find_spec(nombre, ruta, objetivo)
+            if spec is not None:
+                if spec.loader is not None:
+                    spec.loader = _CargadorConGancho(spec.loader, nombre)
+                return spec
+        return None
+
+
+_buscador = _BuscadorConGancho()
+
+
+def al_importar(nombre: str, funcion: Callable[[Any], None]) -> None:
+    """Corre funcion(modulo) tras la primera importación de `nombre`, o ya si estaba importado."""
+    with _ganchos_lock:
+        modulo = sys.modules.get(nombre)
+        if modulo is None:
+            _ganchos.setdefault(nombre, []).append(funcion)
+            if _buscador not in sys.meta_path:
+                sys.meta_path.insert(0, _buscador)
+            return
+    funcion(modulo)
+
+
+# ---- Precalentamiento ----
+
+_precalentamiento: Dict[str, Any] = {"estado": "inactivo"}
+
+
+def precalentar(modulos: Iterable[str] = DIFERIDOS, extras: Iterable[Callable[[], Any]] = ()) -> Dict[str, Any]:
+    """Importa `modulos` y corre `extras` (p. ej. cargar modelos); devuelve qué se cargó y cuánto tardó."""
+    inicio = time.perf_counter()
+    cargados, no_instalados, errores = [], [], {}
+    for nombre in modulos:
+        # Los opcionales (sklearn, ...) pueden no estar instalados
+        if not disponible(nombre.split(".")[0]):
+            no_instalados.append(nombre)
+            continue
+        try:
+            importlib.import_module(nombre)
+            cargados.append(nombre)
+        except Exception as e:
+            errores[nombre] = f"{type(e).__name__}: {e}"
+    for extra in extras:
+        nombre = getattr(extra, "__name__", repr(extra))
+        try:
+            extra()
+            cargados.append(nombre)
+        except Exception as e:
+            errores[nombre] = f"{type(e).__name__}: {e}"
+    return {
+        "cargados": cargados,
+        "no_instalados": no_instalados,
+        "errores": errores,
+        "duracion_s": round(time.perf_counter() - inicio, 2),
+    }
+
+
+def _registrar(resultado: Dict[str, Any], modo: str) -> None:
+    _precalentamiento.update(resultado, estado="listo", modo=modo)
+    logger.info("precalentamiento (%s): %d cargados en %.2f s, %d errores", modo,
+                len(resultado["cargados"]), resultado["duracion_s"], len(resultado["errores"]))
+    for nombre, error in resultado["errores"].items():
+        logger.warning("precalentamiento de %s falló: %s", nombre, error)
+
+
+def precalentar_ya(modulos: Iterable[str] = DIFERIDOS, extras: Iterable[Callable[[], Any]] = (),
+                   modo: str = "sincrono") -> Dict[str, Any]:
+    """
+    precalentar() en este hilo, registrando el estado.
+
+    Para el maestro de gunicorn: los workers que se bifurcan después heredan los
+    módulos cargados y el estado "listo", y su lifespan ya no lanza el hilo.
+    """
+    _precalentamiento["estado"] = "en_curso"
+    resultado = precalentar(modulos, extras)
+    _registrar(resultado, modo)
+    return resultado
+
+
+def precalentar_en_segundo_plano(modulos: Iterable[str] = DIFERIDOS,
+                                 extras: Iterable[Callable[[], Any]] = ()) -> Optional[threading.Thread]:
+    """Lanza precalentar() en un hilo daemon; el estado queda en estado_precalentamiento()."""
+    if _precalentamiento["estado"] != "inactivo":
+        return None
+    _precalentamiento["estado"] = "en_curso"
+    modulos, extras = list(modulos), list(extras)
+
+    def correr():
+        _registrar(precalentar(modulos, extras), "segundo_plano")
+
+    hilo = threading.Thread(target=correr, name="precalentamiento", daemon=True)
+    hilo.start()
+    return hilo
+
+
+def estado_precalentamiento() -> Dict[str, Any]:
+    return dict(_precalentamiento)
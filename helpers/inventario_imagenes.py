@@ -0,0 +1,272 @@
+"""
+Inventario de imágenes embebidas en un PDF, compartido entre detectores.
+
+Cada XObject de imagen se decodifica una sola vez (clave: objgen/xref) y su
+hash perceptual, estadísticas y detección de parche se reutilizan en todas las
+páginas que lo referencian. Así un RIDE con el mismo logo en cada página no
+vuelve a decodificarlo, y riesgo.py y deteccion_texto_superpuesto leen del
+mismo inventario en lugar de recorrer las imágenes cada uno por su lado.
+"""
+
+import io
+import re
+import hashlib
+from typing import Dict, Any, List, Optional, Tuple
+
+import fitz
+import numpy as np
+from PIL import Image
+
+from .type_conversion import ensure_python_bool
+from .importacion_diferida import modulo_diferido
+
+pikepdf = modulo_diferido("pikepdf")
+imagehash = modulo_diferido("imagehash")
+
+
+def _sha256(b: bytes) -> str:
+    """Calcula SHA256 de bytes"""
+    return hashlib.sha256(b).hexdigest()
+
+
+def _png_from_pdf_image(img_bytes: bytes, color_space: str = None) -> Image.Image:
+    """Convierte bytes de imagen del PDF a PIL Image"""
+    # Pillow suele abrir bien JPEG/JPX/Flate ya decodificados por PyMuPDF.
+    return Image.open(io.BytesIO(img_bytes)).convert("RGBA")
+
+
+def _detectar_parche_sospechoso(pil_img: Image.Image, img_array: np.ndarray) -> bool:
+    """
+    Detecta si una imagen es un parche sospechoso que podría ocultar texto.
+
+    Criterios:
+    - Imagen muy pequeña (posible parche)
+    - Colores uniformes (posible fondo para tapar)
+    - Bordes rectangulares perfectos
+    """
+    try:
+        # Criterio 1: Tamaño muy pequeño
+        if pil_img.width < 50 or pil_img.height < 50:
+            return True
+
+        # Criterio 2: Variación de color muy baja (imagen uniforme)
+        if len(img_array.shape) == 3:
+            color_variance = np.var(img_array, axis=(0, 1))
+            if np.mean(color_variance) < 10:  # Muy poca variación de color
+                return True
+
+        # Criterio 3: Bordes perfectamente rectangulares
+        if _tiene_bordes_rectangulares(img_array):
+            return True
+
+        return False
+
+    except:
+        return False
+
+
+def _tiene_bordes_rectangulares(img_array: np.ndarray) -> bool:
+    """Detecta si la imagen tiene bordes perfectamente rectangulares"""
+    try:
+        if len(img_array.shape) == 3:
+            # Convertir a escala de grises para análisis de bordes
+            gray = np.mean(img_array, axis=2)
+        else:
+            gray = img_array
+
+        # Detectar bordes usando gradientes
+        grad_x = np.abs(np.diff(gray, axis=1))
+        grad_y = np.abs(np.diff(gray, axis=0))
+
+        # Si hay muchos bordes rectos, es sospechoso
+        straight_edges_x = np.sum(grad_x > 50) / grad_x.size
+        straight_edges_y = np.sum(grad_y > 50) / grad_y.size
+
+        return ensure_python_bool(straight_edges_x > 0.1 or straight_edges_y > 0.1)
+
+    except:
+        return False
+
+
+def _buscar_bbox_correspondiente(name: str, block_bboxes: List) -> List[float]:
+    """Busca el bbox correspondiente a una imagen en los bloques de texto"""
+    # Por ahora retorna bbox vacío, se puede mejorar con más lógica
+    return [0, 0, 0, 0]
+
+
+def _determinar_orden_capa(name: str, xobjects: dict) -> int:
+    """Determina el orden de capa de una imagen (aproximado)"""
+    # Por ahora retorna orden basado en el nombre, se puede mejorar
+    try:
+        # Extraer número del nombre si existe
+        numbers = re.findall(r'\d+', str(name))
+        if numbers:
+            return int(numbers[0])
+        return 0
+    except:
+        return 0
+
+
+class InventarioImagenes:
+    """
+    Inventario perezoso de imágenes de un PDF.
+
+    - colocaciones(pno): imágenes colocadas en la página (xref, tamaño, filtro, bbox)
+    - pagina(pno): inventario con hashes/estadísticas en el formato de inventariar_imagenes
+
+    Los datos por XObject se calculan una vez y se reutilizan entre páginas.
+    Sin pdf_bytes (solo con doc) únicamente está disponible colocaciones().
+    """
+
+    def __init__(self, pdf_bytes: Optional[bytes], doc: Optional[fitz.Document] = None):
+        self.pdf_bytes = pdf_bytes
+        self._doc = doc
+        self._doc_propio = False
+        self._pdf: Optional[pikepdf.Pdf] = None
+        self._por_objgen: Dict[Tuple[int, int], Optional[Dict[str, Any]]] = {}
+        self._colocaciones: Dict[int, List[Dict[str, Any]]] = {}
+        self._paginas: Dict[int, Dict[str, Any]] = {}
+        self.decodificadas = 0
+        self.reutilizadas = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    @property
+    def doc(self) -> fitz.Document:
+        if self._doc is None:
+            self._doc = fitz.open(stream=self.pdf_bytes, filetype="pdf")
+            self._doc_propio = True
+        return self._doc
+
+    @property
+    def pdf(self) -> "pikepdf.Pdf":
+        if self._pdf is None:
+            self._pdf = pikepdf.open(io.BytesIO(self.pdf_bytes))
+        return self._pdf
+
+    def cerrar(self) -> None:
+        """Libera los documentos abiertos por el inventario."""
+        if self._pdf is not None:
+            self._pdf.close()
+            self._pdf = None
+        if self._doc_propio and self._doc is not None:
+            self._doc.close()
+            self._doc = None
+            self._doc_propio = False
+
+    def colocaciones(self, page_idx: int) -> List[Dict[str, Any]]:
+        """Imágenes colocadas en una página según PyMuPDF (sin decodificar píxeles)."""
+        if page_idx in self._colocaciones:
+            return self._colocaciones[page_idx]
+
+        page = self.doc.load_page(page_idx)
+        bbox_by_xref = {}
+        for info in page.get_image_info(xrefs=True):
+            xref = info.get("xref")
+            bbox = info.get("bbox")
+            if xref and bbox:
+                bbox_by_xref[xref] = bbox
+
+        items = []
+        for img in page.get_images(full=True):
+            xref = img[0]
+            items.append({
+                "xref": xref,
+                "width": img[2],
+                "height": img[3],
+                "name": img[7],
+                "filter": img[-1] if isinstance(img[-1], str) and img[-1] else None,
+                "bbox": bbox_by_xref.get(xref),
+            })
+
+        self._colocaciones[page_idx] = items
+        return items
+
+    def _datos_xobject(self, xobj) -> Optional[Dict[str, Any]]:
+        """Decodifica un XObject de imagen y calcula hash y estadísticas (una vez por objgen)."""
+        objgen = tuple(xobj.objgen)
+        cacheable = objgen != (0, 0)
+        if cacheable and objgen in self._por_objgen:
+            self.reutilizadas += 1
+            return self._por_objgen[objgen]
+
+        datos = None
+        try:
+            # Extraer bytes de la imagen
+            img_bytes = bytes(xobj.read_bytes())
+
+            # Convertir a PIL Image
+            pil_img = _png_from_pdf_image(img_bytes)
+
+            # Estadísticas de la imagen
+            img_array = np.array(pil_img)
+
+            datos = {
+                "xref": str(xobj.objgen),
+                "bytes": len(img_bytes),
+                "sha256": _sha256(img_bytes),
+                "phash": str(imagehash.phash(pil_img)),
+                "mean": float(np.mean(img_array)),
+                "var": float(np.var(img_array)),
+                "is_patch": _detectar_parche_sospechoso(pil_img, img_array),
+                "width": pil_img.width,
+                "height": pil_img.height,
+                "format": pil_img.format
+            }
+            self.decodificadas += 1
+        except Exception:
+            # Si hay error procesando una imagen específica, se omite
+            datos = None
+
+        if cacheable:
+            self._por_objgen[objgen] = datos
+        return datos
+
+    def pagina(self, page_idx: int) -> Dict[str, Any]:
+        """Inventario de imágenes de una página con hashes y estadísticas."""
+        if page_idx in self._paginas:
+            return self._paginas[page_idx]
+
+        out = {
+            "page": page_idx + 1,
+            "streams": 0,
+            "images": []  # [{name,xref,bbox,layer_order,bytes,sha256,phash,mean,var,is_patch}]
+        }
+
+        # BBoxes donde el motor de texto ve imágenes (orden de pintura)
+        block_bboxes = [c["bbox"] for c in self.colocaciones(page_idx) if c.get("bbox")]
+
+        page_obj = self.pdf.pages[page_idx]
+        resources = page_obj.get("/Resources", {})
+        xobjects = resources.get("/XObject", {})
+        out["streams"] = len(xobjects)
+
+        for name, xobj in xobjects.items():
+            if xobj.get("/Subtype") != "/Image":
+                continue
+            datos = self._datos_xobject(xobj)
+            if datos is None:
+                continue
+            img_info = {
+                "name": str(name),
+                "xref": datos["xref"],
+                "bbox": _buscar_bbox_correspondiente(name, block_bboxes),
+                "layer_order": _determinar_orden_capa(name, xobjects),
+            }
+            img_info.update({k: v for k, v in datos.items() if k != "xref"})
+            out["images"].append(img_info)
+
+        self._paginas[page_idx] = out
+        return out
+
+    def resumen(self) -> Dict[str, Any]:
+        """Contadores de reutilización del inventario."""
+        return {
+            "imagenes_unicas": sum(1 for d in self._por_objgen.values() if d is not None),
+            "decodificadas": self.decodificadas,
+            "reutilizadas": self.reutilizadas,
+        }
@@ -7,16 +7,23 @@ import os
 import sys
 import json
 import hashlib
+import threading
 from dataclasses import dataclass, asdict
 from typing import List, Optional, Dict, Any, Tuple
 
 from PIL import Image, ImageOps, ImageFilter
-import pytesseract
-from pyzbar.pyzbar import decode as zbar_decode, ZBarSymbol
-import cv2
 import numpy as np
 from dateutil import parser as dtparser
 
+from .perfilado import perfilable
+from .clave_acceso import escanear_claves
+from .importacion_diferida import modulo_diferido
+from config import EASYOCR_GPU, EASYOCR_LANGS
+
+pytesseract = modulo_diferido("pytesseract")
+pyzbar = modulo_diferido("pyzbar.pyzbar")
+cv2 = modulo_diferido("cv2")
+
 # ============== Validador SRI y Extractor Robusto ==============
 
 # 1) Validador SRI (módulo 11)
@@ -211,46 +218,21 @@ AUTH_HDR = re.compile(r'(?:N[ÚU]MERO\s+DE\s+AUTORIZACI[ÓO]N|AUTORIZACI[ÓO]N|C
 def extract_sri_access_key(ocr_text: str) -> str | None:
     t = _norm_ocr_text(ocr_text)
 
-    candidates = []
+    # Escaneo lineal: la mejor ubicada (alineada, cerca del encabezado) y, entre iguales, con DV válido
+    candidatos = escanear_claves(t, etiquetas=AUTH_HDR, ventana_etiqueta=300)
 
-    # --- Buscar en la ventana posterior al encabezado ---
-    m = AUTH_HDR.search(t)
-    if m:
-        # toma las siguientes ~3–4 líneas (200–300 chars suelen bastar)
-        window = t[m.end(): m.end()+300]
-        # secuencias de 44–50 dígitos permitiendo separadores (espacios, - o .)
-        candidates += re.findall(r'(?:\d[\s\-.]{0,2}){44,50}', window)
-
-        # también juntar explícitamente las primeras líneas después del header
-        next_lines = '\n'.join(t[m.end():].splitlines()[:4])
-        candidates += re.findall(r'(?:\d[\s\-.]{0,2}){44,50}', next_lines)
-
-    # --- Búsqueda global por si el OCR separó mucho ---
-    candidates += re.findall(r'(?:\d[\s\-.]{0,2}){44,50}', t)
-
-    # Normaliza a solo dígitos y ordena por longitud (mayor primero)
-    cleaned = [''.join(re.findall(r'\d', c)) for c in candidates]
-    cleaned = [c for c in cleaned if len(c) >= 44]
-    cleaned.sort(key=len, reverse=True)
-
-    print(f"🔍 Candidatos encontrados: {len(cleaned)}")
-    for i, c in enumerate(cleaned[:3]):  # Mostrar los primeros 3 candidatos
-        print(f"   {i+1}. {c} (len: {len(c)})")
-
-    # 1) Intenta claves de 49 con DV válido
-    for c in cleaned:
-        for i in range(0, len(c) - 48):          # ventanas de 49 dentro del candidato
-            key = c[i:i+49]
-            if validate_sri_access_key(key):
-                print(f"✅ Clave válida encontrada: {key}")
-                return key
-
-    # 2) Fallback: si no hay DV válido, devuelve la mejor (recortada a 49)
-    if cleaned:
-        best = cleaned[0]
-        result = best[:49] if len(best) >= 49 else None
-        print(f"⚠️  Usando mejor candidato (sin validación): {result}")
-        return result
+    print(f"🔍 Candidatos encontrados: {len(candidatos)}")
+    for i, c in enumerate(candidatos[:3]):  # Mostrar los primeros 3 candidatos
+        print(f"   {i+1}. {c.clave} (DV válido: {c.valida})")
+
+    if candidatos and candidatos[0].valida:
+        print(f"✅ Clave válida encontrada: {candidatos[0].clave}")
+        return candidatos[0].clave
+
+    # Fallback: si no hay DV válido, devuelve la mejor ubicada
+    if candidatos:
+        print(f"⚠️  Usando mejor candidato (sin validación): {candidatos[0].clave}")
+        return candidatos[0].clave
 
     print("❌ No se encontraron candidatos válidos")
     return None
@@ -258,16 +240,13 @@ def extract_sri_access_key(ocr_text: str) -> str | None:
 # 4) Extracción de clave de acceso desde códigos de barras
 def extract_access_key_from_barcode(img_bytes: bytes) -> str | None:
     """Extrae clave de acceso desde códigos de barras (Code128/PDF417/Code39)."""
-    if zbar_decode is None:
-        return None
-    
     try:
         img = Image.open(io.BytesIO(img_bytes))
         # Convertir a escala de grises mejora la lectura
         img = img.convert('L')
         
         # Decodificar con múltiples símbolos
-        dec = zbar_decode(img, symbols=[ZBarSymbol.CODE128, ZBarSymbol.PDF417, ZBarSymbol.CODE39])
+        dec = pyzbar.decode(img, symbols=[pyzbar.ZBarSymbol.CODE128, pyzbar.ZBarSymbol.PDF417, pyzbar.ZBarSymbol.CODE39])
         
         cands = []
         for d in dec:
@@ -371,7 +350,7 @@ def decode_barcode_strong(pil_img: Image.Image) -> list[dict]:
             else:  # 270
                 rot_mat = cv2.rotate(resized, cv2.ROTATE_90_COUNTERCLOCKWISE)
             
-            for s in zbar_decode(rot_mat):
+            for s in pyzbar.decode(rot_mat):
                 data = s.data.decode("utf-8", "ignore")
                 if data.isdigit():
                     outs.append({
@@ -516,11 +495,25 @@ def ocr_lines_with_conf(pil_img: Image.Image) -> str:
         print(f"Error en OCR por líneas: {e}")
         return ""
 
+_lector_easyocr = None
+_lector_easyocr_lock = threading.Lock()
+
+
+def lector_easyocr():
+    """Lector de EasyOCR compartido: cargar el modelo (torch) cuesta segundos, se hace una vez por proceso."""
+    global _lector_easyocr
+    if _lector_easyocr is None:
+        with _lector_easyocr_lock:
+            if _lector_easyocr is None:
+                import easyocr
+                _lector_easyocr = easyocr.Reader(EASYOCR_LANGS, gpu=EASYOCR_GPU)
+    return _lector_easyocr
+
+
 def easyocr_text(pil_img: Image.Image) -> str:
     """Fallback con EasyOCR si Tesseract falla"""
     try:
-        import easyocr
-        reader = easyocr.Reader(['es', 'en'], gpu=False)
+        reader = lector_easyocr()
         np_img = np.array(flatten_rgba_to_white(pil_img))
         res = reader.readtext(np_img, detail=0, paragraph=True)
         return "\n".join(res)
@@ -779,6 +772,7 @@ def financial_checks(totals: Totals, items: List[ItemLine]) -> Dict[str, Any]:
 
 # ============== Pipeline principal ==============
 
+@perfilable
 def parse_capture_from_bytes(image_bytes: bytes, filename: str = "capture.png", tesseract_lang: str = "spa") -> ParseResult:
     """Parsea una factura desde bytes de imagen"""
     # Datos técnicos
@@ -0,0 +1,412 @@
+"""
+Métricas en formato de exposición de Prometheus (texto 0.0.4).
+
+Contadores e histogramas con etiquetas, más recolectores que se evalúan al
+momento de exponer (profundidad de colas, cachés, memoria). Sin dependencias
+externas.
+
+Cada proceso cuenta en memoria y, con METRICAS_DB, publica cada
+METRICAS_PUBLICACION_SEGUNDOS en una base SQLite compartida por los workers:
+los contadores e histogramas como incrementos sobre un total común (siguen
+creciendo aunque un worker se recicle) y los gauges como el último valor de
+cada proceso, con la etiqueta `pid`. /metrics responde lo mismo desde
+cualquier worker, con a lo sumo un intervalo de atraso para los demás.
+
+    peticiones.inc(metodo="POST", ruta="/validar-factura", status="200")
+    duracion_etapa.observar(0.42, etapa="sri")
+    registro.recolector(lambda: [("cola", "gauge", "Trabajos en cola", [({}, 3)])])
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from config import METRICAS_DB, METRICAS_PUBLICACION_SEGUNDOS
+
+try:
+    import resource
+except ImportError:
+    # Windows (desarrollo con uvicorn): sin memoria ni CPU del proceso
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# Buckets en segundos: de 5 ms a 2 minutos
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+Etiquetas = Tuple[Tuple[str, str], ...]
+# (nombre, tipo, ayuda, [(etiquetas, valor)])
+Muestra = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+# (sufijo, etiquetas, valor): "_bucket", "_sum", "_count" o "" para una serie de la familia
+Serie = Tuple[str, Etiquetas, float]
+# (nombre, tipo, ayuda, series)
+Familia = Tuple[str, str, str, List[Serie]]
+
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _formatear_etiquetas(etiquetas: Iterable[Tuple[str, str]]) -> str:
+    partes = [f'{k}="{_escapar(v)}"' for k, v in etiquetas]
+    return "{" + ",".join(partes) + "}" if partes else ""
+
+
+def _formatear_valor(valor: float) -> str:
+    if valor == float("inf"):
+        return "+Inf"
+    if float(valor).is_integer():
+        return str(int(valor))
+    return repr(float(valor))
+
+
+def _formatear(familias: Iterable[Familia]) -> str:
+    lineas: List[str] = []
+    for nombre, tipo, ayuda, series in familias:
+        lineas.append(f"# HELP {nombre} {ayuda}")
+        lineas.append(f"# TYPE {nombre} {tipo}")
+        for sufijo, etiquetas, valor in series:
+            lineas.append(f"{nombre}{sufijo}{_formatear_etiquetas(etiquetas)} {_formatear_valor(valor)}")
+    return "\n".join(lineas) + "\n"
+
+
+class Contador:
+    """Contador monótono con etiquetas."""
+
+    tipo = "counter"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Tuple[str, ...] = ()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self._valores: Dict[Etiquetas, float] = {}
+        self._lock = threading.Lock()
+
+    def _clave(self, etiquetas: Dict[str, str]) -> Etiquetas:
+        return tuple((k, str(etiquetas.get(k, ""))) for k in self.etiquetas)
+
+    def inc(self, valor: float = 1, **etiquetas) -> None:
+        clave = self._clave(etiquetas)
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + valor
+
+    def series(self) -> List[Serie]:
+        with self._lock:
+            valores = sorted(self._valores.items())
+        return [("", k, v) for k, v in valores]
+
+
+class Histograma(Contador):
+    """Histograma acumulado (buckets, _sum y _count) con etiquetas."""
+
+    tipo = "histogram"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = BUCKETS_SEGUNDOS):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.buckets = tuple(sorted(buckets))
+        # etiquetas -> [conteos por bucket (no acumulados) + desborde, suma]
+        self._series: Dict[Etiquetas, list] = {}
+
+    def observar(self, valor: float, **etiquetas) -> None:
+        clave = self._clave(etiquetas)
+        indice = bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(clave)
+            if serie is None:
+                serie = self._series[clave] = [[0] * (len(self.buckets) + 1), 0.0]
+            serie[0][indice] += 1
+            serie[1] += valor
+
+    def series(self) -> List[Serie]:
+        with self._lock:
+            series = sorted((k, (list(c), s)) for k, (c, s) in self._series.items())
+        resultado: List[Serie] = []
+        for clave, (conteos, suma) in series:
+            acumulado = 0
+            for limite, n in zip(self.buckets + (float("inf"),), conteos):
+                acumulado += n
+                resultado.append(("_bucket", clave + (("le", _formatear_valor(limite)),), acumulado))
+            resultado.append(("_sum", clave, round(suma, 6)))
+            resultado.append(("_count", clave, acumulado))
+        return resultado
+
+
+class Registro:
+    """Conjunto de métricas y recolectores del proceso."""
+
+    def __init__(self):
+        self._metricas: List[Contador] = []
+        self._recolectores: List[Callable[[], Iterable[Muestra]]] = []
+
+    def contador(self, nombre: str, ayuda: str, etiquetas: Tuple[str, ...] = ()) -> Contador:
+        metrica = Contador(nombre, ayuda, etiquetas)
+        self._metricas.append(metrica)
+        return metrica
+
+    def histograma(self, nombre: str, ayuda: str, etiquetas: Tuple[str, ...] = (),
+                   buckets: Tuple[float, ...] = BUCKETS_SEGUNDOS) -> Histograma:
+        metrica = Histograma(nombre, ayuda, etiquetas, buckets)
+        self._metricas.append(metrica)
+        return metrica
+
+    def recolector(self, funcion: Callable[[], Iterable[Muestra]]) -> Callable:
+        """Registra una función que devuelve muestras calculadas al exponer."""
+        self._recolectores.append(funcion)
+        return funcion
+
+    def familias(self, recolectores: bool = True) -> List[Familia]:
+        """Valores actuales de este proceso: métricas y, si se piden, recolectores."""
+        familias: List[Familia] = [(m.nombre, m.tipo, m.ayuda, m.series()) for m in self._metricas]
+        for funcion in self._recolectores if recolectores else ():
+            try:
+                muestras = list(funcion())
+            except Exception:
+                continue
+            for nombre, tipo, ayuda, valores in muestras:
+                series = [("", tuple(sorted(e.items())), v) for e, v in valores if v is not None]
+                familias.append((nombre, tipo, ayuda, series))
+        return familias
+
+    def exponer(self) -> str:
+        """Solo las métricas de este proceso."""
+        return _formatear(self.familias())
+
+
+_ORDEN_SUFIJO = {"_sum": 1, "_count": 2}
+
+
+def _orden_serie(serie: Serie):
+    # Las series de un histograma juntas: buckets por `le` creciente, luego _sum y _count
+    sufijo, etiquetas, _ = serie
+    le = next((float(v) for k, v in etiquetas if k == "le"), 0.0)
+    return tuple(p for p in etiquetas if p[0] != "le"), _ORDEN_SUFIJO.get(sufijo, 0), le
+
+
+class AlmacenMetricas:
+    """Métricas publicadas por los procesos del servidor, en SQLite."""
+
+    def __init__(self, ruta: str = METRICAS_DB):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(ruta, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # Contadores e histogramas: un total común al que cada proceso suma lo que creció
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS acumulados (
+                familia TEXT NOT NULL,
+                sufijo TEXT NOT NULL,
+                etiquetas TEXT NOT NULL,
+                tipo TEXT NOT NULL,
+                ayuda TEXT NOT NULL,
+                valor REAL NOT NULL,
+                PRIMARY KEY (familia, sufijo, etiquetas)
+            )
+        """)
+        # Gauges: el último valor de cada proceso vivo
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS instantaneos (
+                dueno TEXT NOT NULL,
+                pid INTEGER NOT NULL,
+                familia TEXT NOT NULL,
+                etiquetas TEXT NOT NULL,
+                tipo TEXT NOT NULL,
+                ayuda TEXT NOT NULL,
+                valor REAL NOT NULL,
+                latido REAL NOT NULL,
+                PRIMARY KEY (dueno, familia, etiquetas)
+            )
+        """)
+
+    def publicar(self, dueno: str, incrementos: List[tuple], instantaneos: List[tuple], vencido: float) -> None:
+        """
+        Suma los incrementos y reemplaza los gauges de `dueno` en una transacción.
+
+        incrementos: (familia, sufijo, etiquetas JSON, tipo, ayuda, incremento)
+        instantaneos: (dueno, pid, familia, etiquetas JSON, tipo, ayuda, valor, latido)
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany("""
+                    INSERT INTO acumulados (familia, sufijo, etiquetas, tipo, ayuda, valor) VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (familia, sufijo, etiquetas)
+                    DO UPDATE SET valor = valor + excluded.valor, tipo = excluded.tipo, ayuda = excluded.ayuda
+                """, incrementos)
+                # Los gauges de procesos que dejaron de publicar (caídos) se descartan
+                self._conn.execute("DELETE FROM instantaneos WHERE dueno = ? OR latido < ?", (dueno, vencido))
+                self._conn.executemany("INSERT INTO instantaneos VALUES (?, ?, ?, ?, ?, ?, ?, ?)", instantaneos)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def retirar(self, dueno: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM instantaneos WHERE dueno = ?", (dueno,))
+
+    def familias(self, vencido: float) -> List[Familia]:
+        """Totales de todos los procesos y gauges de los que publicaron después de `vencido`."""
+        with self._lock:
+            acumulados = self._conn.execute(
+                "SELECT familia, tipo, ayuda, sufijo, etiquetas, valor FROM acumulados").fetchall()
+            instantaneos = self._conn.execute(
+                "SELECT familia, tipo, ayuda, pid, etiquetas, valor FROM instantaneos WHERE latido >= ?",
+                (vencido,)).fetchall()
+        familias: Dict[str, Familia] = {}
+        for familia, tipo, ayuda, sufijo, etiquetas, valor in acumulados:
+            serie = (sufijo, tuple(tuple(p) for p in json.loads(etiquetas)), valor)
+            familias.setdefault(familia, (familia, tipo, ayuda, []))[3].append(serie)
+        for familia, tipo, ayuda, pid, etiquetas, valor in instantaneos:
+            serie = ("", tuple(tuple(p) for p in json.loads(etiquetas)) + (("pid", str(pid)),), valor)
+            familias.setdefault(familia, (familia, tipo, ayuda, []))[3].append(serie)
+        for _, _, _, series in familias.values():
+            series.sort(key=_orden_serie)
+        return [familias[nombre] for nombre in sorted(familias)]
+
+
+class MetricasCompartidas:
+    """
+    Publica las métricas de este proceso en METRICAS_DB y expone las de todos.
+
+    Sin METRICAS_DB, /metrics devuelve solo las del proceso que atendió.
+    """
+
+    def __init__(self, registro: "Registro", ruta: str = METRICAS_DB,
+                 intervalo: float = METRICAS_PUBLICACION_SEGUNDOS):
+        self.registro = registro
+        self.ruta = ruta
+        self.intervalo = intervalo
+        self._lock = threading.Lock()
+        # (familia, sufijo, etiquetas) -> último valor ya sumado al total común
+        self._publicado: Dict[Tuple[str, str, Etiquetas], float] = {}
+        # La conexión y el id no se heredan por fork: se abren por PID
+        self._proceso: Tuple[Optional[int], Optional[AlmacenMetricas], str] = (None, None, "")
+        self._detener = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+
+    def _almacen(self) -> Tuple[AlmacenMetricas, str]:
+        if self._proceso[0] != os.getpid():
+            self._proceso = (os.getpid(), AlmacenMetricas(self.ruta), uuid.uuid4().hex)
+        return self._proceso[1], self._proceso[2]
+
+    def iniciar(self) -> None:
+        """En cada worker, al arrancar: publica en segundo plano cada `intervalo` segundos."""
+        if not self.ruta or (self._hilo is not None and self._hilo.is_alive()):
+            return
+        # Lo contado en el maestro antes del fork ya no es de este proceso
+        with self._lock:
+            self._publicado = {
+                (nombre, sufijo, etiquetas): valor
+                for nombre, _, _, series in self.registro.familias(recolectores=False)
+                for sufijo, etiquetas, valor in series
+            }
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._bucle, name="metricas", daemon=True)
+        self._hilo.start()
+
+    def _bucle(self) -> None:
+        while not self._detener.wait(self.intervalo):
+            try:
+                self.publicar()
+            except Exception:
+                logger.warning("No se pudieron publicar las métricas en %s", self.ruta, exc_info=True)
+
+    def publicar(self) -> None:
+        """Suma al total común lo que creció desde la última publicación y renueva los gauges."""
+        familias = self.registro.familias()
+        ahora = time.time()
+        with self._lock:
+            almacen, dueno = self._almacen()
+            incrementos, instantaneos, nuevos = [], [], {}
+            for nombre, tipo, ayuda, series in familias:
+                for sufijo, etiquetas, valor in series:
+                    texto = json.dumps(etiquetas)
+                    if tipo == "gauge":
+                        instantaneos.append((dueno, os.getpid(), nombre, texto, tipo, ayuda, valor, ahora))
+                        continue
+                    clave = (nombre, sufijo, etiquetas)
+                    previo = self._publicado.get(clave, 0)
+                    # Un contador que bajó se reinició: cuenta desde cero
+                    incremento = valor - previo if valor >= previo else valor
+                    if incremento:
+                        incrementos.append((nombre, sufijo, texto, tipo, ayuda, incremento))
+                    nuevos[clave] = valor
+            almacen.publicar(dueno, incrementos, instantaneos, ahora - 3 * self.intervalo)
+            self._publicado.update(nuevos)
+
+    def exponer(self) -> str:
+        """Métricas de todos los procesos; las de este, al día."""
+        if not self.ruta:
+            return self.registro.exponer()
+        try:
+            self.publicar()
+            almacen, _ = self._almacen()
+            return _formatear(almacen.familias(time.time() - 3 * self.intervalo))
+        except sqlite3.Error:
+            logger.warning("No se pudo leer %s; se exponen solo las métricas de este proceso", self.ruta, exc_info=True)
+            return self.registro.exponer()
+
+    def detener(self) -> None:
+        """Al apagar el worker: última publicación y retiro de sus gauges."""
+        if self._hilo is None:
+            return
+        self._detener.set()
+        self._hilo = None
+        try:
+            self.publicar()
+            almacen, dueno = self._almacen()
+            almacen.retirar(dueno)
+        except sqlite3.Error:
+            logger.warning("No se pudieron publicar las métricas finales en %s", self.ruta, exc_info=True)
+
+
+registro = Registro()
+compartidas = MetricasCompartidas(registro)
+
+peticiones = registro.contador(
+    "api_forense_peticiones_total", "Peticiones HTTP atendidas", ("metodo", "ruta", "status"))
+duracion_peticion = registro.histograma(
+    "api_forense_peticion_segundos", "Duración de las peticiones HTTP", ("metodo", "ruta"))
+duracion_etapa = registro.histograma(
+    "api_forense_etapa_segundos", "Duración por etapa (sri, ocr, render, overlay, firmas, ...)", ("etapa",))
+documentos = registro.contador(
+    "api_forense_documentos_procesados_total", "Documentos procesados por tipo", ("tipo",))
+tesseract = registro.contador(
+    "api_forense_tesseract_llamadas_total", "Invocaciones al binario de Tesseract")
+
+_INICIO = time.time()
+
+
+def _reiniciar_inicio() -> None:
+    # Los workers de gunicorn se bifurcan del maestro: su inicio es el del fork
+    global _INICIO
+    _INICIO = time.time()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reiniciar_inicio)
+
+
+@registro.recolector
+def _proceso():
+    """Memoria residente, CPU y antigüedad del proceso."""
+    muestras = [("process_start_time_seconds", "gauge", "Inicio del proceso (epoch)", [({}, round(_INICIO, 3))])]
+    if resource is None:
+        return muestras
+    try:
+        with open("/proc/self/statm") as f:
+            rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # Sin /proc: pico de memoria (ru_maxrss en KB en Linux, bytes en macOS)
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    uso = resource.getrusage(resource.RUSAGE_SELF)
+    return [
+        ("process_resident_memory_bytes", "gauge", "Memoria residente del proceso", [({}, rss)]),
+        ("process_cpu_seconds_total", "counter", "CPU usada por el proceso", [({}, round(uso.ru_utime + uso.ru_stime, 3))]),
+    ] + muestras
@@ -0,0 +1,113 @@
+"""
+Nivel de detalle de las respuestas (detail=summary|standard|full) y máscara de campos.
+
+- summary: solo veredicto (score, nivel y hallazgos principales); las secciones
+  que no entran en el veredicto no se calculan
+- standard: respuesta completa sin volcados de depuración (contenido de streams,
+  comandos de texto completos, estructura interna del PDF)
+- full: todo, igual que antes
+
+La máscara (fields=riesgo.score,riesgo.nivel,...) recorta la respuesta a las
+rutas pedidas y además permite saltar el cálculo de secciones que no se piden.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from config import DETALLE_RESPUESTA
+
+RESUMEN = "summary"
+ESTANDAR = "standard"
+COMPLETO = "full"
+NIVELES = (RESUMEN, ESTANDAR, COMPLETO)
+
+# Descripciones de los parámetros de query ?detail= y ?fields=
+DESC_DETAIL = "Nivel de detalle: summary (score, nivel y hallazgos), standard o full"
+DESC_FIELDS = "Campos a devolver separados por coma, p. ej. riesgo.score,riesgo.nivel"
+
+# Cantidad de hallazgos que se devuelven en summary
+MAX_HALLAZGOS = 5
+
+
+class OpcionesRespuesta:
+    """Nivel de detalle y máscara de campos pedidos por el cliente."""
+
+    def __init__(self, detalle: Optional[str] = None, campos: Optional[str] = None):
+        detalle = (detalle or DETALLE_RESPUESTA).strip().lower()
+        if detalle not in NIVELES:
+            raise HTTPException(status_code=400, detail=f"detail debe ser uno de: {', '.join(NIVELES)}.")
+        self.detalle = detalle
+        self.rutas: Optional[List[Tuple[str, ...]]] = None
+        if campos:
+            self.rutas = [tuple(r.strip().split(".")) for r in campos.split(",") if r.strip()]
+
+    @property
+    def resumen(self) -> bool:
+        return self.detalle == RESUMEN
+
+    @property
+    def completo(self) -> bool:
+        return self.detalle == COMPLETO
+
+    def incluye(self, seccion: str) -> bool:
+        """True si la máscara pide la sección (o algo dentro de ella, o algo que la contiene)."""
+        if self.rutas is None:
+            return True
+        partes = tuple(seccion.split("."))
+        n = len(partes)
+        return any(r[:n] == partes or partes[:len(r)] == r for r in self.rutas)
+
+    def calcula(self, seccion: str) -> bool:
+        """True si hay que calcular una sección que no entra en el veredicto (no summary y pedida)."""
+        return not self.resumen and self.incluye(seccion)
+
+    def aplicar(self, contenido: Dict[str, Any]) -> Dict[str, Any]:
+        """Recorta el contenido a las rutas de la máscara (sin máscara lo devuelve tal cual)."""
+        if self.rutas is None:
+            return contenido
+        return _recortar(contenido, self.rutas)
+
+
+def _recortar(valor: Any, rutas: List[Tuple[str, ...]]) -> Any:
+    if any(len(r) == 0 for r in rutas):
+        return valor
+    if isinstance(valor, list):
+        return [_recortar(v, rutas) for v in valor]
+    if not isinstance(valor, dict):
+        return valor
+    salida = {}
+    for clave, sub in valor.items():
+        sub_rutas = [r[1:] for r in rutas if r[0] == clave]
+        if sub_rutas:
+            salida[clave] = _recortar(sub, sub_rutas)
+    return salida
+
+
+def hallazgos_principales(riesgo: Dict[str, Any], limite: int = MAX_HALLAZGOS) -> List[Dict[str, Any]]:
+    """Checks con penalización, de mayor a menor."""
+    checks = []
+    for grupo in ("prioritarias", "secundarias", "adicionales"):
+        for item in riesgo.get(grupo) or []:
+            penal = item.get("penalizacion") or 0
+            if penal > 0:
+                checks.append({"check": item.get("check"), "penalizacion": penal, "grupo": grupo})
+    checks.sort(key=lambda c: c["penalizacion"], reverse=True)
+    return checks[:limite]
+
+
+def resumir_riesgo(riesgo: Dict[str, Any]) -> Dict[str, Any]:
+    """Versión summary del bloque de riesgo."""
+    return {
+        "score": riesgo.get("score"),
+        "nivel": riesgo.get("nivel"),
+        "es_falso_probable": riesgo.get("es_falso_probable"),
+        "hallazgos": hallazgos_principales(riesgo),
+    }
+
+
+def respuesta_resumida(contenido: Dict[str, Any], campos: Tuple[str, ...]) -> Dict[str, Any]:
+    """Respuesta summary: los campos de veredicto indicados más el riesgo resumido."""
+    resumen = {k: contenido[k] for k in campos if k in contenido}
+    resumen["riesgo"] = resumir_riesgo(contenido.get("riesgo") or {})
+    return resumen
@@ -1,5 +1,7 @@
-import cv2
 import numpy as np
+from .importacion_diferida import modulo_diferido
+
+cv2 = modulo_diferido("cv2")
 
 def detectar_overlays_coloreados(img_bgr: np.ndarray, text_boxes: list = None) -> dict:
     """
@@ -0,0 +1,233 @@
+"""
+Ejecución de análisis por página en paralelo.
+
+Los documentos fitz no son thread-safe y PyMuPDF no libera el GIL, así que el
+paralelismo se hace con procesos: cada trabajador abre su propio documento a
+partir de los bytes compartidos y procesa un lote de páginas. Los resultados se
+devuelven en el mismo orden de las páginas pedidas, sin importar qué trabajador
+terminó primero.
+
+Uso:
+    resultados = mapear_paginas(pdf_bytes, [0, 1, 2], _mi_funcion_pagina)
+
+donde _mi_funcion_pagina(ctx, pno) es una función de nivel de módulo (para
+poder enviarla a otro proceso) que recibe un DocumentoCompartido.
+
+Para entregar resultados a medida que terminan (streaming) está iterar_paginas.
+
+Al pool va solo trabajo de render (rasterizar, comparar capas). El inventario
+de imágenes no: deduplica por objeto en todo el documento y lo comparten
+varios detectores del mismo proceso; un trabajador armaría el suyo y volvería
+a decodificar cada imagen repetida. Si el llamador pasa `inventario`,
+mapear_paginas corre en línea. Por lo mismo, los trabajadores renderizan sin
+caché de rasterizado (ver cache_rasterizado).
+
+Las peticiones perfiladas (helpers/perfilado) no usan el pool, para que el
+perfil vea el trabajo por página.
+
+Con gunicorn hay un pool por worker: en automático cada uno usa
+min(4, CPUs / workers) procesos (al_bifurcar fija los workers), no min(4, CPUs).
+"""
+
+import os
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import fitz
+
+from config import PARALELISMO_PAGINAS
+from .cache_rasterizado import cache as cache_rasterizado
+from .inventario_imagenes import InventarioImagenes
+from .perfilado import perfilando
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_en_trabajador = False
+# Procesos del servidor que comparten las CPUs (gunicorn: lo fija al_bifurcar)
+_procesos_servidor = 1
+
+
+class DocumentoCompartido:
+    """Acceso perezoso al documento (fitz) y al inventario de imágenes de un PDF."""
+
+    def __init__(self, pdf_bytes: Optional[bytes], doc: Optional[fitz.Document] = None,
+                 inventario: Optional[InventarioImagenes] = None):
+        self.pdf_bytes = pdf_bytes
+        self._doc = doc
+        self._doc_propio = False
+        self._inventario = inventario
+        self._inventario_propio = False
+
+    @property
+    def doc(self) -> fitz.Document:
+        if self._doc is None:
+            self._doc = fitz.open(stream=self.pdf_bytes, filetype="pdf")
+            self._doc_propio = True
+        return self._doc
+
+    @property
+    def inventario(self) -> InventarioImagenes:
+        if self._inventario is None:
+            self._inventario = InventarioImagenes(self.pdf_bytes, self.doc)
+            self._inventario_propio = True
+        return self._inventario
+
+    def cerrar(self) -> None:
+        if self._inventario_propio and self._inventario is not None:
+            self._inventario.cerrar()
+            self._inventario = None
+        if self._doc_propio and self._doc is not None:
+            self._doc.close()
+            self._doc = None
+
+
+def fijar_procesos_servidor(procesos: int) -> None:
+    """Workers del servidor entre los que se reparten las CPUs (antes de crear el pool)."""
+    global _procesos_servidor
+    _procesos_servidor = max(1, procesos)
+
+
+def _paralelismo_automatico() -> int:
+    from .servidor import cpus_disponibles
+    return min(4, max(1, cpus_disponibles() // _procesos_servidor))
+
+
+def grado_paralelismo(num_paginas: int, paralelismo: Optional[int] = None) -> int:
+    """Procesos a usar para num_paginas (1 = secuencial)."""
+    if perfilando():
+        # cProfile y tracemalloc solo ven este proceso: una petición perfilada corre en línea
+        return 1
+    if paralelismo is None:
+        paralelismo = PARALELISMO_PAGINAS
+    if paralelismo <= 0:
+        paralelismo = _paralelismo_automatico()
+    return max(1, min(paralelismo, num_paginas))
+
+
+def _marcar_trabajador() -> None:
+    global _en_trabajador
+    _en_trabajador = True
+    cache_rasterizado.fijar_presupuesto(0)
+
+
+def _obtener_pool() -> ProcessPoolExecutor:
+    """Pool de procesos compartido, creado en el primer uso."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=grado_paralelismo(os.cpu_count() or 1),  # tope: CPUs
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_marcar_trabajador,
+            )
+        return _pool
+
+
+def _descartar_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _procesar_lote(pdf_bytes: bytes, paginas: List[int], funcion: Callable) -> Dict[int, Any]:
+    """Trabajo de un proceso: abre su propio documento y procesa sus páginas."""
+    ctx = DocumentoCompartido(pdf_bytes)
+    try:
+        return {pno: funcion(ctx, pno) for pno in paginas}
+    finally:
+        ctx.cerrar()
+
+
+def _procesar_secuencial(pdf_bytes, paginas, funcion, doc, inventario) -> List[Any]:
+    ctx = DocumentoCompartido(pdf_bytes, doc, inventario)
+    try:
+        return [funcion(ctx, pno) for pno in paginas]
+    finally:
+        ctx.cerrar()
+
+
+def mapear_paginas(
+    pdf_bytes: Optional[bytes],
+    paginas: Iterable[int],
+    funcion: Callable[[DocumentoCompartido, int], Any],
+    doc: Optional[fitz.Document] = None,
+    inventario: Optional[InventarioImagenes] = None,
+    paralelismo: Optional[int] = None,
+) -> List[Any]:
+    """
+    Aplica funcion(ctx, pno) a cada página y devuelve los resultados en el orden de `paginas`.
+
+    Con una sola página, paralelismo 1, sin bytes, con `inventario` o dentro de
+    un trabajador se ejecuta en línea reutilizando `doc` e `inventario` del
+    llamador. Si el pool de procesos falla, se reintenta en secuencia.
+    """
+    paginas = list(paginas)
+    n = grado_paralelismo(len(paginas), paralelismo)
+    if n <= 1 or pdf_bytes is None or inventario is not None or _en_trabajador:
+        return _procesar_secuencial(pdf_bytes, paginas, funcion, doc, inventario)
+
+    # Lotes intercalados para repartir páginas pesadas entre trabajadores
+    lotes = [paginas[i::n] for i in range(n)]
+    try:
+        pool = _obtener_pool()
+        futuros = [pool.submit(_procesar_lote, bytes(pdf_bytes), lote, funcion) for lote in lotes]
+        por_pagina: Dict[int, Any] = {}
+        for futuro in futuros:
+            por_pagina.update(futuro.result())
+    except (BrokenProcessPool, OSError):
+        _descartar_pool()
+        return _procesar_secuencial(pdf_bytes, paginas, funcion, doc, inventario)
+
+    return [por_pagina[pno] for pno in paginas]
+
+
+def iterar_paginas(
+    pdf_bytes: bytes,
+    paginas: Iterable[int],
+    funcion: Callable[[DocumentoCompartido, int], Any],
+    paralelismo: Optional[int] = None,
+) -> Iterator[Tuple[int, Any]]:
+    """
+    Como mapear_paginas, pero entrega (pno, resultado) apenas está listo, en el orden de `paginas`.
+
+    Cada página es una tarea independiente y hay a lo sumo 2 páginas en vuelo por
+    proceso, así que la memoria no crece con el tamaño del documento. Si el pool
+    de procesos falla, las páginas que faltan se procesan en secuencia.
+    """
+    paginas = list(paginas)
+    n = grado_paralelismo(len(paginas), paralelismo)
+    entregadas = 0
+    if n > 1 and not _en_trabajador:
+        datos = bytes(pdf_bytes)
+        en_vuelo: deque = deque()
+        try:
+            pool = _obtener_pool()
+            siguiente = 0
+            while entregadas < len(paginas):
+                while siguiente < len(paginas) and len(en_vuelo) < 2 * n:
+                    pno = paginas[siguiente]
+                    en_vuelo.append((pno, pool.submit(_procesar_lote, datos, [pno], funcion)))
+                    siguiente += 1
+                pno, futuro = en_vuelo.popleft()
+                resultado = futuro.result()[pno]
+                entregadas += 1
+                yield pno, resultado
+        except (BrokenProcessPool, OSError):
+            _descartar_pool()
+        finally:
+            for _, futuro in en_vuelo:
+                futuro.cancel()
+
+    if entregadas < len(paginas):
+        ctx = DocumentoCompartido(pdf_bytes)
+        try:
+            for pno in paginas[entregadas:]:
+                yield pno, funcion(ctx, pno)
+        finally:
+            ctx.cerrar()
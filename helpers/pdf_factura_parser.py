@@ -9,22 +9,19 @@ Incluye OCR, corrección de errores comunes y validación SRI
 import re
 import io
 import fitz
-import numpy as np
-import cv2
 from datetime import datetime
 from typing import Dict, Any, Optional, List
 
-try:
-    import pytesseract
-    # La configuración de Tesseract se maneja globalmente
-    # No configurar aquí para evitar conflictos
-except Exception:
-    pytesseract = None
+from .cache_rasterizado import raster_pagina, sha256_documento
+from .clave_acceso import escanear_claves
+from .importacion_diferida import disponible, funcion_diferida, modulo_diferido
 
-try:
-    from pyzbar.pyzbar import decode as zbar_decode
-except Exception:
-    zbar_decode = None
+cv2 = modulo_diferido("cv2")
+
+# Opcionales; se importan en el primer uso. La configuración de Tesseract se
+# maneja globalmente: no configurar aquí para evitar conflictos
+pytesseract = modulo_diferido("pytesseract") if disponible("pytesseract") else None
+zbar_decode = funcion_diferida("pyzbar.pyzbar", "decode") if disponible("pyzbar") else None
 
 # --- utilidades ---
 DIGIT_FIX = str.maketrans({
@@ -38,6 +35,8 @@ DIGIT_FIX = str.maketrans({
 # intentos adicionales que suelen arreglar 1/4 y 7/4
 _SWAP_CANDIDATES = [('4','1'),('1','4'),('7','4'),('4','7')]
 
+_ETIQUETA_CLAVE = re.compile(r'Clave.*?Acceso|N[uú]mero de autorizaci[oó]n', re.I)
+
 def modulo11_ec(clave48):
     """DV ecuatoriano (módulo 11) para los primeros 48 dígitos de la clave."""
     pesos = [7,6,5,4,3,2]*8  # 48 pesos
@@ -92,13 +91,13 @@ def extraer_datos_factura_pdf(pdf_bytes: bytes, lang='spa+eng') -> Dict[str, Any
         raise RuntimeError("Instala pytesseract y el binario de Tesseract para hacer OCR.")
 
     doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    sha = sha256_documento(pdf_bytes)
     texto_total = ""
     claves_barcodes = []
     
     for page in doc:
-        # render a 200 dpi aprox
-        pix = page.get_pixmap(dpi=200, alpha=False)
-        img = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, 3)
+        # render a 200 dpi aprox (compartido con la caché de rasterizado)
+        img = raster_pagina(pdf_bytes, page.number, 200, doc=doc, sha=sha)
         img_proc = preprocess_for_ocr(img)
 
         # OCR texto corrido
@@ -123,7 +122,6 @@ def extraer_datos_factura_pdf(pdf_bytes: bytes, lang='spa+eng') -> Dict[str, Any
     r_razon = re.search(r'(Raz[oó]n Social.*?:\s*)([^\n\r]+)', t, re.I)
     r_fecha = re.search(r'(?:Fecha(?: de Emisi[oó]n)?[:\s]*)\s*(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})', t, re.I)
     r_num   = re.search(r'(?:No\.?|N[uú]mero(?: de factura)?)[:\s]*([0-9]{3}[-–][0-9]{3}[-–][0-9]{6,9})', t, re.I)
-    r_clave = re.search(r'(?:Clave.*Acceso|N[uú]mero de autorizaci[oó]n)[:\s]*([0-9\s]{45,60})', t, re.I)
 
     # limpieza y validación
     ruc = r_ruc.group(1) if r_ruc else None
@@ -131,18 +129,18 @@ def extraer_datos_factura_pdf(pdf_bytes: bytes, lang='spa+eng') -> Dict[str, Any
     fecha = r_fecha.group(1).replace(' ', '') if r_fecha else None
     numero = r_num.group(1) if r_num else None
 
+    # clave: escaneo lineal (alineada, cercanía a la etiqueta, DV válido); si la
+    # mejor no valida, se prueban las correcciones de OCR sobre las candidatas
     clave = None
-    candidates = []
-    if r_clave:
-        candidates.append(r_clave.group(1))
-    # también barre secuencias de 49 dígitos por si el label no se detecta
-    candidates += re.findall(r'\d[\d\s]{47,70}\d', t)
-
-    for c in candidates:
-        cfix = intentar_corregir_clave(c)
-        if cfix:
-            clave = cfix
-            break
+    candidates = escanear_claves(t, etiquetas=_ETIQUETA_CLAVE)
+    if candidates and candidates[0].valida:
+        clave = candidates[0].clave
+    else:
+        for c in candidates:
+            cfix = intentar_corregir_clave(c.clave)
+            if cfix:
+                clave = cfix
+                break
     
     # Priorizar códigos de barras si están disponibles
     if not clave and claves_barcodes:
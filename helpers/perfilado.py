@@ -0,0 +1,360 @@
+"""
+Perfilado bajo demanda de peticiones individuales.
+
+Una petición se perfila si trae la cabecera X-Perfil (cpu, memoria o
+cpu,memoria) junto con X-Perfil-Token igual a PERFIL_TOKEN, o si cae en el
+muestreo aleatorio PERFIL_MUESTREO (solo cpu).
+
+- cpu: cProfile de las funciones marcadas con @perfilable (evaluar_riesgo,
+  TextOverlayDetector.analyze_pdf, analisis_forense_completo,
+  parse_capture_from_bytes) mientras corren para esa petición. Cada hilo que
+  ejecuta trabajo de la petición usa su propio cProfile; al final se combinan.
+- memoria: snapshots de tracemalloc al inicio y al final de la petición, con
+  las líneas que más memoria asignaron y el pico. tracemalloc es global al
+  proceso: con peticiones concurrentes, el diff incluye también sus asignaciones.
+
+Mientras dura el perfil, el trabajo por página de esa petición corre en el
+mismo proceso en lugar de en el pool de paralelo_paginas, que los profilers no
+ven. El perfil mide entonces la versión secuencial: su duración total no es la
+de una petición sin perfilar.
+
+Cerrar el snapshot de memoria y escribir los archivos se hace en el threadpool,
+no en el event loop.
+
+El perfil se guarda en PERFIL_DIR como <id>.json (resumen, SHA-256 de la
+entrada) y <id>.prof (pstats, abrible con snakeviz), y el id vuelve en la
+cabecera X-Perfil-Id. Se conservan los últimos PERFIL_MAX perfiles.
+"""
+
+import contextvars
+import cProfile
+import functools
+import hashlib
+import hmac
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import tracemalloc
+import uuid
+from typing import Any, Dict, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from config import PERFIL_TOKEN, PERFIL_MUESTREO, PERFIL_DIR, PERFIL_MAX
+
+logger = logging.getLogger(__name__)
+
+CPU = "cpu"
+MEMORIA = "memoria"
+
+# Funciones y líneas que se guardan en el resumen JSON
+_TOP_FUNCIONES = 40
+_TOP_MEMORIA = 30
+
+_ID_VALIDO = re.compile(r"^[0-9a-f]{32}$")
+
+_actual: contextvars.ContextVar[Optional["Perfil"]] = contextvars.ContextVar("perfil_actual", default=None)
+
+# tracemalloc es global: se inicia con el primer perfil de memoria y se detiene con el último
+_memoria_lock = threading.Lock()
+_memoria_activos = 0
+
+
+class Perfil:
+    """Perfil en curso de una petición."""
+
+    def __init__(self, modos: List[str], metodo: str, ruta: str, origen: str):
+        self.id = uuid.uuid4().hex
+        self.modos = modos
+        self.metodo = metodo
+        self.ruta = ruta
+        self.origen = origen
+        self.creado = time.time()
+        self.inicio = time.perf_counter()
+        self.sha256_entrada: Optional[str] = None
+        self.bytes_entrada: Optional[int] = None
+        self._hash_cuerpo = hashlib.sha256()
+        self._bytes_cuerpo = 0
+        self._perfiles: List[cProfile.Profile] = []
+        self._activo_por_hilo: Dict[int, cProfile.Profile] = {}
+        self._lock = threading.Lock()
+        self._snapshot_inicial = None
+
+    @property
+    def cpu(self) -> bool:
+        return CPU in self.modos
+
+    @property
+    def memoria(self) -> bool:
+        return MEMORIA in self.modos
+
+    def actualizar_cuerpo(self, datos: bytes) -> None:
+        self._hash_cuerpo.update(datos)
+        self._bytes_cuerpo += len(datos)
+
+    def registrar_entrada(self, datos: bytes) -> None:
+        self.sha256_entrada = hashlib.sha256(datos).hexdigest()
+        self.bytes_entrada = len(datos)
+
+    def ejecutar(self, funcion, args, kwargs):
+        """Ejecuta funcion bajo el cProfile de este hilo (si no hay uno ya activo en el hilo)."""
+        hilo = threading.get_ident()
+        with self._lock:
+            if hilo in self._activo_por_hilo:
+                propio = None
+            else:
+                propio = cProfile.Profile()
+                self._activo_por_hilo[hilo] = propio
+                self._perfiles.append(propio)
+        if propio is None:
+            return funcion(*args, **kwargs)
+        try:
+            propio.enable()
+        except ValueError:
+            # Otro profiler activo en el hilo (p. ej. un depurador): se ejecuta sin perfilar
+            with self._lock:
+                del self._activo_por_hilo[hilo]
+                self._perfiles.remove(propio)
+            return funcion(*args, **kwargs)
+        try:
+            return funcion(*args, **kwargs)
+        finally:
+            propio.disable()
+            with self._lock:
+                del self._activo_por_hilo[hilo]
+
+    def iniciar_memoria(self) -> None:
+        global _memoria_activos
+        with _memoria_lock:
+            if _memoria_activos == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start(25)
+            _memoria_activos += 1
+            tracemalloc.reset_peak()
+            self._snapshot_inicial = tracemalloc.take_snapshot()
+
+    def terminar_memoria(self) -> Dict[str, Any]:
+        global _memoria_activos
+        with _memoria_lock:
+            final = tracemalloc.take_snapshot()
+            actual, pico = tracemalloc.get_traced_memory()
+            _memoria_activos -= 1
+            if _memoria_activos == 0:
+                tracemalloc.stop()
+        filtros = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap>")]
+        diferencias = final.filter_traces(filtros).compare_to(self._snapshot_inicial.filter_traces(filtros), "lineno")
+        return {
+            "pico_bytes": pico,
+            "actual_bytes": actual,
+            "top_asignaciones": [
+                {
+                    "archivo": d.traceback[0].filename,
+                    "linea": d.traceback[0].lineno,
+                    "bytes": d.size_diff,
+                    "bloques": d.count_diff,
+                }
+                for d in diferencias[:_TOP_MEMORIA]
+            ],
+        }
+
+    def estadisticas(self) -> Optional[pstats.Stats]:
+        with self._lock:
+            perfiles = list(self._perfiles)
+        perfiles = [p for p in perfiles if p.getstats()]
+        if not perfiles:
+            return None
+        stats = pstats.Stats(perfiles[0], stream=io.StringIO())
+        for p in perfiles[1:]:
+            stats.add(p)
+        return stats
+
+    def resumen(self, status: Optional[int]) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "metodo": self.metodo,
+            "ruta": self.ruta,
+            "status": status,
+            "origen": self.origen,
+            "modos": self.modos,
+            "creado": self.creado,
+            "duracion_ms": round((time.perf_counter() - self.inicio) * 1000.0, 2),
+            "sha256_entrada": self.sha256_entrada,
+            "bytes_entrada": self.bytes_entrada,
+            "sha256_cuerpo": self._hash_cuerpo.hexdigest() if self._bytes_cuerpo else None,
+            "bytes_cuerpo": self._bytes_cuerpo,
+        }
+
+
+def perfilable(funcion):
+    """Marca una función del pipeline para perfilarla cuando la petición actual lo pidió."""
+
+    @functools.wraps(funcion)
+    def envoltura(*args, **kwargs):
+        perfil = _actual.get()
+        if perfil is None or not perfil.cpu:
+            return funcion(*args, **kwargs)
+        return perfil.ejecutar(funcion, args, kwargs)
+
+    return envoltura
+
+
+def perfilando() -> bool:
+    """True si la petición actual se está perfilando (CPU o memoria)."""
+    return _actual.get() is not None
+
+
+def registrar_entrada(datos: bytes) -> None:
+    """Guarda el SHA-256 del documento analizado en el perfil actual (no-op si no se perfila)."""
+    perfil = _actual.get()
+    if perfil is not None:
+        perfil.registrar_entrada(datos)
+
+
+def _funciones_top(stats: pstats.Stats) -> List[Dict[str, Any]]:
+    filas = []
+    for (archivo, linea, nombre), (cc, nc, tt, ct, _) in stats.stats.items():
+        filas.append({
+            "funcion": nombre,
+            "archivo": archivo,
+            "linea": linea,
+            "llamadas": nc,
+            "tiempo_propio_s": round(tt, 6),
+            "tiempo_acumulado_s": round(ct, 6),
+        })
+    filas.sort(key=lambda f: f["tiempo_acumulado_s"], reverse=True)
+    return filas[:_TOP_FUNCIONES]
+
+
+def _guardar(perfil: Perfil, status: Optional[int], memoria: Optional[Dict[str, Any]]) -> None:
+    os.makedirs(PERFIL_DIR, exist_ok=True)
+    resumen = perfil.resumen(status)
+    stats = perfil.estadisticas() if perfil.cpu else None
+    if stats is not None:
+        stats.dump_stats(os.path.join(PERFIL_DIR, f"{perfil.id}.prof"))
+        resumen["cpu"] = {"total_llamadas": stats.total_calls, "funciones": _funciones_top(stats)}
+    if memoria is not None:
+        resumen["memoria"] = memoria
+    ruta = os.path.join(PERFIL_DIR, f"{perfil.id}.json")
+    temporal = ruta + ".tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(resumen, f, ensure_ascii=False, indent=2)
+    os.replace(temporal, ruta)
+    _podar()
+
+
+def _podar() -> None:
+    """Conserva solo los PERFIL_MAX perfiles más recientes."""
+    try:
+        resumenes = [e for e in os.scandir(PERFIL_DIR) if e.name.endswith(".json")]
+    except FileNotFoundError:
+        return
+    resumenes.sort(key=lambda e: e.stat().st_mtime, reverse=True)
+    for entrada in resumenes[PERFIL_MAX:]:
+        base = entrada.path[:-len(".json")]
+        for ruta in (entrada.path, base + ".prof"):
+            try:
+                os.remove(ruta)
+            except FileNotFoundError:
+                pass
+
+
+def token_valido(token: Optional[str]) -> bool:
+    return bool(PERFIL_TOKEN) and token is not None and hmac.compare_digest(token, PERFIL_TOKEN)
+
+
+def listar_perfiles() -> List[Dict[str, Any]]:
+    try:
+        entradas = [e for e in os.scandir(PERFIL_DIR) if e.name.endswith(".json")]
+    except FileNotFoundError:
+        return []
+    entradas.sort(key=lambda e: e.stat().st_mtime, reverse=True)
+    perfiles = []
+    for entrada in entradas:
+        try:
+            with open(entrada.path, encoding="utf-8") as f:
+                datos = json.load(f)
+        except (OSError, ValueError):
+            continue
+        perfiles.append({k: datos.get(k) for k in ("id", "metodo", "ruta", "status", "modos", "creado",
+                                                   "duracion_ms", "sha256_entrada")})
+    return perfiles
+
+
+def ruta_perfil(id_perfil: str, extension: str) -> Optional[str]:
+    """Ruta del archivo del perfil si existe (el id se valida para no salir de PERFIL_DIR)."""
+    if not _ID_VALIDO.match(id_perfil):
+        return None
+    ruta = os.path.join(PERFIL_DIR, f"{id_perfil}.{extension}")
+    return ruta if os.path.isfile(ruta) else None
+
+
+def _modos_pedidos(scope) -> Optional[List[str]]:
+    cabeceras = {k.lower(): v for k, v in scope.get("headers") or []}
+    pedido = cabeceras.get(b"x-perfil")
+    if pedido is not None:
+        token = cabeceras.get(b"x-perfil-token", b"").decode("latin-1")
+        if not token_valido(token):
+            return None
+        modos = [m.strip() for m in pedido.decode("latin-1").lower().split(",")]
+        modos = [m for m in modos if m in (CPU, MEMORIA)]
+        return modos or [CPU]
+    if PERFIL_MUESTREO > 0 and random.random() < PERFIL_MUESTREO:
+        return [CPU]
+    return None
+
+
+class MiddlewarePerfilado:
+    """Middleware ASGI que activa el perfil de la petición si se pidió o si cae en el muestreo."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        modos = _modos_pedidos(scope) if scope["type"] == "http" else None
+        if not modos:
+            await self.app(scope, receive, send)
+            return
+
+        perfil = Perfil(modos, scope.get("method", ""), scope.get("path", ""),
+                        "cabecera" if any(k.lower() == b"x-perfil" for k, _ in scope.get("headers") or []) else "muestreo")
+        token = _actual.set(perfil)
+        status = None
+        memoria = None
+
+        async def recibir():
+            mensaje = await receive()
+            if mensaje["type"] == "http.request":
+                perfil.actualizar_cuerpo(mensaje.get("body", b""))
+            return mensaje
+
+        async def enviar(mensaje):
+            nonlocal status
+            if mensaje["type"] == "http.response.start":
+                status = mensaje["status"]
+                cabeceras = list(mensaje.get("headers", [])) + [(b"x-perfil-id", perfil.id.encode("latin-1"))]
+                mensaje = dict(mensaje, headers=cabeceras)
+            await send(mensaje)
+
+        # Snapshots, pstats y escritura a disco: fuera del event loop
+        if perfil.memoria:
+            await run_in_threadpool(perfil.iniciar_memoria)
+        try:
+            await self.app(scope, recibir, enviar)
+        finally:
+            _actual.reset(token)
+            # La respuesta ya salió: un fallo al guardar el perfil no debe
+            # propagarse ni tapar la excepción de la aplicación
+            if perfil.memoria:
+                try:
+                    memoria = await run_in_threadpool(perfil.terminar_memoria)
+                except Exception:
+                    logger.exception("No se pudo tomar el perfil de memoria %s", perfil.id)
+            try:
+                await run_in_threadpool(_guardar, perfil, status, memoria)
+            except Exception:
+                logger.exception("No se pudo guardar el perfil %s", perfil.id)
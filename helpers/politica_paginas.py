@@ -0,0 +1,124 @@
+"""
+Política de páginas para acotar el costo del análisis en PDFs largos.
+
+Un RIDE normal tiene 1-2 páginas, pero a veces llegan estados de cuenta de
+decenas de páginas. La política decide qué páginas recibe cada tipo de análisis:
+
+1. Páginas completas: las primeras N, reciben todos los análisis
+2. Páginas estructurales: las completas + una muestra del resto (siempre
+   incluye la última, donde suelen estar los totales) para los checks baratos
+3. Páginas de render: subconjunto de las completas que cabe en el presupuesto
+   de páginas/píxeles para los análisis que renderizan (capas, streams, overlay)
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional
+
+from config import (
+    PAGINAS_ANALISIS_COMPLETO,
+    PAGINAS_MUESTREO_ESTRUCTURAL,
+    MAX_PAGINAS_RENDER,
+    MAX_PIXELES_RENDER,
+)
+
+# DPI con el que se estiman los píxeles de render (el fino de los diffs por capas)
+DPI_ESTIMACION_RENDER = 144
+
+
+@dataclass
+class PoliticaPaginas:
+    """Selección de páginas por tipo de análisis."""
+    total_paginas: int
+    paginas_completas: List[int] = field(default_factory=list)
+    paginas_estructurales: List[int] = field(default_factory=list)
+    paginas_render: List[int] = field(default_factory=list)
+    pixeles_render: int = 0
+
+    @property
+    def acotada(self) -> bool:
+        """True si algún análisis no cubre todas las páginas."""
+        return len(self.paginas_render) < self.total_paginas or \
+            len(self.paginas_estructurales) < self.total_paginas
+
+    def cobertura(self) -> Dict[str, Any]:
+        """Resumen de cobertura para incluir en la respuesta."""
+        total = max(1, self.total_paginas)
+        return {
+            "total_paginas": self.total_paginas,
+            "analisis_completo": [p + 1 for p in self.paginas_completas],
+            "analisis_estructural": [p + 1 for p in self.paginas_estructurales],
+            "analisis_render": [p + 1 for p in self.paginas_render],
+            "porcentaje_estructural": round(len(self.paginas_estructurales) / total * 100, 1),
+            "porcentaje_render": round(len(self.paginas_render) / total * 100, 1),
+            "pixeles_render_estimados": self.pixeles_render,
+            "cobertura_parcial": self.acotada,
+        }
+
+
+def _muestrear(candidatas: List[int], n: int) -> List[int]:
+    """Toma n páginas equiespaciadas de candidatas, incluyendo siempre la última."""
+    if n <= 0 or not candidatas:
+        return []
+    if n >= len(candidatas):
+        return list(candidatas)
+    if n == 1:
+        return [candidatas[-1]]
+    paso = (len(candidatas) - 1) / (n - 1)
+    return sorted({candidatas[round(i * paso)] for i in range(n)})
+
+
+def _pixeles_pagina(page, dpi: int) -> int:
+    rect = page.rect
+    escala = dpi / 72.0
+    return int(rect.width * escala) * int(rect.height * escala)
+
+
+def planificar_paginas(
+    doc,
+    paginas_completas: Optional[int] = None,
+    paginas_muestreo: Optional[int] = None,
+    max_paginas_render: Optional[int] = None,
+    max_pixeles_render: Optional[int] = None,
+) -> PoliticaPaginas:
+    """
+    Construye la política de páginas para un documento fitz abierto.
+
+    Los parámetros en None toman el valor de config. La primera página siempre
+    se renderiza aunque exceda el presupuesto de píxeles, para que un documento
+    de una sola página se analice igual que antes.
+    """
+    if paginas_completas is None:
+        paginas_completas = PAGINAS_ANALISIS_COMPLETO
+    if paginas_muestreo is None:
+        paginas_muestreo = PAGINAS_MUESTREO_ESTRUCTURAL
+    if max_paginas_render is None:
+        max_paginas_render = MAX_PAGINAS_RENDER
+    if max_pixeles_render is None:
+        max_pixeles_render = MAX_PIXELES_RENDER
+
+    total = doc.page_count
+    completas = list(range(min(total, max(1, paginas_completas))))
+    resto = list(range(len(completas), total))
+    estructurales = sorted(completas + _muestrear(resto, paginas_muestreo))
+
+    render: List[int] = []
+    pixeles = 0
+    for pno in completas:
+        if len(render) >= max(1, max_paginas_render):
+            break
+        try:
+            px = _pixeles_pagina(doc.load_page(pno), DPI_ESTIMACION_RENDER)
+        except Exception:
+            px = 0
+        if render and pixeles + px > max_pixeles_render:
+            break
+        render.append(pno)
+        pixeles += px
+
+    return PoliticaPaginas(
+        total_paginas=total,
+        paginas_completas=completas,
+        paginas_estructurales=estructurales,
+        paginas_render=render,
+        pixeles_render=pixeles,
+    )
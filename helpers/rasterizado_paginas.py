@@ -0,0 +1,107 @@
+"""
+Rasterizado de páginas de PDF a imágenes codificadas (PNG, JPEG o WebP).
+
+renderizar_pagina es una función de página para paralelo_paginas
+(iterar_paginas / mapear_paginas): se puede enviar a otro proceso con
+functools.partial y devuelve la imagen ya codificada, lista para transmitir.
+Los rasters salen de la caché del proceso (cache_rasterizado).
+"""
+
+import io
+import math
+import re
+from typing import Any, Dict, List, Optional
+
+import fitz
+import numpy as np
+
+from .cache_rasterizado import raster_pagina, pixmap_desde_array, imagen_desde_array
+from .paralelo_paginas import DocumentoCompartido
+
+# formato -> (media type, extensión)
+FORMATOS = {
+    "png": ("image/png", "png"),
+    "jpeg": ("image/jpeg", "jpg"),
+    "webp": ("image/webp", "webp"),
+}
+
+_RANGO = re.compile(r"^\s*(\d+)\s*(?:-\s*(\d+)\s*)?$")
+
+
+def parsear_rango_paginas(texto: Optional[str], total: int) -> List[int]:
+    """
+    Convierte un rango 1-based ("1-3,7,10-") en índices 0-based ordenados y sin repetir.
+
+    Sin texto devuelve todas las páginas. Lanza ValueError si el rango es inválido.
+    """
+    if not texto:
+        return list(range(total))
+    paginas = set()
+    for parte in texto.split(","):
+        parte = parte.strip()
+        abierto = parte.endswith("-")
+        m = _RANGO.match(parte[:-1] if abierto else parte)
+        if not m or (abierto and m.group(2)):
+            raise ValueError(f"Rango de páginas inválido: '{parte}'")
+        inicio = int(m.group(1))
+        # "N-" llega hasta el final; si N ya pasó el final no selecciona nada
+        fin = max(inicio, total) if abierto else int(m.group(2) or inicio)
+        if inicio < 1 or fin < inicio:
+            raise ValueError(f"Rango de páginas inválido: '{parte}'")
+        paginas.update(range(inicio - 1, min(fin, total)))
+    if not paginas:
+        raise ValueError(f"El rango no incluye páginas del documento ({total} páginas).")
+    return sorted(paginas)
+
+
+def zoom_pagina(page: fitz.Page, dpi: int, max_pixeles: Optional[int] = None) -> float:
+    """Factor de escala para dpi, reducido si la imagen excedería max_pixeles."""
+    zoom = dpi / 72.0
+    if max_pixeles:
+        area_pt = max(1.0, page.rect.width * page.rect.height)
+        zoom = min(zoom, math.sqrt(max_pixeles / area_pt))
+    return zoom
+
+
+def codificar_raster(arr: np.ndarray, formato: str, calidad: int) -> bytes:
+    """Codifica un raster RGB/gris (alto x ancho x canales) en el formato pedido."""
+    if formato == "png":
+        return pixmap_desde_array(arr).tobytes("png")
+    if formato == "jpeg":
+        return pixmap_desde_array(arr).tobytes("jpeg", jpg_quality=calidad)
+    img = imagen_desde_array(arr)
+    buffer = io.BytesIO()
+    img.save(buffer, format="WEBP", quality=calidad, method=4)
+    return buffer.getvalue()
+
+
+def renderizar_pagina(
+    ctx: DocumentoCompartido,
+    pno: int,
+    dpi: int = 150,
+    formato: str = "png",
+    calidad: int = 85,
+    max_pixeles: Optional[int] = None,
+    sha: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Renderiza una página y la codifica.
+
+    Devuelve {pagina (1-based), formato, ancho, alto, dpi, datos (bytes)} o
+    {pagina, error} si la página no se pudo renderizar. `sha` (del documento)
+    evita recalcular el hash en cada página.
+    """
+    try:
+        zoom = zoom_pagina(ctx.doc.load_page(pno), dpi, max_pixeles)
+        arr = raster_pagina(ctx.pdf_bytes, pno, zoom * 72.0, doc=ctx.doc, sha=sha)
+        datos = codificar_raster(arr, formato, calidad)
+        return {
+            "pagina": pno + 1,
+            "formato": formato,
+            "ancho": arr.shape[1],
+            "alto": arr.shape[0],
+            "dpi": round(zoom * 72.0, 1),
+            "datos": datos,
+        }
+    except Exception as e:
+        return {"pagina": pno + 1, "error": f"Error al renderizar la página: {str(e)}"}
@@ -2,9 +2,12 @@ import io
 import math
 from typing import Dict, Any, Tuple, List, Union
 
-import cv2
 import numpy as np
 
+from .importacion_diferida import modulo_diferido
+
+cv2 = modulo_diferido("cv2")
+
 
 def _to_gray(img: Union[np.ndarray, bytes]) -> np.ndarray:
     """
@@ -0,0 +1,94 @@
+"""
+Servidor de producción: un maestro de gunicorn que precarga y bifurca workers uvicorn.
+
+gunicorn.conf.py (en la raíz) arranca con preload_app: el maestro importa la
+app una sola vez (configuración de riesgo, regex compiladas, rutas) y, antes de
+bifurcar, carga el estado caro de solo lectura:
+
+- las dependencias diferidas (OpenCV, scikit-image, pikepdf, zeep, ...)
+- el cliente del SRI con el WSDL ya descargado y compilado
+- las raíces de confianza para validar cadenas de certificados
+- con PRECALENTAR_EASYOCR, el modelo de EasyOCR
+
+Los workers lo heredan por fork y comparten esas páginas de memoria
+(copy-on-write) mientras nadie las escriba. Un worker que se recicla (max
+requests) o que reemplaza a uno caído nace ya caliente.
+
+Lo que rompería el compartir:
+- el recolector de basura escribe en la cabecera de cada objeto que recorre;
+  se desactiva en el maestro y gc.freeze() deja lo precargado fuera de su alcance
+- hilos y sockets abiertos en el maestro no sobreviven al fork: el
+  precalentamiento es síncrono y el cliente del SRI cierra sus conexiones
+"""
+
+import gc
+import logging
+import os
+import sys
+from typing import Any, Callable, Dict, List
+
+from config import PRECALENTAR_EASYOCR, RASTER_CACHE_MAX_BYTES, SERVIDOR_WORKERS
+from helpers.importacion_diferida import precalentar_ya
+
+logger = logging.getLogger(__name__)
+
+
+def extras_precalentamiento() -> List[Callable[[], Any]]:
+    """Estado de solo lectura a cargar además de los módulos diferidos."""
+    from sri import precargar_cliente_sri
+    from helpers.validacion_firma_digital import raices_confianza
+
+    extras = [precargar_cliente_sri, raices_confianza]
+    if PRECALENTAR_EASYOCR:
+        from helpers.invoice_capture_parser import lector_easyocr
+        extras.append(lector_easyocr)
+    return extras
+
+
+def cpus_disponibles() -> int:
+    """CPUs que puede usar este proceso (afinidad; no ve cuotas de cgroups)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def numero_workers() -> int:
+    return SERVIDOR_WORKERS if SERVIDOR_WORKERS > 0 else cpus_disponibles()
+
+
+def precargar_antes_del_fork() -> Dict[str, Any]:
+    """En el maestro, con la app ya importada: precalentar y congelar el heap."""
+    resultado = precalentar_ya(extras=extras_precalentamiento(), modo="maestro")
+    gc.collect()
+    gc.freeze()
+    logger.info("%d objetos congelados para compartir con los workers", gc.get_freeze_count())
+    return resultado
+
+
+def al_bifurcar(workers: int) -> None:
+    """
+    En cada worker recién bifurcado.
+
+    Reactiva el recolector y reparte los hilos de cómputo: con N workers en la
+    misma máquina, que cada torch/OpenCV/Tesseract use todos los núcleos solo
+    produce contención. OMP_NUM_THREADS, si ya viene fijado, se respeta. Lo
+    mismo para el pool de páginas (PARALELISMO_PAGINAS automático) y para la
+    caché de rasterizado: RASTER_CACHE_MAX_BYTES se reparte entre los workers.
+    """
+    from helpers.cache_rasterizado import cache as cache_rasterizado
+    from helpers.paralelo_paginas import fijar_procesos_servidor
+
+    gc.enable()
+    fijar_procesos_servidor(workers)
+    cache_rasterizado.fijar_presupuesto(RASTER_CACHE_MAX_BYTES // max(1, workers))
+    hilos = max(1, cpus_disponibles() // max(1, workers))
+    # Para lo que se importe después en el worker y para los subprocesos de Tesseract
+    os.environ.setdefault("OMP_NUM_THREADS", str(hilos))
+    hilos = int(os.environ["OMP_NUM_THREADS"])
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(hilos)
+    cv2 = sys.modules.get("cv2")
+    if cv2 is not None:
+        cv2.setNumThreads(hilos)
@@ -1,7 +1,9 @@
-import cv2
 import numpy as np
-import pytesseract
-from pytesseract import Output
+
+from .importacion_diferida import modulo_diferido
+
+cv2 = modulo_diferido("cv2")
+pytesseract = modulo_diferido("pytesseract")
 
 def _ela_map(bgr, quality=85):
     # mapa ELA normalizado [0..1]
@@ -45,7 +47,7 @@ def detectar_texto_inyectado(img_bgr):
     gray = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY)
 
     # OCR con boxes
-    data = pytesseract.image_to_data(gray, lang='spa+eng', config='--oem 3 --psm 6', output_type=Output.DICT)
+    data = pytesseract.image_to_data(gray, lang='spa+eng', config='--oem 3 --psm 6', output_type=pytesseract.Output.DICT)
 
     # ELA global (una vez)
     ela = _ela_map(img_bgr, quality=85)
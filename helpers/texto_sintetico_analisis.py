@@ -2,10 +2,13 @@ import io
 import re
 from typing import Any, Dict, List, Tuple, Union
 
-import cv2
 import numpy as np
 from PIL import Image
 
+from .importacion_diferida import modulo_diferido
+
+cv2 = modulo_diferido("cv2")
+
 # Importar detector de texto inyectado
 try:
     from .texto_inyectado_analisis import detectar_texto_inyectado
@@ -1,6 +1,8 @@
-import cv2
 import numpy as np
 import re
+from .importacion_diferida import modulo_diferido
+
+cv2 = modulo_diferido("cv2")
 
 # --- utilidades ---
 def _ela_heatmap(img_bgr, q=95):
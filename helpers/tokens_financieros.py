@@ -0,0 +1,166 @@
+"""
+Tokenización única del texto de una factura para la extracción financiera.
+
+El texto se recorre una sola vez por documento y se convierte en líneas con
+tokens tipados: etiquetas (conceptos como "subtotal_15" o "valor_total"),
+importes decimales, porcentajes y fechas, cada uno con su índice de línea.
+Las estrategias de helpers/validacion_financiera y de riesgo trabajan sobre
+esas líneas con patrones compilados a nivel de módulo, en lugar de volver a
+partir y escanear el texto completo cada una.
+
+    doc = tokenizar(fuente_texto)
+    for i in doc.con_etiqueta("valor_total"):
+        linea = doc.lineas[i]
+        linea.monto, linea.decimales, linea.porcentajes
+
+tokenizar() guarda los últimos documentos: validación financiera y
+consistencia matemática reciben el mismo texto y lo tokenizan una vez.
+"""
+
+import re
+from dataclasses import dataclass
+from functools import cached_property, lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from utils import _to_float
+
+# Importes con dos decimales; `entero` = dígitos de la parte entera
+_DECIMAL = re.compile(r"([0-9]+)[.,][0-9]{2}")
+_PORCENTAJE = re.compile(r"(\d{1,3}(?:[.,]\d+)?)\s*%")
+_FECHA = re.compile(r"\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b")
+_ESPACIOS = re.compile(r"[ \t]+")
+
+# Formatos de importe en orden de preferencia para el importe "de la etiqueta"
+_FORMATOS_MONTO = [
+    re.compile(r"(-?\d{1,3}(?:[.,]\d{3})*[.,]\d{2})"),  # Con decimales: 1,234.56 o 1.234,56
+    re.compile(r"(-?\d+[.,]\d{2})"),                    # Simple con decimales: 123.45
+    re.compile(r"(-?\d{1,3}(?:[.,]\d{3})+)"),          # Miles sin decimales: 1,234
+    re.compile(r"(-?\d+)"),                             # Enteros simples: 123
+]
+
+
+def _alternativas(*patrones: str) -> "re.Pattern":
+    return re.compile("|".join(f"(?:{p})" for p in patrones), re.IGNORECASE)
+
+
+# Etiquetas → concepto (una línea puede tener varios conceptos)
+ETIQUETAS: Dict[str, "re.Pattern"] = {
+    # Patrones específicos basados en formato común ecuatoriano
+    "subtotal_15": _alternativas(r"SUBTOTAL\s*15%", r"SUB\s*TOTAL\s*15%"),
+    "subtotal_0": _alternativas(r"SUBTOTAL\s*0%", r"SUB\s*TOTAL\s*0%"),
+    "subtotal_no_objeto": _alternativas(r"SUBTOTAL\s*No\s*objeto\s*de\s*IVA", r"SUB\s*TOTAL\s*No\s*objeto\s*IVA"),
+    "subtotal_exento": _alternativas(r"SUBTOTAL\s*Exento\s*de\s*IVA", r"SUB\s*TOTAL\s*Exento\s*IVA"),
+    "subtotal_sin_impuestos": _alternativas(
+        r"SUB\s*TOTAL\s*SIN\s*IMPUESTOS", r"BASE\s*IMPONIBLE", r"SUBTOTAL\s*GRAVADO"),
+    "iva_15": _alternativas(r"IVA\s*15\s*%", r"I\.V\.A\.?\s*15%?", r"IMPUESTO\s*15%"),
+    "total_descuento": _alternativas(r"TOTAL\s*DESCUENTO", r"\bDESCUENTO\b", r"DESC\w*"),
+    "propina": _alternativas(r"\bPROPINA\b", r"SERVICIO", r"TIP"),
+    "valor_total": _alternativas(
+        r"VALOR\s*TOTAL", r"TOTAL\s*A\s*PAGAR", r"GRAN\s*TOTAL", r"IMPORTE\s*TOTAL", r"MONTO\s*TOTAL",
+        r"(?:VALOR|TOTAL|IMPORTE|MONTO)\s*(?:TOTAL|FINAL|A\s*PAGAR)?"),
+    "ice": _alternativas(r"\bICE\b"),
+    "irbpnr": _alternativas(r"\bIRBPNR\b"),
+    # Cabecera de la tabla inferior de formas de pago
+    "forma_pago_header": _alternativas(
+        r"\bFORMA\s*PAGO\b.*\bVALOR\b", r"FORMA\s*DE\s*PAGO.*VALOR", r"METODO\s*PAGO.*VALOR"),
+    "tarjeta_credito_valor": _alternativas(r"TARJETA\s*DE\s*CREDITO", r"TARJETA\s*CREDITO"),
+}
+# Prefiltro: las líneas sin ninguna etiqueta no se prueban concepto por concepto
+_ALGUNA_ETIQUETA = re.compile("|".join(f"(?:{p.pattern})" for p in ETIQUETAS.values()), re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class Importe:
+    valor: float
+    texto: str
+    entero: int   # dígitos de la parte entera
+
+
+@dataclass(frozen=True)
+class Linea:
+    indice: int
+    original: str                     # tal como vino (sin \r)
+    texto: str                        # espacios colapsados y sin bordes
+    minusculas: str
+    decimales: Tuple[Importe, ...]
+    porcentajes: Tuple[float, ...]
+    fechas: Tuple[str, ...]
+    etiquetas: frozenset
+
+    @cached_property
+    def monto(self) -> Optional[float]:
+        """Primer importe >= 0 de la línea, por orden de formato (1.234,56 > 123.45 > 1,234 > 123)."""
+        for formato in _FORMATOS_MONTO:
+            for coincidencia in formato.findall(self.texto):
+                val = _to_float(coincidencia.replace(",", "."))
+                if val is not None and val >= 0:
+                    return val
+        return None
+
+    def decimales_hasta(self, digitos: int) -> List[Importe]:
+        """Importes como los encontraría \\d{1,n}[.,]\\d{2}: de parte entera más larga, sus últimos n dígitos."""
+        return [_recortar(d, digitos) for d in self.decimales]
+
+
+def _recortar(importe: Importe, digitos: int) -> Importe:
+    if importe.entero <= digitos:
+        return importe
+    texto = importe.texto[importe.entero - digitos:]
+    return Importe(float(texto.replace(",", ".")), texto, digitos)
+
+
+class DocumentoTokens:
+    """Líneas tokenizadas de un texto, con índice por etiqueta."""
+
+    def __init__(self, lineas: List[Linea]):
+        self.lineas = lineas
+        self._por_etiqueta: Dict[str, List[int]] = {}
+        for linea in lineas:
+            for concepto in linea.etiquetas:
+                self._por_etiqueta.setdefault(concepto, []).append(linea.indice)
+        # Índices de líneas no vacías (las estrategias que ignoran líneas en blanco)
+        self.no_vacias = [l.indice for l in lineas if l.texto]
+
+    def con_etiqueta(self, concepto: str) -> List[int]:
+        return self._por_etiqueta.get(concepto, [])
+
+    def con_decimales(self) -> List[Linea]:
+        return [l for l in self.lineas if l.decimales]
+
+    def decimales(self, digitos: Optional[int] = None) -> List[Importe]:
+        """Todos los importes del texto, en orden."""
+        if digitos is None:
+            return [d for l in self.lineas for d in l.decimales]
+        return [d for l in self.lineas for d in l.decimales_hasta(digitos)]
+
+
+def _etiquetas(texto: str) -> frozenset:
+    if not texto or not _ALGUNA_ETIQUETA.search(texto):
+        return frozenset()
+    return frozenset(c for c, patron in ETIQUETAS.items() if patron.search(texto))
+
+
+def _linea(indice: int, original: str) -> Linea:
+    texto = _ESPACIOS.sub(" ", original).strip()
+    decimales = tuple(
+        Importe(float(m.group().replace(",", ".")), m.group(), len(m.group(1)))
+        for m in _DECIMAL.finditer(texto)
+    )
+    porcentajes = tuple(_to_float(p) for p in _PORCENTAJE.findall(texto))
+    return Linea(
+        indice=indice,
+        original=original,
+        texto=texto,
+        minusculas=texto.lower(),
+        decimales=decimales,
+        porcentajes=tuple(p for p in porcentajes if p is not None),
+        fechas=tuple(_FECHA.findall(texto)),
+        etiquetas=_etiquetas(texto),
+    )
+
+
+@lru_cache(maxsize=8)
+def tokenizar(texto: str) -> DocumentoTokens:
+    """Tokeniza el texto (una vez por documento; el resultado es de solo lectura)."""
+    lineas = (texto or "").replace("\r", "").split("\n")
+    return DocumentoTokens([_linea(i, ln) for i, ln in enumerate(lineas)])
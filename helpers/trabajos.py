@@ -0,0 +1,455 @@
+"""
+Trabajos asíncronos para análisis largos.
+
+Un POST encola el documento y devuelve un id de inmediato; un pool acotado de
+hilos procesa la cola y guarda el resultado en SQLite, de donde se consulta con
+GET /jobs/{id} (desde cualquier proceso del servidor) o se entrega a una URL de
+callback. Los resultados expiran tras TRABAJOS_TTL_SEGUNDOS.
+
+Los reintentos del cliente no repiten el trabajo: un envío con el mismo tipo y
+el mismo contenido (SHA-256) devuelve el id del trabajo activo o vigente.
+
+La cola vive en la memoria del proceso que recibió el envío. Cada fila guarda
+el id de arranque de ese proceso (un UUID por proceso, no el PID: tras
+reiniciar el contenedor los workers vuelven a tener los mismos PID), y cada
+proceso con trabajos registra un latido en la tabla procesos. Un trabajo
+activo cuyo dueño dejó de latir (caída, reciclaje por max_requests, reinicio)
+pasa a error al consultarlo o en la limpieza periódica, y buscar_vigente no lo
+devuelve: el reintento del cliente crea un trabajo nuevo. Al apagarse en
+orden, un worker marca los suyos sin esperar al latido.
+
+callback_url solo puede apuntar a hosts de TRABAJOS_CALLBACK_HOSTS o, sin esa
+lista, a hosts que resuelvan a direcciones públicas; se comprueba al encolar y
+otra vez antes de cada POST (la resolución DNS puede cambiar entre medio).
+"""
+
+import ipaddress
+import json
+import logging
+import os
+import queue
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+
+from config import (
+    TRABAJOS_DB,
+    TRABAJOS_WORKERS,
+    TRABAJOS_MAX_COLA,
+    TRABAJOS_TTL_SEGUNDOS,
+    TRABAJOS_CALLBACK_REINTENTOS,
+    TRABAJOS_CALLBACK_TIMEOUT,
+    TRABAJOS_CALLBACK_HOSTS,
+    TRABAJOS_LATIDO_SEGUNDOS,
+)
+
+logger = logging.getLogger(__name__)
+
+EN_COLA = "en_cola"
+PROCESANDO = "procesando"
+COMPLETADO = "completado"
+ERROR = "error"
+
+# funcion(contenido) -> (status_code, cuerpo JSON ya serializado)
+FuncionTrabajo = Callable[[bytes], Tuple[int, bytes]]
+
+
+# Sin latido durante este tiempo, el proceso se da por terminado
+_LATIDO_VENCIDO = 3 * TRABAJOS_LATIDO_SEGUNDOS
+_MENSAJE_PERDIDO = "Trabajo interrumpido por reinicio del servidor; vuelva a enviarlo."
+
+_arranque: Tuple[Optional[int], str] = (None, "")
+
+
+def id_arranque() -> str:
+    """UUID de este proceso; uno nuevo en cada proceso bifurcado o reiniciado."""
+    global _arranque
+    if _arranque[0] != os.getpid():
+        _arranque = (os.getpid(), uuid.uuid4().hex)
+    return _arranque[1]
+
+
+class ColaLlena(Exception):
+    """La cola de trabajos alcanzó TRABAJOS_MAX_COLA."""
+
+
+def validar_callback_url(url: str) -> None:
+    """
+    ValueError si callback_url no es http(s) o su host no está permitido.
+
+    Sin TRABAJOS_CALLBACK_HOSTS, todas las direcciones a las que resuelve el
+    host deben ser públicas: nada de redes privadas, loopback, link-local
+    (metadatos de la nube) ni reservadas.
+    """
+    partes = urlsplit(url)
+    if partes.scheme not in ("http", "https") or not partes.hostname:
+        raise ValueError("callback_url debe ser una URL http(s).")
+    host = partes.hostname.lower()
+    if TRABAJOS_CALLBACK_HOSTS:
+        if not any(host == h or (h.startswith(".") and host.endswith(h)) for h in TRABAJOS_CALLBACK_HOSTS):
+            raise ValueError(f"callback_url: el host {host} no está en TRABAJOS_CALLBACK_HOSTS.")
+        return
+    try:
+        puerto = partes.port or (443 if partes.scheme == "https" else 80)
+        direcciones = {info[4][0] for info in socket.getaddrinfo(host, puerto, type=socket.SOCK_STREAM)}
+    except (socket.gaierror, UnicodeError, ValueError):
+        raise ValueError(f"callback_url: no se pudo resolver {host}.")
+    for direccion in direcciones:
+        ip = ipaddress.ip_address(direccion.split("%", 1)[0])
+        if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped is not None:
+            ip = ip.ipv4_mapped
+        if not ip.is_global or ip.is_multicast:
+            raise ValueError(f"callback_url: {host} resuelve a una dirección no pública ({ip}).")
+
+
+class AlmacenTrabajos:
+    """Estado de los trabajos en SQLite (compartido entre procesos del servidor)."""
+
+    def __init__(self, ruta: str = TRABAJOS_DB):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(ruta, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS trabajos (
+                id TEXT PRIMARY KEY,
+                tipo TEXT NOT NULL,
+                huella TEXT NOT NULL,
+                estado TEXT NOT NULL,
+                pid INTEGER,
+                callback_url TEXT,
+                creado REAL NOT NULL,
+                iniciado REAL,
+                terminado REAL,
+                expira REAL,
+                status_code INTEGER,
+                resultado BLOB,
+                error TEXT,
+                dueno TEXT
+            )
+        """)
+        columnas = {f["name"] for f in self._conn.execute("PRAGMA table_info(trabajos)")}
+        if "dueno" not in columnas:
+            # Base de antes del latido: las filas sin dueño se tratan como de un proceso terminado
+            self._conn.execute("ALTER TABLE trabajos ADD COLUMN dueno TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_trabajos_huella ON trabajos (tipo, huella)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_trabajos_expira ON trabajos (expira)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_trabajos_estado ON trabajos (estado)")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS procesos (
+                dueno TEXT PRIMARY KEY,
+                pid INTEGER,
+                latido REAL NOT NULL
+            )
+        """)
+
+    def _ejecutar(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._conn.execute(sql, params)
+
+    def crear(self, id_trabajo: str, tipo: str, huella: str, callback_url: Optional[str]) -> None:
+        self._ejecutar(
+            "INSERT INTO trabajos (id, tipo, huella, estado, pid, dueno, callback_url, creado) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (id_trabajo, tipo, huella, EN_COLA, os.getpid(), id_arranque(), callback_url, time.time()),
+        )
+
+    def latir(self) -> None:
+        """Registra que este proceso sigue vivo (y atiende su cola)."""
+        self._ejecutar(
+            "INSERT INTO procesos (dueno, pid, latido) VALUES (?, ?, ?) "
+            "ON CONFLICT (dueno) DO UPDATE SET latido = excluded.latido",
+            (id_arranque(), os.getpid(), time.time()),
+        )
+
+    def buscar_vigente(self, tipo: str, huella: str) -> Optional[str]:
+        """Id de un trabajo igual en cola o en proceso (con dueño vivo), o completado y no expirado."""
+        fila = self._ejecutar(
+            "SELECT t.id FROM trabajos t LEFT JOIN procesos p ON p.dueno = t.dueno "
+            "WHERE t.tipo = ? AND t.huella = ? "
+            "AND ((t.estado IN (?, ?) AND (t.dueno = ? OR p.latido > ?)) OR (t.estado = ? AND t.expira > ?)) "
+            "ORDER BY t.creado DESC LIMIT 1",
+            (tipo, huella, EN_COLA, PROCESANDO, id_arranque(), time.time() - _LATIDO_VENCIDO, COMPLETADO, time.time()),
+        ).fetchone()
+        return fila["id"] if fila else None
+
+    def marcar_procesando(self, id_trabajo: str) -> None:
+        self._ejecutar("UPDATE trabajos SET estado = ?, iniciado = ? WHERE id = ?",
+                       (PROCESANDO, time.time(), id_trabajo))
+
+    def terminar(self, id_trabajo: str, estado: str, status_code: int,
+                 resultado: Optional[bytes] = None, error: Optional[str] = None) -> None:
+        ahora = time.time()
+        self._ejecutar(
+            "UPDATE trabajos SET estado = ?, terminado = ?, expira = ?, status_code = ?, resultado = ?, error = ? WHERE id = ?",
+            (estado, ahora, ahora + TRABAJOS_TTL_SEGUNDOS, status_code, resultado, error, id_trabajo),
+        )
+
+    def obtener(self, id_trabajo: str) -> Optional[Dict[str, Any]]:
+        fila = self._ejecutar("SELECT * FROM trabajos WHERE id = ?", (id_trabajo,)).fetchone()
+        if fila is None:
+            return None
+        if fila["estado"] in (EN_COLA, PROCESANDO) and not self._dueno_vivo(fila["dueno"]):
+            # Sin esperar a la limpieza: quien consulta ve ya que debe reenviarlo
+            self._dar_por_perdido(id_trabajo)
+            fila = self._ejecutar("SELECT * FROM trabajos WHERE id = ?", (id_trabajo,)).fetchone()
+        return dict(fila)
+
+    def _dueno_vivo(self, dueno: Optional[str]) -> bool:
+        if dueno is None:
+            return False
+        if dueno == id_arranque():
+            return True
+        fila = self._ejecutar("SELECT latido FROM procesos WHERE dueno = ?", (dueno,)).fetchone()
+        return fila is not None and fila["latido"] > time.time() - _LATIDO_VENCIDO
+
+    def _dar_por_perdido(self, id_trabajo: str) -> None:
+        ahora = time.time()
+        # Solo si sigue activo: no pisar un resultado que llegó entre medio
+        self._ejecutar(
+            "UPDATE trabajos SET estado = ?, terminado = ?, expira = ?, status_code = ?, error = ? "
+            "WHERE id = ? AND estado IN (?, ?)",
+            (ERROR, ahora, ahora + TRABAJOS_TTL_SEGUNDOS, 503, _MENSAJE_PERDIDO, id_trabajo, EN_COLA, PROCESANDO),
+        )
+
+    def limpiar_expirados(self) -> int:
+        self._ejecutar("DELETE FROM procesos WHERE latido <= ?", (time.time() - max(_LATIDO_VENCIDO, TRABAJOS_TTL_SEGUNDOS),))
+        return self._ejecutar("DELETE FROM trabajos WHERE expira IS NOT NULL AND expira <= ?", (time.time(),)).rowcount
+
+    def recuperar_interrumpidos(self) -> int:
+        """Marca como error los trabajos activos cuyo proceso dueño dejó de latir."""
+        filas = self._ejecutar(
+            "SELECT t.id FROM trabajos t LEFT JOIN procesos p ON p.dueno = t.dueno "
+            "WHERE t.estado IN (?, ?) AND (t.dueno IS NULL OR (t.dueno != ? AND (p.latido IS NULL OR p.latido <= ?)))",
+            (EN_COLA, PROCESANDO, id_arranque(), time.time() - _LATIDO_VENCIDO),
+        ).fetchall()
+        for f in filas:
+            self._dar_por_perdido(f["id"])
+        return len(filas)
+
+    def abandonar_propios(self) -> int:
+        """Al apagar este proceso: sus trabajos activos no van a terminar."""
+        filas = self._ejecutar("SELECT id FROM trabajos WHERE dueno = ? AND estado IN (?, ?)",
+                               (id_arranque(), EN_COLA, PROCESANDO)).fetchall()
+        for f in filas:
+            self._dar_por_perdido(f["id"])
+        self._ejecutar("DELETE FROM procesos WHERE dueno = ?", (id_arranque(),))
+        return len(filas)
+
+    def contar_por_estado(self) -> Dict[str, int]:
+        filas = self._ejecutar("SELECT estado, COUNT(*) AS n FROM trabajos GROUP BY estado").fetchall()
+        return {f["estado"]: f["n"] for f in filas}
+
+
+class GestorTrabajos:
+    """
+    Cola acotada + pool de hilos trabajadores.
+
+    Los hilos se crean en el primer envío. El contenido en cola es un objeto con
+    leer()/cerrar() (p. ej. DocumentoSubido), así los documentos esperan en disco
+    y no en memoria.
+    """
+
+    def __init__(self, almacen: Optional[AlmacenTrabajos] = None,
+                 trabajadores: int = TRABAJOS_WORKERS, max_cola: int = TRABAJOS_MAX_COLA):
+        self._almacen = almacen
+        self.trabajadores = max(1, trabajadores)
+        self.cola: "queue.Queue" = queue.Queue(maxsize=max(1, max_cola))
+        self._tipos: Dict[str, FuncionTrabajo] = {}
+        self._futuros: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._iniciado = False
+        self.en_proceso = 0
+        self.completados = 0
+        self.errores = 0
+        self.rechazados = 0
+        self.reutilizados = 0
+        self.segundos_total = 0.0
+
+    @property
+    def almacen(self) -> AlmacenTrabajos:
+        if self._almacen is None:
+            self._almacen = AlmacenTrabajos()
+        return self._almacen
+
+    def registrar(self, tipo: str, funcion: FuncionTrabajo) -> None:
+        self._tipos[tipo] = funcion
+
+    @property
+    def tipos(self):
+        return sorted(self._tipos)
+
+    def _iniciar(self) -> None:
+        if self._iniciado:
+            return
+        self.almacen.latir()
+        self.almacen.recuperar_interrumpidos()
+        for i in range(self.trabajadores):
+            threading.Thread(target=self._trabajador, name=f"trabajo-{i}", daemon=True).start()
+        threading.Thread(target=self._limpieza, name="trabajos-limpieza", daemon=True).start()
+        threading.Thread(target=self._latido, name="trabajos-latido", daemon=True).start()
+        self._iniciado = True
+
+    def detener(self) -> None:
+        """Apagado ordenado del proceso: lo que queda en su cola se marca como perdido."""
+        if self._iniciado:
+            self.almacen.abandonar_propios()
+
+    def enviar(self, tipo: str, contenido, huella: str, callback_url: Optional[str] = None) -> Tuple[str, bool]:
+        """
+        Encola un trabajo. Devuelve (id, nuevo); nuevo=False si se reutilizó uno vigente.
+
+        Raises:
+            KeyError si el tipo no está registrado, ColaLlena si no hay espacio.
+        """
+        if tipo not in self._tipos:
+            raise KeyError(tipo)
+        with self._lock:
+            self._iniciar()
+            existente = self.almacen.buscar_vigente(tipo, huella)
+            if existente is not None:
+                self.reutilizados += 1
+                contenido.cerrar()
+                return existente, False
+            if self.cola.full():
+                self.rechazados += 1
+                contenido.cerrar()
+                raise ColaLlena()
+            id_trabajo = uuid.uuid4().hex
+            self.almacen.crear(id_trabajo, tipo, huella, callback_url)
+            self._futuros[id_trabajo] = Future()
+            self.cola.put_nowait((id_trabajo, tipo, contenido, callback_url))
+        return id_trabajo, True
+
+    def futuro(self, id_trabajo: str) -> Optional[Future]:
+        """Futuro del trabajo si se encoló en este proceso (para esperar sin sondear)."""
+        return self._futuros.get(id_trabajo)
+
+    def obtener(self, id_trabajo: str) -> Optional[Dict[str, Any]]:
+        return self.almacen.obtener(id_trabajo)
+
+    def _trabajador(self) -> None:
+        while True:
+            id_trabajo, tipo, contenido, callback_url = self.cola.get()
+            with self._lock:
+                self.en_proceso += 1
+            t0 = time.perf_counter()
+            try:
+                self.almacen.marcar_procesando(id_trabajo)
+                try:
+                    datos = contenido.leer()
+                finally:
+                    contenido.cerrar()
+                status_code, cuerpo = self._tipos[tipo](datos)
+                estado = COMPLETADO if status_code < 500 else ERROR
+                self.almacen.terminar(id_trabajo, estado, status_code, resultado=cuerpo)
+            except Exception as e:
+                estado, status_code = ERROR, 500
+                try:
+                    self.almacen.terminar(id_trabajo, ERROR, 500, error=f"Error interno: {str(e)}")
+                except Exception:
+                    # Si el almacén falla (SQLite ocupado, disco lleno) el hilo
+                    # debe seguir vaciando la cola
+                    logger.exception("no se pudo registrar el error del trabajo %s", id_trabajo)
+            finally:
+                with self._lock:
+                    self.en_proceso -= 1
+                    self.segundos_total += time.perf_counter() - t0
+                    if estado == COMPLETADO:
+                        self.completados += 1
+                    else:
+                        self.errores += 1
+                    futuro = self._futuros.pop(id_trabajo, None)
+                self.cola.task_done()
+            if futuro is not None:
+                futuro.set_result(estado)
+            if callback_url:
+                threading.Thread(target=self._notificar, args=(id_trabajo,), daemon=True).start()
+
+    def _notificar(self, id_trabajo: str) -> None:
+        """POST del resultado a callback_url con reintentos y espera creciente."""
+        trabajo = self.almacen.obtener(id_trabajo)
+        if trabajo is None:
+            return
+        cuerpo = serializar_trabajo(trabajo)
+        for intento in range(max(1, TRABAJOS_CALLBACK_REINTENTOS)):
+            try:
+                # La resolución pudo cambiar desde que se encoló; sin redirecciones,
+                # que podrían llevar a una dirección interna
+                validar_callback_url(trabajo["callback_url"])
+            except ValueError as e:
+                logger.warning("callback de %s descartado: %s", id_trabajo, e)
+                return
+            try:
+                r = requests.post(trabajo["callback_url"], data=cuerpo, timeout=TRABAJOS_CALLBACK_TIMEOUT,
+                                  headers={"Content-Type": "application/json"}, allow_redirects=False)
+                if r.status_code < 500:
+                    return
+            except requests.RequestException:
+                pass
+            time.sleep(2 ** intento)
+
+    def _limpieza(self) -> None:
+        intervalo = max(10, min(300, TRABAJOS_TTL_SEGUNDOS // 4))
+        while True:
+            time.sleep(intervalo)
+            try:
+                self.almacen.recuperar_interrumpidos()
+                self.almacen.limpiar_expirados()
+            except sqlite3.Error:
+                pass
+
+    def _latido(self) -> None:
+        while True:
+            time.sleep(TRABAJOS_LATIDO_SEGUNDOS)
+            try:
+                self.almacen.latir()
+            except sqlite3.Error:
+                pass
+
+    def metricas(self) -> Dict[str, Any]:
+        terminados = self.completados + self.errores
+        return {
+            "cola": self.cola.qsize(),
+            "capacidad_cola": self.cola.maxsize,
+            "en_proceso": self.en_proceso,
+            "trabajadores": self.trabajadores,
+            "completados": self.completados,
+            "errores": self.errores,
+            "rechazados_cola_llena": self.rechazados,
+            "reutilizados": self.reutilizados,
+            "segundos_promedio": round(self.segundos_total / terminados, 3) if terminados else None,
+            "por_estado": self.almacen.contar_por_estado(),
+        }
+
+
+def serializar_trabajo(trabajo: Dict[str, Any]) -> bytes:
+    """JSON del trabajo; el resultado ya serializado se inserta sin reparsearlo."""
+    meta = {
+        "id": trabajo["id"],
+        "tipo": trabajo["tipo"],
+        "estado": trabajo["estado"],
+        "creado": trabajo["creado"],
+        "iniciado": trabajo["iniciado"],
+        "terminado": trabajo["terminado"],
+        "expira": trabajo["expira"],
+    }
+    if trabajo["status_code"] is not None:
+        meta["status_code"] = trabajo["status_code"]
+    if trabajo["error"]:
+        meta["error"] = trabajo["error"]
+    base = json.dumps(meta, ensure_ascii=False).encode("utf-8")
+    if trabajo["resultado"] is not None:
+        base = base[:-1] + b',"resultado":' + bytes(trabajo["resultado"]) + b"}"
+    return base
+
+
+gestor = GestorTrabajos()
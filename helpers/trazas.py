@@ -0,0 +1,254 @@
+"""
+Trazas por petición: etapas con duración y atributos.
+
+Cada petición HTTP abre una Traza (MiddlewareTrazas) que queda en un
+contextvar; el código la alimenta con:
+
+    with span("sri"):                 # etapa con nombre
+        ...
+    log_step("5) Validación SRI", t0, "sri")   # etapa ya medida (utils.log_step)
+    contar("tesseract")               # contador (llamadas, aciertos de caché, ...)
+    fijar("paginas", n)               # atributo
+
+Al terminar, la traza se exporta como:
+- cabecera Server-Timing (duración total por etapa)
+- una línea JSON en el logger "trazas"
+- un bloque "timings" dentro de la respuesta JSON, si se pide con ?timings=true
+  o la cabecera X-Timings: 1
+
+Sin traza activa (scripts, hilos de lotes, procesos de páginas) la traza es
+no-op, pero las etapas con nombre (span y log_step con etapa) siempre alimentan
+los histogramas de helpers/metricas.
+"""
+
+import contextvars
+import json
+import logging
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from config import TRAZAS_ACTIVAS, TRAZAS_LOG
+from .metricas import duracion_etapa, duracion_peticion, peticiones, tesseract
+
+logger = logging.getLogger("trazas")
+
+_actual: contextvars.ContextVar[Optional["Traza"]] = contextvars.ContextVar("traza_actual", default=None)
+
+_NOMBRE_METRICA = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+class Traza:
+    """Etapas y atributos de una petición; segura entre hilos."""
+
+    def __init__(self, metodo: str = "", ruta: str = ""):
+        self.id = uuid.uuid4().hex[:16]
+        self.metodo = metodo
+        self.ruta = ruta
+        self.inicio = time.perf_counter()
+        self.status: Optional[int] = None
+        # (nombre, inicio relativo en s, duración en s), en orden de finalización
+        self.spans: List[Tuple[str, float, float]] = []
+        self.atributos: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, nombre: str, t0: float, t1: Optional[float] = None) -> None:
+        if t1 is None:
+            t1 = time.perf_counter()
+        with self._lock:
+            self.spans.append((nombre, t0 - self.inicio, t1 - t0))
+
+    def contar(self, nombre: str, n: int = 1) -> None:
+        with self._lock:
+            self.atributos[nombre] = self.atributos.get(nombre, 0) + n
+
+    def fijar(self, nombre: str, valor: Any) -> None:
+        with self._lock:
+            self.atributos[nombre] = valor
+
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.inicio) * 1000.0
+
+    def por_etapa(self) -> Dict[str, Dict[str, Any]]:
+        """Duración acumulada (ms) y número de veces por nombre de etapa."""
+        etapas: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            spans = list(self.spans)
+        for nombre, _, duracion in spans:
+            etapa = etapas.setdefault(nombre, {"ms": 0.0, "veces": 0})
+            etapa["ms"] += duracion * 1000.0
+            etapa["veces"] += 1
+        for etapa in etapas.values():
+            etapa["ms"] = round(etapa["ms"], 2)
+        return etapas
+
+    def server_timing(self) -> str:
+        partes = []
+        for nombre, etapa in self.por_etapa().items():
+            metrica = _NOMBRE_METRICA.sub("_", nombre).strip("_") or "etapa"
+            parte = f"{metrica};dur={etapa['ms']}"
+            if metrica != nombre:
+                parte += ';desc="' + nombre.replace('"', "'").replace("\\", "/") + '"'
+            partes.append(parte)
+        partes.append(f"total;dur={round(self.total_ms(), 2)}")
+        return ", ".join(partes)
+
+    def como_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            atributos = dict(self.atributos)
+        return {
+            "id": self.id,
+            "metodo": self.metodo,
+            "ruta": self.ruta,
+            "status": self.status,
+            "total_ms": round(self.total_ms(), 2),
+            "etapas": self.por_etapa(),
+            "atributos": atributos,
+        }
+
+
+def traza_actual() -> Optional[Traza]:
+    return _actual.get()
+
+
+@contextmanager
+def activar(traza: Traza):
+    """Usa `traza` como traza actual dentro del bloque (scripts y benchmarks, fuera del middleware)."""
+    token = _actual.set(traza)
+    try:
+        yield traza
+    finally:
+        _actual.reset(token)
+
+
+@contextmanager
+def span(nombre: str):
+    """Mide el bloque como etapa `nombre` de la traza actual."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        registrar_span(nombre, t0)
+
+
+def registrar_span(nombre: str, t0: float, metrica: bool = True) -> None:
+    """Registra una etapa que empezó en t0 y termina ahora (y la observa en los histogramas si `metrica`)."""
+    t1 = time.perf_counter()
+    if metrica:
+        duracion_etapa.observar(t1 - t0, etapa=nombre)
+    traza = _actual.get()
+    if traza is not None:
+        traza.registrar(nombre, t0, t1)
+
+
+def contar(nombre: str, n: int = 1) -> None:
+    traza = _actual.get()
+    if traza is not None:
+        traza.contar(nombre, n)
+
+
+def fijar(nombre: str, valor: Any) -> None:
+    traza = _actual.get()
+    if traza is not None:
+        traza.fijar(nombre, valor)
+
+
+def instrumentar_tesseract() -> None:
+    """Cuenta las invocaciones al binario de Tesseract (atributo "tesseract") en la traza actual."""
+    try:
+        from pytesseract import pytesseract as _pt
+    except ImportError:
+        return
+    original = _pt.run_tesseract
+    if getattr(original, "_contado", False):
+        return
+
+    def run_tesseract(*args, **kwargs):
+        tesseract.inc()
+        contar("tesseract")
+        with span("tesseract"):
+            return original(*args, **kwargs)
+
+    run_tesseract._contado = True
+    _pt.run_tesseract = run_tesseract
+
+
+def _pide_timings(scope) -> bool:
+    for nombre, valor in scope.get("headers") or []:
+        if nombre == b"x-timings":
+            return valor.strip().lower() in (b"1", b"true")
+    query = parse_qs((scope.get("query_string") or b"").decode("latin-1"))
+    return (query.get("timings") or [""])[-1].lower() in ("1", "true")
+
+
+class MiddlewareTrazas:
+    """Middleware ASGI que abre la traza de cada petición y la exporta al responder."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not TRAZAS_ACTIVAS:
+            await self.app(scope, receive, send)
+            return
+
+        traza = Traza(scope.get("method", ""), scope.get("path", ""))
+        token = _actual.set(traza)
+        incluir = _pide_timings(scope)
+        inicio_respuesta: Optional[dict] = None
+        cuerpo: Optional[bytearray] = None
+
+        async def enviar(mensaje):
+            nonlocal inicio_respuesta, cuerpo
+            if mensaje["type"] == "http.response.start":
+                traza.status = mensaje["status"]
+                cabeceras = [(k, v) for k, v in mensaje.get("headers", [])]
+                tipo = next((v for k, v in cabeceras if k.lower() == b"content-type"), b"")
+                if incluir and tipo.startswith(b"application/json"):
+                    # Se retiene hasta tener el cuerpo completo para insertar "timings"
+                    inicio_respuesta = dict(mensaje, headers=cabeceras)
+                    cuerpo = bytearray()
+                    return
+                mensaje = dict(mensaje, headers=cabeceras + _cabeceras_traza(traza))
+            elif mensaje["type"] == "http.response.body" and cuerpo is not None:
+                cuerpo += mensaje.get("body", b"")
+                if mensaje.get("more_body", False):
+                    return
+                datos = _insertar_timings(bytes(cuerpo), traza)
+                cabeceras = [(k, v) for k, v in inicio_respuesta["headers"] if k.lower() != b"content-length"]
+                cabeceras.append((b"content-length", str(len(datos)).encode("latin-1")))
+                await send(dict(inicio_respuesta, headers=cabeceras + _cabeceras_traza(traza)))
+                mensaje = {"type": "http.response.body", "body": datos, "more_body": False}
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _actual.reset(token)
+            # Plantilla de la ruta (/jobs/{id_trabajo}) para no multiplicar series por id
+            ruta = getattr(scope.get("route"), "path", None) or "sin_ruta"
+            peticiones.inc(metodo=traza.metodo, ruta=ruta, status=str(traza.status or 500))
+            duracion_peticion.observar(traza.total_ms() / 1000.0, metodo=traza.metodo, ruta=ruta)
+            if TRAZAS_LOG:
+                logger.info(json.dumps(traza.como_dict(), ensure_ascii=False, default=str))
+
+
+def _cabeceras_traza(traza: Traza) -> List[Tuple[bytes, bytes]]:
+    return [
+        (b"server-timing", traza.server_timing().encode("latin-1", "replace")),
+        (b"x-request-id", traza.id.encode("latin-1")),
+    ]
+
+
+def _insertar_timings(datos: bytes, traza: Traza) -> bytes:
+    """Agrega "timings" al objeto JSON de la respuesta sin reparsearlo."""
+    datos = datos.rstrip()
+    if not datos.startswith(b"{") or not datos.endswith(b"}"):
+        return datos
+    timings = json.dumps(traza.como_dict(), ensure_ascii=False, default=str).encode("utf-8")
+    separador = b"," if datos[1:-1].strip() else b""
+    return datos[:-1] + separador + b'"timings":' + timings + b"}"
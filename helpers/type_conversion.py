@@ -1,11 +1,25 @@
 """
 Helper functions to convert NumPy types to Python native types for JSON serialization.
 This prevents Pydantic serialization errors with numpy.bool, numpy.int64, etc.
+
+Responses should use NumpyJSONResponse, which converts NumPy types while
+encoding; safe_serialize_dict is kept for callers that need a plain-Python copy.
 """
 
+import json
 import numpy as np
 from typing import Any, Dict, List, Union
 
+from starlette.responses import JSONResponse
+
+# Optional orjson import (fast path); falls back to json with the same numpy hook
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
 
 def convert_numpy_types(obj: Any) -> Any:
     """
@@ -104,3 +118,68 @@ def ensure_python_int(value: Any) -> int:
         return int(value)
     else:
         return int(value)
+
+
+def _numpy_default(obj: Any) -> Any:
+    """
+    Default hook for the JSON encoder: called only for values the encoder
+    cannot serialize natively (numpy scalars/arrays, sets, bytes).
+    """
+    if isinstance(obj, np.bool_):
+        return bool(obj)
+    if isinstance(obj, np.integer):
+        return int(obj)
+    if isinstance(obj, np.floating):
+        return float(obj)
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, (bytes, bytearray)):
+        return obj.decode("utf-8", errors="replace")
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps_json(data: Any) -> bytes:
+    """
+    Serializes data to JSON bytes in a single pass, converting NumPy types on
+    the fly instead of rebuilding the tree first (see safe_serialize_dict).
+
+    Uses orjson with OPT_SERIALIZE_NUMPY when available. NaN/Infinity are
+    emitted as null in both paths.
+    """
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(
+            data,
+            default=_numpy_default,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+        )
+    try:
+        texto = json.dumps(data, ensure_ascii=False, allow_nan=False, default=_numpy_default, separators=(",", ":"))
+    except ValueError:
+        # NaN/Infinity: same output as orjson (null)
+        texto = json.dumps(_nan_to_none(convert_numpy_types(data)), ensure_ascii=False,
+                           default=_numpy_default, separators=(",", ":"))
+    return texto.encode("utf-8")
+
+
+def _nan_to_none(obj: Any) -> Any:
+    if isinstance(obj, float) and (obj != obj or obj in (float("inf"), float("-inf"))):
+        return None
+    if isinstance(obj, dict):
+        return {key: _nan_to_none(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_nan_to_none(item) for item in obj]
+    return obj
+
+
+class NumpyJSONResponse(JSONResponse):
+    """
+    JSONResponse that serializes NumPy types directly (see dumps_json).
+
+    This is the single serialization step at the response boundary; helpers
+    return their results as-is, NumPy values included.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps_json(content)
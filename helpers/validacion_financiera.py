@@ -11,6 +11,7 @@ Valida:
 import re
 from typing import Dict, Any, List, Optional
 from utils import _to_float
+from .tokens_financieros import ETIQUETAS, Linea, tokenizar
 
 
 # ============================= Aliases / helpers ============================= #
@@ -48,6 +49,21 @@ TOTAL_KEYS = [
 ]
 PROPINA_KEYS = ["propina", "servicio", "service", "tip", "valor_propina"]
 
+# Importe en contexto de palabra clave (antes o después), sobre la línea en minúsculas
+_PATRONES_CONTEXTO = [
+    (re.compile(p, re.IGNORECASE), tipo) for p, tipo in (
+        # Subtotal patterns
+        (r'(?:subtotal|sub\s*total|base).*?(\d{1,6}[.,]\d{2})', 'subtotal'),
+        (r'(\d{1,6}[.,]\d{2}).*?(?:subtotal|sub\s*total|base)', 'subtotal'),
+        # IVA patterns
+        (r'(?:iva|i\.v\.a|impuesto).*?(\d{1,6}[.,]\d{2})', 'iva'),
+        (r'(\d{1,6}[.,]\d{2}).*?(?:iva|i\.v\.a|impuesto)', 'iva'),
+        # Total patterns
+        (r'(?:total|valor.*?total|importe).*?(\d{1,6}[.,]\d{2})', 'total'),
+        (r'(\d{1,6}[.,]\d{2}).*?(?:total|valor.*?total|importe)', 'total'),
+    )
+]
+
 
 # =============================== Entry point =============================== #
 
@@ -377,115 +393,26 @@ def _extraer_valores_del_texto(texto: str, resultado: Dict[str, Any]) -> Dict[st
     if not texto:
         return valores
 
-    # Normaliza saltos y espacios (no quites acentos aquí)
-    T = texto.replace("\r", "")
-    lines = [re.sub(r"[ \t]+", " ", ln).strip() for ln in T.split("\n")]
-
-    # Patrones de números mejorados para diferentes formatos
-    money_patterns = [
-        r'(-?\d{1,3}(?:[.,]\d{3})*[.,]\d{2})',  # Con decimales: 1,234.56 o 1.234,56
-        r'(-?\d+[.,]\d{2})',                    # Simple con decimales: 123.45
-        r'(-?\d{1,3}(?:[.,]\d{3})+)',          # Miles sin decimales: 1,234
-        r'(-?\d+)'                             # Enteros simples: 123
-    ]
-    
-    def _parse_money(s: str):
-        """Extrae el primer número monetario encontrado en la cadena."""
-        for pattern in money_patterns:
-            matches = re.findall(pattern, s)
-            if matches:
-                # Tomar el primer número válido
-                for match in matches:
-                    val = _to_float(match.replace(",", "."))
-                    if val is not None and val >= 0:  # Solo valores positivos para montos
-                        return val
-        return None
-
-    def _find_after(label_patterns: List[str], next_window: int = 3):
+    # Líneas tokenizadas una sola vez por documento (etiquetas e importes por línea)
+    doc = tokenizar(texto)
+    lines = [linea.texto for linea in doc.lineas]
+
+    def _find_after(concepto: str, next_window: int = 3):
         """
-        Busca una línea que matchee cualquiera de los patrones.
-        Si no hay importe en esa línea, busca en las siguientes 'next_window' líneas.
-        Devuelve el primer número encontrado (float) y la línea donde apareció.
+        Primera línea con la etiqueta `concepto` que tenga importe en esa misma
+        línea o en las siguientes 'next_window' líneas.
+        Devuelve el importe (float) y la línea donde apareció.
         """
-        pat_list = [re.compile(pat, re.IGNORECASE) for pat in label_patterns]
-        for i, ln in enumerate(lines):
-            if any(p.search(ln) for p in pat_list):
-                # 1) mismo renglón
-                val = _parse_money(ln)
-                if val is not None:
-                    return val, ln
-                # 2) renglones siguientes (1..next_window)
-                for k in range(1, next_window + 1):
-                    if i + k < len(lines):
-                        val = _parse_money(lines[i + k])
-                        if val is not None:
-                            return val, lines[i + k]
+        for i in doc.con_etiqueta(concepto):
+            for k in range(0, next_window + 1):
+                if i + k < len(lines):
+                    val = doc.lineas[i + k].monto
+                    if val is not None:
+                        return val, lines[i + k]
         return None, None
 
-    # Mapa de etiquetas → claves de salida (patrones robustos para múltiples formatos)
-    etiquetas = {
-        # Patrones específicos basados en formato común ecuatoriano
-        "subtotal_15":            [
-            r'\bSUBTOTAL\s*15%\b', r'\bSUBTOTAL\s+15%\b',
-            r'SUBTOTAL\s*15%', r'SUB\s*TOTAL\s*15%'
-        ],
-        "subtotal_0":             [
-            r'\bSUBTOTAL\s*0%\b', r'\bSUBTOTAL\s+0%\b',
-            r'SUBTOTAL\s*0%', r'SUB\s*TOTAL\s*0%'
-        ],
-        "subtotal_no_objeto":     [
-            r'\bSUBTOTAL\s*No\s*objeto\s*de\s*IVA\b',
-            r'SUBTOTAL\s*No\s*objeto\s*de\s*IVA',
-            r'SUB\s*TOTAL\s*No\s*objeto\s*IVA'
-        ],
-        "subtotal_exento":        [
-            r'\bSUBTOTAL\s*Exento\s*de\s*IVA\b',
-            r'SUBTOTAL\s*Exento\s*de\s*IVA',
-            r'SUB\s*TOTAL\s*Exento\s*IVA'
-        ],
-        "subtotal_sin_impuestos": [
-            r'\bSUBTOTAL\s*SIN\s*IMPUESTOS\b',
-            r'SUBTOTAL\s+SIN\s+IMPUESTOS',
-            r'SUB\s*TOTAL\s*SIN\s*IMPUESTOS',
-            r'BASE\s*IMPONIBLE',
-            r'SUBTOTAL\s*GRAVADO'
-        ],
-        "iva_15":                 [
-            r'\bIVA\s*15%\b', r'IVA\s+15%',
-            r'IVA\s*15\s*%', r'I\.V\.A\.?\s*15%?',
-            r'IMPUESTO\s*15%'
-        ],
-        "total_descuento":        [
-            r'\bTOTAL\s*Descuento\b', r'\bDESCUENTO\b',
-            r'TOTAL\s*DESCUENTO', r'DESC\w*'
-        ],
-        "propina":                [r'\bPROPINA\b', r'SERVICIO', r'TIP'],
-        "valor_total":            [
-            r'\bVALOR\s*TOTAL\b', r'VALOR\s+TOTAL',
-            r'TOTAL\s*A\s*PAGAR', r'GRAN\s*TOTAL',
-            r'IMPORTE\s*TOTAL', r'MONTO\s*TOTAL',
-            # Patrones específicos para formato ecuatoriano mostrado
-            r'VALOR\s*TOTAL\s*$',
-            r'VALOR\s*TOTAL\s*\n',
-            r'(?:VALOR|TOTAL|IMPORTE|MONTO)\s*(?:TOTAL|FINAL|A\s*PAGAR)?'
-        ],
-        "ice":                    [r'\bICE\b'],
-        "irbpnr":                 [r'\bIRBPNR\b'],
-        # Cabecera de la tabla inferior con más variaciones
-        "forma_pago_header":      [
-            r'\bFORMA\s*PAGO\b.*\bVALOR\b',
-            r'FORMA\s*DE\s*PAGO.*VALOR',
-            r'METODO\s*PAGO.*VALOR'
-        ],
-        # Patrones adicionales específicos para formato de tabla ecuatoriano
-        "tarjeta_credito_valor":  [
-            r'TARJETA\s*DE\s*CREDITO',
-            r'TARJETA\s*CREDITO'
-        ]
-    }
-
-    for key, pats in etiquetas.items():
-        val, matched_line = _find_after(pats, next_window=6 if key == "forma_pago_header" else 3)
+    for key in ETIQUETAS:
+        val, matched_line = _find_after(key, next_window=6 if key == "forma_pago_header" else 3)
         if val is not None:
             if key == "forma_pago_header":
                 out_key = "forma_pago_valor"
@@ -524,9 +451,8 @@ def _extraer_valores_del_texto(texto: str, resultado: Dict[str, Any]) -> Dict[st
             for i in range(max(0, len(lines) - 10), len(lines)):
                 line = lines[i]
                 # Solo números con decimales (formato moneda)
-                numeros = re.findall(r'(\d{1,3}[.,]\d{2})', line)
-                for num_str in numeros:
-                    num = _to_float(num_str.replace(',', '.'))
+                for importe in doc.lineas[i].decimales_hasta(3):
+                    num = importe.valor
                     if num and 1.0 <= num <= 100.0:  # Rango muy específico
                         score = 100  # Score base alto
                         line_lower = line.lower()
@@ -583,7 +509,8 @@ def _extraccion_robusta_sin_sri(pdf_fields: Dict[str, Any], fuente_texto: str) -
     if not fuente_texto:
         return valores
     
-    lines = [line.strip() for line in fuente_texto.split('\n') if line.strip()]
+    doc = tokenizar(fuente_texto)
+    lines = [doc.lineas[i] for i in doc.no_vacias]
     
     # === ESTRATEGIA 1: Análisis de patrones numéricos en contexto ===
     valores_contexto = _extraer_por_contexto_numerico(lines)
@@ -609,29 +536,16 @@ def _extraccion_robusta_sin_sri(pdf_fields: Dict[str, Any], fuente_texto: str) -
     return valores_validados
 
 
-def _extraer_por_contexto_numerico(lines: List[str]) -> Dict[str, float]:
+def _extraer_por_contexto_numerico(lines: List[Linea]) -> Dict[str, float]:
     """Extrae valores buscando números en contexto de palabras clave."""
     valores = {}
     
-    # Patrones más agresivos con contexto
-    patrones_contexto = [
-        # Subtotal patterns
-        (r'(?:subtotal|sub\s*total|base).*?(\d{1,6}[.,]\d{2})', 'subtotal'),
-        (r'(\d{1,6}[.,]\d{2}).*?(?:subtotal|sub\s*total|base)', 'subtotal'),
-        
-        # IVA patterns
-        (r'(?:iva|i\.v\.a|impuesto).*?(\d{1,6}[.,]\d{2})', 'iva'),
-        (r'(\d{1,6}[.,]\d{2}).*?(?:iva|i\.v\.a|impuesto)', 'iva'),
-        
-        # Total patterns
-        (r'(?:total|valor.*?total|importe).*?(\d{1,6}[.,]\d{2})', 'total'),
-        (r'(\d{1,6}[.,]\d{2}).*?(?:total|valor.*?total|importe)', 'total'),
-    ]
-    
     for line in lines:
-        line_lower = line.lower()
-        for patron, tipo in patrones_contexto:
-            matches = re.findall(patron, line_lower, re.IGNORECASE)
+        # Los patrones exigen un importe: las líneas sin ninguno se saltan
+        if not line.decimales:
+            continue
+        for patron, tipo in _PATRONES_CONTEXTO:
+            matches = patron.findall(line.minusculas)
             if matches and tipo not in valores:
                 valor = _to_float(matches[0].replace(',', '.'))
                 if valor and 0.01 <= valor <= 999999:
@@ -680,7 +594,7 @@ def _inferir_desde_items(pdf_fields: Dict[str, Any]) -> Dict[str, float]:
     return valores
 
 
-def _extraer_por_posicion_formato(lines: List[str]) -> Dict[str, float]:
+def _extraer_por_posicion_formato(lines: List[Linea]) -> Dict[str, float]:
     """Busca totales en posiciones típicas con formato de moneda."""
     valores = {}
     
@@ -688,16 +602,15 @@ def _extraer_por_posicion_formato(lines: List[str]) -> Dict[str, float]:
     candidatos = []
     
     for i in range(max(0, len(lines) - 15), len(lines)):
-        line = lines[i]
-        # Buscar números con formato monetario
-        numeros = re.findall(r'(\d{1,4}[.,]\d{2})', line)
-        
-        for num_str in numeros:
-            valor = _to_float(num_str.replace(',', '.'))
+        line = lines[i].texto
+        # Números con formato monetario (tokens de la línea)
+        for importe in lines[i].decimales_hasta(4):
+            num_str = importe.texto
+            valor = importe.valor
             if valor and 1.0 <= valor <= 10000:  # Rango razonable
                 
                 score = 0
-                line_lower = line.lower()
+                line_lower = lines[i].minusculas
                 
                 # Scoring por contexto
                 if any(word in line_lower for word in ['total', 'valor', 'importe', 'pagar']):
@@ -804,12 +717,11 @@ def _analisis_estadistico_numeros(texto: str) -> Dict[str, float]:
     """Análisis estadístico de números en el texto para inferir totales."""
     valores = {}
     
-    # Extraer todos los números decimales del texto
-    numeros = re.findall(r'\d{1,6}[.,]\d{2}', texto)
+    # Todos los importes decimales del texto (tokens ya extraídos)
     valores_numericos = []
     
-    for num_str in numeros:
-        val = _to_float(num_str.replace(',', '.'))
+    for importe in tokenizar(texto).decimales(6):
+        val = importe.valor
         if val and 1.0 <= val <= 10000:
             valores_numericos.append(val)
     
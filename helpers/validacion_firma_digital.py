@@ -21,6 +21,7 @@ import hashlib
 from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 import base64
+from functools import lru_cache
 
 try:
     from asn1crypto import cms, x509, algos
@@ -44,7 +45,30 @@ except ImportError:
     ValidationContext = CertificateValidator = certifi = None
     CERTVALIDATOR_AVAILABLE = False
 
-from .type_conversion import safe_serialize_dict, ensure_python_bool
+from .type_conversion import ensure_python_bool
+
+
+@lru_cache(maxsize=1)
+def raices_confianza() -> Tuple:
+    """
+    Raíces de confianza de Mozilla (bundle de certifi), parseadas una vez por proceso.
+
+    Antes se leía y dividía el PEM en cada validación de cadena. Se puede
+    precargar antes de bifurcar los workers para compartirlas.
+    """
+    if not CERTVALIDATOR_AVAILABLE:
+        return ()
+    with open(certifi.where(), 'rb') as f:
+        pem_data = f.read()
+    roots = []
+    # Dividir PEM concatenado
+    for m in re.finditer(b'-----BEGIN CERTIFICATE-----.*?-----END CERTIFICATE-----',
+                         pem_data, re.DOTALL):
+        try:
+            roots.append(x509.Certificate.load(m.group(0)))
+        except Exception:
+            continue
+    return tuple(roots)
 
 
 def _map_hash_oid(oid: str) -> str:
@@ -278,19 +302,8 @@ def _validate_certificate_chain(signer_cert, intermediate_certs: List) -> Dict[s
         }
     
     try:
-        # Cargar raíces de confianza de Mozilla
-        roots = []
-        with open(certifi.where(), 'rb') as f:
-            pem_data = f.read()
-        
-        # Dividir PEM concatenado
-        for m in re.finditer(b'-----BEGIN CERTIFICATE-----.*?-----END CERTIFICATE-----', 
-                           pem_data, re.DOTALL):
-            try:
-                cert = x509.Certificate.load(m.group(0))
-                roots.append(cert)
-            except Exception:
-                continue
+        # Raíces de confianza de Mozilla
+        roots = list(raices_confianza())
         
         if not roots:
             return {
@@ -364,7 +377,7 @@ def validate_pdf_signatures(pdf_bytes: bytes,
     # Buscar firmas
     sigs = _find_signatures(pdf_bytes)
     if not sigs:
-        return safe_serialize_dict(result)
+        return result
     
     result['firma_detectada'] = True
     result['resumen']['total_firmas'] = len(sigs)
@@ -512,7 +525,7 @@ def validate_pdf_signatures(pdf_bytes: bytes,
         if f.get('message_digest_match') and not f.get('doc_modified_after_signature')
     )
     
-    return safe_serialize_dict(result)
+    return result
 
 
 def detectar_firmas_pdf_simple(pdf_bytes: bytes) -> bool:
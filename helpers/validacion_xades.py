@@ -41,7 +41,7 @@ except ImportError:
     ValidationContext = CertificateValidator = certifi = None
     CERTVALIDATOR_AVAILABLE = False
 
-from .type_conversion import safe_serialize_dict, ensure_python_bool
+from .type_conversion import ensure_python_bool
 
 
 def validar_xades(xml_content: str) -> Dict[str, Any]:
@@ -65,12 +65,12 @@ def validar_xades(xml_content: str) -> Dict[str, Any]:
         
         if not firmas_xades:
             print("[DEBUG XAdES] No se encontraron firmas XAdES")
-            return safe_serialize_dict({
+            return {
                 "firma_detectada": False,
                 "tipo_firma": "ninguna",
                 "firmas": [],
                 "resumen": "No se detectaron firmas XAdES en el documento"
-            })
+            }
         
         # Validar cada firma
         firmas_validadas = []
@@ -82,7 +82,7 @@ def validar_xades(xml_content: str) -> Dict[str, Any]:
         # Calcular resumen
         resumen = _calcular_resumen_xades(firmas_validadas)
         
-        return safe_serialize_dict({
+        return {
             "firma_detectada": True,
             "tipo_firma": "xades",
             "firmas": firmas_validadas,
@@ -92,15 +92,15 @@ def validar_xades(xml_content: str) -> Dict[str, Any]:
                 "oscrypto": OSCRYPTO_AVAILABLE,
                 "certvalidator": CERTVALIDATOR_AVAILABLE
             }
-        })
+        }
         
     except Exception as e:
-        return safe_serialize_dict({
+        return {
             "firma_detectada": False,
             "error": f"Error procesando XML: {str(e)}",
             "firmas": [],
             "resumen": "Error en análisis"
-        })
+        }
 
 
 def _buscar_firmas_xades(root: ET.Element) -> List[Dict[str, Any]]:
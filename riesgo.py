@@ -1,7 +1,8 @@
+import logging
 import re
 import statistics
 from datetime import datetime, date
-from typing import Dict, Any, List, Tuple, Optional
+from typing import Dict, Any, List, Mapping, Tuple, Optional
 from collections import Counter, defaultdict
 from difflib import SequenceMatcher
 import json
@@ -10,11 +11,11 @@ import fitz  # PyMuPDF
 # from defauld import detectar_texto_sobrepuesto_base64 # No necesario, usamos la función local
  
 
-try:
-    import pdfplumber
-    PDFPLUMBER_AVAILABLE = True
-except ImportError:
-    PDFPLUMBER_AVAILABLE = False
+from helpers.importacion_diferida import disponible, modulo_diferido
+
+# pdfplumber se importa en el primer uso
+PDFPLUMBER_AVAILABLE = disponible("pdfplumber")
+pdfplumber = modulo_diferido("pdfplumber")
 
 
 from sri import (
@@ -23,21 +24,74 @@ from sri import (
     factura_xml_to_json,
     validar_clave_acceso_interna,
 )
-from helpers.type_conversion import safe_serialize_dict, ensure_python_bool
+from helpers.type_conversion import ensure_python_bool
+from helpers.nivel_detalle import COMPLETO
+from helpers.trazas import span
+from helpers.perfilado import perfilable
+from helpers import config_riesgo
+from helpers.config_riesgo import ConfigRiesgo
 
 from config import (
     TEXT_MIN_LEN_FOR_DOC,
     ONEPAGE_MIN_BYTES,
     ONEPAGE_MAX_BYTES_TEXTUAL,
     ONEPAGE_MAX_BYTES_ESCANEADO,
-    RISK_WEIGHTS,
-    RISK_LEVELS,
     STD_IMAGE_FILTERS,
 )
 from utils import _to_float
 from helpers.validacion_financiera import validar_contenido_financiero
+from helpers.tokens_financieros import tokenizar
 from helpers.firma_digital import analizar_firmas_digitales, tiene_firma_digital
 from helpers.deteccion_capas import LayerDetector, detect_layers_advanced, calculate_dynamic_penalty
+from helpers.politica_paginas import planificar_paginas
+from helpers.inventario_imagenes import InventarioImagenes
+from helpers.paralelo_paginas import DocumentoCompartido, mapear_paginas
+
+logger = logging.getLogger(__name__)
+
+# Patrones de la consistencia matemática desde el PDF (compilados una vez). Se
+# aplican al texto completo: varios cruzan saltos de línea entre etiqueta e importe.
+_PATRONES_SUBTOTAL = [re.compile(p, re.I | re.M) for p in (
+    # Formatos ecuatorianos estándar
+    r"subtotal\s*(?:sin\s*)?(?:impuestos?)?\s*:?\s*\$?\s*([0-9]+[.,][0-9]{1,2})",
+    r"subtotal\s*(?:15%|0%)?\s*:?\s*\$?\s*([0-9]+[.,][0-9]{1,2})",
+    r"base\s*imponible\s*:?\s*\$?\s*([0-9]+[.,][0-9]{1,2})",
+    # Búsqueda por posición (después de palabras clave)
+    r"sin\s*impuestos\s*:?\s*\$?\s*([0-9]+[.,][0-9]{1,2})",
+    r"(?:^|\n)\s*([0-9]+[.,][0-9]{2})\s*(?=\n|$)",  # Números aislados
+    # Contexto de tabla
+    r"subtotal.*?([0-9]+[.,][0-9]{2})",
+)]
+
+_PATRONES_IVA = [re.compile(p, re.I | re.M) for p in (
+    # IVA específico ecuatoriano
+    r"iva\s*(?:15%?|12%?)?\s*:?\s*\$?\s*([0-9]+[.,][0-9]{1,2})",
+    r"i\.?v\.?a\.?\s*(?:15%?)?\s*:?\s*\$?\s*([0-9]+[.,][0-9]{1,2})",
+    r"impuesto\s*(?:valor\s*agregado)?\s*:?\s*\$?\s*([0-9]+[.,][0-9]{1,2})",
+    # Después de porcentajes
+    r"15%\s*:?\s*\$?\s*([0-9]+[.,][0-9]{1,2})",
+    r"12%\s*:?\s*\$?\s*([0-9]+[.,][0-9]{1,2})",
+    # Por contexto de tabla
+    r"iva.*?([0-9]+[.,][0-9]{2})",
+)]
+
+_PATRONES_TOTAL = [re.compile(p, re.I | re.M) for p in (
+    # Formatos estándar ecuatorianos MÁS ESPECÍFICOS
+    r"valor\s*total\s*:?\s*\$?\s*([0-9]+[.,][0-9]{1,2})",
+    r"total\s*a\s*pagar\s*:?\s*\$?\s*([0-9]+[.,][0-9]{1,2})",
+    r"importe\s*total\s*:?\s*\$?\s*([0-9]+[.,][0-9]{1,2})",
+    r"gran\s*total\s*:?\s*\$?\s*([0-9]+[.,][0-9]{1,2})",
+    # ESPECÍFICO para facturas con formato de tabla
+    r"valor\s*total\s*\|?\s*([0-9]+[.,][0-9]{2})",
+    r"total\s*\|\s*([0-9]+[.,][0-9]{2})",
+    # Buscar en contexto de líneas finales de tabla
+    r"total.*?([0-9]+[.,][0-9]{2})",
+    # ESPECÍFICO: Números de 2-3 dígitos con decimales en posición de total
+    r"(?:^|\n|\s)([2-9][0-9][.,][0-9]{2})(?:\s*\n|$|\s*$)",  # 20.00-99.99
+    r"(?:^|\n|\s)([1-9][0-9]{2}[.,][0-9]{2})(?:\s*\n|$|\s*$)",  # 100.00-999.99
+    # Búsqueda muy agresiva al final del documento
+    r"(?:^|\n)\s*([0-9]{1,3}[.,][0-9]{2})\s*(?:\n|$)",
+)]
 
 
 def verificar_sri_para_riesgo(
@@ -323,7 +377,8 @@ def _detect_layers(pdf_bytes: bytes) -> bool:
 
 # ================= FUNCIONES DE CONVENIENCIA PARA EL NUEVO SISTEMA =================
 
-def _generate_capas_check_from_complete_response(capas_analisis_completo: Dict[str, Any]) -> Dict[str, Any]:
+def _generate_capas_check_from_complete_response(capas_analisis_completo: Dict[str, Any],
+                                                   pesos: Mapping[str, int]) -> Dict[str, Any]:
     """Genera el check de capas múltiples usando toda la respuesta completa del endpoint universal"""
     
     # Obtener análisis de capas del resultado completo
@@ -338,10 +393,10 @@ def _generate_capas_check_from_complete_response(capas_analisis_completo: Dict[s
     nivel_avanzado = capas_analisis_completo.get("analisis_avanzado_overlay", {}).get("nivel_riesgo", "LOW")
     nivel_imagenes = capas_analisis_completo.get("analisis_imagenes", {}).get("nivel_riesgo_imagenes", "LOW")
     
-    print(f"DEBUG: Niveles de riesgo detectados:")
-    print(f"  - analisis_por_capas: {nivel_capas}")
-    print(f"  - analisis_avanzado_overlay: {nivel_avanzado}")
-    print(f"  - analisis_imagenes: {nivel_imagenes}")
+    logger.debug("Niveles de riesgo detectados:")
+    logger.debug("  - analisis_por_capas: %s", nivel_capas)
+    logger.debug("  - analisis_avanzado_overlay: %s", nivel_avanzado)
+    logger.debug("  - analisis_imagenes: %s", nivel_imagenes)
     
     # Usar el nivel de riesgo más alto
     niveles = [nivel_capas, nivel_avanzado, nivel_imagenes]
@@ -352,20 +407,20 @@ def _generate_capas_check_from_complete_response(capas_analisis_completo: Dict[s
     else:
         nivel_riesgo = "LOW"
     
-    print(f"DEBUG: Nivel de riesgo final calculado: {nivel_riesgo}")
+    logger.debug("Nivel de riesgo final calculado: %s", nivel_riesgo)
     
     # Calcular penalización basada en el nivel de riesgo del helper deteccion_texto_superpuesto
-    peso_base = RISK_WEIGHTS.get("capas_multiples")  # Valor base de capas_multiples
+    peso_base = pesos.get("capas_multiples")  # Valor base de capas_multiples
     
     if nivel_riesgo == "HIGH":
         penalizacion = peso_base  # 100% del valor de capas_multiples
-        print(f"DEBUG: Nivel de riesgo HIGH - Penalización completa: {penalizacion} puntos")
+        logger.debug("Nivel de riesgo HIGH - Penalización completa: %s puntos", penalizacion)
     elif nivel_riesgo == "MEDIUM":
         penalizacion = peso_base # 50% del valor de capas_multiples
-        print(f"DEBUG: Nivel de riesgo MEDIUM - Penalización mitad: {penalizacion} puntos")
+        logger.debug("Nivel de riesgo MEDIUM - Penalización mitad: %s puntos", penalizacion)
     else:  # LOW
         penalizacion = 0  # 0% - Sin penalización
-        print(f"DEBUG: Nivel de riesgo LOW - Sin penalización: {penalizacion} puntos")
+        logger.debug("Nivel de riesgo LOW - Sin penalización: %s puntos", penalizacion)
     
     # Generar explicación de penalización
     percentage = 100 if nivel_riesgo == 'HIGH' else 50 if nivel_riesgo == 'MEDIUM' else 0
@@ -682,30 +737,28 @@ def _collect_fonts_and_alignment(page: fitz.Page) -> Tuple[List[str], Dict[str,
     }
 
 
-def _collect_images_info(doc: fitz.Document) -> Dict[str, Any]:
+def _fuentes_y_alineacion_pagina(ctx: DocumentoCompartido, pno: int) -> Tuple[List[str], Dict[str, Any]]:
+    """_collect_fonts_and_alignment por número de página (ejecutable en otro proceso)."""
+    return _collect_fonts_and_alignment(ctx.doc.load_page(pno))
+
+
+def _collect_images_info(doc: fitz.Document, paginas: Optional[List[int]] = None,
+                         inventario: Optional[InventarioImagenes] = None) -> Dict[str, Any]:
     """Extrae DPI, filtros de compresión y tamaño de imágenes colocadas."""
     dpis: List[float] = []
     filters: List[str] = []
+    if paginas is None:
+        paginas = list(range(doc.page_count))
+    if inventario is None:
+        inventario = InventarioImagenes(None, doc)
     try:
-        for pno in range(doc.page_count):
-            page = doc.load_page(pno)
-            raw = page.get_text("rawdict")
-            bbox_by_xref = {}
-            for b in raw.get("blocks", []):
-                if b.get("type") == 1 and "image" in b:
-                    info = b["image"]
-                    xref = info.get("xref")
-                    bbox = b.get("bbox")
-                    if xref and bbox:
-                        bbox_by_xref[xref] = bbox
-
-            for img in page.get_images(full=True):
-                xref = img[0]
-                w_px, h_px = img[2], img[3]
-                filt = img[-1] if isinstance(img[-1], str) else None
+        for pno in paginas:
+            for img in inventario.colocaciones(pno):
+                w_px, h_px = img["width"], img["height"]
+                filt = img["filter"]
                 if filt:
                     filters.append(filt)
-                bbox = bbox_by_xref.get(xref)
+                bbox = img["bbox"]
                 if bbox:
                     width_pt = max(1e-6, bbox[2] - bbox[0])
                     height_pt = max(1e-6, bbox[3] - bbox[1])
@@ -793,12 +846,13 @@ def _is_scanned_image_pdf(pdf_bytes: bytes, extracted_text: str) -> bool:
 
 # --------------------- evaluación principal de riesgo ---------------------
 
-def evaluar_riesgo_con_xml_sri(pdf_bytes: bytes, fuente_texto: str, pdf_fields: Dict[str, Any], xml_sri: Dict[str, Any] = None) -> Dict[str, Any]:
+def evaluar_riesgo_con_xml_sri(pdf_bytes: bytes, fuente_texto: str, pdf_fields: Dict[str, Any], xml_sri: Dict[str, Any] = None,
+                               detalle: str = COMPLETO, config: Optional[ConfigRiesgo] = None) -> Dict[str, Any]:
     """
     Versión de evaluar_riesgo que puede usar datos del XML del SRI para validación financiera más precisa.
     """
     # Simplemente llamamos a evaluar_riesgo pero actualizamos la validación financiera
-    base_result = evaluar_riesgo(pdf_bytes, fuente_texto, pdf_fields, type="factura")
+    base_result = evaluar_riesgo(pdf_bytes, fuente_texto, pdf_fields, type="factura", detalle=detalle, config=config)
     
     # Si tenemos XML del SRI, re-ejecutamos solo la validación financiera con esos datos (DESHABILITADO)
     # if xml_sri and xml_sri.get("autorizado"):
@@ -825,429 +879,442 @@ def evaluar_riesgo_con_xml_sri(pdf_bytes: bytes, fuente_texto: str, pdf_fields:
     return base_result
 
 
-def evaluar_riesgo(pdf_bytes: bytes,fuente_texto: str,  pdf_fields: Dict[str, Any], type: str) -> Dict[str, Any]:
-    """Calcula score y desglose de validaciones para el PDF."""
+@perfilable
+def evaluar_riesgo(pdf_bytes: bytes,fuente_texto: str,  pdf_fields: Dict[str, Any], type: str,
+                   detalle: str = COMPLETO, config: Optional[ConfigRiesgo] = None) -> Dict[str, Any]:
+    """
+    Calcula score y desglose de validaciones para el PDF.
+
+    detalle: nivel de detalle pedido (helpers.nivel_detalle); no cambia el score,
+    solo evita calcular secciones informativas del análisis de capas.
+    config: instantánea de pesos y niveles (helpers.config_riesgo); por defecto la
+    vigente. Toda la evaluación usa la misma y su versión va en "version_config".
+    """
+    cfg = config or config_riesgo.actual()
+    pesos = cfg.pesos
     doc = fitz.open(stream=pdf_bytes, filetype="pdf")
     meta = doc.metadata or {}
     pages = doc.page_count
     size_bytes = len(pdf_bytes)
     scanned = _is_scanned_image_pdf(pdf_bytes, fuente_texto or "")
-
-    # --- ANÁLISIS AVANZADO DE CAPAS (usando lógica completa de detección de texto superpuesto) ---
-    from helpers.deteccion_texto_superpuesto import detectar_texto_superpuesto_detallado
-    import base64
-    
-    # Usar la lógica completa del endpoint universal de detección de texto superpuesto
+    politica = planificar_paginas(doc)
+    inventario = InventarioImagenes(pdf_bytes, doc)
     try:
-        # Usar la función que devuelve la estructura original del endpoint
-        pdf_base64 = base64.b64encode(pdf_bytes).decode('utf-8')
-        capas_analisis_completo = detectar_texto_superpuesto_detallado(pdf_base64)
+        # --- ANÁLISIS AVANZADO DE CAPAS (usando lógica completa de detección de texto superpuesto) ---
+        from helpers.deteccion_texto_superpuesto import detectar_texto_superpuesto_desde_bytes
+    
+        # Usar la lógica completa del endpoint universal de detección de texto superpuesto
+        try:
+            # Usar la función que devuelve la estructura original del endpoint
+            with span("overlay"):
+                capas_analisis_completo = detectar_texto_superpuesto_desde_bytes(pdf_bytes, politica, inventario, detalle)
         
-        # Debug: verificar si la respuesta tiene la estructura esperada
-        if not isinstance(capas_analisis_completo, dict):
-            print(f"DEBUG: capas_analisis_completo no es dict: {type(capas_analisis_completo)}")
+            # Debug: verificar si la respuesta tiene la estructura esperada
+            if not isinstance(capas_analisis_completo, dict):
+                logger.debug("capas_analisis_completo no es dict: %s", type(capas_analisis_completo))
+                capas_analisis_completo = {}
+            else:
+                logger.debug("capas_analisis_completo keys: %s", list(capas_analisis_completo.keys()))
+                logger.debug("analisis_imagenes: %s", capas_analisis_completo.get('analisis_imagenes', 'NO_EXISTS'))
+                logger.debug("analisis_por_capas: %s", capas_analisis_completo.get('analisis_por_capas', 'NO_EXISTS'))
+        except Exception as e:
+            logger.debug("Error en análisis de capas: %s", e)
             capas_analisis_completo = {}
-        else:
-            print(f"DEBUG: capas_analisis_completo keys: {list(capas_analisis_completo.keys())}")
-            print(f"DEBUG: analisis_imagenes: {capas_analisis_completo.get('analisis_imagenes', 'NO_EXISTS')}")
-            print(f"DEBUG: analisis_por_capas: {capas_analisis_completo.get('analisis_por_capas', 'NO_EXISTS')}")
-    except Exception as e:
-        print(f"DEBUG: Error en análisis de capas: {str(e)}")
-        capas_analisis_completo = {}
-    
-    # Extraer información para compatibilidad con el sistema existente
-    layers_analysis = {
-        "has_layers": capas_analisis_completo.get("tiene_capas", False),
-        "confidence": capas_analisis_completo.get("probabilidad", 0.0) / 100.0,
-        "probability_percentage": capas_analisis_completo.get("probabilidad", 0.0),
-        "risk_level": "HIGH" if capas_analisis_completo.get("probabilidad", 0) > 70 else "MEDIUM" if capas_analisis_completo.get("probabilidad", 0) > 40 else "LOW",
-        "indicators": capas_analisis_completo.get("indicadores", []),
-        "ocg_objects": capas_analisis_completo.get("objetos_ocg", 0),
-        "overlay_objects": capas_analisis_completo.get("objetos_superpuestos", 0),
-        "transparency_objects": capas_analisis_completo.get("objetos_transparencia", 0),
-        "suspicious_operators": capas_analisis_completo.get("operadores_sospechosos", 0),
-        "content_streams": capas_analisis_completo.get("content_streams", 0),
-        "blend_modes": capas_analisis_completo.get("modos_mezcla", []),
-        "alpha_values": capas_analisis_completo.get("valores_alpha", []),
-        "score_breakdown": capas_analisis_completo.get("desglose_puntuacion", {}),
-        "layer_count_estimate": capas_analisis_completo.get("estimacion_capas", 0),
-        "detailed_analysis": capas_analisis_completo.get("analisis_detallado", {}),
-        "penalty_points": capas_analisis_completo.get("penalizacion", 0),
-        "weights_used": capas_analisis_completo.get("pesos_usados", {}),
-        "metodo_calculo": "deteccion_texto_superpuesto_universal"
-    }
     
-    # Mantener compatibilidad con el sistema existente
-    text_overlapping = capas_analisis_completo.get("tiene_texto_superpuesto", False)
-    structure_analysis = {
-        "suspicious_structure": capas_analisis_completo.get("estructura_sospechosa", False),
-        "details": capas_analisis_completo.get("detalles_estructura", []),
-        "object_analysis": capas_analisis_completo.get("analisis_objetos", {}),
-        "content_analysis": capas_analisis_completo.get("analisis_contenido", {})
-    }
+        # Extraer información para compatibilidad con el sistema existente
+        layers_analysis = {
+            "has_layers": capas_analisis_completo.get("tiene_capas", False),
+            "confidence": capas_analisis_completo.get("probabilidad", 0.0) / 100.0,
+            "probability_percentage": capas_analisis_completo.get("probabilidad", 0.0),
+            "risk_level": "HIGH" if capas_analisis_completo.get("probabilidad", 0) > 70 else "MEDIUM" if capas_analisis_completo.get("probabilidad", 0) > 40 else "LOW",
+            "indicators": capas_analisis_completo.get("indicadores", []),
+            "ocg_objects": capas_analisis_completo.get("objetos_ocg", 0),
+            "overlay_objects": capas_analisis_completo.get("objetos_superpuestos", 0),
+            "transparency_objects": capas_analisis_completo.get("objetos_transparencia", 0),
+            "suspicious_operators": capas_analisis_completo.get("operadores_sospechosos", 0),
+            "content_streams": capas_analisis_completo.get("content_streams", 0),
+            "blend_modes": capas_analisis_completo.get("modos_mezcla", []),
+            "alpha_values": capas_analisis_completo.get("valores_alpha", []),
+            "score_breakdown": capas_analisis_completo.get("desglose_puntuacion", {}),
+            "layer_count_estimate": capas_analisis_completo.get("estimacion_capas", 0),
+            "detailed_analysis": capas_analisis_completo.get("analisis_detallado", {}),
+            "penalty_points": capas_analisis_completo.get("penalizacion", 0),
+            "weights_used": capas_analisis_completo.get("pesos_usados", {}),
+            "metodo_calculo": "deteccion_texto_superpuesto_universal"
+        }
+    
+        # Mantener compatibilidad con el sistema existente
+        text_overlapping = capas_analisis_completo.get("tiene_texto_superpuesto", False)
+        structure_analysis = {
+            "suspicious_structure": capas_analisis_completo.get("estructura_sospechosa", False),
+            "details": capas_analisis_completo.get("detalles_estructura", []),
+            "object_analysis": capas_analisis_completo.get("analisis_objetos", {}),
+            "content_analysis": capas_analisis_completo.get("analisis_contenido", {})
+        }
 
-    # --- fechas ---
-    if type == "factura":
-        fecha_emision = _parse_fecha_emision(pdf_fields.get("fechaEmision"))
-    dt_cre = _pdf_date_to_dt(meta.get("creationDate") or meta.get("CreationDate"))
-    dt_mod = _pdf_date_to_dt(meta.get("modDate") or meta.get("ModDate"))
-
-    # --- software ---
-    prod_ok = _is_known_producer(meta)
-
-    # --- capas (usando la detección mejorada) ---
-    has_layers = layers_analysis["has_layers"]
-
-    # --- fuentes y alineación ---
-    all_fonts: List[str] = []
-    align_metrics: List[Dict[str, Any]] = []
-    for pno in range(pages):
-        page = doc.load_page(pno)
-        fonts, als = _collect_fonts_and_alignment(page)
-        all_fonts += fonts
-        align_metrics.append(als)
-    fonts_info = _fonts_consistency(all_fonts)
-
-    # --- imágenes ---
-    img_info = _collect_images_info(doc)
-
-    # --- compresión ---
-    filters_set = set(img_info.get("filters") or [])
-    comp_ok = True
-    unknown_filters: List[str] = []
-    for f in filters_set:
-        for tok in re.split(r"[,\s]+", f):
-            if tok and tok not in STD_IMAGE_FILTERS:
-                unknown_filters.append(tok)
-    if unknown_filters:
-        comp_ok = False
-
-    # --- alineación global ---
-    align_score_vals = [m.get("alineacion_score", 1.0) for m in align_metrics if m]
-    rot_ratio_vals = [m.get("rotacion_ratio", 0.0) for m in align_metrics if m]
-    align_score_mean = statistics.mean(align_score_vals) if align_score_vals else 1.0
-    rot_ratio_mean = statistics.mean(rot_ratio_vals) if rot_ratio_vals else 0.0
-
-    # --- análisis avanzado de texto sobrepuesto (usando la misma lógica de capas) ---
-    texto_sobrepuesto_analisis_completo = capas_analisis_completo
-    
-    # --- análisis financiero completo ---
-    # TODO: Integrar XML del SRI cuando esté disponible
-    validacion_financiera = validar_contenido_financiero(pdf_fields, fuente_texto or "")
-    
-    # --- consistencia matemática --- (DESHABILITADO)
-    # print(f"DEBUG EVALUAR_RIESGO: Llamando _evaluar_consistencia_matematica con pdf_fields keys: {list(pdf_fields.keys()) if pdf_fields else 'None'}")
-    # math_consistency_result = _evaluar_consistencia_matematica(pdf_fields, fuente_texto or "", validacion_financiera)
-    # print(f"DEBUG EVALUAR_RIESGO: math_consistency_result = {math_consistency_result}")
-    # print(f"DEBUG EVALUAR_RIESGO: math_consistency_result is None? {math_consistency_result is None}")
-    # print(f"DEBUG EVALUAR_RIESGO: bool(math_consistency_result)? {bool(math_consistency_result)}")
-    math_consistency_result = None  # Deshabilitado
-    
-    # --- análisis completo de firmas digitales ---
-    analisis_firmas = analizar_firmas_digitales(pdf_bytes)
-
-    # --- tamaño esperado ---
-    size_expect = _file_size_expectation(size_bytes, pages, scanned)
-
-    # --- otros marcadores ---
-    has_js = _has_js_embedded(pdf_bytes)
-    has_emb = _has_embedded_files(pdf_bytes)
-    has_forms = _has_forms_or_annots(pdf_bytes)
-    has_sig = tiene_firma_digital(pdf_bytes)
-    incr_updates = _count_incremental_updates(pdf_bytes)
-    try:
-        is_encrypted = doc.is_encrypted
-    except Exception:
-        is_encrypted = False
-
-    # ===================== SCORING MEJORADO =====================
-    score = 0
-    details_prior: List[Dict[str, Any]] = []
-    details_sec: List[Dict[str, Any]] = []
-    details_extra: List[Dict[str, Any]] = []
-
-    # PRIORITARIAS
-    # 1) Fecha creación vs fecha emisión
-    penal = 0
-    msg = "sin datos suficientes"
-    if type == "factura":
-        if fecha_emision and dt_cre:
-            dias = abs((dt_cre.date() - fecha_emision).days)
-            msg = f"{dias} día(s) entre creación PDF y emisión"
-            if dias >= 0 and dias <= 10:
-                penal = 0
+        # --- fechas ---
+        if type == "factura":
+            fecha_emision = _parse_fecha_emision(pdf_fields.get("fechaEmision"))
+        dt_cre = _pdf_date_to_dt(meta.get("creationDate") or meta.get("CreationDate"))
+        dt_mod = _pdf_date_to_dt(meta.get("modDate") or meta.get("ModDate"))
+
+        # --- software ---
+        prod_ok = _is_known_producer(meta)
+
+        # --- capas (usando la detección mejorada) ---
+        has_layers = layers_analysis["has_layers"]
+
+        # --- fuentes y alineación ---
+        all_fonts: List[str] = []
+        align_metrics: List[Dict[str, Any]] = []
+        for fonts, als in mapear_paginas(pdf_bytes, politica.paginas_estructurales,
+                                         _fuentes_y_alineacion_pagina, doc=doc):
+            all_fonts += fonts
+            align_metrics.append(als)
+        fonts_info = _fonts_consistency(all_fonts)
+
+        # --- imágenes ---
+        img_info = _collect_images_info(doc, politica.paginas_estructurales, inventario)
+
+        # --- compresión ---
+        filters_set = set(img_info.get("filters") or [])
+        comp_ok = True
+        unknown_filters: List[str] = []
+        for f in filters_set:
+            for tok in re.split(r"[,\s]+", f):
+                if tok and tok not in STD_IMAGE_FILTERS:
+                    unknown_filters.append(tok)
+        if unknown_filters:
+            comp_ok = False
+
+        # --- alineación global ---
+        align_score_vals = [m.get("alineacion_score", 1.0) for m in align_metrics if m]
+        rot_ratio_vals = [m.get("rotacion_ratio", 0.0) for m in align_metrics if m]
+        align_score_mean = statistics.mean(align_score_vals) if align_score_vals else 1.0
+        rot_ratio_mean = statistics.mean(rot_ratio_vals) if rot_ratio_vals else 0.0
+
+        # --- análisis avanzado de texto sobrepuesto (usando la misma lógica de capas) ---
+        texto_sobrepuesto_analisis_completo = capas_analisis_completo
+    
+        # --- análisis financiero completo ---
+        # TODO: Integrar XML del SRI cuando esté disponible
+        validacion_financiera = validar_contenido_financiero(pdf_fields, fuente_texto or "")
+    
+        # --- consistencia matemática --- (DESHABILITADO)
+        # print(f"DEBUG EVALUAR_RIESGO: Llamando _evaluar_consistencia_matematica con pdf_fields keys: {list(pdf_fields.keys()) if pdf_fields else 'None'}")
+        # math_consistency_result = _evaluar_consistencia_matematica(pdf_fields, fuente_texto or "", validacion_financiera)
+        # print(f"DEBUG EVALUAR_RIESGO: math_consistency_result = {math_consistency_result}")
+        # print(f"DEBUG EVALUAR_RIESGO: math_consistency_result is None? {math_consistency_result is None}")
+        # print(f"DEBUG EVALUAR_RIESGO: bool(math_consistency_result)? {bool(math_consistency_result)}")
+        math_consistency_result = None  # Deshabilitado
+    
+        # --- análisis completo de firmas digitales ---
+        with span("firmas"):
+            analisis_firmas = analizar_firmas_digitales(pdf_bytes)
+
+        # --- tamaño esperado ---
+        size_expect = _file_size_expectation(size_bytes, pages, scanned)
+
+        # --- otros marcadores ---
+        has_js = _has_js_embedded(pdf_bytes)
+        has_emb = _has_embedded_files(pdf_bytes)
+        has_forms = _has_forms_or_annots(pdf_bytes)
+        has_sig = tiene_firma_digital(pdf_bytes)
+        incr_updates = _count_incremental_updates(pdf_bytes)
+        try:
+            is_encrypted = doc.is_encrypted
+        except Exception:
+            is_encrypted = False
+
+        # ===================== SCORING MEJORADO =====================
+        score = 0
+        details_prior: List[Dict[str, Any]] = []
+        details_sec: List[Dict[str, Any]] = []
+        details_extra: List[Dict[str, Any]] = []
+
+        # PRIORITARIAS
+        # 1) Fecha creación vs fecha emisión
+        penal = 0
+        msg = "sin datos suficientes"
+        if type == "factura":
+            if fecha_emision and dt_cre:
+                dias = abs((dt_cre.date() - fecha_emision).days)
+                msg = f"{dias} día(s) entre creación PDF y emisión"
+                if dias >= 0 and dias <= 10:
+                    penal = 0
+                else:
+                    penal = pesos["fecha_creacion_vs_emision"]
             else:
-                penal = RISK_WEIGHTS["fecha_creacion_vs_emision"]
-        else:
-            msg = "sin datos de fecha de emisión o creación"
-            penal = RISK_WEIGHTS["fecha_creacion_vs_emision"]
-    details_prior.append({"check": "Fecha de creación vs fecha de emisión", "detalle": msg, "penalizacion": penal})
-    score += penal
-
-    # 2) Fecha modificación vs creación
-    penal = 0
-    msg = "sin datos suficientes"
-    if dt_mod and dt_cre:
-        diff = (dt_mod - dt_cre).days
-        msg = f"{diff} día(s) entre modificación y creación"
-        if diff != 0:
-            penal = int(RISK_WEIGHTS["fecha_mod_vs_creacion"])
-    details_prior.append({"check": "Fecha de modificación vs fecha de creación", "detalle": msg, "penalizacion": penal})
-    score += penal
-
-    # 3) Software conocido
-    penal = 0 if prod_ok else RISK_WEIGHTS["software_conocido"]
-    details_prior.append({"check": "Software de creación/producción conocido", "detalle": meta, "penalizacion": penal})
-    score += penal
-
-
-    # 5) Presencia de capas múltiples (USANDO RESPUESTA COMPLETA DEL ENDPOINT UNIVERSAL)
-    # Usar toda la respuesta del endpoint detectar-texto-superpuesto-simple
-    capas_check = _generate_capas_check_from_complete_response(capas_analisis_completo)
-    
-    details_prior.append({
-        "check": capas_check["check"],
-        "resumen": capas_check["resumen"],
-        "detalle": capas_check["detalle"],
-        "penalizacion": capas_check["penalizacion"]
-    })
-    score += capas_check["penalizacion"]
-
-    # SECUNDARIAS (continúan igual)
-    # Consistencia de fuentes
-    penal = 0
-    f_det = fonts_info
-    if f_det["num_fuentes_unicas"] > 2 or f_det["dominante_ratio"] < 0.4:
-        penal = RISK_WEIGHTS["consistencia_fuentes"]
-    elif f_det["num_fuentes_unicas"] > 2 or f_det["dominante_ratio"] < 0.6:
-        penal = int(RISK_WEIGHTS["consistencia_fuentes"] * 0.6)
-    details_sec.append({"check": "Consistencia de fuentes", "detalle": f_det, "penalizacion": penal})
-    score += penal
-
-    # Resolución/DPI uniforme
-    penal = 0
-    dpi_min = img_info.get("dpi_min", None)
-    dpi_stdev = img_info.get("dpi_stdev", 0.0)
-    if dpi_min is not None:
-        if dpi_min < 90:
-            penal = RISK_WEIGHTS["dpi_uniforme"]
-        elif dpi_stdev and img_info.get("dpi_mean", 0) and (dpi_stdev / max(1e-6, img_info.get("dpi_mean"))) > 0.35:
-            penal = int(RISK_WEIGHTS["dpi_uniforme"] * 0.6)
-    details_sec.append({"check": "Resolución/DPI uniforme", "detalle": img_info, "penalizacion": penal})
-    score += penal
-
-    # Métodos de compresión estándar
-    penal = 0 if comp_ok else RISK_WEIGHTS["compresion_estandar"]
-    details_sec.append({"check": "Métodos de compresión estándar", "detalle": list(filters_set), "penalizacion": penal})
-    score += penal
-
-    # Alineación de elementos de texto (análisis completo con texto sobrepuesto)
-    penal = 0
-    
-    # Calcular penalización basada en alineación tradicional
-    if align_score_mean < 0.7 or rot_ratio_mean > 0.2:
-        penal = RISK_WEIGHTS["alineacion_texto"]
-    elif align_score_mean < 0.85 or rot_ratio_mean > 0.1:
-        penal = int(RISK_WEIGHTS["alineacion_texto"] * 0.6)
-    
-    # Usar el análisis ya calculado para agregar información adicional
-    texto_sobrepuesto = texto_sobrepuesto_analisis_completo
-    
-    # Construir detalle completo combinando alineación tradicional + texto sobrepuesto
-    detalle_completo = {
-        "alineacion_promedio": align_score_mean, 
-        "rotacion_promedio": rot_ratio_mean,
-        "alertas": texto_sobrepuesto_analisis_completo.get("alertas", []),
-        "texto_sobrepuesto_detectado": texto_sobrepuesto_analisis_completo.get("tiene_texto_superpuesto", False),
-        "total_casos": texto_sobrepuesto_analisis_completo.get("total_casos", 0),
-        "paginas_afectadas": texto_sobrepuesto_analisis_completo.get("paginas_afectadas", []),
-        "metodo_usado": texto_sobrepuesto_analisis_completo.get("metodo_usado", "deteccion_texto_superpuesto_universal"),
-        "estadisticas": texto_sobrepuesto_analisis_completo.get("estadisticas", {}),
-        "probabilidad": texto_sobrepuesto_analisis_completo.get("probabilidad", 0.0),
-        "indicadores": texto_sobrepuesto_analisis_completo.get("indicadores", []),
-        "penalizacion": texto_sobrepuesto_analisis_completo.get("penalizacion", 0)
-    }
+                msg = "sin datos de fecha de emisión o creación"
+                penal = pesos["fecha_creacion_vs_emision"]
+        details_prior.append({"check": "Fecha de creación vs fecha de emisión", "detalle": msg, "penalizacion": penal})
+        score += penal
+
+        # 2) Fecha modificación vs creación
+        penal = 0
+        msg = "sin datos suficientes"
+        if dt_mod and dt_cre:
+            diff = (dt_mod - dt_cre).days
+            msg = f"{diff} día(s) entre modificación y creación"
+            if diff != 0:
+                penal = int(pesos["fecha_mod_vs_creacion"])
+        details_prior.append({"check": "Fecha de modificación vs fecha de creación", "detalle": msg, "penalizacion": penal})
+        score += penal
+
+        # 3) Software conocido
+        penal = 0 if prod_ok else pesos["software_conocido"]
+        details_prior.append({"check": "Software de creación/producción conocido", "detalle": meta, "penalizacion": penal})
+        score += penal
+
+
+        # 5) Presencia de capas múltiples (USANDO RESPUESTA COMPLETA DEL ENDPOINT UNIVERSAL)
+        # Usar toda la respuesta del endpoint detectar-texto-superpuesto-simple
+        capas_check = _generate_capas_check_from_complete_response(capas_analisis_completo, pesos)
+    
+        details_prior.append({
+            "check": capas_check["check"],
+            "resumen": capas_check["resumen"],
+            "detalle": capas_check["detalle"],
+            "penalizacion": capas_check["penalizacion"]
+        })
+        score += capas_check["penalizacion"]
+
+        # SECUNDARIAS (continúan igual)
+        # Consistencia de fuentes
+        penal = 0
+        f_det = fonts_info
+        if f_det["num_fuentes_unicas"] > 2 or f_det["dominante_ratio"] < 0.4:
+            penal = pesos["consistencia_fuentes"]
+        elif f_det["num_fuentes_unicas"] > 2 or f_det["dominante_ratio"] < 0.6:
+            penal = int(pesos["consistencia_fuentes"] * 0.6)
+        details_sec.append({"check": "Consistencia de fuentes", "detalle": f_det, "penalizacion": penal})
+        score += penal
+
+        # Resolución/DPI uniforme
+        penal = 0
+        dpi_min = img_info.get("dpi_min", None)
+        dpi_stdev = img_info.get("dpi_stdev", 0.0)
+        if dpi_min is not None:
+            if dpi_min < 90:
+                penal = pesos["dpi_uniforme"]
+            elif dpi_stdev and img_info.get("dpi_mean", 0) and (dpi_stdev / max(1e-6, img_info.get("dpi_mean"))) > 0.35:
+                penal = int(pesos["dpi_uniforme"] * 0.6)
+        details_sec.append({"check": "Resolución/DPI uniforme", "detalle": img_info, "penalizacion": penal})
+        score += penal
+
+        # Métodos de compresión estándar
+        penal = 0 if comp_ok else pesos["compresion_estandar"]
+        details_sec.append({"check": "Métodos de compresión estándar", "detalle": list(filters_set), "penalizacion": penal})
+        score += penal
+
+        # Alineación de elementos de texto (análisis completo con texto sobrepuesto)
+        penal = 0
+    
+        # Calcular penalización basada en alineación tradicional
+        if align_score_mean < 0.7 or rot_ratio_mean > 0.2:
+            penal = pesos["alineacion_texto"]
+        elif align_score_mean < 0.85 or rot_ratio_mean > 0.1:
+            penal = int(pesos["alineacion_texto"] * 0.6)
+    
+        # Usar el análisis ya calculado para agregar información adicional
+        texto_sobrepuesto = texto_sobrepuesto_analisis_completo
+    
+        # Construir detalle completo combinando alineación tradicional + texto sobrepuesto
+        detalle_completo = {
+            "alineacion_promedio": align_score_mean, 
+            "rotacion_promedio": rot_ratio_mean,
+            "alertas": texto_sobrepuesto_analisis_completo.get("alertas", []),
+            "texto_sobrepuesto_detectado": texto_sobrepuesto_analisis_completo.get("tiene_texto_superpuesto", False),
+            "total_casos": texto_sobrepuesto_analisis_completo.get("total_casos", 0),
+            "paginas_afectadas": texto_sobrepuesto_analisis_completo.get("paginas_afectadas", []),
+            "metodo_usado": texto_sobrepuesto_analisis_completo.get("metodo_usado", "deteccion_texto_superpuesto_universal"),
+            "estadisticas": texto_sobrepuesto_analisis_completo.get("estadisticas", {}),
+            "probabilidad": texto_sobrepuesto_analisis_completo.get("probabilidad", 0.0),
+            "indicadores": texto_sobrepuesto_analisis_completo.get("indicadores", []),
+            "penalizacion": texto_sobrepuesto_analisis_completo.get("penalizacion", 0)
+        }
     
-    # Agregar error si existe
-    if texto_sobrepuesto_analisis_completo.get("error"):
-        detalle_completo["error"] = texto_sobrepuesto_analisis_completo["error"]
+        # Agregar error si existe
+        if texto_sobrepuesto_analisis_completo.get("error"):
+            detalle_completo["error"] = texto_sobrepuesto_analisis_completo["error"]
     
-    details_sec.append({
-        "check": "Alineación de elementos de texto",
-        "detalle": detalle_completo,
-        "penalizacion": penal
-    })
-    score += penal
-
-
-    # ADICIONALES
-    # Anotaciones / Formularios
-    penal = RISK_WEIGHTS["anotaciones_o_formularios"] if has_forms else 0
-    details_extra.append({"check": "Anotaciones o Formularios", "detalle": has_forms, "penalizacion": penal})
-    score += penal
-
-    # JavaScript embebido
-    penal = RISK_WEIGHTS["javascript_embebido"] if has_js else 0
-    details_extra.append({"check": "JavaScript embebido", "detalle": has_js, "penalizacion": penal})
-    score += penal
-
-    # Archivos incrustados
-    penal = RISK_WEIGHTS["archivos_incrustados"] if has_emb else 0
-    details_extra.append({"check": "Archivos incrustados", "detalle": has_emb, "penalizacion": penal})
-    score += penal
-
-    # Firmas digitales (análisis completo)
-    penal = 0
-    if has_sig:
-        # Bonificación base por tener firma
-        penal = RISK_WEIGHTS["firmas_pdf"]
+        details_sec.append({
+            "check": "Alineación de elementos de texto",
+            "detalle": detalle_completo,
+            "penalizacion": penal
+        })
+        score += penal
+
+
+        # ADICIONALES
+        # Anotaciones / Formularios
+        penal = pesos["anotaciones_o_formularios"] if has_forms else 0
+        details_extra.append({"check": "Anotaciones o Formularios", "detalle": has_forms, "penalizacion": penal})
+        score += penal
+
+        # JavaScript embebido
+        penal = pesos["javascript_embebido"] if has_js else 0
+        details_extra.append({"check": "JavaScript embebido", "detalle": has_js, "penalizacion": penal})
+        score += penal
+
+        # Archivos incrustados
+        penal = pesos["archivos_incrustados"] if has_emb else 0
+        details_extra.append({"check": "Archivos incrustados", "detalle": has_emb, "penalizacion": penal})
+        score += penal
+
+        # Firmas digitales (análisis completo)
+        penal = 0
+        if has_sig:
+            # Bonificación base por tener firma
+            penal = pesos["firmas_pdf"]
         
-        # Ajustes basados en calidad de la firma
-        if analisis_firmas["firmas_validas"] > 0:
-            # Bonificación adicional por firmas válidas
-            penal = int(penal * 1.5)
+            # Ajustes basados en calidad de la firma
+            if analisis_firmas["firmas_validas"] > 0:
+                # Bonificación adicional por firmas válidas
+                penal = int(penal * 1.5)
         
-        if not analisis_firmas["integridad_documento"]["documento_integro"]:
-            # Penalización si el documento fue modificado después de firmar
-            penal = int(penal * 0.3)  # Reduce significativamente la bonificación
+            if not analisis_firmas["integridad_documento"]["documento_integro"]:
+                # Penalización si el documento fue modificado después de firmar
+                penal = int(penal * 0.3)  # Reduce significativamente la bonificación
         
-        if analisis_firmas["seguridad"]["nivel_seguridad"] == "alto":
-            # Bonificación extra por alta seguridad
-            penal = int(penal * 1.2)
-    
-    # Crear detalle completo de firma
-    detalle_firma = {
-        "firma_detectada": has_sig,
-        "cantidad_firmas": analisis_firmas["cantidad_firmas"],
-        "firmas_validas": analisis_firmas["firmas_validas"],
-        "nivel_seguridad": analisis_firmas["seguridad"]["nivel_seguridad"],
-        "documento_integro": analisis_firmas["integridad_documento"]["documento_integro"],
-        "certificado_valido": analisis_firmas["cadena_confianza"]["certificado_raiz_valido"]
-    }
+            if analisis_firmas["seguridad"]["nivel_seguridad"] == "alto":
+                # Bonificación extra por alta seguridad
+                penal = int(penal * 1.2)
+    
+        # Crear detalle completo de firma
+        detalle_firma = {
+            "firma_detectada": has_sig,
+            "cantidad_firmas": analisis_firmas["cantidad_firmas"],
+            "firmas_validas": analisis_firmas["firmas_validas"],
+            "nivel_seguridad": analisis_firmas["seguridad"]["nivel_seguridad"],
+            "documento_integro": analisis_firmas["integridad_documento"]["documento_integro"],
+            "certificado_valido": analisis_firmas["cadena_confianza"]["certificado_raiz_valido"]
+        }
     
-    # Agregar vulnerabilidades si existen
-    if analisis_firmas["seguridad"]["vulnerabilidades"]:
-        detalle_firma["vulnerabilidades"] = analisis_firmas["seguridad"]["vulnerabilidades"]
+        # Agregar vulnerabilidades si existen
+        if analisis_firmas["seguridad"]["vulnerabilidades"]:
+            detalle_firma["vulnerabilidades"] = analisis_firmas["seguridad"]["vulnerabilidades"]
     
-    details_extra.append({
-        "check": "Firma(s) digital(es) PDF", 
-        "detalle": detalle_firma, 
-        "penalizacion": penal
-    })
-    score += penal
-
-    # Actualizaciones incrementales (>1 startxref)
-    penal = 0
-    if incr_updates > 1:
-        penal = RISK_WEIGHTS["actualizaciones_incrementales"] if incr_updates >= 3 else int(RISK_WEIGHTS["actualizaciones_incrementales"] * 0.6)
-    details_extra.append({"check": "Actualizaciones incrementales", "detalle": incr_updates, "penalizacion": penal})
-    score += penal
-
-    # Cifrado / permisos estrictos
-    penal = RISK_WEIGHTS["cifrado_permisos_extra"] if is_encrypted else 0
-    details_extra.append({"check": "Cifrado / Permisos", "detalle": {"encriptado": is_encrypted}, "penalizacion": penal})
-    score += penal
-
-    # NUEVAS VALIDACIONES ESPECÍFICAS PARA CAPAS
-    # Superposición de texto detectada
- 
-    # Estructura sospechosa sin otras indicaciones
-    has_text_overlapping = text_overlapping if isinstance(text_overlapping, bool) else text_overlapping.get("has_overlapping", False)
-    if structure_analysis["suspicious_structure"] and not has_layers and not has_text_overlapping:
-        penal = int(RISK_WEIGHTS.get("capas_multiples"))
         details_extra.append({
-            "check": "Estructura PDF sospechosa", 
-            "detalle": structure_analysis["details"], 
+            "check": "Firma(s) digital(es) PDF", 
+            "detalle": detalle_firma, 
             "penalizacion": penal
         })
         score += penal
 
+        # Actualizaciones incrementales (>1 startxref)
+        penal = 0
+        if incr_updates > 1:
+            penal = pesos["actualizaciones_incrementales"] if incr_updates >= 3 else int(pesos["actualizaciones_incrementales"] * 0.6)
+        details_extra.append({"check": "Actualizaciones incrementales", "detalle": incr_updates, "penalizacion": penal})
+        score += penal
+
+        # Cifrado / permisos estrictos
+        penal = pesos["cifrado_permisos_extra"] if is_encrypted else 0
+        details_extra.append({"check": "Cifrado / Permisos", "detalle": {"encriptado": is_encrypted}, "penalizacion": penal})
+        score += penal
+
+        # NUEVAS VALIDACIONES ESPECÍFICAS PARA CAPAS
+        # Superposición de texto detectada
+ 
+        # Estructura sospechosa sin otras indicaciones
+        has_text_overlapping = text_overlapping if isinstance(text_overlapping, bool) else text_overlapping.get("has_overlapping", False)
+        if structure_analysis["suspicious_structure"] and not has_layers and not has_text_overlapping:
+            penal = int(pesos.get("capas_multiples"))
+            details_extra.append({
+                "check": "Estructura PDF sospechosa", 
+                "detalle": structure_analysis["details"], 
+                "penalizacion": penal
+            })
+            score += penal
+
   
 
-    # Estructura sospechosa sin otras indicaciones (segunda verificación - eliminar duplicado)
-    # Esta línea es duplicada y se puede eliminar
-
-    # Validación financiera completa (DESHABILITADO)
-    # penal = 0
-    # 
-    # # Usar el análisis financiero ya calculado
-    # if not validacion_financiera["validacion_general"]["valido"]:
-    #     # Penalización basada en el score de validación financiera
-    #     score_financiero = validacion_financiera["validacion_general"]["score_validacion"]
-    #     penal = int(RISK_WEIGHTS.get("validacion_financiera", 15) * (100 - score_financiero) / 100)
-    # 
-    # # Solo mostrar el criterio si hay datos suficientes para validar
-    # if (validacion_financiera["validacion_items"]["total_items"] > 0 or 
-    #     validacion_financiera["validacion_totales"]["total_declarado"] > 0):
-    #     
-    #     details_extra.append({
-    #         "check": "Validación financiera completa", 
-    #         "detalle": validacion_financiera, 
-    #         "penalizacion": penal
-    #     })
-    #     score += penal
-    
-    # 5.1) Math Consistency (check específico) - DESHABILITADO
-    # penal_math = 0
-    # math_valido = True
-    # math_errores = []
-    # 
-    # # Siempre agregar el check de math_consistency si se ejecutó
-    # if math_consistency_result is not None:
-    #     math_valido = math_consistency_result.get("valido", True)
-    #     math_errores = math_consistency_result.get("errores", [])
-    #     
-    #     if not math_valido:
-    #         penal_math = RISK_WEIGHTS.get("math_consistency", 10)
-    #     
-    #     details_extra.append({
-    #         "check": "Consistencia aritmética (math_consistency)",
-    #         "detalle": math_consistency_result,
-    #         "penalizacion": penal_math
-    #     })
-    #     score += penal_math
-    #     print(f"DEBUG: Math consistency agregado - válido: {math_valido}, errores: {len(math_errores)}, penalización: {penal_math}")
-    # else:
-    #     print("DEBUG: math_consistency_result es None - no se agregó el check")
-
-    # Normalizar score a [0, 100] y redondear
-    score = round(max(0, min(100, score)), 2)
-
-    # Determinar si es falso (indicadores fuertes)
-    es_falso = False
-    if has_layers and layers_analysis["confidence"] >= 0.7:
-        es_falso = True
-    if dt_cre and dt_mod and dt_cre != dt_mod and abs((dt_mod - dt_cre).days) > 1:
-        es_falso = True
-    # Manejar text_overlapping que puede ser bool o dict
-    if isinstance(text_overlapping, bool):
-        has_text_overlapping = text_overlapping
-        duplicate_lines_count = 0
-    else:
-        duplicate_lines_count = len(text_overlapping.get("duplicate_lines", {}))
-    
-    if has_text_overlapping and duplicate_lines_count > 2:
-        es_falso = True
-
-    # Determinar nivel de riesgo
-    nivel = "bajo"
-    for k, (lo, hi) in RISK_LEVELS.items():
-        if lo <= score <= hi:
-            nivel = k
-            break
-
-    return safe_serialize_dict({
-        "score": score,
-        "nivel": nivel,
-        "es_falso_probable": ensure_python_bool(es_falso),
-        "prioritarias": details_prior,
-        "secundarias": details_sec,
-        "adicionales": details_extra,
-        "metadatos": meta,
-        "paginas": pages,
-        "escaneado_aprox": scanned,
-        "imagenes": img_info,
-    })
+        # Estructura sospechosa sin otras indicaciones (segunda verificación - eliminar duplicado)
+        # Esta línea es duplicada y se puede eliminar
+
+        # Validación financiera completa (DESHABILITADO)
+        # penal = 0
+        # 
+        # # Usar el análisis financiero ya calculado
+        # if not validacion_financiera["validacion_general"]["valido"]:
+        #     # Penalización basada en el score de validación financiera
+        #     score_financiero = validacion_financiera["validacion_general"]["score_validacion"]
+        #     penal = int(RISK_WEIGHTS.get("validacion_financiera", 15) * (100 - score_financiero) / 100)
+        # 
+        # # Solo mostrar el criterio si hay datos suficientes para validar
+        # if (validacion_financiera["validacion_items"]["total_items"] > 0 or 
+        #     validacion_financiera["validacion_totales"]["total_declarado"] > 0):
+        #     
+        #     details_extra.append({
+        #         "check": "Validación financiera completa", 
+        #         "detalle": validacion_financiera, 
+        #         "penalizacion": penal
+        #     })
+        #     score += penal
+    
+        # 5.1) Math Consistency (check específico) - DESHABILITADO
+        # penal_math = 0
+        # math_valido = True
+        # math_errores = []
+        # 
+        # # Siempre agregar el check de math_consistency si se ejecutó
+        # if math_consistency_result is not None:
+        #     math_valido = math_consistency_result.get("valido", True)
+        #     math_errores = math_consistency_result.get("errores", [])
+        #     
+        #     if not math_valido:
+        #         penal_math = RISK_WEIGHTS.get("math_consistency", 10)
+        #     
+        #     details_extra.append({
+        #         "check": "Consistencia aritmética (math_consistency)",
+        #         "detalle": math_consistency_result,
+        #         "penalizacion": penal_math
+        #     })
+        #     score += penal_math
+        #     print(f"DEBUG: Math consistency agregado - válido: {math_valido}, errores: {len(math_errores)}, penalización: {penal_math}")
+        # else:
+        #     print("DEBUG: math_consistency_result es None - no se agregó el check")
+
+        # Normalizar score a [0, 100] y redondear
+        score = round(max(0, min(100, score)), 2)
+
+        # Determinar si es falso (indicadores fuertes)
+        es_falso = False
+        if has_layers and layers_analysis["confidence"] >= 0.7:
+            es_falso = True
+        if dt_cre and dt_mod and dt_cre != dt_mod and abs((dt_mod - dt_cre).days) > 1:
+            es_falso = True
+        # Manejar text_overlapping que puede ser bool o dict
+        if isinstance(text_overlapping, bool):
+            has_text_overlapping = text_overlapping
+            duplicate_lines_count = 0
+        else:
+            duplicate_lines_count = len(text_overlapping.get("duplicate_lines", {}))
+    
+        if has_text_overlapping and duplicate_lines_count > 2:
+            es_falso = True
+
+        # Determinar nivel de riesgo
+        nivel = cfg.nivel(score, "bajo")
+
+        return {
+            "score": score,
+            "nivel": nivel,
+            "es_falso_probable": ensure_python_bool(es_falso),
+            "prioritarias": details_prior,
+            "secundarias": details_sec,
+            "adicionales": details_extra,
+            "metadatos": meta,
+            "paginas": pages,
+            "escaneado_aprox": scanned,
+            "imagenes": img_info,
+            "cobertura_paginas": politica.cobertura(),
+            "version_config": cfg.version,
+        }
+    finally:
+        # También si algo falla: el inventario tiene abierto el PDF en pikepdf
+        inventario.cerrar()
 
 
 def evaluar_riesgo_factura(
@@ -1260,7 +1327,8 @@ def evaluar_riesgo_factura(
     guardar_json_sri: bool = False,          # True => guarda archivo sri_response_*.json como hacía tu test
     xml_sri_data: Optional[Dict[str, Any]] = None,  # Datos XML del SRI ya parseados
     firmas_pdf: Optional[bool] = None,       # True si tiene firmas PDF válidas, False si no, None si no se verificó
-    info_firmas: Optional[Dict[str, Any]] = None  # Información detallada de las firmas
+    info_firmas: Optional[Dict[str, Any]] = None,  # Información detallada de las firmas
+    detalle: str = COMPLETO                  # nivel de detalle (helpers.nivel_detalle)
 ) -> Dict[str, Any]:
     """
     Igual que antes, pero ahora puede ejecutar el 'test SRI' integrado si así lo pides.
@@ -1268,6 +1336,9 @@ def evaluar_riesgo_factura(
     - Si 'sri_ok' es None y 'ejecutar_prueba_sri' es True y hay 'clave_acceso',
       entonces se consulta SRI aquí y se construye el sri_ok a partir de esa respuesta.
     """
+    # Misma configuración de riesgo para el análisis base y las penalizaciones de aquí
+    cfg = config_riesgo.actual()
+
     # 1) Determinar sri_ok y obtener datos XML (preferencia: argumento explícito; si no, calcularlo aquí)
     sri_test_result: Optional[Dict[str, Any]] = None
     
@@ -1287,10 +1358,10 @@ def evaluar_riesgo_factura(
         sri_ok = True  # si prefieres penalizar en incertidumbre, cámbialo a False
 
     # 2) Ejecuta el análisis base, pasando XML del SRI si está disponible
-    base = evaluar_riesgo_con_xml_sri(pdf_bytes, fuente_texto, pdf_fields, xml_sri_data)
+    base = evaluar_riesgo_con_xml_sri(pdf_bytes, fuente_texto, pdf_fields, xml_sri_data, detalle, config=cfg)
 
     # 3) Aplicar penalización por verificación contra SRI (igual que antes, pero usando sri_ok final)
-    penal = 0 if sri_ok else RISK_WEIGHTS.get("sri_verificacion", 0)
+    penal = 0 if sri_ok else cfg.pesos.get("sri_verificacion", 0)
     base["score"] = round(max(0, min(100, base["score"] + penal)), 2)
     base.setdefault("adicionales", []).append({
         "check": "Verificación contra SRI",
@@ -1300,7 +1371,7 @@ def evaluar_riesgo_factura(
 
     # 4) Aplicar penalización por falta de firmas PDF
     if firmas_pdf is not None:
-        penal_firmas = 0 if firmas_pdf else RISK_WEIGHTS.get("firmas_digitales", 0)
+        penal_firmas = 0 if firmas_pdf else cfg.pesos.get("firmas_digitales", 0)
         base["score"] = round(max(0, min(100, base["score"] + penal_firmas)), 2)
         
         # Generar detalle de firmas basado en la información de detección de firmas PDF
@@ -1358,19 +1429,16 @@ def evaluar_riesgo_factura(
     # Se eliminó la sección "sri" del objeto base según solicitud del usuario
 
     # 5) Recalcular nivel según score final (igual que en tu función)
-    for k, (lo, hi) in RISK_LEVELS.items():
-        if lo <= base["score"] <= hi:
-            base["nivel"] = k
-            break
+    base["nivel"] = cfg.nivel(base["score"], base["nivel"])
 
-    return safe_serialize_dict(base)
+    return base
     """
     Igual que evaluar_riesgo, pero si el comprobante SRI no coincide,
     suma la penalización 'sri_verificacion'.
     """
     base = evaluar_riesgo(pdf_bytes, fuente_texto, pdf_fields)
 
-    penal = 0 if sri_ok else RISK_WEIGHTS.get("sri_verificacion", 0)
+    penal = 0 if sri_ok else cfg.pesos.get("sri_verificacion", 0)
     base["score"] = round(max(0, min(100, base["score"] + penal)), 2)
     base.setdefault("adicionales", []).append({
         "check": "Verificación contra SRI",
@@ -1379,10 +1447,7 @@ def evaluar_riesgo_factura(
     })
 
     # recalcular nivel
-    for k, (lo, hi) in RISK_LEVELS.items():
-        if lo <= base["score"] <= hi:
-            base["nivel"] = k
-            break
+    base["nivel"] = cfg.nivel(base["score"], base["nivel"])
 
     return base
 
@@ -1442,27 +1507,27 @@ def _evaluar_consistencia_matematica(pdf_fields: Dict[str, Any], fuente_texto: s
     
     try:
         # DEBUG: Mostrar contenido de pdf_fields
-        print("=== DEBUG MATH_CONSISTENCY (SOLO PDF) ===")
-        print(f"PDF_FIELDS contenido: {pdf_fields}")
-        print(f"PDF_FIELDS keys: {list(pdf_fields.keys()) if pdf_fields else 'None'}")
+        logger.debug("=== DEBUG MATH_CONSISTENCY (SOLO PDF) ===")
+        logger.debug("PDF_FIELDS contenido: %s", pdf_fields)
+        logger.debug("PDF_FIELDS keys: %s", list(pdf_fields.keys()) if pdf_fields else 'None')
         if pdf_fields:
             for key, value in pdf_fields.items():
-                print(f"  {key}: {value} (tipo: {type(value)})")
-        print(f"FUENTE_TEXTO disponible: {bool(fuente_texto)} (longitud: {len(fuente_texto) if fuente_texto else 0})")
+                logger.debug("  %s: %s (tipo: %s)", key, value, type(value))
+        logger.debug("FUENTE_TEXTO disponible: %s (longitud: %s)", bool(fuente_texto), len(fuente_texto) if fuente_texto else 0)
         if fuente_texto and len(fuente_texto) > 0:
-            print(f"FUENTE_TEXTO preview: {fuente_texto[:200]}...")
+            logger.debug("FUENTE_TEXTO preview: %s...", fuente_texto[:200])
         
         # Verificar si la validación financiera está usando XML del SRI
         metodo_usado = validacion_financiera.get("extraccion_texto", {}).get("metodo_usado", "")
         usando_sri = metodo_usado == "xml_sri_oficial"
         
-        print(f"METODO_VALIDACION: {metodo_usado}")
-        print(f"IGNORANDO_SRI_PARA_MATH_CONSISTENCY: {usando_sri}")
-        print("=== FIN DEBUG ===")
+        logger.debug("METODO_VALIDACION: %s", metodo_usado)
+        logger.debug("IGNORANDO_SRI_PARA_MATH_CONSISTENCY: %s", usando_sri)
+        logger.debug("=== FIN DEBUG ===")
         
         # ESTRATEGIA MEJORADA: Para facturas legítimas, usar valores de validación financiera cuando no usa SRI
         if validacion_financiera and not usando_sri:
-            print("DEBUG: Usando valores de validación financiera (sin SRI) para math_consistency")
+            logger.debug("Usando valores de validación financiera (sin SRI) para math_consistency")
             # Extraer valores de la validación financiera que ya funcionó
             totales = validacion_financiera.get("validacion_totales", {})
             if totales and totales.get("formula_correcta", False):
@@ -1493,14 +1558,14 @@ def _evaluar_consistencia_matematica(pdf_fields: Dict[str, Any], fuente_texto: s
                     resultado["validacion_impuestos"]["iva_coherente"] = impuestos_info.get("iva_coherente", True)
                     resultado["validacion_impuestos"]["porcentaje_detectado"] = impuestos_info.get("porcentaje_iva_detectado", 0)
                 
-                print(f"DEBUG: Valores copiados - Subtotal: {resultado['validacion_formula']['componentes']['subtotal']}, IVA: {resultado['validacion_formula']['componentes']['iva']}, Total: {resultado['validacion_formula']['componentes']['total_declarado']}")
+                logger.debug("Valores copiados - Subtotal: %s, IVA: %s, Total: %s", resultado['validacion_formula']['componentes']['subtotal'], resultado['validacion_formula']['componentes']['iva'], resultado['validacion_formula']['componentes']['total_declarado'])
             else:
                 # Si la validación financiera falló, usar extracción directa
-                print("DEBUG: Validación financiera falló, usando extracción directa del PDF")
+                logger.debug("Validación financiera falló, usando extracción directa del PDF")
                 _evaluar_matematica_desde_pdf(pdf_fields, fuente_texto, resultado)
         else:
             # 1. Ejecutar validación matemática independiente del PDF para math_consistency
-            print("DEBUG: Ejecutando validación matemática independiente del PDF para math_consistency")
+            logger.debug("Ejecutando validación matemática independiente del PDF para math_consistency")
             # Hacer validación matemática directa desde PDF (independiente del SRI)
             _evaluar_matematica_desde_pdf(pdf_fields, fuente_texto, resultado)
         
@@ -1676,138 +1741,94 @@ def _evaluar_matematica_desde_pdf(pdf_fields: Dict[str, Any], fuente_texto: str,
     SISTEMA ROBUSTO: Funciona con cualquier formato de factura ecuatoriana.
     NO usa datos del SRI, solo lo que se puede extraer del documento.
     """
-    import re
-    
-    print(f"DEBUG MATH_CONSISTENCY: ===== INICIANDO EXTRACCIÓN UNIVERSAL =====")
-    print(f"DEBUG: Longitud del texto: {len(fuente_texto) if fuente_texto else 0} caracteres")
+    logger.debug("MATH_CONSISTENCY: ===== INICIANDO EXTRACCIÓN UNIVERSAL =====")
+    logger.debug("Longitud del texto: %s caracteres", len(fuente_texto) if fuente_texto else 0)
     
     # Extractor universal de valores financieros
     valores_pdf = {}
     
+    # Líneas tokenizadas (compartidas con la validación financiera del mismo texto)
+    doc = tokenizar(fuente_texto or "")
+
     # DEBUG: Mostrar una muestra del texto para diagnóstico
-    if fuente_texto:
+    if fuente_texto and logger.isEnabledFor(logging.DEBUG):
         # Mostrar las líneas que contienen números monetarios
-        lineas_con_numeros = []
-        for i, linea in enumerate(fuente_texto.split('\n')):
-            if re.search(r'[0-9]+[.,][0-9]{2}', linea):
-                lineas_con_numeros.append(f"L{i}: {linea.strip()}")
-        print(f"DEBUG: Líneas con números (primeras 10): {lineas_con_numeros[:10]}")
-        print(f"DEBUG: Líneas con números (últimas 10): {lineas_con_numeros[-10:]}")
+        lineas_con_numeros = [f"L{l.indice}: {l.original.strip()}" for l in doc.con_decimales()]
+        logger.debug("Líneas con números (primeras 10): %s", lineas_con_numeros[:10])
+        logger.debug("Líneas con números (últimas 10): %s", lineas_con_numeros[-10:])
     
     # ESTRATEGIA 1: Desde pdf_fields (primera prioridad)
     if pdf_fields:
-        print(f"DEBUG: pdf_fields keys: {list(pdf_fields.keys())}")
+        logger.debug("pdf_fields keys: %s", list(pdf_fields.keys()))
         if "importeTotal" in pdf_fields:
             valores_pdf["total_declarado"] = float(pdf_fields["importeTotal"])
-            print(f"DEBUG: Total desde pdf_fields: {valores_pdf['total_declarado']}")
+            logger.debug("Total desde pdf_fields: %s", valores_pdf['total_declarado'])
         if "subtotal" in pdf_fields:
             valores_pdf["subtotal"] = float(pdf_fields["subtotal"])
-            print(f"DEBUG: Subtotal desde pdf_fields: {valores_pdf['subtotal']}")
+            logger.debug("Subtotal desde pdf_fields: %s", valores_pdf['subtotal'])
         if "iva" in pdf_fields:
             valores_pdf["iva"] = float(pdf_fields["iva"])
-            print(f"DEBUG: IVA desde pdf_fields: {valores_pdf['iva']}")
+            logger.debug("IVA desde pdf_fields: %s", valores_pdf['iva'])
         if "descuento" in pdf_fields:
             valores_pdf["descuentos"] = float(pdf_fields["descuento"])
     
     # ESTRATEGIA 2: Extracción agresiva del texto (cualquier formato)
     if fuente_texto:
-        print(f"DEBUG MATH_CONSISTENCY: Analizando texto con {len(fuente_texto)} caracteres...")
+        logger.debug("MATH_CONSISTENCY: Analizando texto con %s caracteres...", len(fuente_texto))
         
         # === PATRONES UNIVERSALES PARA SUBTOTAL ===
         if "subtotal" not in valores_pdf or valores_pdf["subtotal"] == 0:
-            subtotal_patterns = [
-                # Formatos ecuatorianos estándar
-                r"subtotal\s*(?:sin\s*)?(?:impuestos?)?\s*:?\s*\$?\s*([0-9]+[.,][0-9]{1,2})",
-                r"subtotal\s*(?:15%|0%)?\s*:?\s*\$?\s*([0-9]+[.,][0-9]{1,2})",
-                r"base\s*imponible\s*:?\s*\$?\s*([0-9]+[.,][0-9]{1,2})",
-                # Búsqueda por posición (después de palabras clave)
-                r"sin\s*impuestos\s*:?\s*\$?\s*([0-9]+[.,][0-9]{1,2})",
-                r"(?:^|\n)\s*([0-9]+[.,][0-9]{2})\s*(?=\n|$)",  # Números aislados
-                # Contexto de tabla
-                r"subtotal.*?([0-9]+[.,][0-9]{2})",
-            ]
-            
-            for i, pattern in enumerate(subtotal_patterns):
-                print(f"DEBUG: Probando patrón subtotal {i}: {pattern}")
-                matches = re.finditer(pattern, fuente_texto, re.I | re.M)
+            for i, pattern in enumerate(_PATRONES_SUBTOTAL):
+                logger.debug("Probando patrón subtotal %s: %s", i, pattern.pattern)
+                matches = pattern.finditer(fuente_texto)
                 matches_list = list(matches)
-                print(f"DEBUG: Patrón {i} encontró {len(matches_list)} coincidencias")
+                logger.debug("Patrón %s encontró %s coincidencias", i, len(matches_list))
                 for match in matches_list:
                     try:
                         val = float(match.group(1).replace(",", "."))
-                        print(f"DEBUG: Patrón {i} - Valor: {val}, Texto: '{match.group(0).strip()}'")
+                        logger.debug("Patrón %s - Valor: %s, Texto: '%s'", i, val, match.group(0).strip())
                         # Rango realista para subtotal
                         if 0.1 <= val <= 10000.0:
                             valores_pdf["subtotal"] = val
-                            print(f"DEBUG: ✅ Subtotal ACEPTADO (patrón {i}): {val}")
+                            logger.debug("✅ Subtotal ACEPTADO (patrón %s): %s", i, val)
                             break
                         else:
-                            print(f"DEBUG: ❌ Subtotal RECHAZADO (fuera de rango): {val}")
+                            logger.debug("❌ Subtotal RECHAZADO (fuera de rango): %s", val)
                     except Exception as e:
-                        print(f"DEBUG: ❌ Error procesando subtotal: {e}")
+                        logger.debug("❌ Error procesando subtotal: %s", e)
                         continue
                 if "subtotal" in valores_pdf:
                     break
         
         # === PATRONES UNIVERSALES PARA IVA ===
         if "iva" not in valores_pdf or valores_pdf["iva"] == 0:
-            iva_patterns = [
-                # IVA específico ecuatoriano
-                r"iva\s*(?:15%?|12%?)?\s*:?\s*\$?\s*([0-9]+[.,][0-9]{1,2})",
-                r"i\.?v\.?a\.?\s*(?:15%?)?\s*:?\s*\$?\s*([0-9]+[.,][0-9]{1,2})",
-                r"impuesto\s*(?:valor\s*agregado)?\s*:?\s*\$?\s*([0-9]+[.,][0-9]{1,2})",
-                # Después de porcentajes
-                r"15%\s*:?\s*\$?\s*([0-9]+[.,][0-9]{1,2})",
-                r"12%\s*:?\s*\$?\s*([0-9]+[.,][0-9]{1,2})",
-                # Por contexto de tabla
-                r"iva.*?([0-9]+[.,][0-9]{2})",
-            ]
-            
-            for i, pattern in enumerate(iva_patterns):
-                print(f"DEBUG: Probando patrón IVA {i}: {pattern}")
-                matches = re.finditer(pattern, fuente_texto, re.I | re.M)
+            for i, pattern in enumerate(_PATRONES_IVA):
+                logger.debug("Probando patrón IVA %s: %s", i, pattern.pattern)
+                matches = pattern.finditer(fuente_texto)
                 matches_list = list(matches)
-                print(f"DEBUG: Patrón IVA {i} encontró {len(matches_list)} coincidencias")
+                logger.debug("Patrón IVA %s encontró %s coincidencias", i, len(matches_list))
                 for match in matches_list:
                     try:
                         val = float(match.group(1).replace(",", "."))
-                        print(f"DEBUG: Patrón IVA {i} - Valor: {val}, Texto: '{match.group(0).strip()}'")
+                        logger.debug("Patrón IVA %s - Valor: %s, Texto: '%s'", i, val, match.group(0).strip())
                         # Rango realista para IVA
                         if 0.0 <= val <= 5000.0:
                             valores_pdf["iva"] = val
-                            print(f"DEBUG: ✅ IVA ACEPTADO (patrón {i}): {val}")
+                            logger.debug("✅ IVA ACEPTADO (patrón %s): %s", i, val)
                             break
                         else:
-                            print(f"DEBUG: ❌ IVA RECHAZADO (fuera de rango): {val}")
+                            logger.debug("❌ IVA RECHAZADO (fuera de rango): %s", val)
                     except Exception as e:
-                        print(f"DEBUG: ❌ Error procesando IVA: {e}")
+                        logger.debug("❌ Error procesando IVA: %s", e)
                         continue
                 if "iva" in valores_pdf:
                     break
         
         # === PATRONES UNIVERSALES PARA TOTAL ===
         if "total_declarado" not in valores_pdf or valores_pdf["total_declarado"] == 0:
-            total_patterns = [
-                # Formatos estándar ecuatorianos MÁS ESPECÍFICOS
-                r"valor\s*total\s*:?\s*\$?\s*([0-9]+[.,][0-9]{1,2})",
-                r"total\s*a\s*pagar\s*:?\s*\$?\s*([0-9]+[.,][0-9]{1,2})",
-                r"importe\s*total\s*:?\s*\$?\s*([0-9]+[.,][0-9]{1,2})",
-                r"gran\s*total\s*:?\s*\$?\s*([0-9]+[.,][0-9]{1,2})",
-                # ESPECÍFICO para facturas con formato de tabla
-                r"valor\s*total\s*\|?\s*([0-9]+[.,][0-9]{2})",
-                r"total\s*\|\s*([0-9]+[.,][0-9]{2})",
-                # Buscar en contexto de líneas finales de tabla
-                r"total.*?([0-9]+[.,][0-9]{2})",
-                # ESPECÍFICO: Números de 2-3 dígitos con decimales en posición de total
-                r"(?:^|\n|\s)([2-9][0-9][.,][0-9]{2})(?:\s*\n|$|\s*$)",  # 20.00-99.99
-                r"(?:^|\n|\s)([1-9][0-9]{2}[.,][0-9]{2})(?:\s*\n|$|\s*$)",  # 100.00-999.99
-                # Búsqueda muy agresiva al final del documento
-                r"(?:^|\n)\s*([0-9]{1,3}[.,][0-9]{2})\s*(?:\n|$)",
-            ]
-            
             valores_totales_candidatos = []
-            for i, pattern in enumerate(total_patterns):
-                matches = re.finditer(pattern, fuente_texto, re.I | re.M)
+            for i, pattern in enumerate(_PATRONES_TOTAL):
+                matches = pattern.finditer(fuente_texto)
                 for match in matches:
                     try:
                         val = float(match.group(1).replace(",", "."))
@@ -1818,7 +1839,7 @@ def _evaluar_matematica_desde_pdf(pdf_fields: Dict[str, Any], fuente_texto: str,
                                 "patron": i,
                                 "texto": match.group(0).strip()
                             })
-                            print(f"DEBUG: Total candidato (patrón {i}): {val} de '{match.group(0).strip()}'")
+                            logger.debug("Total candidato (patrón %s): %s de '%s'", i, val, match.group(0).strip())
                     except:
                         continue
             
@@ -1828,13 +1849,13 @@ def _evaluar_matematica_desde_pdf(pdf_fields: Dict[str, Any], fuente_texto: str,
                 valores_totales_candidatos.sort(key=lambda x: (x["patron"], -x["valor"]))
                 total_seleccionado = valores_totales_candidatos[0]["valor"]
                 valores_pdf["total_declarado"] = total_seleccionado
-                print(f"DEBUG: Total seleccionado: {total_seleccionado}")
+                logger.debug("Total seleccionado: %s", total_seleccionado)
                 
                 # Detectar múltiples totales (posible manipulación)
                 valores_unicos = list(set([c["valor"] for c in valores_totales_candidatos]))
                 if len(valores_unicos) > 1:
                     valores_unicos.sort()
-                    print(f"DEBUG: ⚠️ MÚLTIPLES TOTALES: {valores_unicos}")
+                    logger.debug("⚠️ MÚLTIPLES TOTALES: %s", valores_unicos)
                     resultado["anomalias_detectadas"].append(f"Múltiples valores de total detectados: {valores_unicos}")
     
     # ESTRATEGIA 3: Usar datos de validación financiera como fallback
@@ -1845,24 +1866,18 @@ def _evaluar_matematica_desde_pdf(pdf_fields: Dict[str, Any], fuente_texto: str,
     
     # FALLBACK FINAL: Si aún faltan valores, usar las últimas líneas numéricas del PDF
     if (subtotal == 0 or iva == 0) and fuente_texto:
-        print("DEBUG: Fallback final - usando últimas líneas numéricas")
-        lineas = fuente_texto.split('\n')
+        logger.debug("Fallback final - usando últimas líneas numéricas")
         ultimos_numeros = []
         
         # Buscar en las últimas 20 líneas (donde suelen estar los totales)
-        for linea in lineas[-20:]:
-            numeros = re.findall(r'([0-9]+[.,][0-9]{2})', linea)
-            for num in numeros:
-                try:
-                    val = float(num.replace(",", "."))
-                    if 0.01 <= val <= 100.0:
-                        ultimos_numeros.append(val)
-                except:
-                    continue
+        for linea in doc.lineas[-20:]:
+            for importe in linea.decimales:
+                if 0.01 <= importe.valor <= 100.0:
+                    ultimos_numeros.append(importe.valor)
         
         # Usar los valores típicos de facturas ecuatorianas
         ultimos_unicos = sorted(list(set(ultimos_numeros)))
-        print(f"DEBUG: Últimos números únicos: {ultimos_unicos}")
+        logger.debug("Últimos números únicos: %s", ultimos_unicos)
         
         if len(ultimos_unicos) >= 3:
             # IVA suele ser el más pequeño > 0.01
@@ -1871,7 +1886,7 @@ def _evaluar_matematica_desde_pdf(pdf_fields: Dict[str, Any], fuente_texto: str,
                 if candidatos_iva:
                     iva = min(candidatos_iva)
                     valores_pdf["iva"] = iva
-                    print(f"DEBUG: IVA fallback: {iva}")
+                    logger.debug("IVA fallback: %s", iva)
             
             # Subtotal suele estar cerca del total
             if subtotal == 0 and total_declarado > 0:
@@ -1880,23 +1895,23 @@ def _evaluar_matematica_desde_pdf(pdf_fields: Dict[str, Any], fuente_texto: str,
                     subtotal = max([v for v in candidatos_subtotal if v < total_declarado], default=0)
                     if subtotal > 0:
                         valores_pdf["subtotal"] = subtotal
-                        print(f"DEBUG: Subtotal fallback: {subtotal}")
+                        logger.debug("Subtotal fallback: %s", subtotal)
     
     # Si los valores del PDF fallan, usar los de validación financiera (sin SRI) como referencia
     if (subtotal == 0 or iva == 0 or total_declarado == 0) and pdf_fields:
-        print("DEBUG: Usando valores de pdf_fields como fallback final")
+        logger.debug("Usando valores de pdf_fields como fallback final")
         if "subtotal" in pdf_fields and subtotal == 0:
             subtotal = float(pdf_fields["subtotal"])
             valores_pdf["subtotal"] = subtotal
-            print(f"DEBUG: Subtotal desde pdf_fields: {subtotal}")
+            logger.debug("Subtotal desde pdf_fields: %s", subtotal)
         if "iva" in pdf_fields and iva == 0:
             iva = float(pdf_fields["iva"])
             valores_pdf["iva"] = iva
-            print(f"DEBUG: IVA desde pdf_fields: {iva}")
+            logger.debug("IVA desde pdf_fields: %s", iva)
         if "importeTotal" in pdf_fields and total_declarado == 0:
             total_declarado = float(pdf_fields["importeTotal"])
             valores_pdf["total_declarado"] = total_declarado
-            print(f"DEBUG: Total desde pdf_fields: {total_declarado}")
+            logger.debug("Total desde pdf_fields: %s", total_declarado)
     
     # Si tenemos total pero no subtotal, intentar inferir
     if total_declarado > 0 and subtotal == 0:
@@ -1906,7 +1921,7 @@ def _evaluar_matematica_desde_pdf(pdf_fields: Dict[str, Any], fuente_texto: str,
             if subtotal_inferido > 0:
                 subtotal = subtotal_inferido
                 valores_pdf["subtotal"] = subtotal
-                print(f"DEBUG: Subtotal inferido: {subtotal} (total - iva)")
+                logger.debug("Subtotal inferido: %s (total - iva)", subtotal)
         else:
             # Asumir que el total es subtotal + 15% de IVA
             subtotal_inferido = total_declarado / 1.15
@@ -1916,7 +1931,7 @@ def _evaluar_matematica_desde_pdf(pdf_fields: Dict[str, Any], fuente_texto: str,
                 iva = iva_inferido
                 valores_pdf["subtotal"] = subtotal
                 valores_pdf["iva"] = iva
-                print(f"DEBUG: Valores inferidos - Subtotal: {subtotal}, IVA: {iva}")
+                logger.debug("Valores inferidos - Subtotal: %s, IVA: %s", subtotal, iva)
     
     # Si tenemos subtotal pero no IVA, intentar inferir
     if subtotal > 0 and iva == 0 and total_declarado > subtotal:
@@ -1924,21 +1939,22 @@ def _evaluar_matematica_desde_pdf(pdf_fields: Dict[str, Any], fuente_texto: str,
         if iva_inferido > 0:
             iva = iva_inferido
             valores_pdf["iva"] = iva
-            print(f"DEBUG: IVA inferido: {iva} (total - subtotal)")
+            logger.debug("IVA inferido: %s (total - subtotal)", iva)
     
     # ESTRATEGIA 4: Búsqueda exhaustiva de números sospechosos
     if fuente_texto:
-        print("DEBUG: Búsqueda exhaustiva de números...")
-        lineas = fuente_texto.split('\n')
+        logger.debug("Búsqueda exhaustiva de números...")
+        lineas = doc.lineas
         numeros_encontrados = []
         numeros_sospechosos = []
         
-        for i, linea in enumerate(lineas):
-            # Buscar TODOS los números monetarios en cada línea
-            numeros = re.findall(r'([0-9]+[.,][0-9]{2})', linea)
-            for num in numeros:
+        # Solo las líneas con números monetarios (tokens ya extraídos)
+        for token_linea in doc.con_decimales():
+            i = token_linea.indice
+            linea = token_linea.original
+            for importe in token_linea.decimales:
                 try:
-                    val = float(num.replace(",", "."))
+                    val = importe.valor
                     if 0.1 <= val <= 15000.0:
                         numeros_encontrados.append({
                             "valor": val,
@@ -1972,9 +1988,9 @@ def _evaluar_matematica_desde_pdf(pdf_fields: Dict[str, Any], fuente_texto: str,
                                 "contexto": linea.strip(),
                                 "es_total_candidato": True
                             })
-                            print(f"DEBUG: ✅ Total candidato válido: {val} en '{linea.strip()}'")
+                            logger.debug("✅ Total candidato válido: %s en '%s'", val, linea.strip())
                         elif 20.0 <= val <= 100.0:
-                            print(f"DEBUG: ❌ Número excluido: {val} en '{linea.strip()}' (es_total_real={es_total_real}, es_irrelevante={es_numero_irrelevante})")
+                            logger.debug("❌ Número excluido: %s en '%s' (es_total_real=%s, es_irrelevante=%s)", val, linea.strip(), es_total_real, es_numero_irrelevante)
                 except:
                     continue
         
@@ -1982,8 +1998,8 @@ def _evaluar_matematica_desde_pdf(pdf_fields: Dict[str, Any], fuente_texto: str,
         numeros_encontrados.sort(key=lambda x: x["linea"])
         numeros_sospechosos.sort(key=lambda x: x["linea"])
         
-        print(f"DEBUG: Números encontrados ({len(numeros_encontrados)}): {[n['valor'] for n in numeros_encontrados[-10:]]}")
-        print(f"DEBUG: Números sospechosos de total ({len(numeros_sospechosos)}): {[n['valor'] for n in numeros_sospechosos]}")
+        logger.debug("Números encontrados (%s): %s", len(numeros_encontrados), [n['valor'] for n in numeros_encontrados[-10:]])
+        logger.debug("Números sospechosos de total (%s): %s", len(numeros_sospechosos), [n['valor'] for n in numeros_sospechosos])
         
         # Si no tenemos total, buscar candidatos
         if total_declarado == 0 and numeros_sospechosos:
@@ -1993,23 +2009,23 @@ def _evaluar_matematica_desde_pdf(pdf_fields: Dict[str, Any], fuente_texto: str,
                 total_candidato = candidatos_finales[-1]["valor"]  # Último del final
                 valores_pdf["total_declarado"] = total_candidato
                 total_declarado = total_candidato
-                print(f"DEBUG: Total candidato por posición final: {total_candidato}")
+                logger.debug("Total candidato por posición final: %s", total_candidato)
             elif numeros_sospechosos:
                 # Si no hay en la parte final, tomar el último número sospechoso
                 total_candidato = numeros_sospechosos[-1]["valor"]
                 valores_pdf["total_declarado"] = total_candidato
                 total_declarado = total_candidato
-                print(f"DEBUG: Total candidato por último sospechoso: {total_candidato}")
+                logger.debug("Total candidato por último sospechoso: %s", total_candidato)
         
         # CORRECCIÓN INTELIGENTE: Usar valores sospechosos detectados
         if numeros_sospechosos:
-            print(f"DEBUG: 🔧 CORRECCIÓN INTELIGENTE usando números sospechosos")
+            logger.debug("🔧 CORRECCIÓN INTELIGENTE usando números sospechosos")
             
             # Inferir valores usando los números sospechosos (ordenados por línea)
             valores_candidatos = [n["valor"] for n in numeros_sospechosos]
             valores_candidatos.sort()  # Ordenar de menor a mayor
             
-            print(f"DEBUG: Valores candidatos ordenados: {valores_candidatos}")
+            logger.debug("Valores candidatos ordenados: %s", valores_candidatos)
             
             # LÓGICA: En facturas ecuatorianas típicas:
             # - El más pequeño suele ser IVA
@@ -2034,7 +2050,7 @@ def _evaluar_matematica_desde_pdf(pdf_fields: Dict[str, Any], fuente_texto: str,
                 if candidatos_iva:
                     iva = min(candidatos_iva)  # El más pequeño suele ser IVA
                     valores_pdf["iva"] = iva
-                    print(f"DEBUG: 🔧 IVA corregido: {iva}")
+                    logger.debug("🔧 IVA corregido: %s", iva)
                 
                 # Para subtotal: buscar uno que sea coherente con total-iva
                 candidatos_subtotal = [v for v in valores_candidatos if 15.0 <= v <= 50.0]
@@ -2043,7 +2059,7 @@ def _evaluar_matematica_desde_pdf(pdf_fields: Dict[str, Any], fuente_texto: str,
                     total_menos_iva = total_candidato - (iva if 'iva' in locals() else 0)
                     subtotal = min(candidatos_subtotal, key=lambda x: abs(x - total_menos_iva))
                     valores_pdf["subtotal"] = subtotal
-                    print(f"DEBUG: 🔧 Subtotal corregido: {subtotal}")
+                    logger.debug("🔧 Subtotal corregido: %s", subtotal)
                 
                 if 20.0 <= total_candidato <= 100.0:
                     # AQUÍ detectamos manipulación SOLO si hay múltiples totales DIFERENTES
@@ -2055,25 +2071,25 @@ def _evaluar_matematica_desde_pdf(pdf_fields: Dict[str, Any], fuente_texto: str,
                         diferencia_maxima = max(valores_unicos_totales) - min(valores_unicos_totales)
                         # Solo alertar si la diferencia es significativa (>$1)
                         if diferencia_maxima > 1.0:
-                            print(f"DEBUG: 🚨 MÚLTIPLES TOTALES DIFERENTES: {valores_unicos_totales}")
+                            logger.debug("🚨 MÚLTIPLES TOTALES DIFERENTES: %s", valores_unicos_totales)
                             resultado["errores"].append(f"⚠️ MÚLTIPLES TOTALES DIFERENTES DETECTADOS: {valores_unicos_totales} - Posible manipulación")
                             # Usar el más alto como sospechoso
                             total_declarado = max(valores_unicos_totales)
                         else:
-                            print(f"DEBUG: ✅ Totales similares (diferencia mínima: ${diferencia_maxima:.2f})")
+                            logger.debug("✅ Totales similares (diferencia mínima: $%.2f)", diferencia_maxima)
                             total_declarado = total_candidato
                     else:
-                        print(f"DEBUG: ✅ Total único o duplicado legítimo: {total_candidato}")
+                        logger.debug("✅ Total único o duplicado legítimo: %s", total_candidato)
                         total_declarado = total_candidato
                         
                     valores_pdf["total_declarado"] = total_declarado
-                    print(f"DEBUG: 🔧 Total corregido: {total_declarado}")
+                    logger.debug("🔧 Total corregido: %s", total_declarado)
         
         # BÚSQUEDA ESPECÍFICA para valores como 33.15 (manipulados)
         if total_declarado < 30.0:  # Si el total detectado es bajo, buscar valores más altos
             valores_altos = [n for n in numeros_encontrados if n["valor"] > 25.0]
             if valores_altos:
-                print(f"DEBUG: ⚠️ VALORES ALTOS DETECTADOS (posible manipulación): {[v['valor'] for v in valores_altos]}")
+                logger.debug("⚠️ VALORES ALTOS DETECTADOS (posible manipulación): %s", [v['valor'] for v in valores_altos])
                 # Agregar como anomalía
                 valores_manipulados = [v["valor"] for v in valores_altos]
                 resultado["anomalias_detectadas"].append(f"Valores anómalamente altos detectados: {valores_manipulados}")
@@ -2082,7 +2098,7 @@ def _evaluar_matematica_desde_pdf(pdf_fields: Dict[str, Any], fuente_texto: str,
                 valor_mas_alto = max(valores_altos, key=lambda x: x["valor"])
                 if valor_mas_alto["valor"] > total_declarado * 1.2:  # 20% mayor
                     resultado["errores"].append(f"⚠️ VALOR SOSPECHOSO DETECTADO: ${valor_mas_alto['valor']:.2f} vs total ${total_declarado:.2f}")
-                    print(f"DEBUG: 🚨 MANIPULACIÓN DETECTADA: {valor_mas_alto['valor']} vs {total_declarado}")
+                    logger.debug("🚨 MANIPULACIÓN DETECTADA: %s vs %s", valor_mas_alto['valor'], total_declarado)
     
     # Actualizar resultado con valores extraídos
     resultado["validacion_formula"]["componentes"] = {
@@ -2128,11 +2144,11 @@ def _evaluar_matematica_desde_pdf(pdf_fields: Dict[str, Any], fuente_texto: str,
         if not iva_coherente:
             resultado["errores"].append(f"IVA no estándar: {porcentaje_iva:.2f}% (esperado: 0%, 12% o 15%)")
     
-    print(f"DEBUG MATH_CONSISTENCY: ===== RESUMEN EXTRACCIÓN =====")
-    print(f"DEBUG: Subtotal: {subtotal}, IVA: {iva}, Total: {total_declarado}")
-    print(f"DEBUG: Fórmula válida: {resultado['validacion_formula']['formula_correcta']}")
-    print(f"DEBUG: Diferencia: {diferencia:.3f} (tolerancia: {tolerancia})")
-    print(f"DEBUG MATH_CONSISTENCY: ===== FIN EXTRACCIÓN =====")
+    logger.debug("MATH_CONSISTENCY: ===== RESUMEN EXTRACCIÓN =====")
+    logger.debug("Subtotal: %s, IVA: %s, Total: %s", subtotal, iva, total_declarado)
+    logger.debug("Fórmula válida: %s", resultado['validacion_formula']['formula_correcta'])
+    logger.debug("Diferencia: %.3f (tolerancia: %s)", diferencia, tolerancia)
+    logger.debug("MATH_CONSISTENCY: ===== FIN EXTRACCIÓN =====")
 
 
 def _evaluar_items_desde_pdf(detalles: List[Dict[str, Any]], resultado: Dict[str, Any]):
@@ -1,21 +1,12 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 import base64
-import pdfplumber
+from helpers.importacion_diferida import modulo_diferido
+from helpers import config_riesgo
 from collections import defaultdict
 import io
-import os
-import json
- 
-# --------------------------- CONFIG ----------------------------------
-CONFIG_FILE = "risk_weights.json"
- 
-if os.path.exists(CONFIG_FILE):
-    with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-        RISK_WEIGHTS = json.load(f)
-else:
-    # Fallback
-    RISK_WEIGHTS = {"alineacion_texto": 6}
+
+pdfplumber = modulo_diferido("pdfplumber")
  
 # Define el modelo para la solicitud (Base64 del PDF)
 class PDFRequest(BaseModel):
@@ -99,7 +90,7 @@ def detectar_texto_sobrepuesto(pdf_bytes: bytes, tolerancia_solapamiento=5):
                 "alineacion_promedio": 0.0,  # ejemplo si quieres calcular un score
                 "rotacion_promedio": 0.0
             },
-            "penalizacion": RISK_WEIGHTS.get("alineacion_texto")
+            "penalizacion": config_riesgo.actual().pesos.get("alineacion_texto", 6)
         }
  
  
@@ -20,28 +20,19 @@ from typing import Dict, Any, Tuple, Optional, List
 import numpy as np
 from PIL import Image, ImageChops, ImageEnhance, ImageFilter, ExifTags
 from fastapi import APIRouter, HTTPException, UploadFile, File
-from fastapi.responses import JSONResponse
+from helpers.type_conversion import NumpyJSONResponse
+from helpers.importacion_diferida import disponible, funcion_diferida, modulo_diferido
 
-# Optional sklearn import
-try:
-    from sklearn.cluster import KMeans
-    SKLEARN_AVAILABLE = True
-except ImportError:
-    SKLEARN_AVAILABLE = False
+# --- Optional imports (se importan en el primer uso) ---
+SKLEARN_AVAILABLE = disponible("sklearn")
+KMeans = funcion_diferida("sklearn.cluster", "KMeans")
 
-# --- Optional imports ---
-try:
-    import cv2
-except Exception:
-    cv2 = None
+cv2 = modulo_diferido("cv2") if disponible("cv2") else None
 
 # Usar configuración global de Tesseract
 import configurar_tesseract_global
 
-try:
-    import pytesseract
-except Exception:
-    pytesseract = None
+pytesseract = modulo_diferido("pytesseract") if disponible("pytesseract") else None
 
 router = APIRouter()
 
@@ -68,8 +59,8 @@ def configure_tesseract():
         print(f"Error configurando Tesseract: {e}")
         return False
 
-# Configurar Tesseract al importar el módulo
-configure_tesseract()
+# No se configura al importar: cada endpoint que usa Tesseract llama a
+# configure_tesseract() antes, y así pytesseract no se carga al arrancar
 
 # ------------------------ Data structures ------------------------
 
@@ -1109,7 +1100,7 @@ async def analizar_imagen_forense(file: UploadFile = File(...)):
         # Realizar análisis forense
         resultado = analyze_image_from_bytes(image_bytes)
         
-        return JSONResponse(content={
+        return NumpyJSONResponse(content={
             "success": True,
             "filename": file.filename,
             "content_type": file.content_type,
@@ -1118,7 +1109,7 @@ async def analizar_imagen_forense(file: UploadFile = File(...)):
         })
         
     except Exception as e:
-        return JSONResponse(
+        return NumpyJSONResponse(
             status_code=500,
             content={
                 "success": False,
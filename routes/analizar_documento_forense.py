@@ -19,19 +19,13 @@ from typing import Dict, Any, Tuple, Optional, List, Union
 import numpy as np
 from PIL import Image, ImageChops, ImageEnhance, ImageFilter, ExifTags
 from fastapi import APIRouter, HTTPException
-from fastapi.responses import JSONResponse
+from helpers.type_conversion import NumpyJSONResponse
 from pydantic import BaseModel
+from helpers.importacion_diferida import disponible, modulo_diferido
 
-# Optional imports
-try:
-    import cv2
-except Exception:
-    cv2 = None
-
-try:
-    import pytesseract
-except Exception:
-    pytesseract = None
+# Optional imports (cv2 y pytesseract se importan en el primer uso)
+cv2 = modulo_diferido("cv2") if disponible("cv2") else None
+pytesseract = modulo_diferido("pytesseract") if disponible("pytesseract") else None
 
 try:
     import PyPDF2
@@ -674,7 +668,7 @@ async def analizar_documento_forense(req: PeticionDocumento):
             img = Image.open(io.BytesIO(documento_bytes))
             resultado = analyze_image(img)
         
-        return JSONResponse(
+        return NumpyJSONResponse(
             status_code=200,
             content={
                 "exito": True,
@@ -685,7 +679,7 @@ async def analizar_documento_forense(req: PeticionDocumento):
         )
         
     except Exception as e:
-        return JSONResponse(
+        return NumpyJSONResponse(
             status_code=400,
             content={
                 "exito": False,
@@ -1,10 +1,9 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Dict
-import json
-import os
 
-from config import RISK_WEIGHTS, RISK_WEIGHTS_DESCRIPTIONS, CONFIG_FILE
+from helpers import config_riesgo
+from helpers.config_riesgo import descongelar
 
 router = APIRouter()
 
@@ -14,53 +13,62 @@ class RiskWeightsPayload(BaseModel):
 @router.get("/config/risk-weights")
 def get_risk_weights():
     """Devuelve los pesos de riesgo actuales con sus descripciones."""
+    cfg = config_riesgo.actual()
     return {
-        "RISK_WEIGHTS": RISK_WEIGHTS,
-        "RISK_WEIGHTS_DESCRIPTIONS": RISK_WEIGHTS_DESCRIPTIONS
+        "RISK_WEIGHTS": descongelar(cfg.pesos),
+        "RISK_WEIGHTS_DESCRIPTIONS": descongelar(cfg.descripciones),
+        "version_config": cfg.version,
     }
 
 @router.put("/config/risk-weights")
 def update_risk_weights(payload: RiskWeightsPayload):
     new_weights = payload.RISK_WEIGHTS
+    actuales = config_riesgo.actual().pesos
 
     # Validar que las claves coincidan exactamente
-    if set(new_weights.keys()) != set(RISK_WEIGHTS.keys()):
+    if set(new_weights.keys()) != set(actuales.keys()):
         raise HTTPException(
             status_code=400,
             detail="Las claves no coinciden con la configuración actual. Solo puedes modificar valores."
         )
 
-    # Actualizar valores
+    # Validar todo antes de publicar nada
     for key, value in new_weights.items():
         if not isinstance(value, int):
             raise HTTPException(status_code=400, detail=f"El valor de {key} debe ser un entero")
-        RISK_WEIGHTS[key] = value
 
-    # Guardar en JSON para persistencia
-    with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-        json.dump(RISK_WEIGHTS, f, indent=2, ensure_ascii=False)
+    # Mismo orden de claves que el archivo actual; se guarda de forma atómica y
+    # los demás workers la recogen al notar el cambio del archivo
+    cfg = config_riesgo.guardar_pesos({key: new_weights[key] for key in actuales})
 
-    return {"message": "Pesos actualizados correctamente", "RISK_WEIGHTS": RISK_WEIGHTS}
+    return {
+        "message": "Pesos actualizados correctamente",
+        "RISK_WEIGHTS": descongelar(cfg.pesos),
+        "version_config": cfg.version,
+    }
 
 @router.get("/config/risk-weights-descriptions")
 def get_risk_weights_descriptions():
     """Devuelve solo las descripciones de los pesos de riesgo."""
-    return {"RISK_WEIGHTS_DESCRIPTIONS": RISK_WEIGHTS_DESCRIPTIONS}
+    return {"RISK_WEIGHTS_DESCRIPTIONS": descongelar(config_riesgo.actual().descripciones)}
 
 @router.get("/config/risk-weights-detailed")
 def get_risk_weights_detailed():
     """Devuelve los pesos con descripciones en formato detallado para frontend."""
+    cfg = config_riesgo.actual()
+    pesos, descripciones = cfg.pesos, cfg.descripciones
     detailed_weights = {}
-    for key in RISK_WEIGHTS.keys():
+    for key in pesos.keys():
         detailed_weights[key] = {
-            "valor": RISK_WEIGHTS[key],
-            "descripcion": RISK_WEIGHTS_DESCRIPTIONS.get(key, {}).get("descripcion", "Sin descripción"),
-            "explicacion": RISK_WEIGHTS_DESCRIPTIONS.get(key, {}).get("explicacion", "Sin explicación")
+            "valor": pesos[key],
+            "descripcion": descripciones.get(key, {}).get("descripcion", "Sin descripción"),
+            "explicacion": descripciones.get(key, {}).get("explicacion", "Sin explicación")
         }
     
     return {
         "weights_detailed": detailed_weights,
-        "total_criterios": len(RISK_WEIGHTS),
-        "peso_maximo_positivo": max([v for v in RISK_WEIGHTS.values() if v > 0]),
-        "peso_maximo_negativo": min([v for v in RISK_WEIGHTS.values() if v < 0], default=0)
+        "total_criterios": len(pesos),
+        "peso_maximo_positivo": max([v for v in pesos.values() if v > 0]),
+        "peso_maximo_negativo": min([v for v in pesos.values() if v < 0], default=0),
+        "version_config": cfg.version,
     }
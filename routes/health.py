@@ -1,6 +1,8 @@
 from fastapi import APIRouter
 from importlib.metadata import version as pkg_version
 from config import MAX_PDF_BYTES, SRI_TIMEOUT
+from helpers.importacion_diferida import estado_precalentamiento
+from helpers import config_riesgo
 
 router = APIRouter()
 
@@ -23,4 +25,6 @@ def health():
         "max_pdf_bytes": MAX_PDF_BYTES,
         "sri_timeout_sec": SRI_TIMEOUT,
         "app_version": "1.50.0-risk",
+        "precalentamiento": estado_precalentamiento()["estado"],
+        "version_config": config_riesgo.actual().version,
     }
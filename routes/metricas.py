@@ -0,0 +1,58 @@
+"""
+GET /metrics: métricas de todos los workers en formato de Prometheus.
+
+Peticiones y latencias por endpoint y por etapa vienen de helpers/trazas; aquí se
+registran los recolectores de la cola de trabajos y de la caché de rasterizado.
+"""
+
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+from helpers.metricas import compartidas, registro
+from helpers.cache_rasterizado import cache as cache_rasterizado
+from helpers.trabajos import gestor
+
+router = APIRouter()
+
+_TIPO_CONTENIDO = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@registro.recolector
+def _trabajos():
+    m = gestor.metricas()
+    return [
+        ("api_forense_trabajos_cola", "gauge", "Trabajos en cola esperando trabajador", [({}, m["cola"])]),
+        ("api_forense_trabajos_capacidad_cola", "gauge", "Capacidad máxima de la cola de trabajos", [({}, m["capacidad_cola"])]),
+        ("api_forense_trabajos_en_proceso", "gauge", "Trabajadores ocupados", [({}, m["en_proceso"])]),
+        ("api_forense_trabajos_trabajadores", "gauge", "Trabajadores del pool de trabajos", [({}, m["trabajadores"])]),
+        ("api_forense_trabajos_total", "counter", "Trabajos terminados por resultado", [
+            ({"resultado": "completado"}, m["completados"]),
+            ({"resultado": "error"}, m["errores"]),
+            ({"resultado": "rechazado_cola_llena"}, m["rechazados_cola_llena"]),
+            ({"resultado": "reutilizado"}, m["reutilizados"]),
+        ]),
+    ]
+
+
+@registro.recolector
+def _cache_rasterizado():
+    e = cache_rasterizado.estadisticas()
+    consultas = e["aciertos"] + e["reescalados"] + e["renders"]
+    return [
+        ("api_forense_cache_consultas_total", "counter", "Consultas a cachés por resultado", [
+            ({"cache": "rasterizado", "resultado": "acierto"}, e["aciertos"]),
+            ({"cache": "rasterizado", "resultado": "reescalado"}, e["reescalados"]),
+            ({"cache": "rasterizado", "resultado": "fallo"}, e["renders"]),
+        ]),
+        ("api_forense_cache_ratio_aciertos", "gauge", "Fracción de consultas servidas sin renderizar", [
+            ({"cache": "rasterizado"}, round((e["aciertos"] + e["reescalados"]) / consultas, 4) if consultas else None),
+        ]),
+        ("api_forense_cache_bytes", "gauge", "Bytes ocupados por la caché", [({"cache": "rasterizado"}, e["bytes"])]),
+        ("api_forense_cache_entradas", "gauge", "Entradas en la caché", [({"cache": "rasterizado"}, e["entradas"])]),
+    ]
+
+
+@router.get("/metrics")
+def metrics():
+    """Métricas de todos los workers (METRICAS_DB) en formato de exposición de Prometheus."""
+    return Response(content=compartidas.exponer(), media_type=_TIPO_CONTENIDO)
@@ -1,14 +1,24 @@
 import base64
+import functools
 import io
+import json
 import time
-from typing import List
+import uuid
+from typing import Any, Dict, Iterator, List, Optional
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import fitz  # PyMuPDF
 
 from config import MAX_PDF_BYTES
 from utils import log_step
+from helpers.trazas import fijar
+from helpers.metricas import documentos
+from helpers.carga_documentos import recibir_bytes, TIPOS_PDF
+from helpers.cache_rasterizado import raster_pagina, pixmap_desde_array, sha256_documento
+from helpers.paralelo_paginas import iterar_paginas
+from helpers.rasterizado_paginas import FORMATOS, parsear_rango_paginas, renderizar_pagina
 
 router = APIRouter()
 
@@ -51,29 +61,20 @@ def pdf_to_images(pdf_bytes: bytes, dpi: int = 150) -> List[str]:
     try:
         # Abrir el PDF
         doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        sha = sha256_documento(pdf_bytes)
         
         # Convertir cada página a imagen
         for page_num in range(len(doc)):
-            # Obtener la página
-            page = doc.load_page(page_num)
-            
-            # Crear matriz de transformación para el DPI deseado
-            # fitz usa 72 DPI por defecto, así que calculamos el factor de escala
-            zoom = dpi / 72.0
-            mat = fitz.Matrix(zoom, zoom)
-            
-            # Renderizar la página como imagen
-            pix = page.get_pixmap(matrix=mat)
+            # Renderizar la página (o tomarla de la caché de rasterizado)
+            arr = raster_pagina(pdf_bytes, page_num, dpi, doc=doc, sha=sha)
             
             # Convertir a bytes PNG
-            img_data = pix.tobytes("png")
+            img_data = pixmap_desde_array(arr).tobytes("png")
             
             # Convertir a base64
             img_b64 = base64.b64encode(img_data).decode('utf-8')
             images_b64.append(img_b64)
             
-            # Limpiar memoria
-            pix = None
         
         doc.close()
         return images_b64
@@ -105,6 +106,26 @@ async def parse_pdf_to_images(req: PeticionPdfImagenes):
     except Exception:
         raise HTTPException(status_code=400, detail="El campo 'pdfbase64' no es base64 válido.")
     
+    return _convertir_pdf_bytes(pdf_bytes, req.dpi)
+
+
+@router.post("/parse-pdf-to-images/archivo", response_model=RespuestaImagenes)
+async def parse_pdf_to_images_archivo(
+    request: Request,
+    dpi: int = Query(150, description="Resolución de salida (72-600)")
+):
+    """
+    Variante de /parse-pdf-to-images sin base64: el PDF llega como multipart
+    (campo 'archivo') o como cuerpo application/pdf.
+    """
+    log_step("Iniciando conversión PDF a imágenes", time.perf_counter())
+    pdf_bytes = await recibir_bytes(request, TIPOS_PDF)
+    return _convertir_pdf_bytes(pdf_bytes, dpi)
+
+
+def _validar_pdf(pdf_bytes: bytes, dpi: int) -> None:
+    """Validaciones comunes a todas las variantes: tamaño, PDF válido y DPI."""
+    documentos.inc(tipo="pdf_a_imagenes")
     # 2) Validar tamaño del PDF
     if len(pdf_bytes) > MAX_PDF_BYTES:
         raise HTTPException(
@@ -120,21 +141,138 @@ async def parse_pdf_to_images(req: PeticionPdfImagenes):
         )
     
     # 4) Validar DPI
-    if req.dpi < 72 or req.dpi > 600:
+    if dpi < 72 or dpi > 600:
         raise HTTPException(
             status_code=400, 
             detail="El DPI debe estar entre 72 y 600."
         )
     
     log_step("Validaciones completadas", time.perf_counter())
-    
+
+
+def _convertir_pdf_bytes(pdf_bytes: bytes, dpi: int) -> RespuestaImagenes:
+    """Valida el PDF y lo convierte a imágenes (común a todas las variantes)."""
+    _validar_pdf(pdf_bytes, dpi)
+
     # 5) Convertir PDF a imágenes
-    imagenes_b64 = pdf_to_images(pdf_bytes, req.dpi)
+    imagenes_b64 = pdf_to_images(pdf_bytes, dpi)
     
     log_step(f"Conversión completada - {len(imagenes_b64)} páginas", time.perf_counter())
     
     return RespuestaImagenes(
         total_paginas=len(imagenes_b64),
         imagenes=imagenes_b64,
-        mensaje=f"PDF convertido exitosamente a {len(imagenes_b64)} imágenes con DPI {req.dpi}"
+        mensaje=f"PDF convertido exitosamente a {len(imagenes_b64)} imágenes con DPI {dpi}"
     )
+
+
+# ------------------------- Variante en streaming -------------------------
+
+def _lineas_ndjson(paginas: Iterator, total: int, t0: float) -> Iterator[bytes]:
+    """Una línea JSON por página con la imagen en base64, y una línea final de resumen."""
+    enviadas = errores = 0
+    for _, resultado in paginas:
+        datos = resultado.pop("datos", None)
+        if datos is None:
+            errores += 1
+        else:
+            enviadas += 1
+            resultado["bytes"] = len(datos)
+            resultado["datos"] = base64.b64encode(datos).decode("ascii")
+        yield json.dumps(resultado, ensure_ascii=False).encode("utf-8") + b"\n"
+    yield json.dumps({"resumen": _resumen(total, enviadas, errores, t0)}).encode("utf-8") + b"\n"
+
+
+def _partes_multipart(paginas: Iterator, total: int, t0: float, boundary: str) -> Iterator[bytes]:
+    """Una parte binaria por página (multipart/mixed) y una parte JSON final de resumen."""
+    separador = f"--{boundary}\r\n".encode("ascii")
+    enviadas = errores = 0
+    for _, resultado in paginas:
+        datos = resultado.pop("datos", None)
+        if datos is None:
+            errores += 1
+            cuerpo = json.dumps(resultado, ensure_ascii=False).encode("utf-8")
+            cabeceras = f"Content-Type: application/json\r\nX-Pagina: {resultado['pagina']}\r\n"
+        else:
+            enviadas += 1
+            cuerpo = datos
+            media_type, extension = FORMATOS[resultado["formato"]]
+            cabeceras = (
+                f"Content-Type: {media_type}\r\n"
+                f"Content-Disposition: inline; filename=\"pagina-{resultado['pagina']}.{extension}\"\r\n"
+                f"X-Pagina: {resultado['pagina']}\r\n"
+                f"X-Ancho: {resultado['ancho']}\r\n"
+                f"X-Alto: {resultado['alto']}\r\n"
+                f"X-Dpi: {resultado['dpi']}\r\n"
+            )
+        yield separador + (cabeceras + f"Content-Length: {len(cuerpo)}\r\n\r\n").encode("utf-8") + cuerpo + b"\r\n"
+    resumen = json.dumps({"resumen": _resumen(total, enviadas, errores, t0)}).encode("utf-8")
+    yield separador + b"Content-Type: application/json\r\n\r\n" + resumen + b"\r\n"
+    yield f"--{boundary}--\r\n".encode("ascii")
+
+
+def _resumen(total: int, enviadas: int, errores: int, t0: float) -> Dict[str, Any]:
+    log_step(f"Streaming completado - {enviadas} páginas", t0)
+    return {
+        "total_paginas": total,
+        "paginas_enviadas": enviadas,
+        "errores": errores,
+        "segundos": round(time.perf_counter() - t0, 3),
+    }
+
+
+@router.post("/parse-pdf-to-images/stream")
+async def parse_pdf_to_images_stream(
+    request: Request,
+    salida: str = Query("ndjson", description="ndjson (base64 por línea) o multipart (multipart/mixed binario)"),
+    formato: str = Query("png", description="png, jpeg o webp"),
+    calidad: int = Query(85, ge=1, le=100, description="Calidad JPEG/WebP (1-100)"),
+    dpi: int = Query(150, description="Resolución de salida (72-600)"),
+    max_pixels: Optional[int] = Query(None, ge=1, description="Máximo de píxeles por página; reduce el DPI si se excede"),
+    paginas: Optional[str] = Query(None, description="Páginas 1-based, p. ej. 1-3,7,10-"),
+):
+    """
+    Convierte el PDF a imágenes y las envía a medida que se renderizan.
+
+    El PDF llega como multipart (campo 'archivo'), cuerpo application/pdf o JSON
+    {"pdfbase64": "..."}. Las páginas se renderizan en paralelo y se entregan en
+    orden, sin acumular el documento completo en memoria.
+    """
+    t0 = time.perf_counter()
+    if salida not in ("ndjson", "multipart"):
+        raise HTTPException(status_code=400, detail="salida debe ser 'ndjson' o 'multipart'.")
+    if formato not in FORMATOS:
+        raise HTTPException(status_code=400, detail=f"formato debe ser uno de: {', '.join(FORMATOS)}.")
+
+    content_type = (request.headers.get("content-type") or "").split(";")[0].strip().lower()
+    if content_type == "application/json":
+        try:
+            pdf_bytes = base64.b64decode((await request.json())["pdfbase64"], validate=True)
+        except Exception:
+            raise HTTPException(status_code=400, detail="El campo 'pdfbase64' no es base64 válido.")
+    else:
+        pdf_bytes = await recibir_bytes(request, TIPOS_PDF)
+
+    _validar_pdf(pdf_bytes, dpi)
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        total = doc.page_count
+    fijar("paginas", total)
+    fijar("bytes", len(pdf_bytes))
+    try:
+        indices = parsear_rango_paginas(paginas, total)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    funcion = functools.partial(renderizar_pagina, dpi=dpi, formato=formato, calidad=calidad,
+                                max_pixeles=max_pixels, sha=sha256_documento(pdf_bytes))
+    resultados = iterar_paginas(pdf_bytes, indices, funcion)
+    cabeceras = {"X-Total-Paginas": str(total), "X-Paginas-Solicitadas": str(len(indices))}
+
+    if salida == "multipart":
+        boundary = uuid.uuid4().hex
+        return StreamingResponse(
+            _partes_multipart(resultados, total, t0, boundary),
+            media_type=f"multipart/mixed; boundary={boundary}",
+            headers=cabeceras,
+        )
+    return StreamingResponse(_lineas_ndjson(resultados, total, t0), media_type="application/x-ndjson", headers=cabeceras)
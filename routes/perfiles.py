@@ -0,0 +1,52 @@
+"""
+Consulta de perfiles guardados por helpers/perfilado (requiere X-Perfil-Token).
+
+GET /perfiles                 perfiles guardados, del más reciente al más antiguo
+GET /perfiles/{id}            resumen JSON (funciones más costosas, memoria, SHA-256 de la entrada)
+GET /perfiles/{id}/pstats     volcado pstats (python -m pstats, snakeviz)
+
+Sin PERFIL_TOKEN configurado los endpoints responden 404.
+"""
+
+import json
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import FileResponse
+
+from config import PERFIL_TOKEN
+from helpers.perfilado import listar_perfiles, ruta_perfil, token_valido
+
+router = APIRouter()
+
+
+def _autorizar(token: Optional[str]) -> None:
+    if not PERFIL_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not token_valido(token):
+        raise HTTPException(status_code=403, detail="Token de perfilado inválido.")
+
+
+@router.get("/perfiles")
+def perfiles(x_perfil_token: Optional[str] = Header(None)):
+    _autorizar(x_perfil_token)
+    return {"perfiles": listar_perfiles()}
+
+
+@router.get("/perfiles/{id_perfil}")
+def perfil(id_perfil: str, x_perfil_token: Optional[str] = Header(None)):
+    _autorizar(x_perfil_token)
+    ruta = ruta_perfil(id_perfil, "json")
+    if ruta is None:
+        raise HTTPException(status_code=404, detail="Perfil no encontrado.")
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)
+
+
+@router.get("/perfiles/{id_perfil}/pstats")
+def perfil_pstats(id_perfil: str, x_perfil_token: Optional[str] = Header(None)):
+    _autorizar(x_perfil_token)
+    ruta = ruta_perfil(id_perfil, "prof")
+    if ruta is None:
+        raise HTTPException(status_code=404, detail="El perfil no existe o no tiene datos de CPU.")
+    return FileResponse(ruta, media_type="application/octet-stream", filename=f"{id_perfil}.prof")
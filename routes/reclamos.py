@@ -3,18 +3,16 @@
 Endpoints para el sistema de reclamos
 """
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 from pydantic import BaseModel
-from typing import Dict, List, Optional, Any
-import json
-import os
-from datetime import datetime, date
-from generar_id_reclamo import generar_id_reclamo, obtener_siguiente_id
+from typing import Optional
+import base64
+import binascii
+import hashlib
 
-router = APIRouter()
+from helpers.almacen_reclamos import almacen, fecha_iso
 
-# Archivo de datos de reclamos
-RECLAMOS_FILE = "reclamos_data.json"
+router = APIRouter()
 
 # Modelos Pydantic
 class Proveedor(BaseModel):
@@ -48,163 +46,122 @@ class ActualizarReclamo(BaseModel):
     observaciones: Optional[str] = None
 
 # Funciones auxiliares
-def cargar_reclamos() -> Dict[str, Any]:
-    """Carga los reclamos desde el archivo JSON"""
-    if not os.path.exists(RECLAMOS_FILE):
-        # Si no existe, crear estructura inicial
-        data = {
-            "reclamos": [],
-            "metadatos": {
-                "total_reclamos": 0,
-                "estados_disponibles": ["En Revisión", "Aprobado", "Rechazado"],
-                "configuracion_id": {
-                    "prefijo": "CLM",
-                    "formato": "CLM-{secuencial:06d}",
-                    "ejemplo": "CLM-000001"
-                }
-            }
-        }
-        guardar_reclamos(data)
-        return data
-    
+def _fecha_filtro(valor: Optional[str], parametro: str) -> Optional[str]:
+    """DD/MM/YYYY de la query -> ISO para la consulta; 400 si no es una fecha."""
+    if not valor:
+        return None
     try:
-        with open(RECLAMOS_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            
-            # Asegurar que existe la estructura metadatos
-            if "metadatos" not in data:
-                data["metadatos"] = {
-                    "total_reclamos": len(data.get("reclamos", [])),
-                    "estados_disponibles": ["En Revisión", "Aprobado", "Rechazado"],
-                    "configuracion_id": {
-                        "prefijo": "CLM",
-                        "formato": "CLM-{secuencial:06d}",
-                        "ejemplo": "CLM-000001"
-                    }
-                }
-            
-            return data
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error al cargar reclamos: {str(e)}")
+        return fecha_iso(valor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{parametro} inválida: {valor!r} (formato DD/MM/YYYY)")
 
-def guardar_reclamos(data: Dict[str, Any]) -> None:
-    """Guarda los reclamos en el archivo JSON"""
-    try:
-        with open(RECLAMOS_FILE, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error al guardar reclamos: {str(e)}")
+def _cursor(secuencial: Optional[int]) -> Optional[str]:
+    """Cursor opaco para la página siguiente (el último secuencial devuelto)."""
+    if secuencial is None:
+        return None
+    return base64.urlsafe_b64encode(str(secuencial).encode()).decode().rstrip("=")
 
-def obtener_ultimo_id(reclamos: List[Dict]) -> str:
-    """Obtiene el último ID de la lista de reclamos"""
-    if not reclamos:
+def _leer_cursor(cursor: Optional[str]) -> Optional[int]:
+    if not cursor:
         return None
-    
-    # Ordenar por ID para obtener el último
-    ids = [r["id_reclamo"] for r in reclamos]
-    ids.sort()
-    return ids[-1] if ids else None
+    try:
+        return int(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail=f"cursor inválido: {cursor!r}")
+
+def _etag(request: Request) -> str:
+    """
+    Revisión de la base + ruta y parámetros: sin cambios en los reclamos, la
+    misma petición da la misma respuesta. Se toma antes de leer los datos, así
+    un cambio concurrente a lo sumo provoca una descarga de más, nunca un 304
+    con datos viejos.
+    """
+    consulta = sorted(request.query_params.multi_items())
+    huella = hashlib.sha1(f"{request.url.path}?{consulta}".encode("utf-8")).hexdigest()[:12]
+    return f'W/"{almacen().revision()}-{huella}"'
+
+def _no_modificado(request: Request, response: Response) -> Optional[Response]:
+    """304 si el cliente ya tiene esta versión (If-None-Match); si no, deja la ETag en `response`."""
+    etag = _etag(request)
+    cabeceras = {"ETag": etag, "Cache-Control": "no-cache"}
+    enviadas = request.headers.get("if-none-match", "")
+    # Comparación débil: W/"x" y "x" son la misma versión
+    etiquetas = {e.strip().removeprefix("W/") for e in enviadas.split(",") if e.strip()}
+    if "*" in etiquetas or etag.removeprefix("W/") in etiquetas:
+        return Response(status_code=304, headers=cabeceras)
+    response.headers.update(cabeceras)
+    return None
 
 # Endpoints
+# Los GET responden con ETag: el tablero, que consulta cada pocos segundos, manda
+# If-None-Match y recibe 304 sin cuerpo mientras no cambie ningún reclamo.
 
 @router.get("/reclamos")
 def listar_reclamos(
+    request: Request,
+    response: Response,
     estado: Optional[str] = Query(None, description="Filtrar por estado"),
     fecha_desde: Optional[str] = Query(None, description="Fecha desde (DD/MM/YYYY)"),
     fecha_hasta: Optional[str] = Query(None, description="Fecha hasta (DD/MM/YYYY)"),
     proveedor: Optional[str] = Query(None, description="Buscar por nombre de proveedor"),
-    limit: Optional[int] = Query(None, description="Límite de resultados"),
-    offset: Optional[int] = Query(0, description="Desplazamiento para paginación")
+    limit: Optional[int] = Query(None, ge=0, description="Límite de resultados"),
+    offset: Optional[int] = Query(0, description="Desplazamiento para paginación"),
+    cursor: Optional[str] = Query(None, description="siguiente_cursor de la página anterior (reemplaza a offset)"),
 ):
     """
     Lista todos los reclamos con filtros opcionales
     """
-    data = cargar_reclamos()
-    reclamos = data["reclamos"]
-    
-    # Aplicar filtros
-    if estado:
-        reclamos = [r for r in reclamos if r["estado"].lower() == estado.lower()]
-    
-    if proveedor:
-        reclamos = [r for r in reclamos if proveedor.lower() in r["proveedor"]["nombre"].lower()]
-    
-    # TODO: Implementar filtros de fecha si es necesario
-    
-    # Paginación (solo si se especifica limit)
-    total = len(reclamos)
-    if limit is not None:
-        reclamos_paginados = reclamos[offset:offset + limit]
-    else:
-        reclamos_paginados = reclamos[offset:] if offset > 0 else reclamos
+    no_modificado = _no_modificado(request, response)
+    if no_modificado is not None:
+        return no_modificado
+    
+    # Filtros, conteo y paginación se resuelven en la consulta
+    reclamos, total, siguiente = almacen().listar(
+        estado=estado,
+        proveedor=proveedor,
+        fecha_desde=_fecha_filtro(fecha_desde, "fecha_desde"),
+        fecha_hasta=_fecha_filtro(fecha_hasta, "fecha_hasta"),
+        limit=limit,
+        offset=offset or 0,
+        despues_de=_leer_cursor(cursor),
+    )
     
     return {
-        "reclamos": reclamos_paginados,
+        "reclamos": reclamos,
         "total": total,
         "limit": limit,
         "offset": offset,
-        "metadatos": data.get("metadatos", {
-            "total_reclamos": total,
-            "estados_disponibles": ["En Revisión", "Aprobado", "Rechazado"],
-            "configuracion_id": {
-                "prefijo": "CLM",
-                "formato": "CLM-{secuencial:000-000}",
-                "ejemplo": "CLM-000-001"
-            }
-        })
+        "siguiente_cursor": _cursor(siguiente),
+        "metadatos": almacen().metadatos()
     }
 
 @router.get("/reclamos/{id_reclamo}")
-def obtener_reclamo(id_reclamo: str):
+def obtener_reclamo(id_reclamo: str, request: Request, response: Response):
     """
     Obtiene un reclamo específico por ID
     """
-    data = cargar_reclamos()
-    
-    for reclamo in data["reclamos"]:
-        if reclamo["id_reclamo"] == id_reclamo:
-            return reclamo
+    no_modificado = _no_modificado(request, response)
+    if no_modificado is not None:
+        return no_modificado
     
-    raise HTTPException(status_code=404, detail=f"Reclamo {id_reclamo} no encontrado")
+    reclamo = almacen().obtener(id_reclamo)
+    if reclamo is None:
+        raise HTTPException(status_code=404, detail=f"Reclamo {id_reclamo} no encontrado")
+    return reclamo
 
 @router.post("/reclamos")
 def crear_reclamo(nuevo_reclamo: NuevoReclamo):
     """
     Crea un nuevo reclamo
     """
-    data = cargar_reclamos()
-    
-    # Generar nuevo ID
-    ultimo_id = obtener_ultimo_id(data["reclamos"])
-    nuevo_id = obtener_siguiente_id(ultimo_id)
-    
-    # Crear fecha actual
-    fecha_actual = datetime.now().strftime("%d/%m/%Y")
-    
-    # Crear el reclamo
-    reclamo = {
-        "id_reclamo": nuevo_id,
-        "fecha_envio": fecha_actual,
-        "proveedor": {
-            "nombre": nuevo_reclamo.proveedor.nombre,
-            "tipo_servicio": nuevo_reclamo.proveedor.tipo_servicio
-        },
-        "estado": nuevo_reclamo.estado,  # Estado enviado por el frontend
-        "monto_solicitado": nuevo_reclamo.monto_solicitado,
-        "monto_aprobado": None,
-        "moneda": nuevo_reclamo.moneda,
-        "acciones": {
-            "ver": True,
-            "subir": nuevo_reclamo.estado in ["En Revisión", "Rechazado"]  # Puede subir según el estado
-        }
-    }
-    
-    # Agregar a la lista
-    data["reclamos"].append(reclamo)
-    data["metadatos"]["total_reclamos"] = len(data["reclamos"])
-    
-    # Guardar
-    guardar_reclamos(data)
+    # El id se asigna dentro de la transacción: dos altas simultáneas no lo repiten
+    reclamo = almacen().crear(
+        proveedor=nuevo_reclamo.proveedor.nombre,
+        tipo_servicio=nuevo_reclamo.proveedor.tipo_servicio,
+        estado=nuevo_reclamo.estado,  # Estado enviado por el frontend
+        monto_solicitado=nuevo_reclamo.monto_solicitado,
+        moneda=nuevo_reclamo.moneda,
+    )
     
     return {
         "mensaje": "Reclamo creado exitosamente",
@@ -216,36 +173,14 @@ def actualizar_reclamo(id_reclamo: str, actualizacion: ActualizarReclamo):
     """
     Actualiza un reclamo existente
     """
-    data = cargar_reclamos()
-    
-    # Buscar el reclamo
-    reclamo_encontrado = None
-    for i, reclamo in enumerate(data["reclamos"]):
-        if reclamo["id_reclamo"] == id_reclamo:
-            reclamo_encontrado = i
-            break
-    
-    if reclamo_encontrado is None:
+    reclamo = almacen().actualizar(
+        id_reclamo,
+        estado=actualizacion.estado,
+        monto_aprobado=actualizacion.monto_aprobado,
+    )
+    if reclamo is None:
         raise HTTPException(status_code=404, detail=f"Reclamo {id_reclamo} no encontrado")
     
-    # Actualizar campos
-    reclamo = data["reclamos"][reclamo_encontrado]
-    
-    if actualizacion.estado:
-        reclamo["estado"] = actualizacion.estado
-        
-        # Ajustar acciones según el estado
-        if actualizacion.estado == "Aprobado":
-            reclamo["acciones"]["subir"] = False  # Ya no puede subir más documentos
-        elif actualizacion.estado == "Rechazado":
-            reclamo["acciones"]["subir"] = True   # Puede subir documentos para corrección
-    
-    if actualizacion.monto_aprobado is not None:
-        reclamo["monto_aprobado"] = actualizacion.monto_aprobado
-    
-    # Guardar
-    guardar_reclamos(data)
-    
     return {
         "mensaje": "Reclamo actualizado exitosamente",
         "reclamo": reclamo
@@ -256,53 +191,32 @@ def eliminar_reclamo(id_reclamo: str):
     """
     Elimina un reclamo
     """
-    data = cargar_reclamos()
-    
-    # Buscar y eliminar
-    reclamos_originales = len(data["reclamos"])
-    data["reclamos"] = [r for r in data["reclamos"] if r["id_reclamo"] != id_reclamo]
-    
-    if len(data["reclamos"]) == reclamos_originales:
+    if not almacen().eliminar(id_reclamo):
         raise HTTPException(status_code=404, detail=f"Reclamo {id_reclamo} no encontrado")
     
-    # Actualizar metadatos
-    data["metadatos"]["total_reclamos"] = len(data["reclamos"])
-    
-    # Guardar
-    guardar_reclamos(data)
-    
     return {"mensaje": f"Reclamo {id_reclamo} eliminado exitosamente"}
 
 @router.get("/reclamos/estadisticas/resumen")
-def obtener_estadisticas():
+def obtener_estadisticas(request: Request, response: Response):
     """
     Obtiene estadísticas resumidas de los reclamos
     """
-    data = cargar_reclamos()
-    reclamos = data["reclamos"]
-    
-    # Contar por estado
-    estados = {}
-    monto_total_solicitado = 0
-    monto_total_aprobado = 0
+    no_modificado = _no_modificado(request, response)
+    if no_modificado is not None:
+        return no_modificado
     
-    for reclamo in reclamos:
-        estado = reclamo["estado"]
-        estados[estado] = estados.get(estado, 0) + 1
-        
-        monto_total_solicitado += reclamo["monto_solicitado"]
-        if reclamo["monto_aprobado"]:
-            monto_total_aprobado += reclamo["monto_aprobado"]
+    # Agregados mantenidos en cada alta, cambio y baja: no se recorren los reclamos
+    estadisticas = almacen().estadisticas()
     
     return {
-        "total_reclamos": len(reclamos),
-        "por_estado": estados,
+        "total_reclamos": estadisticas["total_reclamos"],
+        "por_estado": estadisticas["por_estado"],
         "montos": {
-            "total_solicitado": round(monto_total_solicitado, 2),
-            "total_aprobado": round(monto_total_aprobado, 2),
+            "total_solicitado": round(estadisticas["total_solicitado"], 2),
+            "total_aprobado": round(estadisticas["total_aprobado"], 2),
             "moneda": "$"
         },
-        "estados_disponibles": data["metadatos"]["estados_disponibles"]
+        "estados_disponibles": almacen().estados_disponibles()
     }
 
 @router.get("/reclamos/config/estados")
@@ -310,8 +224,7 @@ def obtener_estados_disponibles():
     """
     Obtiene la lista de estados disponibles
     """
-    data = cargar_reclamos()
     return {
-        "estados": data["metadatos"]["estados_disponibles"],
+        "estados": almacen().estados_disponibles(),
         "descripcion": "Estados disponibles para los reclamos"
     }
@@ -1,10 +1,11 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Dict, Tuple, List
-import json
 import os
 
-from config import RISK_LEVELS
+from config import RISK_LEVELS_FILE
+from helpers import config_riesgo
+from helpers.config_riesgo import descongelar
 
 router = APIRouter()
 
@@ -20,10 +21,12 @@ class RiskLevelItem(BaseModel):
 @router.get("/risk-levels")
 def get_risk_levels():
     """Devuelve los niveles de riesgo actuales con descripción."""
+    cfg = config_riesgo.actual()
     return {
-        "RISK_LEVELS": RISK_LEVELS,
+        "RISK_LEVELS": descongelar(cfg.niveles),
         "descripcion": "Rangos de puntuación para clasificar el nivel de riesgo de documentos",
-        "niveles_disponibles": ["bajo", "medio", "alto"]
+        "niveles_disponibles": ["bajo", "medio", "alto"],
+        "version_config": cfg.version,
     }
 
 @router.put("/risk-levels")
@@ -81,19 +84,15 @@ def update_risk_levels(payload: RiskLevelsPayload):
                 detail=f"Los rangos de '{current_name}' y '{next_name}' no pueden solaparse"
             )
     
-    # Actualizar valores en memoria (convertir a tuplas)
-    for key, value in new_levels.items():
-        RISK_LEVELS[key] = tuple(value)
-    
-    # Guardar en archivo específico para niveles de riesgo
-    config_file = "risk_levels_config.json"
-    with open(config_file, "w", encoding="utf-8") as f:
-        json.dump(new_levels, f, indent=2, ensure_ascii=False)
+    # Guardar de forma atómica y publicar la nueva configuración (los demás
+    # workers la recogen al notar el cambio del archivo)
+    cfg = config_riesgo.guardar_niveles(new_levels)
     
     return {
         "message": "Niveles de riesgo actualizados correctamente", 
-        "RISK_LEVELS": RISK_LEVELS,
-        "archivo_guardado": config_file
+        "RISK_LEVELS": descongelar(cfg.niveles),
+        "archivo_guardado": RISK_LEVELS_FILE,
+        "version_config": cfg.version,
     }
 
 @router.get("/risk-levels/example")
@@ -102,7 +101,7 @@ def get_risk_levels_example():
     return {
         "ejemplo_configuracion_actual": {
             "descripcion": "Configuración actual de niveles de riesgo",
-            "valores": dict(RISK_LEVELS)
+            "valores": descongelar(config_riesgo.actual().niveles)
         },
         "ejemplo_payload_actualizacion": {
             "descripcion": "Estructura para actualizar niveles de riesgo",
@@ -150,15 +149,18 @@ def get_risk_levels_example():
 @router.get("/risk-levels/validate")
 def validate_current_levels():
     """Valida la configuración actual de niveles de riesgo."""
+    cfg = config_riesgo.actual()
+    niveles = cfg.niveles
     validation_result = {
         "es_valido": True,
         "errores": [],
         "advertencias": [],
-        "configuracion_actual": dict(RISK_LEVELS)
+        "configuracion_actual": descongelar(niveles),
+        "version_config": cfg.version,
     }
     
     # Verificar rangos válidos
-    for level_name, (min_val, max_val) in RISK_LEVELS.items():
+    for level_name, (min_val, max_val) in niveles.items():
         if min_val < 0 or max_val > 100:
             validation_result["es_valido"] = False
             validation_result["errores"].append(
@@ -172,7 +174,7 @@ def validate_current_levels():
             )
     
     # Verificar solapamientos
-    ranges = list(RISK_LEVELS.items())
+    ranges = list(niveles.items())
     ranges.sort(key=lambda x: x[1][0])
     
     for i in range(len(ranges) - 1):
@@ -186,7 +188,7 @@ def validate_current_levels():
             )
     
     # Verificar cobertura completa 0-100
-    sorted_ranges = sorted(RISK_LEVELS.values(), key=lambda x: x[0])
+    sorted_ranges = sorted(niveles.values(), key=lambda x: x[0])
     if sorted_ranges[0][0] > 0:
         validation_result["advertencias"].append(
             f"Gap en el rango: 0-{sorted_ranges[0][0]-1} no está cubierto"
@@ -202,19 +204,14 @@ def validate_current_levels():
 @router.post("/risk-levels/reset")
 def reset_risk_levels():
     """Restaura los niveles de riesgo a los valores por defecto."""
-    default_levels = {"bajo": (0, 29), "medio": (30, 59), "alto": (60, 100)}
-    
-    # Actualizar en memoria
-    for key, value in default_levels.items():
-        RISK_LEVELS[key] = value
+    existia = os.path.exists(RISK_LEVELS_FILE)
     
-    # Eliminar archivo de configuración personalizada si existe
-    config_file = "risk_levels_config.json"
-    if os.path.exists(config_file):
-        os.remove(config_file)
+    # Eliminar el archivo de configuración personalizada y publicar los valores por defecto
+    cfg = config_riesgo.restaurar_niveles()
     
     return {
         "message": "Niveles de riesgo restaurados a valores por defecto",
-        "RISK_LEVELS": RISK_LEVELS,
-        "archivo_eliminado": config_file if os.path.exists(config_file) else None
+        "RISK_LEVELS": descongelar(cfg.niveles),
+        "archivo_eliminado": RISK_LEVELS_FILE if existia else None,
+        "version_config": cfg.version,
     }
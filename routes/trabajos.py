@@ -0,0 +1,197 @@
+"""
+API de trabajos asíncronos.
+
+POST /jobs/{tipo}          encola el documento (multipart, cuerpo binario o JSON base64) y responde 202 con el id
+GET  /jobs/{id}            estado del trabajo y, al terminar, el resultado del análisis
+GET  /jobs/metricas        profundidad de cola, trabajadores ocupados y contadores
+
+Con ?esperar=N el POST espera hasta N segundos (máx. TRABAJOS_ESPERA_MAX_SEGUNDOS)
+y, si el trabajo termina a tiempo, devuelve el resultado directamente, igual
+que el endpoint síncrono. Con ?callback_url=... el resultado se envía por POST
+a esa URL al terminar (solo hosts públicos o de TRABAJOS_CALLBACK_HOSTS).
+"""
+
+import asyncio
+import base64
+import hashlib
+import io
+import json
+import tempfile
+import time
+from typing import Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response
+from PIL import Image
+
+from config import MAX_PDF_BYTES, TRABAJOS_ESPERA_MAX_SEGUNDOS
+from helpers import config_riesgo
+from helpers.carga_documentos import DocumentoSubido, recibir_documento, TIPOS_PDF, TIPOS_IMAGEN
+from helpers.deteccion_texto_superpuesto import detectar_texto_superpuesto_desde_bytes
+from helpers.type_conversion import NumpyJSONResponse
+from helpers.trabajos import gestor, ColaLlena, serializar_trabajo, validar_callback_url, COMPLETADO, ERROR
+from routes.validar import _validar_factura_bytes
+from routes.validar_documento import _validar_documento_bytes
+from routes.validar_imagen import _validar_imagen_bytes
+from routes.analisis_forense_imagen import analyze_image_from_bytes
+from routes.analizar_documento_forense import analyze_pdf, analyze_image
+
+router = APIRouter()
+
+# Campos base64 aceptados cuando el cuerpo es JSON (los mismos de los endpoints síncronos)
+_CAMPOS_BASE64 = ("pdfbase64", "imagen_base64", "documento_base64")
+
+
+def _respuesta(resp: Response) -> Tuple[int, bytes]:
+    return resp.status_code, bytes(resp.body)
+
+
+def _ejecutar(funcion, datos: bytes) -> Tuple[int, bytes]:
+    """Ejecuta el análisis y convierte HTTPException en la misma respuesta que daría FastAPI."""
+    try:
+        return funcion(datos)
+    except HTTPException as e:
+        return e.status_code, json.dumps({"detail": e.detail}, ensure_ascii=False).encode("utf-8")
+
+
+def _trabajo_validar_factura(datos: bytes):
+    return _respuesta(asyncio.run(_validar_factura_bytes(datos, time.perf_counter())))
+
+
+def _trabajo_validar_documento(datos: bytes):
+    return _respuesta(_validar_documento_bytes(datos, time.perf_counter()))
+
+
+def _trabajo_validar_imagen(datos: bytes):
+    return _respuesta(asyncio.run(_validar_imagen_bytes(datos, time.perf_counter())))
+
+
+def _trabajo_analizar_imagen_forense(datos: bytes):
+    return _respuesta(NumpyJSONResponse(content={
+        "success": True,
+        "file_size": len(datos),
+        "analisis_forense": analyze_image_from_bytes(datos),
+    }))
+
+
+def _trabajo_analizar_documento_forense(datos: bytes):
+    if datos.startswith(b"%PDF"):
+        tipo, resultado = "pdf", analyze_pdf(datos)
+    else:
+        tipo, resultado = "imagen", analyze_image(Image.open(io.BytesIO(datos)))
+    return _respuesta(NumpyJSONResponse(content={
+        "exito": True,
+        "tipo_documento": tipo,
+        "analisis_forense": resultado,
+    }))
+
+
+def _trabajo_texto_superpuesto(datos: bytes):
+    return _respuesta(NumpyJSONResponse(content=detectar_texto_superpuesto_desde_bytes(datos)))
+
+
+# tipo -> (función, tipos de contenido aceptados)
+TIPOS_TRABAJO = {
+    "validar-factura": (_trabajo_validar_factura, TIPOS_PDF),
+    "validar-documento": (_trabajo_validar_documento, TIPOS_PDF),
+    "validar-imagen": (_trabajo_validar_imagen, TIPOS_IMAGEN),
+    "analizar-imagen-forense": (_trabajo_analizar_imagen_forense, TIPOS_IMAGEN),
+    "analizar-documento-forense": (_trabajo_analizar_documento_forense, TIPOS_PDF + TIPOS_IMAGEN),
+    "detectar-texto-superpuesto": (_trabajo_texto_superpuesto, TIPOS_PDF),
+}
+
+for _tipo, (_funcion, _) in TIPOS_TRABAJO.items():
+    gestor.registrar(_tipo, lambda datos, f=_funcion: _ejecutar(f, datos))
+
+
+async def _recibir_json_base64(request: Request) -> DocumentoSubido:
+    """Cuerpo JSON con el documento en base64 (compatibilidad con los endpoints síncronos)."""
+    try:
+        cuerpo = await request.json()
+        valor = next(cuerpo[c] for c in _CAMPOS_BASE64 if isinstance(cuerpo.get(c), str))
+        datos = base64.b64decode(valor, validate=True)
+    except Exception:
+        raise HTTPException(status_code=400, detail=f"Se esperaba un JSON con uno de {', '.join(_CAMPOS_BASE64)} en base64 válido.")
+    if not datos:
+        raise HTTPException(status_code=400, detail="El documento está vacío.")
+    if len(datos) > MAX_PDF_BYTES:
+        raise HTTPException(status_code=413, detail=f"El archivo excede el tamaño máximo permitido ({MAX_PDF_BYTES} bytes).")
+    destino = tempfile.TemporaryFile()
+    destino.write(datos)
+    return DocumentoSubido(destino, len(datos), "application/json", None, hashlib.sha256(datos).hexdigest())
+
+
+def _respuesta_trabajo(trabajo: dict, status_code: int = 200) -> Response:
+    return Response(content=serializar_trabajo(trabajo), status_code=status_code, media_type="application/json")
+
+
+@router.get("/jobs/metricas")
+async def metricas_trabajos():
+    """Profundidad de la cola, trabajadores ocupados y contadores de trabajos."""
+    return gestor.metricas()
+
+
+@router.post("/jobs/{tipo}")
+async def crear_trabajo(
+    tipo: str,
+    request: Request,
+    callback_url: Optional[str] = Query(None, description="URL que recibe el resultado por POST al terminar"),
+    esperar: float = Query(0, ge=0, description="Segundos a esperar el resultado antes de responder 202"),
+):
+    """
+    Encola un análisis y devuelve su id (202). Reenviar el mismo documento
+    devuelve el trabajo existente en lugar de repetir el análisis.
+    """
+    if tipo not in TIPOS_TRABAJO:
+        raise HTTPException(status_code=404, detail=f"Tipo de trabajo desconocido. Disponibles: {', '.join(TIPOS_TRABAJO)}.")
+    if callback_url:
+        try:
+            # Resuelve el host (bloqueante): fuera del bucle de eventos
+            await run_in_threadpool(validar_callback_url, callback_url)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    content_type = (request.headers.get("content-type") or "").split(";")[0].strip().lower()
+    if content_type == "application/json":
+        documento = await _recibir_json_base64(request)
+    else:
+        documento = await recibir_documento(request, TIPOS_TRABAJO[tipo][1])
+
+    try:
+        # Con la versión de la configuración de riesgo: tras cambiar pesos o niveles
+        # no se reutiliza un resultado calculado con los anteriores
+        huella = f"{documento.sha256}:{config_riesgo.actual().version}"
+        id_trabajo, nuevo = gestor.enviar(tipo, documento, huella, callback_url)
+    except ColaLlena:
+        raise HTTPException(status_code=503, detail="La cola de trabajos está llena; reintente más tarde.",
+                            headers={"Retry-After": "30"})
+
+    futuro = gestor.futuro(id_trabajo)
+    espera = min(esperar, TRABAJOS_ESPERA_MAX_SEGUNDOS)
+    if espera > 0 and futuro is not None:
+        try:
+            await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(futuro)), timeout=espera)
+        except asyncio.TimeoutError:
+            pass
+
+    trabajo = gestor.obtener(id_trabajo)
+    if espera > 0 and trabajo["estado"] in (COMPLETADO, ERROR) and trabajo["resultado"] is not None:
+        # Terminó dentro de la espera: misma respuesta que el endpoint síncrono
+        return Response(content=bytes(trabajo["resultado"]), status_code=trabajo["status_code"],
+                        media_type="application/json", headers={"X-Job-Id": id_trabajo})
+
+    respuesta = _respuesta_trabajo(trabajo, status_code=202)
+    respuesta.headers["Location"] = f"/jobs/{id_trabajo}"
+    if not nuevo:
+        respuesta.headers["X-Job-Reused"] = "true"
+    return respuesta
+
+
+@router.get("/jobs/{id_trabajo}")
+async def obtener_trabajo(id_trabajo: str):
+    """Estado del trabajo; incluye `resultado` cuando terminó."""
+    trabajo = gestor.obtener(id_trabajo)
+    if trabajo is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado o expirado.")
+    return _respuesta_trabajo(trabajo)
@@ -12,7 +12,7 @@ Autor: Sistema de Análisis Forense
 Versión: 1.0
 """
 
-from fastapi import APIRouter, HTTPException, Form, Query
+from fastapi import APIRouter, HTTPException, Form, Query, Request
 from pydantic import BaseModel
 from typing import Optional, Dict, Any, List
 import base64
@@ -24,8 +24,10 @@ from helpers.validacion_firma_digital import (
 )
 from helpers.validacion_xades import validar_xades, generar_reporte_xades
 from helpers.analisis_sri_ride import analizar_documento_sri, validar_xml_firmado_sri
-from helpers.deteccion_firma_simple import detectar_firma_desde_base64
-from helpers.type_conversion import safe_serialize_dict
+from helpers.deteccion_firma_simple import detectar_firma_desde_bytes
+from helpers.type_conversion import NumpyJSONResponse
+from helpers.carga_documentos import recibir_bytes, TIPOS_PDF_O_XML
+from helpers.clave_acceso import escanear_claves
 from sri import sri_autorizacion_por_clave, parse_autorizacion_response
 import fitz  # PyMuPDF
 import re
@@ -57,37 +59,78 @@ async def validar_firma_universal_endpoint(request: DocumentoRequest):
     Returns:
         Resultado completo de validación de firmas
     """
+    # Validar base64
+    try:
+        documento_bytes = base64.b64decode(request.documento_base64)
+    except Exception:
+        raise HTTPException(status_code=400, detail="El campo 'documento_base64' no es base64 válido")
+    
+    return await _validar_firma_universal_bytes(
+        documento_bytes,
+        request.tipo_documento,
+        request.verificar_crypto,
+        request.verificar_cadena,
+        request.validar_autorizacion_sri
+    )
+
+
+@router.post("/validar-firma-universal/archivo")
+async def validar_firma_universal_archivo(
+    request: Request,
+    tipo_documento: str = Query("auto", description="'pdf', 'xml' o 'auto'"),
+    verificar_crypto: bool = Query(False),
+    verificar_cadena: bool = Query(False),
+    validar_autorizacion_sri: bool = Query(False)
+):
+    """
+    Variante de /validar-firma-universal sin base64: el documento llega como
+    multipart (campo 'archivo') o como cuerpo application/pdf / application/xml.
+    Las opciones van como parámetros de query.
+    """
+    documento_bytes = await recibir_bytes(request, TIPOS_PDF_O_XML)
+    
+    return await _validar_firma_universal_bytes(
+        documento_bytes,
+        tipo_documento,
+        verificar_crypto,
+        verificar_cadena,
+        validar_autorizacion_sri
+    )
+
+
+async def _validar_firma_universal_bytes(
+    documento_bytes: bytes,
+    tipo_documento: str,
+    verificar_crypto: bool,
+    verificar_cadena: bool,
+    validar_autorizacion_sri: bool
+) -> NumpyJSONResponse:
+    """Validación universal de firmas a partir de los bytes del documento."""
     try:
-        # Validar base64
-        try:
-            documento_bytes = base64.b64decode(request.documento_base64)
-        except Exception:
-            raise HTTPException(status_code=400, detail="El campo 'documento_base64' no es base64 válido")
-        
         # Determinar tipo de documento si no se especifica
-        if request.tipo_documento == "auto":
-            request.tipo_documento = _detectar_tipo_documento(documento_bytes)
+        if tipo_documento == "auto":
+            tipo_documento = _detectar_tipo_documento(documento_bytes)
         
         resultado = {}
         
-        if request.tipo_documento.lower() == "pdf":
+        if tipo_documento.lower() == "pdf":
             # Validación para PDFs
             resultado = await _validar_pdf_universal(
                 documento_bytes, 
-                request.verificar_crypto, 
-                request.verificar_cadena,
-                request.validar_autorizacion_sri
+                verificar_crypto, 
+                verificar_cadena,
+                validar_autorizacion_sri
             )
-        elif request.tipo_documento.lower() == "xml":
+        elif tipo_documento.lower() == "xml":
             # Validación para XMLs
-            resultado = await _validar_xml_universal(documento_bytes, request.validar_autorizacion_sri)
+            resultado = await _validar_xml_universal(documento_bytes, validar_autorizacion_sri)
         else:
             raise HTTPException(status_code=400, detail="Tipo de documento no soportado. Use 'pdf' o 'xml'")
         
-        return safe_serialize_dict({
+        return NumpyJSONResponse(content={
             "success": True,
             "mensaje": "Validación universal de firmas completada",
-            "tipo_documento": request.tipo_documento,
+            "tipo_documento": tipo_documento,
             "resultado": resultado
         })
         
@@ -104,7 +147,7 @@ async def _validar_pdf_universal(pdf_bytes: bytes, verificar_crypto: bool, verif
     deteccion_basica = detectar_firmas_pdf_simple(pdf_bytes)
     
     # 2. Detección con patrones
-    deteccion_patrones = detectar_firma_desde_base64(base64.b64encode(pdf_bytes).decode('utf-8'))
+    deteccion_patrones = detectar_firma_desde_bytes(pdf_bytes)
     
     # 3. Validación avanzada (si se solicita)
     validacion_avanzada = None
@@ -587,40 +630,33 @@ def _extraer_clave_acceso_xml(xml_content: str) -> Optional[str]:
         return None
 
 
+_ETIQUETA_AUTORIZACION = re.compile(r"n[uú]mero\s*de\s*autorizaci[oó]n|clave\s*de\s*acceso", re.I)
+
+
 def _extraer_numero_autorizacion_pdf(pdf_bytes: bytes) -> Dict[str, Any]:
     """Extrae el número de autorización de un PDF usando la lógica robusta"""
     
     try:
-        # Patrones para buscar
-        LABELS = r"(n[uú]mero\s*de\s*autorizaci[oó]n|clave\s*de\s*acceso)"
-        # 49 dígitos permitiendo espacios, guiones o no-break spaces entre medio
-        DIG49 = r"(?:\d[\s\-\u2009\u00A0]*){49}"
-        
-        def normaliza_num(s: str) -> str:
-            return re.sub(r"\D", "", s)  # deja solo dígitos
-        
         # Abrir PDF desde bytes
         doc = fitz.open(stream=pdf_bytes, filetype="pdf")
         
-        # Buscar en texto del PDF
-        hallados, cerca_label = set(), set()
+        # Buscar en texto del PDF (escaneo lineal de claves de 49 dígitos)
+        # dicts en lugar de sets: conservan el orden del escáner (el mejor primero)
+        hallados, cerca_label = {}, {}
         full = []
         
         for p in doc:
-            full.append(p.get_text())
-            # búsqueda "cerca de la etiqueta": ventana de 0–150 chars después
             t = p.get_text()
-            for m in re.finditer(LABELS, t, flags=re.I):
-                trozo = t[m.end(): m.end()+150]
-                n = re.search(DIG49, trozo, flags=re.I)
-                if n:
-                    cerca_label.add(normaliza_num(n.group()))
+            full.append(t)
+            # "cerca de la etiqueta": hasta 150 chars después; la mejor de cada página
+            for c in escanear_claves(t, etiquetas=_ETIQUETA_AUTORIZACION, ventana_etiqueta=150):
+                if c.distancia_etiqueta is not None:
+                    cerca_label.setdefault(c.clave)
+                    break
         
         all_text = "\n".join(full)
-        for m in re.finditer(DIG49, all_text, flags=re.I):
-            n = normaliza_num(m.group())
-            if len(n) == 49:
-                hallados.add(n)
+        for c in escanear_claves(all_text, etiquetas=None):
+            hallados.setdefault(c.clave)
         
         # Buscar en adjuntos XML
         xml_nums = set()
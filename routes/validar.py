@@ -1,12 +1,12 @@
+import logging
 import base64
 import io
 import re
 import time
 import json
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, HTTPException, Query, Request
 from pydantic import BaseModel
 from pdfminer.high_level import extract_text
 from difflib import SequenceMatcher
@@ -21,16 +21,24 @@ from config import (
     MATCH_THRESHOLD,
 )
 from utils import log_step, normalize_comprobante_xml, strip_accents, _to_float
+from helpers.trazas import fijar, span
+from helpers.metricas import documentos
+from helpers.perfilado import registrar_entrada
 from pdf_extract import extract_clave_acceso_from_text, extract_invoice_fields_from_text
-from helpers.type_conversion import safe_serialize_dict
+from helpers.type_conversion import NumpyJSONResponse
+from helpers.nivel_detalle import OpcionesRespuesta, respuesta_resumida, DESC_DETAIL, DESC_FIELDS
+from helpers.carga_documentos import recibir_bytes, TIPOS_PDF
+from helpers.cache_rasterizado import raster_pagina, imagen_desde_array, sha256_documento
 from helpers.firma_digital import analizar_firmas_digitales_avanzado
 from helpers.validacion_firma_digital import detectar_firmas_pdf_simple
-from helpers.deteccion_firma_simple import detectar_firma_desde_base64
+from helpers.deteccion_firma_simple import detectar_firma_desde_bytes
 from routes.validacion_firma_universal import _extraer_numero_autorizacion_pdf
 from helpers.analisis_sri_ride import analizar_documento_sri
 from helpers.validacion_xades import validar_xades
 from sri import sri_autorizacion_por_clave, parse_autorizacion_response
 
+logger = logging.getLogger(__name__)
+
 # Funciones para validación SRI (copiadas del endpoint universal)
 async def _comparar_valores_totales_pdf_xml(pdf_bytes: bytes, xml_content: str) -> Dict[str, Any]:
     """Compara los valores totales entre PDF y XML del SRI"""
@@ -342,11 +350,11 @@ async def _validar_autorizacion_sri_por_clave(clave_acceso: str, pdf_bytes: byte
     """Valida la autorización del SRI por clave de acceso"""
     
     try:
-        print(f"[DEBUG] Iniciando validación SRI para clave: {clave_acceso[:20]}...")
+        logger.debug("Iniciando validación SRI para clave: %s...", clave_acceso[:20])
         # Llamar al servicio del SRI
         autorizado, estado, xml_comprobante, raw_data = sri_autorizacion_por_clave(clave_acceso)
-        print(f"[DEBUG] SRI response: autorizado={autorizado}, estado={estado[:50]}...")
-        print(f"[DEBUG] XML comprobante: {xml_comprobante is not None}, longitud: {len(xml_comprobante) if xml_comprobante else 0}")
+        logger.debug("SRI response: autorizado=%s, estado=%s...", autorizado, estado[:50])
+        logger.debug("XML comprobante: %s, longitud: %s", xml_comprobante is not None, len(xml_comprobante) if xml_comprobante else 0)
         
         resultado = {
             "autorizado": autorizado,
@@ -358,7 +366,7 @@ async def _validar_autorizacion_sri_por_clave(clave_acceso: str, pdf_bytes: byte
         # Si está autorizado, validar la firma del XML usando la misma lógica que validar-firma-universal
         if autorizado and xml_comprobante:
             try:
-                print(f"[DEBUG] Validando firma XAdES del XML usando lógica de validar-firma-universal")
+                logger.debug("Validando firma XAdES del XML usando lógica de validar-firma-universal")
                 
                 # Usar exactamente la misma lógica que el endpoint universal
                 from routes.validacion_firma_universal import _validar_xml_universal
@@ -369,25 +377,23 @@ async def _validar_autorizacion_sri_por_clave(clave_acceso: str, pdf_bytes: byte
                 # Llamar a la función universal
                 validacion_universal = await _validar_xml_universal(xml_bytes, validar_autorizacion_sri=False)
                 
-                print(f"[DEBUG] Validación universal completada: {type(validacion_universal)}")
-                print(f"[DEBUG] Validación universal keys: {list(validacion_universal.keys())}")
+                logger.debug("Validación universal completada: %s", type(validacion_universal))
+                logger.debug("Validación universal keys: %s", list(validacion_universal.keys()))
                 
                 resultado["validacion_firma_xml"] = validacion_universal
                 
             except Exception as e:
-                print(f"[DEBUG] Error en validación XAdES: {str(e)}")
-                import traceback
-                traceback.print_exc()
+                logger.debug("Error en validación XAdES: %s", e, exc_info=True)
                 resultado["error_firma_xml"] = f"Error validando firma del XML: {str(e)}"
                 resultado["validacion_firma_xml"] = False
         else:
-            print(f"[DEBUG] No se ejecutó validación XAdES: autorizado={autorizado}, xml_comprobante={xml_comprobante is not None}")
+            logger.debug("No se ejecutó validación XAdES: autorizado=%s, xml_comprobante=%s", autorizado, xml_comprobante is not None)
         
-        print(f"[DEBUG] Resultado final: {list(resultado.keys())}")
+        logger.debug("Resultado final: %s", list(resultado.keys()))
         return resultado
         
     except Exception as e:
-        print(f"[DEBUG] Error general en validación SRI: {str(e)}")
+        logger.debug("Error general en validación SRI: %s", e)
         return {
             "autorizado": False,
             "error": f"Error en validación SRI: {str(e)}",
@@ -405,6 +411,7 @@ def easyocr_text_from_pdf(pdf_bytes, lang=['es', 'en']):
         
         # Primero intentar extracción de texto normal
         doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        sha = sha256_documento(pdf_bytes)
         text_extracted = ""
         
         for page_num in range(doc.page_count):
@@ -414,17 +421,14 @@ def easyocr_text_from_pdf(pdf_bytes, lang=['es', 'en']):
             # Si la página tiene poco texto, intentar OCR de imágenes
             if len(page_text.strip()) < 50:
                 try:
-                    # Convertir página a imagen
-                    pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))  # Aumentar resolución
-                    img_data = pix.tobytes("png")
+                    # Convertir página a imagen (2x, desde la caché de rasterizado)
+                    arr = raster_pagina(pdf_bytes, page_num, 144, doc=doc, sha=sha)
                     
                     # Intentar OCR con pytesseract si está disponible
                     try:
                         import pytesseract
-                        from PIL import Image
-                        import io
                         
-                        img = Image.open(io.BytesIO(img_data))
+                        img = imagen_desde_array(arr)
                         ocr_text = pytesseract.image_to_string(img, lang='spa+eng')
                         text_extracted += f"\n--- OCR Página {page_num + 1} ---\n{ocr_text}\n"
                         
@@ -442,7 +446,7 @@ def easyocr_text_from_pdf(pdf_bytes, lang=['es', 'en']):
         return text_extracted
         
     except Exception as e:
-        print(f"Error en OCR básico: {e}")
+        logger.warning("Error en OCR básico: %s", e)
         return ""
 
 HAS_EASYOCR = True  # Habilitado con implementación básica
@@ -472,9 +476,19 @@ def is_scanned_image_pdf(pdf_bytes: bytes, extracted_text: str) -> bool:
     return little_text and has_image_objs
 
 
+# Campos de la respuesta que se conservan en detail=summary (además del riesgo resumido)
+_CAMPOS_RESUMEN = ("sri_verificado", "mensaje", "coincidencia")
+
+
+
 @router.post("/validar-factura")
-async def validar_factura(req: Peticion):
+async def validar_factura(
+    req: Peticion,
+    detail: Optional[str] = Query(None, description=DESC_DETAIL),
+    fields: Optional[str] = Query(None, description=DESC_FIELDS),
+):
     t_all = time.perf_counter()
+    opciones = OpcionesRespuesta(detail, fields)
 
     # 1) decode base64
     t0 = time.perf_counter()
@@ -484,18 +498,66 @@ async def validar_factura(req: Peticion):
         raise HTTPException(status_code=400, detail="El campo 'pdfbase64' no es base64 válido.")
     if len(archivo_bytes) > MAX_PDF_BYTES:
         raise HTTPException(status_code=413, detail=f"El archivo excede el tamaño máximo permitido ({MAX_PDF_BYTES} bytes).")
-    log_step("1) decode base64", t0)
+    log_step("1) decode base64", t0, "decode")
+
+    return await _validar_factura_bytes(archivo_bytes, t_all, opciones=opciones)
+
+
+@router.post("/validar-factura/archivo")
+async def validar_factura_archivo(
+    request: Request,
+    detail: Optional[str] = Query(None, description=DESC_DETAIL),
+    fields: Optional[str] = Query(None, description=DESC_FIELDS),
+):
+    """
+    Variante de /validar-factura sin base64: el PDF llega como multipart
+    (campo 'archivo') o como cuerpo application/pdf.
+    """
+    t_all = time.perf_counter()
+    opciones = OpcionesRespuesta(detail, fields)
 
+    # 1) recibir archivo (volcado a temporal con tope de tamaño)
+    t0 = time.perf_counter()
+    archivo_bytes = await recibir_bytes(request, TIPOS_PDF)
+    log_step("1) recibir archivo", t0, "decode")
+
+    return await _validar_factura_bytes(archivo_bytes, t_all, opciones=opciones)
+
+
+def _respuesta_factura(opciones: OpcionesRespuesta, status_code: int, content: Dict[str, Any]) -> NumpyJSONResponse:
+    """Aplica el nivel de detalle y la máscara de campos a la respuesta de /validar-factura."""
+    if opciones.resumen:
+        content = respuesta_resumida(content, _CAMPOS_RESUMEN)
+    return NumpyJSONResponse(status_code=status_code, content=opciones.aplicar(content))
+
+
+async def _validar_factura_bytes(archivo_bytes: bytes, t_all: float, consultar_sri=None,
+                                 opciones: Optional[OpcionesRespuesta] = None):
+    """
+    Validación de factura a partir de los bytes del PDF (común a todas las variantes).
+
+    consultar_sri: corrutina (clave, pdf_bytes) -> dict que reemplaza a
+    _validar_autorizacion_sri_por_clave (p. ej. la versión deduplicada del lote).
+    opciones: nivel de detalle y máscara de campos (por defecto DETALLE_RESPUESTA).
+    """
+    if consultar_sri is None:
+        consultar_sri = _validar_autorizacion_sri_por_clave
+    if opciones is None:
+        opciones = OpcionesRespuesta()
+    documentos.inc(tipo="factura")
+    registrar_entrada(archivo_bytes)
     # Validar que sea un PDF válido
     t0 = time.perf_counter()
     try:
         # Intentar abrir como PDF para validar
         import fitz
         doc = fitz.open(stream=archivo_bytes, filetype="pdf")
+        fijar("paginas", doc.page_count)
         doc.close()
     except Exception:
         raise HTTPException(status_code=400, detail="El archivo no es un PDF válido.")
-    log_step("1.1) validar PDF", t0)
+    fijar("bytes", len(archivo_bytes))
+    log_step("1.1) validar PDF", t0, "decode")
 
     # 2) texto directo con pdfminer
     t0 = time.perf_counter()
@@ -503,7 +565,7 @@ async def validar_factura(req: Peticion):
         text = extract_text(io.BytesIO(archivo_bytes))
     except Exception:
         text = ""
-    log_step("2) extract_text(pdfminer)", t0)
+    log_step("2) extract_text(pdfminer)", t0, "texto")
 
     # 3) clave de acceso
     clave, etiqueta_encontrada = extract_clave_acceso_from_text(text or "")
@@ -511,7 +573,7 @@ async def validar_factura(req: Peticion):
     if not etiqueta_encontrada and is_scanned_image_pdf(archivo_bytes, text or "") and HAS_EASYOCR:
         t_ocr = time.perf_counter()
         ocr_text = easyocr_text_from_pdf(archivo_bytes)
-        log_step("3b) EasyOCR total", t_ocr)
+        log_step("3b) EasyOCR total", t_ocr, "ocr")
         clave_ocr, etiqueta_ocr = extract_clave_acceso_from_text(ocr_text or "")
         if etiqueta_ocr and clave_ocr:
             clave = clave_ocr
@@ -524,11 +586,12 @@ async def validar_factura(req: Peticion):
 
     # Si no hay clave válida → ejecutar riesgo con sri_ok=False
     if not etiqueta_encontrada or not clave or not re.fullmatch(r"\d{49}", str(clave)):
-        riesgo = evaluar_riesgo_factura(archivo_bytes, fuente_texto or "", pdf_fields, sri_ok=False)
-        log_step("TOTAL (RIESGO sin clave)", t_all)
-        return JSONResponse(
+        with span("riesgo"):
+            riesgo = evaluar_riesgo_factura(archivo_bytes, fuente_texto or "", pdf_fields, sri_ok=False, detalle=opciones.detalle)
+        return _respuesta_factura(
+            opciones,
             status_code=200,
-            content=safe_serialize_dict({
+            content={
                 "sri_verificado": False,
                 "mensaje": "No se pudo obtener una Clave de Acceso válida del PDF. Se ejecutó evaluación de riesgo.",
                 "riesgo": riesgo,
@@ -540,23 +603,25 @@ async def validar_factura(req: Peticion):
                     "tipo_documento": "pdf",
                     "firma_detectada": False
                 }
-            })
+            }
         )
 
     # 5) Validación SRI usando la lógica del endpoint universal
     t0 = time.perf_counter()
     try:
-        print(f"[DEBUG] Llamando a _validar_autorizacion_sri_por_clave con clave: {clave[:20]}...")
-        validacion_sri = await _validar_autorizacion_sri_por_clave(clave, archivo_bytes)
-        print(f"[DEBUG] validacion_sri recibida: {type(validacion_sri)}")
-        print(f"[DEBUG] validacion_sri keys: {list(validacion_sri.keys()) if isinstance(validacion_sri, dict) else 'No es dict'}")
-        log_step("5) Validación SRI", t0)
+        logger.debug("Llamando a _validar_autorizacion_sri_por_clave con clave: %s...", clave[:20])
+        validacion_sri = await consultar_sri(clave, archivo_bytes)
+        logger.debug("validacion_sri recibida: %s", type(validacion_sri))
+        logger.debug("validacion_sri keys: %s", list(validacion_sri.keys()) if isinstance(validacion_sri, dict) else 'No es dict')
+        log_step("5) Validación SRI", t0, "sri")
         
         if not validacion_sri.get("autorizado", False):
-            riesgo = evaluar_riesgo_factura(archivo_bytes, fuente_texto or "", pdf_fields, sri_ok=False)
-            return JSONResponse(
+            with span("riesgo"):
+                riesgo = evaluar_riesgo_factura(archivo_bytes, fuente_texto or "", pdf_fields, sri_ok=False, detalle=opciones.detalle)
+            return _respuesta_factura(
+                opciones,
                 status_code=200,
-                content=safe_serialize_dict({
+                content={
                 "sri_verificado": False,
                     "mensaje": "El comprobante no está AUTORIZADO en el SRI.",
                 "riesgo": riesgo,
@@ -568,18 +633,20 @@ async def validar_factura(req: Peticion):
                         "tipo_documento": "pdf",
                         "firma_detectada": False
                     }
-                })
+                }
             )
         
         # Si está autorizado, continuar con el procesamiento
         raw = validacion_sri.get("datos_autorizacion", {})
         
     except Exception as e:
-        print(f"[DEBUG] Error en validación SRI: {e}")
-        riesgo = evaluar_riesgo_factura(archivo_bytes, fuente_texto or "", pdf_fields, sri_ok=False)
-        return JSONResponse(
+        logger.debug("Error en validación SRI: %s", e)
+        with span("riesgo"):
+            riesgo = evaluar_riesgo_factura(archivo_bytes, fuente_texto or "", pdf_fields, sri_ok=False, detalle=opciones.detalle)
+        return _respuesta_factura(
+            opciones,
             status_code=200,
-            content=safe_serialize_dict({
+            content={
                 "sri_verificado": False,
                 "mensaje": f"Error consultando SRI: {str(e)}",
                 "riesgo": riesgo,
@@ -591,7 +658,7 @@ async def validar_factura(req: Peticion):
                     "tipo_documento": "pdf",
                     "firma_detectada": False
                 }
-            })
+            }
         )
 
     # 6) parsear XML del SRI
@@ -599,8 +666,9 @@ async def validar_factura(req: Peticion):
     try:
         sri_json = factura_xml_to_json(xml_src)
     except Exception as e:
-        riesgo = evaluar_riesgo_factura(archivo_bytes, fuente_texto or "", pdf_fields, sri_ok=True)
-        return JSONResponse(status_code=200, content=safe_serialize_dict({
+        with span("riesgo"):
+            riesgo = evaluar_riesgo_factura(archivo_bytes, fuente_texto or "", pdf_fields, sri_ok=True, detalle=opciones.detalle)
+        return _respuesta_factura(opciones, status_code=200, content={
             "sri_verificado": True,
             "mensaje": "AUTORIZADO en el SRI, pero no se pudo convertir a JSON.",
             "detalle": str(e),
@@ -613,7 +681,7 @@ async def validar_factura(req: Peticion):
                 "tipo_documento": "pdf",
                 "firma_detectada": False
             }
-        }))
+        })
 
     # --------- Comparación cabecera ----------
     sri_fields = {
@@ -723,17 +791,17 @@ async def validar_factura(req: Peticion):
     coincidencia = (not diferencias and not diferenciasProductos and totales_ok)
     
     # DEBUG: logs para entender por qué no hay coincidencia
-    print(f"[DEBUG COINCIDENCIA] diferencias: {diferencias}")
-    print(f"[DEBUG COINCIDENCIA] diferenciasProductos: {len(diferenciasProductos)} elementos")
-    print(f"[DEBUG COINCIDENCIA] totales_ok: {totales_ok}")
-    print(f"[DEBUG COINCIDENCIA] coincidencia final: {coincidencia}")
-    print(f"[DEBUG COINCIDENCIA] total_pdf_items: {total_pdf_items}")
-    print(f"[DEBUG COINCIDENCIA] total_sri_items: {total_sri_items}")
+    logger.debug("[COINCIDENCIA] diferencias: %s", diferencias)
+    logger.debug("[COINCIDENCIA] diferenciasProductos: %s elementos", len(diferenciasProductos))
+    logger.debug("[COINCIDENCIA] totales_ok: %s", totales_ok)
+    logger.debug("[COINCIDENCIA] coincidencia final: %s", coincidencia)
+    logger.debug("[COINCIDENCIA] total_pdf_items: %s", total_pdf_items)
+    logger.debug("[COINCIDENCIA] total_sri_items: %s", total_sri_items)
     
     # 7) Análisis avanzado de texto sobrepuesto
     t0 = time.perf_counter()
     texto_sobrepuesto_analisis = detectar_texto_sobrepuesto_avanzado(archivo_bytes)
-    log_step("7) Análisis texto sobrepuesto avanzado", t0)
+    log_step("7) Análisis texto sobrepuesto avanzado", t0, "overlay")
     
     # Para la evaluación de riesgo, si el SRI está AUTORIZADO, eso debería ser suficiente
     # para considerarlo válido, independientemente de diferencias menores en el parseo
@@ -755,55 +823,10 @@ async def validar_factura(req: Peticion):
         clave_acceso=clave,
         ejecutar_prueba_sri=False,  # Ya tenemos los datos
         xml_sri_data=xml_sri_data,  # Pasar el XML del SRI
-        firmas_pdf=False  # Se actualizará después de la validación de firmas
+        firmas_pdf=False,  # Se actualizará después de la validación de firmas
+        detalle=opciones.detalle
     )
-    log_step("7) Evaluación de riesgo inicial", t0)
-
-    # 8) Validación de firmas digitales (siempre para facturas)
-    t0 = time.perf_counter()
-    try:
-        validacion_firmas = analizar_firmas_digitales_avanzado(
-            archivo_bytes, 
-            verify_crypto=True, 
-            verify_chain=True
-        )
-        log_step("8) Validación de firmas digitales", t0)
-    except Exception as e:
-        print(f"[DEBUG] Error en validación de firmas: {e}")
-        validacion_firmas = {
-            "firma_detectada": False,
-            "tipo_firma": "ninguna",
-            "es_pades": False,
-            "metadatos": {"numero_firmas": 0},
-            "resumen": {
-                "tiene_firma": False,
-                "total_firmas": 0,
-                "firmas_validas": 0,
-                "firmas_pades": 0,
-                "integridad_ok": 0,
-                "crypto_ok": 0,
-                "chain_ok": 0
-            },
-            "validacion_avanzada": {
-                "firma_detectada": False,
-                "firmas": [],
-                "resumen": {
-                    "total_firmas": 0,
-                    "firmas_validas": 0,
-                    "firmas_integridad_ok": 0,
-                    "firmas_sin_modificaciones": 0,
-                    "firmas_crypto_ok": 0,
-                    "firmas_chain_ok": 0,
-                    "firmas_pades": 0
-                },
-                "dependencias": {
-                    "asn1crypto": False,
-                    "oscrypto": False,
-                    "certvalidator": False
-                }
-            },
-            "cantidad_firmas_pades": 0
-        }
+    log_step("7) Evaluación de riesgo inicial", t0, "riesgo")
 
     # 9) Actualizar evaluación de riesgo usando exactamente la misma lógica que el endpoint universal
     t0 = time.perf_counter()
@@ -813,7 +836,7 @@ async def validar_factura(req: Peticion):
     deteccion_basica = detectar_firmas_pdf_simple(archivo_bytes)
     
     # 2. Detección con patrones
-    deteccion_patrones = detectar_firma_desde_base64(req.pdfbase64)
+    deteccion_patrones = detectar_firma_desde_bytes(archivo_bytes)
     
     # 3. Análisis de documento SRI (ya tenemos analisis_sri)
     analisis_sri = analizar_documento_sri(archivo_bytes)
@@ -866,13 +889,13 @@ async def validar_factura(req: Peticion):
     }
     
     # Debug: verificar estructura de validacion_sri
-    print(f"[DEBUG] validacion_sri existe: {validacion_sri is not None}")
+    logger.debug("validacion_sri existe: %s", validacion_sri is not None)
     if validacion_sri:
-        print(f"[DEBUG] validacion_sri keys: {list(validacion_sri.keys())}")
+        logger.debug("validacion_sri keys: %s", list(validacion_sri.keys()))
         if validacion_sri.get("validacion_firma_xml"):
-            print(f"[DEBUG] validacion_firma_xml keys: {list(validacion_sri['validacion_firma_xml'].keys())}")
+            logger.debug("validacion_firma_xml keys: %s", list(validacion_sri['validacion_firma_xml'].keys()))
         else:
-            print(f"[DEBUG] No hay validacion_firma_xml en validacion_sri")
+            logger.debug("No hay validacion_firma_xml en validacion_sri")
     
     # Usar directamente la información de validacion_sri que ya tenemos
     if validacion_sri and validacion_sri.get("validacion_firma_xml"):
@@ -899,11 +922,11 @@ async def validar_factura(req: Peticion):
             # Actualizar firmas_pdf_valido con la información XAdES
             firmas_pdf_valido = validacion_xades.get("firma_detectada", False)
             
-            print(f"[DEBUG] ✅ Usando información XAdES: firma_detectada={firmas_pdf_valido}, total_firmas={resumen_xades.get('total_firmas', 0)}")
+            logger.debug("✅ Usando información XAdES: firma_detectada=%s, total_firmas=%s", firmas_pdf_valido, resumen_xades.get('total_firmas', 0))
         else:
-            print(f"[DEBUG] ❌ No hay validacion_xades en validacion_firma_xml")
+            logger.debug("❌ No hay validacion_xades en validacion_firma_xml")
     else:
-        print(f"[DEBUG] ❌ No hay validacion_sri o validacion_firma_xml")
+        logger.debug("❌ No hay validacion_sri o validacion_firma_xml")
     
     riesgo_actualizado = evaluar_riesgo_factura(
         archivo_bytes, 
@@ -914,21 +937,97 @@ async def validar_factura(req: Peticion):
         ejecutar_prueba_sri=False,
         xml_sri_data=xml_sri_data,
         firmas_pdf=firmas_pdf_valido,
-        info_firmas=info_firmas
+        info_firmas=info_firmas,
+        detalle=opciones.detalle
+    )
+    log_step("9) Actualización de riesgo con firmas", t0, "riesgo")
+
+    # 8) y 10) Validación de firmas digitales (solo si la respuesta la incluye)
+    contenido_firmas = {}
+    if opciones.calcula("validacion_firmas"):
+        contenido_firmas["validacion_firmas"] = _validacion_firmas_completa(archivo_bytes, validacion_sri)
+
+    return _respuesta_factura(
+        opciones,
+        status_code=200,
+        content={
+            "sri_verificado": True,
+            "mensaje": "El comprobante es AUTORIZADO en el SRI.",
+            "coincidencia": "si" if coincidencia else "no",
+            "diferencias": diferencias,
+            "diferenciasProductos": diferenciasProductos,
+            "resumenProductos": {
+                "num_sri": len(sri_items),
+                "num_pdf": len(pdf_items),
+                "total_sri_items": total_sri_items,
+                "total_pdf_items": total_pdf_items
+            },
+            "factura": sri_json,
+            "riesgo": riesgo_actualizado,
+            **contenido_firmas,
+        },
     )
-    log_step("9) Actualización de riesgo con firmas", t0)
+
+
+def _validacion_firmas_completa(archivo_bytes: bytes, validacion_sri: Dict[str, Any]) -> Dict[str, Any]:
+    """Sección validacion_firmas de /validar-factura (firmas PDF + XAdES del SRI)."""
+    # 8) Validación de firmas digitales (siempre para facturas)
+    t0 = time.perf_counter()
+    try:
+        validacion_firmas = analizar_firmas_digitales_avanzado(
+            archivo_bytes, 
+            verify_crypto=True, 
+            verify_chain=True
+        )
+        log_step("8) Validación de firmas digitales", t0, "firmas")
+    except Exception as e:
+        logger.debug("Error en validación de firmas: %s", e)
+        validacion_firmas = {
+            "firma_detectada": False,
+            "tipo_firma": "ninguna",
+            "es_pades": False,
+            "metadatos": {"numero_firmas": 0},
+            "resumen": {
+                "tiene_firma": False,
+                "total_firmas": 0,
+                "firmas_validas": 0,
+                "firmas_pades": 0,
+                "integridad_ok": 0,
+                "crypto_ok": 0,
+                "chain_ok": 0
+            },
+            "validacion_avanzada": {
+                "firma_detectada": False,
+                "firmas": [],
+                "resumen": {
+                    "total_firmas": 0,
+                    "firmas_validas": 0,
+                    "firmas_integridad_ok": 0,
+                    "firmas_sin_modificaciones": 0,
+                    "firmas_crypto_ok": 0,
+                    "firmas_chain_ok": 0,
+                    "firmas_pades": 0
+                },
+                "dependencias": {
+                    "asn1crypto": False,
+                    "oscrypto": False,
+                    "certvalidator": False
+                }
+            },
+            "cantidad_firmas_pades": 0
+        }
 
     # 10) Preparar información completa de validación de firmas usando la misma lógica que validar-firma-universal
     t0 = time.perf_counter()
     
     # Obtener información de validación XAdES del SRI (ya viene del endpoint universal)
     validacion_firma_xml = validacion_sri.get("validacion_firma_xml", {})
-    print(f"[DEBUG] validacion_firma_xml keys: {list(validacion_firma_xml.keys())}")
-    print(f"[DEBUG] validacion_firma_xml resumen: {validacion_firma_xml.get('resumen', {})}")
+    logger.debug("validacion_firma_xml keys: %s", list(validacion_firma_xml.keys()))
+    logger.debug("validacion_firma_xml resumen: %s", validacion_firma_xml.get('resumen', {}))
     
     # Si validacion_firma_xml está vacío, usar la estructura directa del endpoint universal
     if not validacion_firma_xml:
-        print(f"[DEBUG] validacion_firma_xml está vacío, usando estructura directa del endpoint universal")
+        logger.debug("validacion_firma_xml está vacío, usando estructura directa del endpoint universal")
         # La estructura viene directamente del endpoint universal
         validacion_firmas_completa = {
             "resumen": validacion_sri.get("resumen", {
@@ -991,28 +1090,8 @@ async def validar_factura(req: Peticion):
             "firma_detectada": validacion_firma_xml.get("firma_detectada", False)
         }
     
-    print(f"[DEBUG] validacion_firmas_completa resumen: {validacion_firmas_completa['resumen']}")
+    logger.debug("validacion_firmas_completa resumen: %s", validacion_firmas_completa['resumen'])
     
-    log_step("10) Preparación validación firmas completa", t0)
-
-    return JSONResponse(
-        status_code=200,
-        content=safe_serialize_dict({
-            "sri_verificado": True,
-            "mensaje": "El comprobante es AUTORIZADO en el SRI.",
-            "coincidencia": "si" if coincidencia else "no",
-            "diferencias": diferencias,
-            "diferenciasProductos": diferenciasProductos,
-            "resumenProductos": {
-                "num_sri": len(sri_items),
-                "num_pdf": len(pdf_items),
-                "total_sri_items": total_sri_items,
-                "total_pdf_items": total_pdf_items
-            },
-            "factura": sri_json,
-            "riesgo": riesgo_actualizado,
-            "validacion_firmas": validacion_firmas_completa
-        }),
-    )
-
+    log_step("10) Preparación validación firmas completa", t0, "firmas")
 
+    return validacion_firmas_completa
@@ -4,15 +4,22 @@ import re
 import time
 import json
 
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import JSONResponse
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request
 from pydantic import BaseModel
 from pdfminer.high_level import extract_text
 
 from config import MAX_PDF_BYTES
 from utils import log_step
+from helpers.trazas import fijar, span
+from helpers.metricas import documentos
+from helpers.perfilado import registrar_entrada
 from pdf_extract import extract_clave_acceso_from_text, extract_invoice_fields_from_text
-from helpers.type_conversion import safe_serialize_dict
+from helpers.type_conversion import NumpyJSONResponse
+from helpers.carga_documentos import recibir_bytes, TIPOS_PDF
+from helpers.cache_rasterizado import raster_pagina, imagen_desde_array, sha256_documento
+from helpers.nivel_detalle import OpcionesRespuesta, respuesta_resumida, DESC_DETAIL, DESC_FIELDS
 # OCR functionality básica restaurada
 def easyocr_text_from_pdf(pdf_bytes, lang=['es', 'en']):
     """
@@ -24,6 +31,7 @@ def easyocr_text_from_pdf(pdf_bytes, lang=['es', 'en']):
         
         # Primero intentar extracción de texto normal
         doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        sha = sha256_documento(pdf_bytes)
         text_extracted = ""
         
         for page_num in range(doc.page_count):
@@ -33,17 +41,14 @@ def easyocr_text_from_pdf(pdf_bytes, lang=['es', 'en']):
             # Si la página tiene poco texto, intentar OCR de imágenes
             if len(page_text.strip()) < 50:
                 try:
-                    # Convertir página a imagen
-                    pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))  # Aumentar resolución
-                    img_data = pix.tobytes("png")
+                    # Convertir página a imagen (2x, desde la caché de rasterizado)
+                    arr = raster_pagina(pdf_bytes, page_num, 144, doc=doc, sha=sha)
                     
                     # Intentar OCR con pytesseract si está disponible
                     try:
                         import pytesseract
-                        from PIL import Image
-                        import io
                         
-                        img = Image.open(io.BytesIO(img_data))
+                        img = imagen_desde_array(arr)
                         ocr_text = pytesseract.image_to_string(img, lang='spa+eng')
                         text_extracted += f"\n--- OCR Página {page_num + 1} ---\n{ocr_text}\n"
                         
@@ -86,10 +91,18 @@ def is_scanned_image_pdf(pdf_bytes: bytes, extracted_text: str) -> bool:
     return little_text and has_image_objs
 
 
+# Campos que se conservan en detail=summary (además del riesgo resumido)
+_CAMPOS_RESUMEN = ("sri_verificado", "mensaje", "claveAccesoDetectada")
+
+
 @router.post("/validar-documento")
-async def validar_documento(req: PeticionDoc):
+async def validar_documento(
+    req: PeticionDoc,
+    detail: Optional[str] = Query(None, description=DESC_DETAIL),
+    fields: Optional[str] = Query(None, description=DESC_FIELDS),
+):
     t_all = time.perf_counter()
-    typeDocumento = "Documento";
+    opciones = OpcionesRespuesta(detail, fields)
 
     # 1) decode base64
     t0 = time.perf_counter()
@@ -99,19 +112,55 @@ async def validar_documento(req: PeticionDoc):
         raise HTTPException(status_code=400, detail="El campo 'pdfbase64' no es base64 válido.")
     if len(pdf_bytes) > MAX_PDF_BYTES:
         raise HTTPException(status_code=413, detail=f"El PDF excede el tamaño máximo permitido ({MAX_PDF_BYTES} bytes).")
-    log_step("1) decode base64", t0)
+    log_step("1) decode base64", t0, "decode")
+
+    return _validar_documento_bytes(pdf_bytes, t_all, opciones)
+
+
+@router.post("/validar-documento/archivo")
+async def validar_documento_archivo(
+    request: Request,
+    detail: Optional[str] = Query(None, description=DESC_DETAIL),
+    fields: Optional[str] = Query(None, description=DESC_FIELDS),
+):
+    """
+    Variante de /validar-documento sin base64: el PDF llega como multipart
+    (campo 'archivo') o como cuerpo application/pdf.
+    """
+    t_all = time.perf_counter()
+    opciones = OpcionesRespuesta(detail, fields)
+
+    # 1) recibir archivo (volcado a temporal con tope de tamaño)
+    t0 = time.perf_counter()
+    pdf_bytes = await recibir_bytes(request, TIPOS_PDF)
+    log_step("1) recibir archivo", t0, "decode")
+
+    return _validar_documento_bytes(pdf_bytes, t_all, opciones)
+
+
+def _validar_documento_bytes(pdf_bytes: bytes, t_all: float, opciones: Optional[OpcionesRespuesta] = None):
+    """Análisis local del documento a partir de los bytes del PDF."""
+    if opciones is None:
+        opciones = OpcionesRespuesta()
+    typeDocumento = "Documento";
+
+    documentos.inc(tipo="documento")
+    registrar_entrada(pdf_bytes)
+    fijar("bytes", len(pdf_bytes))
 
     # 2) texto directo con pdfminer
-    try:
-        text = extract_text(io.BytesIO(pdf_bytes))
-    except Exception:
-        text = ""
+    with span("texto"):
+        try:
+            text = extract_text(io.BytesIO(pdf_bytes))
+        except Exception:
+            text = ""
 
     # 3) clave de acceso (opcional)
     clave, _ = extract_clave_acceso_from_text(text or "")
     ocr_text = ""
     if is_scanned_image_pdf(pdf_bytes, text or "") and HAS_EASYOCR:
-        ocr_text = easyocr_text_from_pdf(pdf_bytes)
+        with span("ocr"):
+            ocr_text = easyocr_text_from_pdf(pdf_bytes)
 
     fuente_texto = text if text and not is_scanned_image_pdf(pdf_bytes, text) else (ocr_text or text)
 
@@ -120,15 +169,16 @@ async def validar_documento(req: PeticionDoc):
     pdf_fields_b64 = base64.b64encode(json.dumps(pdf_fields, ensure_ascii=False).encode("utf-8")).decode("utf-8")
 
     # 5) análisis de riesgo (sin SRI)
-    riesgo = evaluar_riesgo(pdf_bytes, fuente_texto or "", pdf_fields, type=typeDocumento)
-
-    return JSONResponse(
-        status_code=200,
-        content=safe_serialize_dict({
-            "sri_verificado": False,
-            "mensaje": "Análisis local del documento (sin consulta al SRI).",
-            "riesgo": riesgo,
-            "claveAccesoDetectada": clave,
-            "textoAnalizado": fuente_texto
-        })
-    )
+    with span("riesgo"):
+        riesgo = evaluar_riesgo(pdf_bytes, fuente_texto or "", pdf_fields, type=typeDocumento, detalle=opciones.detalle)
+
+    contenido = {
+        "sri_verificado": False,
+        "mensaje": "Análisis local del documento (sin consulta al SRI).",
+        "riesgo": riesgo,
+        "claveAccesoDetectada": clave,
+        "textoAnalizado": fuente_texto
+    }
+    if opciones.resumen:
+        contenido = respuesta_resumida(contenido, _CAMPOS_RESUMEN)
+    return NumpyJSONResponse(status_code=200, content=opciones.aplicar(contenido))
@@ -8,12 +8,13 @@ Endpoint corregido para validar facturas PDF
 import os
 import sys
 import base64
+import numpy as np
 import io
 import tempfile
 import time
 from typing import Dict, Any, Optional
 from fastapi import APIRouter, HTTPException
-from fastapi.responses import JSONResponse
+from helpers.type_conversion import NumpyJSONResponse
 from pydantic import BaseModel
 
 # Usar configuración global de Tesseract
@@ -32,7 +33,7 @@ class PeticionFactura(BaseModel):
     pdfbase64: str
 
 @router.post("/validar-factura")
-async def validar_factura(req: PeticionFactura) -> JSONResponse:
+async def validar_factura(req: PeticionFactura) -> NumpyJSONResponse:
     """
     Valida una factura PDF usando análisis inteligente
     """
@@ -110,6 +111,8 @@ async def validar_factura(req: PeticionFactura) -> JSONResponse:
                         return obj.decode('utf-8')
                     except UnicodeDecodeError:
                         return base64.b64encode(obj).decode('utf-8')
+                elif isinstance(obj, np.generic):
+                    return obj.item()
                 elif isinstance(obj, (str, int, float, bool, type(None))):
                     return obj
                 else:
@@ -179,7 +182,7 @@ async def validar_factura(req: PeticionFactura) -> JSONResponse:
                     print(f"   Clave Acceso en factura: {factura.get('claveAcceso', 'N/A')}")
                     print(f"   Total en factura: {factura.get('total', 'N/A')}")
             
-            return JSONResponse(content=response)
+            return NumpyJSONResponse(content=response)
             
         finally:
             # Limpiar archivo temporal
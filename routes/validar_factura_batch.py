@@ -0,0 +1,310 @@
+"""
+Validación de facturas por lotes.
+
+POST /validar-factura/batch recibe N documentos y devuelve un NDJSON con una
+línea por documento a medida que terminan, más una línea final de resumen.
+
+Entrada:
+- application/x-ndjson: una línea por documento {"id": "...", "pdfbase64": "..."}
+- multipart/form-data: un archivo por documento (el id es el nombre del archivo)
+
+Cada documento pasa por el mismo pipeline que /validar-factura. Dentro del lote:
+- documentos idénticos (mismo SHA-256) se procesan una sola vez
+- claves de acceso repetidas se consultan una sola vez al SRI
+- las consultas al SRI se limitan a LOTE_CONCURRENCIA_SRI simultáneas
+- a lo sumo LOTE_CONCURRENCIA_DOCUMENTOS documentos decodificados en memoria:
+  con todos los cupos ocupados se deja de leer el cuerpo hasta que uno
+  termine (en multipart los demás esperan en los temporales de Starlette)
+- a lo sumo LOTE_MAX_DOCUMENTOS líneas o archivos, válidos o no; el cuerpo
+  multipart se corta con 413 al pasar de LOTE_MAX_DOCUMENTOS documentos de
+  tamaño máximo, y un archivo de más de MAX_PDF_BYTES no se lee del temporal
+- si la lectura del cuerpo falla (413, desconexión), se cancelan los
+  documentos del lote que aún no empezaron y se esperan sus tareas
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from starlette.datastructures import UploadFile
+
+from config import (
+    MAX_PDF_BYTES,
+    LOTE_MAX_DOCUMENTOS,
+    LOTE_CONCURRENCIA_DOCUMENTOS,
+    LOTE_CONCURRENCIA_SRI,
+)
+from utils import log_step
+from helpers.carga_documentos import HOLGURA_MULTIPART, leer_formulario, rechazar_si_declara_mas
+from helpers.nivel_detalle import OpcionesRespuesta, DESC_DETAIL, DESC_FIELDS
+from routes.validar import _validar_factura_bytes, _validar_autorizacion_sri_por_clave
+
+router = APIRouter()
+
+# Hilos compartidos por todos los lotes; cada documento corre su pipeline en su propio event loop
+_executor = ThreadPoolExecutor(max_workers=max(1, LOTE_CONCURRENCIA_DOCUMENTOS), thread_name_prefix="lote")
+
+# Una línea NDJSON con base64 puede ocupar ~4/3 del PDF más el JSON que la envuelve
+_MAX_LINEA_NDJSON = MAX_PDF_BYTES * 4 // 3 + 64 * 1024
+
+# Cuerpo máximo: LOTE_MAX_DOCUMENTOS documentos de tamaño máximo
+_MAX_CUERPO_MULTIPART = LOTE_MAX_DOCUMENTOS * (MAX_PDF_BYTES + HOLGURA_MULTIPART)
+_MAX_CUERPO_NDJSON = LOTE_MAX_DOCUMENTOS * (_MAX_LINEA_NDJSON + 1)
+
+
+class ConsultasSRICompartidas:
+    """
+    Consultas al SRI deduplicadas por clave de acceso y con límite de concurrencia.
+
+    Es seguro entre hilos: cada documento del lote corre en un hilo con su propio
+    event loop, así que la deduplicación usa futuros de concurrent.futures.
+    """
+
+    def __init__(self, limite: int = LOTE_CONCURRENCIA_SRI):
+        self._semaforo = threading.BoundedSemaphore(max(1, limite))
+        self._lock = threading.Lock()
+        self._futuros: Dict[str, Future] = {}
+        self.consultas = 0
+        self.reutilizadas = 0
+
+    async def __call__(self, clave: str, pdf_bytes: bytes = None) -> Dict[str, Any]:
+        with self._lock:
+            futuro = self._futuros.get(clave)
+            propio = futuro is None
+            if propio:
+                futuro = Future()
+                self._futuros[clave] = futuro
+                self.consultas += 1
+            else:
+                self.reutilizadas += 1
+
+        if propio:
+            try:
+                # Bloquear aquí solo detiene el loop de este documento
+                with self._semaforo:
+                    resultado = await _validar_autorizacion_sri_por_clave(clave, pdf_bytes)
+                futuro.set_result(resultado)
+            except BaseException as e:
+                futuro.set_exception(e)
+                raise
+
+        return await asyncio.wrap_future(futuro)
+
+
+def _procesar_documento(archivo_bytes: bytes, consultas: ConsultasSRICompartidas, opciones: OpcionesRespuesta):
+    """Ejecuta el pipeline de /validar-factura en el hilo actual."""
+    return asyncio.run(_validar_factura_bytes(archivo_bytes, time.perf_counter(), consultas, opciones))
+
+
+def _linea(meta: Dict[str, Any], cuerpo: Optional[bytes] = None) -> bytes:
+    """Serializa una línea NDJSON; el cuerpo JSON ya renderizado se inserta sin reparsearlo."""
+    base = json.dumps(meta, ensure_ascii=False).encode("utf-8")
+    if cuerpo is not None:
+        base = base[:-1] + b',"resultado":' + cuerpo + b"}"
+    return base + b"\n"
+
+
+class _Lote:
+    """Estado de un lote: despacho de documentos, deduplicación y cola de resultados."""
+
+    def __init__(self, opciones: OpcionesRespuesta):
+        self.opciones = opciones
+        self.cola: asyncio.Queue = asyncio.Queue()
+        # Un cupo por hilo del executor: su cola interna no tiene límite y cada
+        # documento despachado retiene sus bytes hasta que un hilo lo toma
+        self.cupos = asyncio.Semaphore(max(1, LOTE_CONCURRENCIA_DOCUMENTOS))
+        self.consultas = ConsultasSRICompartidas()
+        self.por_sha: Dict[str, asyncio.Future] = {}
+        self.primero_por_sha: Dict[str, str] = {}
+        self.tareas = []
+        self.total = 0
+        self.duplicados = 0
+        self.errores = 0
+        self.t0 = time.perf_counter()
+
+    def _admitir(self) -> None:
+        """Cuenta un documento más del lote (también los inválidos); 413 si pasa del máximo."""
+        if self.total >= LOTE_MAX_DOCUMENTOS:
+            raise HTTPException(status_code=413, detail=f"El lote excede {LOTE_MAX_DOCUMENTOS} documentos.")
+        self.total += 1
+
+    def error(self, indice: int, id_doc: str, status: int, detalle: str) -> None:
+        self._admitir()
+        self.errores += 1
+        self.cola.put_nowait(_linea({"indice": indice, "id": id_doc, "status": status, "error": detalle}))
+
+    def excedido(self, indice: int, id_doc: str) -> None:
+        self.error(indice, id_doc, 413, f"El archivo excede el tamaño máximo permitido ({MAX_PDF_BYTES} bytes).")
+
+    async def despachar(self, indice: int, id_doc: str, archivo_bytes: bytes) -> None:
+        """Lanza el documento; espera un cupo libre si ya hay tantos en proceso como hilos."""
+        if len(archivo_bytes) > MAX_PDF_BYTES:
+            self.excedido(indice, id_doc)
+            return
+        self._admitir()
+
+        sha = hashlib.sha256(archivo_bytes).hexdigest()
+        original = self.por_sha.get(sha)
+        if original is None:
+            await self.cupos.acquire()
+            loop = asyncio.get_running_loop()
+            original = loop.run_in_executor(_executor, _procesar_documento, archivo_bytes, self.consultas, self.opciones)
+            original.add_done_callback(lambda _: self.cupos.release())
+            self.por_sha[sha] = original
+            self.primero_por_sha[sha] = id_doc
+            duplicado_de = None
+        else:
+            self.duplicados += 1
+            duplicado_de = self.primero_por_sha[sha]
+        self.tareas.append(asyncio.ensure_future(self._emitir(indice, id_doc, sha, original, duplicado_de)))
+
+    async def cancelar(self) -> None:
+        """La lectura del cuerpo falló: descarta lo que no empezó y espera las tareas del lote."""
+        # Cancelar el futuro de asyncio cancela el del executor si aún está en cola;
+        # los que ya corren terminan en su hilo y su resultado se descarta
+        for futuro in self.por_sha.values():
+            futuro.cancel()
+        for tarea in self.tareas:
+            tarea.cancel()
+        await asyncio.gather(*self.tareas, return_exceptions=True)
+
+    async def _emitir(self, indice, id_doc, sha, futuro, duplicado_de) -> None:
+        meta = {"indice": indice, "id": id_doc, "sha256": sha}
+        if duplicado_de is not None:
+            meta["duplicado_de"] = duplicado_de
+        try:
+            respuesta = await asyncio.shield(futuro)
+            meta["status"] = respuesta.status_code
+            self.cola.put_nowait(_linea(meta, bytes(respuesta.body)))
+        except HTTPException as e:
+            self.errores += 1
+            meta.update({"status": e.status_code, "error": e.detail})
+            self.cola.put_nowait(_linea(meta))
+        except Exception as e:
+            self.errores += 1
+            meta.update({"status": 500, "error": f"Error interno: {str(e)}"})
+            self.cola.put_nowait(_linea(meta))
+
+    async def resultados(self):
+        """Generador de líneas NDJSON en orden de finalización, con resumen al final."""
+        pendientes = set(self.tareas)
+        emitidas = 0
+        while emitidas < self.total:
+            yield await self.cola.get()
+            emitidas += 1
+        await asyncio.gather(*pendientes, return_exceptions=True)
+        log_step(f"lote de {self.total} documentos", self.t0)
+        yield _linea({"resumen": {
+            "total": self.total,
+            "procesados": len(self.por_sha),
+            "duplicados": self.duplicados,
+            "errores": self.errores,
+            "consultas_sri": self.consultas.consultas,
+            "consultas_sri_reutilizadas": self.consultas.reutilizadas,
+            "segundos": round(time.perf_counter() - self.t0, 3),
+        }})
+
+
+async def _leer_ndjson(request: Request, lote: _Lote) -> None:
+    """Despacha cada línea apenas llega, sin esperar el cuerpo completo."""
+    rechazar_si_declara_mas(
+        request, _MAX_CUERPO_NDJSON, f"El lote excede el tamaño máximo permitido ({_MAX_CUERPO_NDJSON} bytes).")
+    buffer = bytearray()
+    indice = 0
+
+    async def procesar_linea(linea: bytes):
+        nonlocal indice
+        linea = linea.strip()
+        if not linea:
+            return
+        id_doc = str(indice)
+        try:
+            item = json.loads(linea)
+            id_doc = str(item.get("id", indice))
+            archivo_bytes = base64.b64decode(item["pdfbase64"], validate=True)
+        except Exception:
+            lote.error(indice, id_doc, 400, "Línea inválida: se esperaba {\"id\": ..., \"pdfbase64\": ...} con base64 válido.")
+        else:
+            # Sin cupo, espera aquí: no se lee el siguiente bloque del cuerpo
+            await lote.despachar(indice, id_doc, archivo_bytes)
+        indice += 1
+
+    async for bloque in request.stream():
+        inicio = len(buffer)
+        buffer += bloque
+        # Solo se busca el salto de línea en el bloque nuevo
+        fin = buffer.find(b"\n", inicio)
+        while fin >= 0:
+            linea = bytes(buffer[:fin])
+            del buffer[:fin + 1]
+            await procesar_linea(linea)
+            fin = buffer.find(b"\n")
+        if len(buffer) > _MAX_LINEA_NDJSON:
+            raise HTTPException(status_code=413, detail="Una línea del NDJSON excede el tamaño máximo permitido.")
+    await procesar_linea(bytes(buffer))
+
+
+async def _leer_multipart(request: Request, lote: _Lote) -> None:
+    detalle = f"El lote excede el tamaño máximo permitido ({_MAX_CUERPO_MULTIPART} bytes)."
+    rechazar_si_declara_mas(request, _MAX_CUERPO_MULTIPART, detalle)
+    form = await leer_formulario(request, _MAX_CUERPO_MULTIPART, detalle, max_files=LOTE_MAX_DOCUMENTOS)
+    try:
+        indice = 0
+        for _, valor in form.multi_items():
+            if not isinstance(valor, UploadFile):
+                continue
+            id_doc = valor.filename or str(indice)
+            if valor.size is not None and valor.size > MAX_PDF_BYTES:
+                # Sin leerlo del temporal
+                lote.excedido(indice, id_doc)
+            else:
+                # Los archivos esperan en los temporales del formulario; se leen de a uno cuando hay cupo
+                await lote.despachar(indice, id_doc, await valor.read())
+            await valor.close()
+            indice += 1
+    finally:
+        await form.close()
+
+
+@router.post("/validar-factura/batch")
+async def validar_factura_batch(
+    request: Request,
+    detail: Optional[str] = Query(None, description=DESC_DETAIL),
+    fields: Optional[str] = Query(None, description=DESC_FIELDS),
+):
+    """
+    Valida un lote de facturas y devuelve NDJSON (application/x-ndjson).
+
+    Cada línea: {"indice", "id", "sha256", "status", "resultado" | "error", ["duplicado_de"]}.
+    La última línea es {"resumen": {...}}. ?detail= y ?fields= se aplican a cada resultado.
+    """
+    content_type = (request.headers.get("content-type") or "").split(";")[0].strip().lower()
+    lote = _Lote(OpcionesRespuesta(detail, fields))
+
+    # El cuerpo se lee por completo antes de empezar a responder (Starlette no permite
+    # leer el request mientras transmite la respuesta), pero cada documento se despacha
+    # apenas llega, así que el procesamiento avanza en paralelo con la carga.
+    if content_type == "multipart/form-data":
+        leer = _leer_multipart
+    elif content_type in ("application/x-ndjson", "application/ndjson", "application/jsonl", "text/plain", ""):
+        leer = _leer_ndjson
+    else:
+        raise HTTPException(status_code=415, detail="Use application/x-ndjson o multipart/form-data.")
+    try:
+        await leer(request, lote)
+    except BaseException:
+        # 413 a mitad del cuerpo, desconexión del cliente: nada del lote queda huérfano
+        await lote.cancelar()
+        raise
+
+    if lote.total == 0:
+        raise HTTPException(status_code=400, detail="El lote no contiene documentos.")
+
+    return StreamingResponse(lote.resultados(), media_type="application/x-ndjson")
@@ -8,10 +8,11 @@ Endpoint NUEVO para validar facturas PDF - Versión simplificada
 import os
 import sys
 import base64
+import numpy as np
 import tempfile
 import time
 from fastapi import APIRouter, HTTPException
-from fastapi.responses import JSONResponse
+from helpers.type_conversion import NumpyJSONResponse
 from pydantic import BaseModel
 
 # Usar configuración global de Tesseract
@@ -30,7 +31,7 @@ class PeticionFactura(BaseModel):
     pdfbase64: str
 
 @router.post("/validar-factura-nuevo")
-async def validar_factura_nuevo(req: PeticionFactura) -> JSONResponse:
+async def validar_factura_nuevo(req: PeticionFactura) -> NumpyJSONResponse:
     """
     Valida una factura PDF usando análisis inteligente - VERSIÓN NUEVA
     """
@@ -105,6 +106,8 @@ async def validar_factura_nuevo(req: PeticionFactura) -> JSONResponse:
                         return obj.decode('utf-8')
                     except UnicodeDecodeError:
                         return base64.b64encode(obj).decode('utf-8')
+                elif isinstance(obj, np.generic):
+                    return obj.item()
                 elif isinstance(obj, (str, int, float, bool, type(None))):
                     return obj
                 else:
@@ -174,7 +177,7 @@ async def validar_factura_nuevo(req: PeticionFactura) -> JSONResponse:
                     print(f"   Clave Acceso en factura: {factura.get('claveAcceso', 'N/A')}")
                     print(f"   Total en factura: {factura.get('total', 'N/A')}")
             
-            return JSONResponse(content=response)
+            return NumpyJSONResponse(content=response)
             
         finally:
             # Limpiar archivo temporal
@@ -11,8 +11,7 @@ from typing import Dict, Any, List, Optional, Tuple
 # Usar configuración global de Tesseract
 import configurar_tesseract_global
 
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
 from difflib import SequenceMatcher
 import requests
@@ -26,8 +25,11 @@ from config import (
     MATCH_THRESHOLD,
 )
 from utils import log_step, normalize_comprobante_xml, strip_accents, _to_float
-from helpers.type_conversion import safe_serialize_dict
-from helpers.analisis_imagenes import analizar_imagen_completa, detectar_tipo_archivo
+from helpers.metricas import documentos
+from helpers.perfilado import registrar_entrada
+from helpers.type_conversion import NumpyJSONResponse
+from helpers.carga_documentos import recibir_bytes, TIPOS_IMAGEN
+from helpers.analisis_imagenes import analizar_imagen_completa, detectar_tipo_archivo_desde_bytes
 from helpers.analisis_forense_avanzado import analisis_forense_completo
 from helpers.forensics_avanzado import analizar_forensics_avanzado
 from helpers.invoice_capture_parser import parse_capture_from_bytes
@@ -594,21 +596,44 @@ def _evaluar_riesgo_imagen(imagen_bytes: bytes, texto_extraido: str, campos_fact
 async def validar_imagen(req: PeticionImagen):
     t_all = time.perf_counter()
 
+    # 1) Decodificar base64
+    t0 = time.perf_counter()
+    try:
+        archivo_bytes = base64.b64decode(req.imagen_base64, validate=True)
+    except Exception:
+        raise HTTPException(status_code=400, detail="El campo 'imagen_base64' no es base64 válido.")
+    log_step("1) decode base64", t0)
+
+    return await _validar_imagen_bytes(archivo_bytes, t_all)
+
+
+@router.post("/validar-imagen/archivo")
+async def validar_imagen_archivo(request: Request):
+    """
+    Variante de /validar-imagen sin base64: la imagen llega como multipart
+    (campo 'archivo') o como cuerpo image/*.
+    """
+    t_all = time.perf_counter()
+
+    # 1) recibir archivo (volcado a temporal con tope de tamaño)
+    t0 = time.perf_counter()
+    archivo_bytes = await recibir_bytes(request, TIPOS_IMAGEN)
+    log_step("1) recibir archivo", t0)
+
+    return await _validar_imagen_bytes(archivo_bytes, t_all)
+
+
+async def _validar_imagen_bytes(archivo_bytes: bytes, t_all: float):
+    """Validación de la imagen a partir de sus bytes (común a todas las variantes)."""
+    documentos.inc(tipo="imagen")
+    registrar_entrada(archivo_bytes)
     try:
-        # 1) Decodificar base64
-        t0 = time.perf_counter()
-        try:
-            archivo_bytes = base64.b64decode(req.imagen_base64, validate=True)
-        except Exception:
-            raise HTTPException(status_code=400, detail="El campo 'imagen_base64' no es base64 válido.")
-        
         if len(archivo_bytes) > MAX_PDF_BYTES:  # Usar el mismo límite por ahora
             raise HTTPException(status_code=413, detail=f"El archivo excede el tamaño máximo permitido ({MAX_PDF_BYTES} bytes).")
-        log_step("1) decode base64", t0)
 
         # 2) Detectar tipo de archivo
         t0 = time.perf_counter()
-        tipo_info = detectar_tipo_archivo(req.imagen_base64)
+        tipo_info = detectar_tipo_archivo_desde_bytes(archivo_bytes)
         if not tipo_info["valido"] or tipo_info["tipo"] not in ["PNG", "JPEG", "JPG", "TIFF", "BMP", "WEBP"]:
             raise HTTPException(status_code=400, detail=f"Archivo no es una imagen válida: {tipo_info.get('error', 'Tipo no soportado')}")
         tipo_archivo = tipo_info["tipo"]
@@ -678,7 +703,7 @@ async def validar_imagen(req: PeticionImagen):
             # Convertir imagen a JPEG si no es JPEG/JPG para análisis forense
             imagen_bytes_jpeg = archivo_bytes
             # Detectar tipo de archivo para conversión
-            tipo_info = detectar_tipo_archivo(req.imagen_base64)
+            tipo_info = detectar_tipo_archivo_desde_bytes(archivo_bytes)
             tipo_archivo = tipo_info.get("tipo", "UNKNOWN").upper()
             if not tipo_archivo in ["JPEG", "JPG"]:
                 try:
@@ -697,17 +722,12 @@ async def validar_imagen(req: PeticionImagen):
                     img_original.save(jpeg_buffer, format="JPEG", quality=95, optimize=True)
                     imagen_bytes_jpeg = jpeg_buffer.getvalue()
                     
-                    # Convertir a base64 para el análisis
-                    imagen_base64_jpeg = base64.b64encode(imagen_bytes_jpeg).decode('utf-8')
-                    
                     print(f"Imagen convertida a JPEG para análisis forense. Tamaño original: {len(archivo_bytes)} bytes, JPEG: {len(imagen_bytes_jpeg)} bytes")
                     
                 except Exception as e:
                     print(f"Error convirtiendo imagen a JPEG: {e}")
                     # Usar imagen original si falla la conversión
-                    imagen_base64_jpeg = req.imagen_base64
-            else:
-                imagen_base64_jpeg = req.imagen_base64
+                    imagen_bytes_jpeg = archivo_bytes
             
             # Análisis forense profesional completo (único análisis forense)
             try:
@@ -747,9 +767,9 @@ async def validar_imagen(req: PeticionImagen):
         sri_verificado = factura_con_sri.get("sri_verificado", False)
         mensaje_sri = factura_con_sri.get("mensaje", f"Análisis forense de imagen {tipo_archivo} completado.")
         
-        return JSONResponse(
+        return NumpyJSONResponse(
             status_code=200,
-            content=safe_serialize_dict({
+            content={
                 "sri_verificado": sri_verificado,
                 "mensaje": mensaje_sri,
                 "tipo_archivo": tipo_archivo,
@@ -775,7 +795,7 @@ async def validar_imagen(req: PeticionImagen):
                     "validaciones_financieras": campos_factura.get("financial_checks", {}),
                     "metadatos_avanzados": campos_factura.get("metadata", {})
                 }
-            })
+            }
         )
     
     except Exception as e:
@@ -784,7 +804,7 @@ async def validar_imagen(req: PeticionImagen):
         print(f"   Traceback: {traceback.format_exc()}")
         
         # Respuesta de error genérica
-        return JSONResponse(
+        return NumpyJSONResponse(
             status_code=500,
             content={
                 "sri_verificado": False,
@@ -1,13 +1,14 @@
 # sri.py
+import logging
 import requests
+from functools import lru_cache
 import xml.etree.ElementTree as ET
 from typing import Dict, Optional, Tuple, Any, List
-from zeep import Client
-from zeep.transports import Transport
-try:
-    from zeep.helpers import serialize_object as zeep_serialize
-except Exception:
-    zeep_serialize = None  # fallback simple
+
+from helpers.importacion_diferida import disponible, funcion_diferida
+
+# zeep (y lxml detrás) se importa en la primera consulta al SRI, no al arrancar
+zeep_serialize = funcion_diferida("zeep.helpers", "serialize_object") if disponible("zeep") else None  # fallback simple
 
 # Config externos (si no existen, usa defaults productivos seguros)
 try:
@@ -46,6 +47,8 @@ except Exception:
         except Exception:
             return None
 
+logger = logging.getLogger(__name__)
+
 # ------------------------------------------------------------
 # 1) Validación interna de clave de acceso (módulo 11 + estructura)
 # ------------------------------------------------------------
@@ -239,19 +242,49 @@ def factura_xml_to_json(xml_str: str) -> Dict[str, Any]:
 # ------------------------------------------------------------
 # 3) Cliente SRI + parseo robusto
 # ------------------------------------------------------------
+def cliente_sri(timeout: float = SRI_TIMEOUT):
+    """
+    Cliente zeep del servicio de autorización, uno por proceso (y por timeout).
+
+    Crear el cliente descarga y compila el WSDL y sus esquemas; antes se hacía en
+    cada consulta. La sesión HTTP se reutiliza (keep-alive con el SRI) y `timeout`
+    aplica tanto a la descarga del WSDL como a cada consulta.
+    """
+    # Normalizado: cliente_sri() y cliente_sri(12) deben dar el mismo cliente
+    return _cliente_sri(float(timeout))
+
+
+@lru_cache(maxsize=4)
+def _cliente_sri(timeout: float):
+    from zeep import Client
+    from zeep.transports import Transport
+
+    session = requests.Session()
+    transport = Transport(session=session, timeout=timeout, operation_timeout=timeout)
+    return Client(wsdl=SRI_WSDL, transport=transport)
+
+
+def precargar_cliente_sri() -> None:
+    """
+    Crea el cliente (WSDL compilado) antes de bifurcar los workers.
+
+    Cierra las conexiones que abrió la descarga: un socket heredado por varios
+    procesos no se puede compartir; cada worker abre las suyas en su primera consulta.
+    """
+    cliente_sri().transport.session.close()
+
+
 def sri_autorizacion_por_clave(clave: str, timeout: float = SRI_TIMEOUT):
     """
     Consulta la autorización del comprobante en el SRI por clave de acceso.
     Devuelve: (autorizado: bool, estado: str, xml_comprobante: Optional[str], raw_normalizado: dict)
     """
     try:
-        session = requests.Session()
-        transport = Transport(session=session, timeout=timeout)
-        client = Client(wsdl=SRI_WSDL, transport=transport)
+        client = cliente_sri(timeout)
         resp = client.service.autorizacionComprobante(clave)
         return parse_autorizacion_response(resp)
     except Exception as e:
-        print(f"[DEBUG SRI] Error en sri_autorizacion_por_clave: {e}")
+        logger.debug("[SRI] Error en sri_autorizacion_por_clave: %s", e)
         return False, f"ERROR_SRI: {str(e)}", None, {"error": str(e)}
 
 def _serialize_zeep(obj) -> Dict[str, Any]:
@@ -277,22 +310,22 @@ def parse_autorizacion_response(resp) -> Tuple[bool, str, Optional[str], Dict]:
     try:
         # Normaliza toda la respuesta a dict
         raw_dict = _serialize_zeep(resp)
-        print(f"[DEBUG SRI] Raw dict después de serializar: {raw_dict}")
+        logger.debug("[SRI] Raw dict después de serializar: %s", raw_dict)
 
         # Estructura esperada:
         # { 'claveAccesoConsultada': ..., 'numeroComprobantes': ..., 'autorizaciones': { 'autorizacion': [...] } }
         clave = raw_dict.get("claveAccesoConsultada")
         ncomp = raw_dict.get("numeroComprobantes")
-        print(f"[DEBUG SRI] Clave consultada: {clave}, Número comprobantes: {ncomp}")
+        logger.debug("[SRI] Clave consultada: %s, Número comprobantes: %s", clave, ncomp)
 
         auts = raw_dict.get("autorizaciones") or {}
-        print(f"[DEBUG SRI] Sección autorizaciones: {auts}")
+        logger.debug("[SRI] Sección autorizaciones: %s", auts)
         
         aut_list = auts.get("autorizacion")
         if aut_list and not isinstance(aut_list, list):
             aut_list = [aut_list]
         aut_list = aut_list or []
-        print(f"[DEBUG SRI] Lista de autorizaciones procesada: {len(aut_list)} elementos")
+        logger.debug("[SRI] Lista de autorizaciones procesada: %s elementos", len(aut_list))
 
         raw_auts: List[Dict[str, Any]] = []
         xml = None
@@ -302,8 +335,8 @@ def parse_autorizacion_response(resp) -> Tuple[bool, str, Optional[str], Dict]:
         for i, a in enumerate(aut_list):
             # cada 'a' es dict ya serializado
             estado = (a.get("estado") or "").strip()
-            print(f"[DEBUG SRI] Autorización {i}: estado='{estado}', tipo={type(a)}")
-            print(f"[DEBUG SRI] Autorización {i} completa: {a}")
+            logger.debug("[SRI] Autorización %s: estado='%s', tipo=%s", i, estado, type(a))
+            logger.debug("[SRI] Autorización %s completa: %s", i, a)
             
             estado_global = estado_global or estado  # guarda el primero visto
             d = {
@@ -319,26 +352,26 @@ def parse_autorizacion_response(resp) -> Tuple[bool, str, Optional[str], Dict]:
             estados_validos = ["AUTORIZADO", "AUTHORIZED", "VIGENTE", "VALID"]
             
             if estado_normalizado in estados_validos:
-                print(f"[DEBUG SRI] ENCONTRADO estado válido '{estado}' (normalizado: '{estado_normalizado}') en autorización {i}")
+                logger.debug("[SRI] ENCONTRADO estado válido '%s' (normalizado: '%s') en autorización %s", estado, estado_normalizado, i)
                 autorizado = True
                 xml = a.get("comprobante")
                 if xml:
-                    print(f"[DEBUG SRI] XML comprobante obtenido (longitud: {len(str(xml))})")
+                    logger.debug("[SRI] XML comprobante obtenido (longitud: %s)", len(str(xml)))
                 else:
-                    print(f"[DEBUG SRI] ADVERTENCIA: Estado {estado} pero sin XML comprobante")
+                    logger.debug("[SRI] ADVERTENCIA: Estado %s pero sin XML comprobante", estado)
             else:
-                print(f"[DEBUG SRI] Estado no válido: '{estado}' (normalizado: '{estado_normalizado}')")
+                logger.debug("[SRI] Estado no válido: '%s' (normalizado: '%s')", estado, estado_normalizado)
 
         # Si no encontramos ningún AUTORIZADO, verificar si hay comprobantes para debug
         if not autorizado and aut_list:
-            print(f"[DEBUG SRI] No hay estados AUTORIZADO. Buscando primer comprobante para debug...")
+            logger.debug("[SRI] No hay estados AUTORIZADO. Buscando primer comprobante para debug...")
             for i, a in enumerate(aut_list):
                 if a.get("comprobante"):
                     xml = a.get("comprobante")
-                    print(f"[DEBUG SRI] Tomando XML de autorización {i} para debug")
+                    logger.debug("[SRI] Tomando XML de autorización %s para debug", i)
                     break
 
-        print(f"[DEBUG SRI] Resultado final: autorizado={autorizado}, estado_global='{estado_global}'")
+        logger.debug("[SRI] Resultado final: autorizado=%s, estado_global='%s'", autorizado, estado_global)
 
         raw = {
             "claveAccesoConsultada": clave,
@@ -347,18 +380,18 @@ def parse_autorizacion_response(resp) -> Tuple[bool, str, Optional[str], Dict]:
         }
         
         resultado_estado = estado_global if estado_global else ("AUTORIZADO" if autorizado else "SIN_ESTADO")
-        print(f"[DEBUG SRI] Retornando: autorizado={autorizado}, estado='{resultado_estado}'")
+        logger.debug("[SRI] Retornando: autorizado=%s, estado='%s'", autorizado, resultado_estado)
         
         return autorizado, resultado_estado, xml, raw
 
     except Exception as e:
-        print(f"[DEBUG SRI] ERROR en parse_autorizacion_response: {e}")
-        print(f"[DEBUG SRI] Tipo de respuesta recibida: {type(resp)}")
+        logger.debug("[SRI] ERROR en parse_autorizacion_response: %s", e)
+        logger.debug("[SRI] Tipo de respuesta recibida: %s", type(resp))
         
         # Fallback: intenta al menos repr
         try:
             raw = dict(resp)  # puede fallar
         except Exception as e2:
-            print(f"[DEBUG SRI] Error en fallback dict(): {e2}")
+            logger.debug("[SRI] Error en fallback dict(): %s", e2)
             raw = {"_repr": str(resp), "_error": str(e)}
         return False, f"ERROR_PARSING: {str(e)}", None, raw
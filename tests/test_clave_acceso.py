@@ -0,0 +1,71 @@
+"""
+Regresiones del escáner de claves de acceso (helpers/clave_acceso).
+
+    python -m pytest -q tests/test_clave_acceso.py
+"""
+
+import random
+
+from helpers.clave_acceso import clave_valida, dv_modulo11, escanear_claves, mejor_clave
+
+# 19/08/2024, factura, RUC, pruebas, serie 001-001, secuencial 123, código numérico, emisión normal
+_BASE = "19082024" + "01" + "1790012345001" + "1" + "001001" + "000000123" + "12345678" + "1"
+
+
+def _clave(base48: str = _BASE) -> str:
+    return base48 + str(dv_modulo11(base48))
+
+
+def _adulterada() -> str:
+    """La clave válida con el secuencial cambiado y el DV original: estructura plausible, DV inválido."""
+    clave = _clave()
+    adulterada = clave[:30] + "9" + clave[31:]
+    assert not clave_valida(adulterada)
+    return adulterada
+
+
+def _tabla_items(filas: int, semilla: int = 7) -> str:
+    """Filas de ítems con cantidades y montos enteros: una sola corrida larga de dígitos."""
+    rnd = random.Random(semilla)
+    return "\n".join(
+        f"{i} {rnd.randint(1, 9)} {rnd.randint(1, 999)} 0 {rnd.randint(1, 999)}" for i in range(1, filas + 1)
+    )
+
+
+def test_clave_adulterada_bajo_la_etiqueta_gana_a_ventanas_validas_por_azar():
+    adulterada = _adulterada()
+    texto = f"NUMERO DE AUTORIZACION\n{adulterada}\n{_tabla_items(40)}\nSUBTOTAL 12.50"
+
+    candidatos = escanear_claves(texto)
+    # La corrida (clave + tabla) tiene ventanas que pasan el módulo 11 por azar
+    assert any(c.valida for c in candidatos)
+    assert candidatos[0].clave == adulterada
+    assert not candidatos[0].valida
+
+
+def test_tabla_con_montos_decimales_no_se_une_en_una_corrida():
+    adulterada = _adulterada()
+    tabla = "\n".join(f"{i} 1 3.50 0.00 3.50" for i in range(1, 60))
+    texto = f"NUMERO DE AUTORIZACION\n{adulterada}\n{tabla}"
+
+    assert mejor_clave(texto) == adulterada
+
+
+def test_ruc_en_la_linea_anterior():
+    for clave in (_clave(), _adulterada()):
+        texto = f"CLAVE DE ACCESO\nR.U.C.: 1790012345001\n{clave}\nFECHA 19/08/2024"
+        assert mejor_clave(texto) == clave
+
+
+def test_clave_en_grupos_con_ruc_pegado():
+    clave = _adulterada()
+    agrupada = " ".join(clave[i:i + 4] for i in range(0, len(clave), 4))
+    texto = f"NUMERO DE AUTORIZACION\n1790012345001\n{agrupada}"
+
+    assert mejor_clave(texto) == clave
+
+
+def test_clave_valida_sin_etiqueta():
+    clave = _clave()
+    assert mejor_clave(f"documento {clave} fin") == clave
+    assert mejor_clave(f"documento {clave} fin", solo_validas=True) == clave
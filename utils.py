@@ -1,10 +1,18 @@
 import time
 import html
+import logging
 import unicodedata
 import re
 
-def log_step(step: str, t0: float):
-    print(f"[TIMING] {step}: {time.perf_counter() - t0:.3f}s")
+logger = logging.getLogger("timing")
+
+def log_step(step: str, t0: float, etapa: str = None):
+    """Registra el paso en el log; con `etapa` además lo añade como etapa de la traza de la petición."""
+    if etapa is not None:
+        # Import local: helpers/__init__ importa módulos que dependen de utils
+        from helpers.trazas import registrar_span
+        registrar_span(etapa, t0)
+    logger.debug("%s: %.3fs", step, time.perf_counter() - t0)
 
 def normalize_comprobante_xml(x: str) -> str:
     if not isinstance(x, str):